@@ -2,8 +2,12 @@ from typing import List, Dict
 from uuid import UUID
 from datetime import datetime, timezone
 from ..schemas import Assignment, MatchResponse
-from ..crud import get_riders, get_drivers
-from ..utils.distance_calc import calculate_distance
+from ..crud import get_rider_trips, record_algorithm_run
+from ..fleet_index import fleet_index
+from ..routing.engine import travel_table
+from ..config import AVERAGE_SPEED_KMH
+from ..utils.fairness_metrics import fairness_metrics
+from ..utils.profiling import PhaseTimer
 from ..utils.utility_function import calculate_utility, calculate_time_utility, gini_index, social_welfare
 
 def iterative_voting_algorithm(voting_rule: str = "borda") -> MatchResponse:
@@ -11,100 +15,83 @@ def iterative_voting_algorithm(voting_rule: str = "borda") -> MatchResponse:
     Iterative Voting Algorithm for ride matching
     Riders vote among candidate routes using selected voting rule
     """
-    # Get all riders and drivers
-    riders = get_riders()
-    drivers = get_drivers()
+    timer = PhaseTimer()
     
-    # Filter available drivers
-    available_drivers = [d for d in drivers if d.available]
+    # Get all riders (only the columns matching reads) and the available drivers from the live fleet index
+    riders = get_rider_trips()
+    available_drivers = fleet_index.available_drivers()
+    timer.lap("data_fetch")
     
     assignments = []
     assigned_driver_ids = set()
     utilities = []
     
-    # For each rider, create a preference list of drivers
-    rider_preferences = {}
+    # Pickup travel between every rider and available driver (road network and learned travel times when available)
+    pickup_table = travel_table(
+        [(rider.origin_lat, rider.origin_lon) for rider in riders],
+        [(driver.current_lat, driver.current_lon) for driver in available_drivers]
+    )
     
-    for rider in riders:
-        driver_scores = []
-        
-        # Score each available driver
-        for driver in available_drivers:
-            if driver.id in assigned_driver_ids:
-                continue
-                
-            # Calculate score based on distance
-            distance = calculate_distance(
-                rider.origin_lat, rider.origin_lon,
-                driver.current_lat, driver.current_lon
-            )
-            
-            # Enhanced scoring using rider preferences
-            # Base score on distance (lower distance = higher score)
-            distance_score = 1 / (1 + distance)
-            
-            # If rider has preferred departure time, factor it in
-            time_score = 1.0
-            if rider.preferred_departure:
-                # Calculate time-based utility with timezone-aware datetime
-                current_time = datetime.now(timezone.utc)
-                time_score = calculate_time_utility(rider.beta or 0.5, rider.preferred_departure, current_time)
-            
-            # Combined score
-            score = distance_score * time_score
-            driver_scores.append((driver.id, score))
+    # Score (utility) of every rider/driver pair
+    current_time = datetime.now(timezone.utc)
+    utility_table = []
+    for i, rider in enumerate(riders):
+        # If rider has preferred departure time, factor it in (independent of the driver)
+        time_score = 1.0
+        if rider.preferred_departure:
+            time_score = calculate_time_utility(rider.beta or 0.5, rider.preferred_departure, current_time)
         
+        # Base score on pickup time as km at average speed (lower distance = higher score)
+        utility_table.append([
+            (1 / (1 + minutes * AVERAGE_SPEED_KMH / 60)) * time_score
+            for _, minutes in pickup_table[i]
+        ])
+    timer.lap("utility")
+    
+    # For each rider, create a preference list of drivers (indices into available_drivers)
+    rider_preferences = {}
+    
+    for i, rider in enumerate(riders):
         # Sort by score (descending)
-        driver_scores.sort(key=lambda x: x[1], reverse=True)
-        rider_preferences[rider.id] = [driver_id for driver_id, _ in driver_scores]
+        rider_preferences[i] = sorted(range(len(available_drivers)), key=lambda j: utility_table[i][j], reverse=True)
     
     # Apply voting rule (simplified implementation)
     # In a full implementation, this would use more sophisticated voting mechanisms
     
     # Simple assignment based on preferences
-    for rider in riders:
-        if rider.id not in rider_preferences:
-            continue
-            
+    for i, rider in enumerate(riders):
         # Find the highest-ranked available driver
-        for driver_id in rider_preferences[rider.id]:
+        for j in rider_preferences[i]:
+            driver_id = available_drivers[j].id
             if driver_id not in assigned_driver_ids:
-                # Calculate utility
-                rider_obj = next((r for r in riders if r.id == rider.id), None)
-                driver_obj = next((d for d in available_drivers if d.id == driver_id), None)
+                utility = utility_table[i][j]
                 
-                if rider_obj and driver_obj:
-                    distance = calculate_distance(
-                        rider_obj.origin_lat, rider_obj.origin_lon,
-                        driver_obj.current_lat, driver_obj.current_lon
-                    )
-                    
-                    # Enhanced utility calculation using preferences
-                    distance_utility = 1 / (1 + distance)
-                    time_utility = 1.0
-                    if rider_obj.preferred_departure:
-                        current_time = datetime.now(timezone.utc)
-                        time_utility = calculate_time_utility(rider_obj.beta or 0.5, rider_obj.preferred_departure, current_time)
-                    utility = distance_utility * time_utility
-                    
-                    assignment = Assignment(
-                        rider_id=rider.id,
-                        driver_id=driver_id,
-                        utility=utility
-                    )
-                    assignments.append(assignment)
-                    assigned_driver_ids.add(driver_id)
-                    utilities.append(utility)
+                assignment = Assignment(
+                    rider_id=rider.id,
+                    driver_id=driver_id,
+                    utility=utility
+                )
+                assignments.append(assignment)
+                assigned_driver_ids.add(driver_id)
+                utilities.append(utility)
                 break
+    timer.lap("assignment")
+    
+    # Feed the rolling fairness metrics served by /metrics/latest
+    fairness_metrics.record("IV", utilities)
     
     # Calculate metrics
     gini = gini_index(utilities)
     sw = social_welfare(utilities)
+    timer.lap("metrics")
+    
+    timings = timer.as_metrics()
+    record_algorithm_run("IV", len(available_drivers), timings, utilities)
     
     return MatchResponse(
         algorithm="IV",
         assignments=assignments,
-        metrics={"gini": gini, "social_welfare": sw}
+        metrics={"gini": gini, "social_welfare": sw, "timings_ms": timings, "fleet_size": len(available_drivers)}
     )
 
 def borda_voting(riders: List, available_drivers: List) -> MatchResponse:
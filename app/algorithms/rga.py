@@ -3,59 +3,66 @@ from typing import List, Dict
 from uuid import UUID
 from datetime import datetime, timezone
 from ..schemas import Assignment, MatchResponse
-from ..crud import get_riders, get_drivers
-from ..utils.distance_calc import calculate_distance
+from ..crud import get_rider_trips, record_algorithm_run
+from ..fleet_index import fleet_index
+from ..routing.engine import travel_table
+from ..config import AVERAGE_SPEED_KMH
+from ..utils.fairness_metrics import fairness_metrics
+from ..utils.profiling import PhaseTimer
 from ..utils.utility_function import calculate_utility, calculate_time_utility, gini_index, social_welfare
 
 def rga_algorithm() -> MatchResponse:
     """
     Randomized Greedy Algorithm for ride matching
     """
-    # Get all riders and drivers
-    riders = get_riders()
-    drivers = get_drivers()
+    timer = PhaseTimer()
     
-    # Filter available drivers
-    available_drivers = [d for d in drivers if d.available]
+    # Get all riders (only the columns matching reads) and the available drivers from the live fleet index
+    riders = get_rider_trips()
+    available_drivers = fleet_index.available_drivers()
+    timer.lap("data_fetch")
     
     # Randomly shuffle riders
     random.shuffle(riders)
     
+    # Pickup travel between every rider and available driver (road network and learned travel times when available)
+    pickup_table = travel_table(
+        [(rider.origin_lat, rider.origin_lon) for rider in riders],
+        [(driver.current_lat, driver.current_lon) for driver in available_drivers]
+    )
+    
+    # Utility of every rider/driver pair
+    current_time = datetime.now(timezone.utc)
+    utility_table = []
+    for i, rider in enumerate(riders):
+        # If rider has preferred departure time, factor it in (independent of the driver)
+        time_utility = 1.0
+        if rider.preferred_departure:
+            time_utility = calculate_time_utility(rider.beta or 0.5, rider.preferred_departure, current_time)
+        
+        # Base utility on pickup time (as km at average speed), combined with the time utility
+        utility_table.append([
+            (1 / (1 + minutes * AVERAGE_SPEED_KMH / 60)) * time_utility
+            for _, minutes in pickup_table[i]
+        ])
+    timer.lap("utility")
+    
     assignments = []
     assigned_driver_ids = set()
     utilities = []
     
     # For each rider, find the best available driver
-    for rider in riders:
+    for i, rider in enumerate(riders):
         best_driver = None
         best_utility = -1
         
         # Find the best available driver for this rider
-        for driver in available_drivers:
+        for j, driver in enumerate(available_drivers):
             # Skip if driver already assigned
             if driver.id in assigned_driver_ids:
                 continue
-                
-            # Calculate utility based on distance and rider preferences
-            distance = calculate_distance(
-                rider.origin_lat, rider.origin_lon,
-                driver.current_lat, driver.current_lon
-            )
-            
-            # Enhanced utility function using rider preferences
-            # Base utility on distance
-            distance_utility = 1 / (1 + distance)
-            
-            # If rider has preferred departure time, factor it in
-            time_utility = 1.0
-            if rider.preferred_departure:
-                # Calculate time-based utility with timezone-aware datetime
-                current_time = datetime.now(timezone.utc)
-                time_utility = calculate_time_utility(rider.beta or 0.5, rider.preferred_departure, current_time)
-            
-            # Combined utility
-            utility = distance_utility * time_utility
             
+            utility = utility_table[i][j]
             if utility > best_utility:
                 best_utility = utility
                 best_driver = driver
@@ -70,13 +77,21 @@ def rga_algorithm() -> MatchResponse:
             assignments.append(assignment)
             assigned_driver_ids.add(best_driver.id)
             utilities.append(best_utility)
+    timer.lap("assignment")
+    
+    # Feed the rolling fairness metrics served by /metrics/latest
+    fairness_metrics.record("RGA", utilities)
     
     # Calculate metrics
     gini = gini_index(utilities)
     sw = social_welfare(utilities)
+    timer.lap("metrics")
+    
+    timings = timer.as_metrics()
+    record_algorithm_run("RGA", len(available_drivers), timings, utilities)
     
     return MatchResponse(
         algorithm="RGA",
         assignments=assignments,
-        metrics={"gini": gini, "social_welfare": sw}
+        metrics={"gini": gini, "social_welfare": sw, "timings_ms": timings, "fleet_size": len(available_drivers)}
     )
\ No newline at end of file
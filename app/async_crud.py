@@ -0,0 +1,404 @@
+"""
+Async versions of the hot CRUD operations (users, riders, drivers, rides, tracking)
+
+They mirror the functions of the same name in crud.py but go through the
+shared non-blocking PostgREST client, so awaiting them lets the event loop
+serve other requests while the database round trip is in flight.
+
+Database errors propagate to the caller (the routes turn them into error
+responses); "not found" is None, an empty list or False. Only
+trigger_emergency_sos, which reports its outcome, catches them itself.
+"""
+import asyncio
+from typing import List, Optional, Sequence
+from uuid import UUID
+from datetime import datetime, timezone
+from .async_database import get_async_db, is_transient_error, Filters
+from .loaders import get_loaders
+from .pagination import Page, page_size, decode_cursor, cursor_after
+from .schemas import RiderCreate, RiderResponse, DriverCreate, DriverResponse, RideCreate, RideResponse, UserResponse, DriverLocation, RiderTrip, projection
+from .serialization import validate_row, validate_rows
+from .utils.datetime_serializer import simple_datetime_handler
+from .utils.principal_cache import invalidate_principal
+from .utils.batching import BackgroundBatcher
+from .fleet_index import fleet_index
+from .config import (WALLET_BATCH_MAX_SIZE, WALLET_BATCH_MAX_DELAY_SECONDS, WALLET_BATCH_MAX_FAILED_FLUSHES,
+                     LOYALTY_BATCH_MAX_SIZE, LOYALTY_BATCH_MAX_DELAY_SECONDS, LOYALTY_BATCH_MAX_FAILED_FLUSHES,
+                     LOYALTY_POINTS_PER_RIDE, LOYALTY_POINTS_PER_FARE_UNIT)
+
+async def _select_page(table: str, model, filters: Optional[Filters], sort_columns: Sequence[str],
+                       descending: bool, limit: Optional[int], cursor: Optional[str]) -> Page:
+    """
+    One keyset page of a table ordered by sort_columns (which must end in a unique column)
+    """
+    size = page_size(limit)
+    filters = dict(filters or {})
+    if cursor:
+        filters[tuple(sort_columns)] = ("lt" if descending else "gt", decode_cursor(cursor, len(sort_columns)))
+    direction = "desc" if descending else "asc"
+    rows = await get_async_db().select(table, "*", filters, order=[f"{column}.{direction}" for column in sort_columns],
+                                       limit=size + 1)
+    next_cursor = cursor_after(rows[size - 1], sort_columns) if len(rows) > size else None
+    return Page(validate_rows(model, rows[:size]), next_cursor)
+
+# User operations
+async def get_user_by_email(email: str) -> Optional[UserResponse]:
+    return await get_loaders().users_by_email.load(email)
+
+async def get_user_by_id(user_id: UUID) -> Optional[UserResponse]:
+    """
+    Get user by ID
+    """
+    return await get_loaders().users.load(user_id)
+
+async def update_user_role(user_id: UUID, role: str) -> Optional[UserResponse]:
+    """
+    Update user role, combining 'rider' and 'driver' into 'both'
+    """
+    current_user = await get_user_by_id(user_id)
+    if not current_user:
+        return None
+
+    current_role = current_user.role
+    new_role = role
+    if current_role == 'both' or {current_role, role} == {'rider', 'driver'}:
+        new_role = 'both'
+
+    rows = await get_async_db().update("users", {"role": new_role}, {"id": str(user_id)})
+    get_loaders().invalidate("users")
+    invalidate_principal(user_id)
+    if rows:
+        return validate_row(UserResponse, rows[0])
+    return None
+
+# Rider operations
+async def create_rider(rider: RiderCreate) -> RiderResponse:
+    rows = await get_async_db().insert("riders", rider.model_dump(mode="json"))
+    return validate_row(RiderResponse, rows[0])
+
+async def get_rider_by_user_id(user_id: UUID) -> Optional[RiderResponse]:
+    row = await get_async_db().select_one("riders", filters={"user_id": str(user_id)})
+    if row:
+        return validate_row(RiderResponse, row)
+    return None
+
+async def get_rider(rider_id: UUID) -> Optional[RiderResponse]:
+    return await get_loaders().riders.load(rider_id)
+
+async def get_rider_trip(rider_id: UUID) -> Optional[RiderTrip]:
+    """
+    Get only the origin, destination and timing columns of a rider
+    """
+    return await get_loaders().rider_trips.load(rider_id)
+
+async def get_riders() -> List[RiderResponse]:
+    rows = await get_async_db().select("riders")
+    return validate_rows(RiderResponse, rows)
+
+async def get_riders_page(limit: Optional[int] = None, cursor: Optional[str] = None) -> Page:
+    """
+    Riders, newest first, one page at a time
+    """
+    return await _select_page("riders", RiderResponse, None, ("created_at", "id"), True, limit, cursor)
+
+async def update_rider(rider_id: UUID, rider: RiderCreate) -> Optional[RiderResponse]:
+    rows = await get_async_db().update("riders", rider.model_dump(mode="json"), {"id": str(rider_id)})
+    get_loaders().invalidate("riders")
+    if rows:
+        return validate_row(RiderResponse, rows[0])
+    return None
+
+async def delete_rider(rider_id: UUID) -> bool:
+    rows = await get_async_db().delete("riders", {"id": str(rider_id)})
+    get_loaders().invalidate("riders")
+    return len(rows) > 0
+
+# Driver operations
+async def create_driver(driver: DriverCreate) -> DriverResponse:
+    rows = await get_async_db().insert("drivers", driver.model_dump(mode="json"))
+    created = validate_row(DriverResponse, rows[0])
+    fleet_index.track(created)
+    return created
+
+async def get_driver_by_user_id(user_id: UUID) -> Optional[DriverResponse]:
+    row = await get_async_db().select_one("drivers", filters={"user_id": str(user_id)})
+    if row:
+        return validate_row(DriverResponse, row)
+    return None
+
+async def get_driver(driver_id: UUID) -> Optional[DriverResponse]:
+    return await get_loaders().drivers.load(driver_id)
+
+async def get_drivers() -> List[DriverResponse]:
+    rows = await get_async_db().select("drivers")
+    return validate_rows(DriverResponse, rows)
+
+async def get_driver_location(driver_id: UUID) -> Optional[DriverLocation]:
+    """
+    Get only the position and availability of a driver
+    """
+    return await get_loaders().driver_locations.load(driver_id)
+
+async def get_driver_locations(available_only: bool = False) -> List[DriverLocation]:
+    """
+    Get the position and availability of drivers, optionally only available ones
+    """
+    rows = await get_async_db().select("drivers", projection(DriverLocation), {"available": True} if available_only else None)
+    return validate_rows(DriverLocation, rows)
+
+async def get_drivers_page(limit: Optional[int] = None, cursor: Optional[str] = None) -> Page:
+    """
+    Drivers in id order, one page at a time (the drivers table has no creation time)
+    """
+    return await _select_page("drivers", DriverResponse, None, ("id",), False, limit, cursor)
+
+async def update_driver(driver_id: UUID, driver: DriverCreate) -> Optional[DriverResponse]:
+    rows = await get_async_db().update("drivers", driver.model_dump(mode="json"), {"id": str(driver_id)})
+    get_loaders().invalidate("drivers")
+    if rows:
+        updated = validate_row(DriverResponse, rows[0])
+        fleet_index.track(updated)
+        return updated
+    return None
+
+async def update_driver_location(driver_id: UUID, lat: float, lon: float, available: bool = True) -> Optional[DriverResponse]:
+    update_data = {
+        "current_lat": lat,
+        "current_lon": lon,
+        "available": available
+    }
+    rows = await get_async_db().update("drivers", update_data, {"id": str(driver_id)})
+    get_loaders().invalidate("drivers")
+    if rows:
+        updated = validate_row(DriverResponse, rows[0])
+        fleet_index.track(updated)
+        return updated
+    return None
+
+async def delete_driver(driver_id: UUID) -> bool:
+    rows = await get_async_db().delete("drivers", {"id": str(driver_id)})
+    get_loaders().invalidate("drivers")
+    fleet_index.remove(driver_id)
+    return len(rows) > 0
+
+# Ride operations
+async def create_ride(ride: RideCreate) -> RideResponse:
+    rows = await get_async_db().insert("rides", ride.model_dump(mode="json"))
+    return validate_row(RideResponse, rows[0])
+
+async def _get_ride_list(filters: Optional[dict]) -> List[RideResponse]:
+    rows = await get_async_db().select("rides", filters=filters)
+    return validate_rows(RideResponse, rows)
+
+async def get_rides() -> List[RideResponse]:
+    """
+    Get all rides
+    """
+    return await _get_ride_list(None)
+
+async def get_rides_by_user_id(user_id: UUID) -> List[RideResponse]:
+    """
+    Get all rides for a specific user
+    """
+    return await _get_ride_list({"user_id": str(user_id)})
+
+async def get_rides_by_user_id_page(user_id: UUID, limit: Optional[int] = None,
+                                    cursor: Optional[str] = None) -> Page:
+    """
+    Rides of a user in id order, one page at a time (the rides table has no creation time)
+    """
+    return await _select_page("rides", RideResponse, {"user_id": str(user_id)}, ("id",), False, limit, cursor)
+
+async def get_rides_by_rider(rider_id: UUID) -> List[RideResponse]:
+    """
+    Get all rides for a specific rider
+    """
+    return await _get_ride_list({"rider_id": str(rider_id)})
+
+async def get_rides_by_driver(driver_id: UUID) -> List[RideResponse]:
+    """
+    Get all rides for a specific driver
+    """
+    return await _get_ride_list({"driver_id": str(driver_id)})
+
+async def get_ride(ride_id: UUID) -> Optional[RideResponse]:
+    """
+    Get a specific ride by ID
+    """
+    return await get_loaders().rides.load(ride_id)
+
+async def update_ride(ride_id: UUID, ride: RideCreate) -> Optional[RideResponse]:
+    """
+    Update a ride record
+    """
+    rows = await get_async_db().update("rides", ride.model_dump(mode="json"), {"id": str(ride_id)})
+    get_loaders().invalidate("rides")
+    if rows:
+        return validate_row(RideResponse, rows[0])
+    return None
+
+async def update_ride_status(ride_id: UUID, status: str) -> Optional[RideResponse]:
+    """
+    Update the status of a ride
+    """
+    rows = await get_async_db().update("rides", {"status": status}, {"id": str(ride_id)})
+    get_loaders().invalidate("rides")
+    if rows:
+        return validate_row(RideResponse, rows[0])
+    return None
+
+async def cancel_ride(ride_id: UUID) -> bool:
+    """
+    Cancel a ride by updating its status
+    """
+    rows = await get_async_db().update("rides", {"status": "cancelled"}, {"id": str(ride_id)})
+    get_loaders().invalidate("rides")
+    return len(rows) > 0
+
+# Tracking operations
+async def create_tracking_point(driver_id: UUID, lat: float, lon: float, speed: float, heading: float,
+                                user_id: Optional[UUID] = None) -> bool:
+    """
+    Append a driver location ping to the tracking table
+    """
+    tracking_data = {
+        "user_id": str(user_id) if user_id else None,
+        "driver_id": str(driver_id),
+        "lat": lat,
+        "lon": lon,
+        "speed": speed,
+        "heading": heading,
+        "updated_at": datetime.now(timezone.utc).isoformat()
+    }
+    await get_async_db().insert("tracking", tracking_data, returning=False)
+    return True
+
+async def get_driver_trajectory(driver_id: UUID, start: datetime, end: datetime, limit: int) -> List[dict]:
+    """
+    A driver's pings with start <= updated_at < end in time order (only the partitions of those days are read)
+    """
+    return await get_async_db().select(
+        "tracking", "lat,lon,speed,heading,updated_at",
+        {"driver_id": str(driver_id), "updated_at": [("gte", start.isoformat()), ("lt", end.isoformat())]},
+        order="updated_at", limit=limit
+    )
+
+# Dead letters
+async def record_dead_letters(source: str, entries: List[dict], error: str) -> None:
+    """
+    Store entries a background writer gave up on (models/dead_letters.sql), so they can be replayed
+    """
+    await get_async_db().insert("dead_letters", [{"source": source, "payload": entry, "error": error} for entry in entries],
+                                returning=False)
+
+# Wallet operations
+async def apply_wallet_transactions(entries: List[dict]) -> List[dict]:
+    """
+    Append many transactions to the wallet ledger in one round trip
+    """
+    return await get_async_db().rpc("wallet_apply_transactions", {"p_entries": entries}) or []
+
+# Fare charges of ended rides, appended to the ledger in batches off the request path
+# (requeued through an outage; the idempotency keys make the repeated writes safe)
+fare_charges = BackgroundBatcher(apply_wallet_transactions, WALLET_BATCH_MAX_SIZE,
+                                 WALLET_BATCH_MAX_DELAY_SECONDS, name="fare charge", dead_letter=record_dead_letters,
+                                 is_transient=is_transient_error, max_failed_flushes=WALLET_BATCH_MAX_FAILED_FLUSHES)
+
+def charge_ride_fare(ride: RideResponse) -> bool:
+    """
+    Queue the debit of a completed ride's fare from the rider's wallet
+
+    The ride id is the idempotency key, so a ride is charged at most once.
+    """
+    if not ride.user_id or not ride.fare:
+        return False
+    fare_charges.add({
+        "user_id": str(ride.user_id),
+        "amount": ride.fare,
+        "transaction_type": "debit",
+        "description": f"Fare for ride {ride.id}",
+        "idempotency_key": f"ride-fare:{ride.id}"
+    })
+    return True
+
+# Loyalty operations
+async def accrue_loyalty_points(grants: List[dict]) -> List[dict]:
+    """
+    Add loyalty points for many users and re-tier them in one round trip
+    """
+    return await get_async_db().rpc("loyalty_accrue_batch", {"p_grants": grants}) or []
+
+# Point grants of completed rides, accrued in batches off the request path
+# (requeued through an outage; the grant keys make the repeated writes safe)
+loyalty_grants = BackgroundBatcher(accrue_loyalty_points, LOYALTY_BATCH_MAX_SIZE,
+                                   LOYALTY_BATCH_MAX_DELAY_SECONDS, name="loyalty grant", dead_letter=record_dead_letters,
+                                   is_transient=is_transient_error, max_failed_flushes=LOYALTY_BATCH_MAX_FAILED_FLUSHES)
+
+def grant_ride_loyalty_points(ride: RideResponse) -> bool:
+    """
+    Queue the loyalty points earned by a completed ride
+
+    The ride id is the grant key, so a ride earns points at most once.
+    """
+    if not ride.user_id:
+        return False
+    points = LOYALTY_POINTS_PER_RIDE + int((ride.fare or 0) * LOYALTY_POINTS_PER_FARE_UNIT)
+    loyalty_grants.add({
+        "user_id": str(ride.user_id),
+        "points": points,
+        "grant_key": f"ride:{ride.id}"
+    })
+    return True
+
+# SOS operations
+async def get_primary_emergency_contact(user_id: UUID) -> Optional[dict]:
+    """
+    Get the primary emergency contact for a user
+    """
+    row = await get_async_db().select_one("emergency_contacts", filters={"user_id": str(user_id), "is_primary": True})
+    return simple_datetime_handler(row) if row else None
+
+async def trigger_emergency_sos(ride_id: UUID, user_id: UUID, message: str = "Emergency SOS") -> dict:
+    """
+    Trigger an emergency SOS
+
+    The ride and the emergency contact are fetched concurrently, then the
+    rider and driver of the ride in one more round trip.
+    """
+    try:
+        ride, emergency_contact = await asyncio.gather(get_ride(ride_id), get_primary_emergency_contact(user_id))
+        if not ride:
+            return {"message": "Ride not found", "emergency_contact_notified": False, "location_shared": False}
+        if not emergency_contact:
+            return {"message": "No emergency contact found", "emergency_contact_notified": False, "location_shared": False}
+
+        rider, driver = await asyncio.gather(
+            get_rider(ride.rider_id) if ride.rider_id else asyncio.sleep(0),
+            get_driver(ride.driver_id) if ride.driver_id else asyncio.sleep(0)
+        )
+
+        # In a real implementation, this would:
+        # 1. Send SMS/WhatsApp to emergency contact
+        # 2. Send push notification to emergency contact
+        # 3. Share live location URL
+        # 4. Notify support team
+
+        # For now, we'll just log the action
+        print(f"EMERGENCY SOS TRIGGERED: {message}")
+        print(f"Ride ID: {ride_id}")
+        print(f"Rider: {rider.name if rider else 'Unknown'}")
+        print(f"Driver: {driver.name if driver else 'Unknown'}")
+        print(f"Emergency Contact: {emergency_contact['name']} ({emergency_contact['phone']})")
+
+        return {
+            "message": "Emergency SOS triggered successfully",
+            "emergency_contact_notified": True,
+            "location_shared": True
+        }
+    except Exception as e:
+        print(f"Error triggering emergency SOS: {e}")
+        return {
+            "message": "Error triggering emergency SOS",
+            "emergency_contact_notified": False,
+            "location_shared": False
+        }
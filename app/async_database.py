@@ -0,0 +1,329 @@
+import asyncio
+import json
+from abc import ABC, abstractmethod
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+import httpx
+from .config import (
+    SUPABASE_URL, SUPABASE_KEY,
+    DB_HTTP_MAX_CONNECTIONS, DB_HTTP_MAX_KEEPALIVE_CONNECTIONS, DB_HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    DB_HTTP_TIMEOUT_SECONDS, DB_HTTP_CONNECT_TIMEOUT_SECONDS, DB_HTTP2, STORAGE_BACKEND
+)
+from .pagination import keyset_condition
+
+try:
+    import h2  # noqa: F401  (required by httpx for HTTP/2)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# A filter value is either a plain value (equality) or an (operator, value) pair,
+# e.g. {"id": ride_id, "updated_at": ("gt", since), "status": ("in", ["requested", "assigned"])}.
+# A list of pairs applies several conditions to one column: {"updated_at": [("gt", start), ("lte", end)]}.
+# A tuple of columns compares rows for keyset pagination: {("created_at", "id"): ("lt", [created_at, id])}
+FilterValue = Union[Any, Tuple[str, Any]]
+Filters = Dict[Union[str, Tuple[str, ...]], FilterValue]
+
+
+# Response header reporting how many database round trips served a request
+ROUND_TRIPS_HEADER = "X-DB-Round-Trips"
+
+
+class RoundTripCounter:
+    """
+    Number of database round trips made in one request scope
+    """
+
+    def __init__(self):
+        self.count = 0
+
+
+_round_trips: ContextVar[Optional[RoundTripCounter]] = ContextVar("db_round_trips", default=None)
+
+
+def start_round_trip_count() -> RoundTripCounter:
+    """
+    Start counting round trips for the current context (one per HTTP request)
+    """
+    counter = RoundTripCounter()
+    _round_trips.set(counter)
+    return counter
+
+
+def record_round_trip() -> None:
+    counter = _round_trips.get()
+    if counter is not None:
+        counter.count += 1
+
+
+class PostgrestError(Exception):
+    """
+    Raised when PostgREST answers with an error status
+    """
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"PostgREST error {status_code}: {message}")
+        self.status_code = status_code
+
+
+# SQLSTATE classes of failures that may go away on their own: connection exception,
+# transaction rollback (serialization failure, deadlock), insufficient resources,
+# operator intervention (statement timeout, shutdown)
+TRANSIENT_SQLSTATE_CLASSES = ("08", "40", "53", "57")
+
+
+def is_transient_error(error: Exception) -> bool:
+    """
+    True if a failed database call is worth repeating as is (unreachable, timed out,
+    overloaded), False if the database rejected the request itself
+    """
+    if isinstance(error, PostgrestError):
+        return error.status_code >= 500 or error.status_code in (408, 429)
+    if isinstance(error, (httpx.TransportError, ConnectionError, TimeoutError, asyncio.TimeoutError)):
+        return True
+    sqlstate = getattr(error, "sqlstate", None)
+    return isinstance(sqlstate, str) and sqlstate[:2] in TRANSIENT_SQLSTATE_CLASSES
+
+
+def _format_value(value: Any) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def filter_conditions(value: FilterValue) -> List[FilterValue]:
+    """
+    Split a filter value into its individual conditions
+    """
+    if isinstance(value, list) and value and all(isinstance(item, tuple) for item in value):
+        return value
+    return [value]
+
+
+def format_filter(value: FilterValue) -> str:
+    if isinstance(value, tuple):
+        operator, operand = value
+        if operator == "in":
+            items = ",".join(json.dumps(str(item)) if isinstance(item, str) else _format_value(item) for item in operand)
+            return f"in.({items})"
+        if operator == "is":
+            return f"is.{_format_value(operand)}"
+        return f"{operator}.{_format_value(operand)}"
+    if value is None:
+        return "is.null"
+    return f"eq.{_format_value(value)}"
+
+
+class StorageBackend(ABC):
+    """
+    Table-level operations used by the async CRUD layer
+
+    Rows go in and come out as JSON-compatible dicts (UUIDs, timestamps and
+    numerics as strings/floats), the shape PostgREST returns, so callers do
+    not depend on which backend is configured.
+    """
+
+    @abstractmethod
+    async def select(self, table: str, columns: str = "*", filters: Optional[Filters] = None,
+                     order: Optional[Union[str, Sequence[str]]] = None, limit: Optional[int] = None,
+                     offset: Optional[int] = None) -> List[dict]:
+        ...
+
+    async def select_one(self, table: str, columns: str = "*", filters: Optional[Filters] = None) -> Optional[dict]:
+        rows = await self.select(table, columns, filters, limit=1)
+        return rows[0] if rows else None
+
+    @abstractmethod
+    async def count(self, table: str, filters: Optional[Filters] = None) -> int:
+        ...
+
+    @abstractmethod
+    async def insert(self, table: str, rows: Union[dict, List[dict]], returning: bool = True) -> List[dict]:
+        ...
+
+    @abstractmethod
+    async def update(self, table: str, values: dict, filters: Filters, returning: bool = True) -> List[dict]:
+        ...
+
+    @abstractmethod
+    async def delete(self, table: str, filters: Filters, returning: bool = True) -> List[dict]:
+        ...
+
+    @abstractmethod
+    async def rpc(self, function: str, params: Optional[dict] = None) -> Any:
+        ...
+
+    @abstractmethod
+    async def aclose(self) -> None:
+        ...
+
+
+class AsyncPostgrestClient(StorageBackend):
+    """
+    Non-blocking PostgREST client sharing one pooled HTTP/2 connection set
+
+    All requests go through a single httpx.AsyncClient, so TLS handshakes and
+    connections are reused across requests (keep-alive) and, over HTTP/2,
+    many concurrent queries are multiplexed on the same connection.
+    """
+
+    def __init__(self, url: str = SUPABASE_URL, key: str = SUPABASE_KEY,
+                 client: Optional[httpx.AsyncClient] = None):
+        if client is None and not url:
+            raise RuntimeError("SUPABASE_URL must be set for STORAGE_BACKEND=postgrest")
+        self._client = client or httpx.AsyncClient(
+            base_url=f"{url.rstrip('/')}/rest/v1",
+            headers={"apikey": key, "Authorization": f"Bearer {key}"},
+            http2=DB_HTTP2 and HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_connections=DB_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=DB_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=DB_HTTP_KEEPALIVE_EXPIRY_SECONDS
+            ),
+            timeout=httpx.Timeout(DB_HTTP_TIMEOUT_SECONDS, connect=DB_HTTP_CONNECT_TIMEOUT_SECONDS)
+        )
+
+    @staticmethod
+    def _params(filters: Optional[Filters]) -> List[Tuple[str, str]]:
+        params = []
+        for column, value in (filters or {}).items():
+            if isinstance(column, tuple):
+                operator, values = value
+                params.append(("or", f"({keyset_condition(column, values, operator)})"))
+            else:
+                params.extend((column, format_filter(condition)) for condition in filter_conditions(value))
+        return params
+
+    async def _request(self, method: str, path: str, params: Sequence[Tuple[str, str]] = (),
+                       body: Any = None, prefer: Optional[str] = None,
+                       headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+        request_headers = dict(headers or {})
+        if prefer:
+            request_headers["Prefer"] = prefer
+        record_round_trip()
+        response = await self._client.request(method, path, params=list(params), json=body, headers=request_headers)
+        if response.status_code >= 400:
+            try:
+                message = response.json().get("message", response.text)
+            except ValueError:
+                message = response.text
+            raise PostgrestError(response.status_code, message)
+        return response
+
+    async def select(self, table: str, columns: str = "*", filters: Optional[Filters] = None,
+                     order: Optional[Union[str, Sequence[str]]] = None, limit: Optional[int] = None,
+                     offset: Optional[int] = None) -> List[dict]:
+        """
+        Select rows; `order` takes PostgREST terms such as "created_at.desc"
+        """
+        params = [("select", columns)] + self._params(filters)
+        if order:
+            params.append(("order", order if isinstance(order, str) else ",".join(order)))
+        if limit is not None:
+            params.append(("limit", str(limit)))
+        if offset is not None:
+            params.append(("offset", str(offset)))
+        response = await self._request("GET", f"/{table}", params)
+        return response.json()
+
+    async def count(self, table: str, filters: Optional[Filters] = None) -> int:
+        """
+        Exact row count without transferring the rows
+        """
+        response = await self._request("HEAD", f"/{table}", [("select", "*")] + self._params(filters),
+                                       prefer="count=exact")
+        content_range = response.headers.get("content-range", "*/0")
+        return int(content_range.rsplit("/", 1)[-1])
+
+    async def insert(self, table: str, rows: Union[dict, List[dict]], returning: bool = True) -> List[dict]:
+        response = await self._request("POST", f"/{table}", body=rows,
+                                       prefer="return=representation" if returning else "return=minimal")
+        return response.json() if returning else []
+
+    async def update(self, table: str, values: dict, filters: Filters, returning: bool = True) -> List[dict]:
+        if not filters:
+            raise ValueError("update requires at least one filter")
+        response = await self._request("PATCH", f"/{table}", self._params(filters), body=values,
+                                       prefer="return=representation" if returning else "return=minimal")
+        return response.json() if returning else []
+
+    async def delete(self, table: str, filters: Filters, returning: bool = True) -> List[dict]:
+        if not filters:
+            raise ValueError("delete requires at least one filter")
+        response = await self._request("DELETE", f"/{table}", self._params(filters),
+                                       prefer="return=representation" if returning else "return=minimal")
+        return response.json() if returning else []
+
+    async def rpc(self, function: str, params: Optional[dict] = None) -> Any:
+        response = await self._request("POST", f"/rpc/{function}", body=params or {})
+        return response.json() if response.content else None
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+def create_storage_backend(name: str = STORAGE_BACKEND) -> StorageBackend:
+    """
+    Build the backend selected by STORAGE_BACKEND ("postgrest" or "postgres")
+    """
+    if name == "postgrest":
+        return AsyncPostgrestClient()
+    if name == "postgres":
+        from .postgres_backend import AsyncpgBackend
+        return AsyncpgBackend()
+    raise ValueError(f"Unknown storage backend: {name}")
+
+
+_client: Optional[StorageBackend] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+# Closes of backends replaced after an event loop change, kept referenced until done
+_retiring: set = set()
+
+
+def get_async_db() -> StorageBackend:
+    """
+    Return the process-wide storage backend, creating it on first use
+
+    The backend is bound to the running event loop; if the loop changes (e.g.
+    between test runs) a new one is created and the old one is closed.
+    """
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop:
+        if _client is not None:
+            _retire(_client, _client_loop)
+        _client = create_storage_backend()
+        _client_loop = loop
+    return _client
+
+
+def _retire(backend: StorageBackend, loop: asyncio.AbstractEventLoop) -> None:
+    """
+    Close a backend left behind by an earlier event loop, on that loop if it still runs
+    """
+    if loop.is_running() and not loop.is_closed():
+        asyncio.run_coroutine_threadsafe(_close_quietly(backend), loop)
+    else:
+        task = asyncio.ensure_future(_close_quietly(backend))
+        _retiring.add(task)
+        task.add_done_callback(_retiring.discard)
+
+
+async def _close_quietly(backend: StorageBackend) -> None:
+    try:
+        await backend.aclose()
+    except Exception as e:
+        print(f"Error closing storage backend of a previous event loop: {e}")
+
+
+async def close_async_db() -> None:
+    """
+    Close the shared backend's connections (called on application shutdown)
+    """
+    global _client, _client_loop
+    if _client is not None:
+        await _client.aclose()
+    _client = None
+    _client_loop = None
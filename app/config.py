@@ -17,4 +17,112 @@ GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
 # JWT configuration
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
-ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
\ No newline at end of file
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+
+# Distance/ETA cache configuration
+DISTANCE_CACHE_GRID_METERS = float(os.getenv("DISTANCE_CACHE_GRID_METERS", 50))
+DISTANCE_CACHE_MAX_ENTRIES = int(os.getenv("DISTANCE_CACHE_MAX_ENTRIES", 100000))
+
+# Average city speed (km/h) used when no road or traffic data is available
+AVERAGE_SPEED_KMH = float(os.getenv("AVERAGE_SPEED_KMH", 30))
+
+# Offline routing configuration (OpenStreetMap XML extract and preprocessed cache file)
+ROUTING_OSM_PATH = os.getenv("ROUTING_OSM_PATH")
+ROUTING_CACHE_PATH = os.getenv("ROUTING_CACHE_PATH")
+
+# Learned travel-time matrix (built from the tracking table by app.routing.travel_time_matrix)
+TRAVEL_MATRIX_PATH = os.getenv("TRAVEL_MATRIX_PATH")
+# Bounding box "min_lat,min_lon,max_lat,max_lon"; derived from the data on a full build when unset
+TRAVEL_MATRIX_BBOX = os.getenv("TRAVEL_MATRIX_BBOX")
+TRAVEL_MATRIX_ZONES = int(os.getenv("TRAVEL_MATRIX_ZONES", 16))
+TRAVEL_MATRIX_MIN_SAMPLES = int(os.getenv("TRAVEL_MATRIX_MIN_SAMPLES", 3))
+TRAVEL_MATRIX_UTC_OFFSET_HOURS = float(os.getenv("TRAVEL_MATRIX_UTC_OFFSET_HOURS", 0))
+
+# Rolling windows (seconds) and utility quantization of the streaming fairness metrics
+FAIRNESS_WINDOWS_SECONDS = [float(w) for w in os.getenv("FAIRNESS_WINDOWS_SECONDS", "300,3600,86400").split(",") if w.strip()]
+FAIRNESS_UTILITY_BUCKETS = int(os.getenv("FAIRNESS_UTILITY_BUCKETS", 1024))
+
+# Async PostgREST client pool (app.async_database)
+DB_HTTP_MAX_CONNECTIONS = int(os.getenv("DB_HTTP_MAX_CONNECTIONS", 100))
+DB_HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("DB_HTTP_MAX_KEEPALIVE_CONNECTIONS", 20))
+DB_HTTP_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("DB_HTTP_KEEPALIVE_EXPIRY_SECONDS", 30))
+DB_HTTP_TIMEOUT_SECONDS = float(os.getenv("DB_HTTP_TIMEOUT_SECONDS", 10))
+DB_HTTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv("DB_HTTP_CONNECT_TIMEOUT_SECONDS", 5))
+DB_HTTP2 = os.getenv("DB_HTTP2", "true").lower() in ("1", "true", "yes")
+
+# Storage backend for the async CRUD layer: "postgrest" (HTTP via Supabase) or "postgres" (direct asyncpg)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "postgrest").lower()
+DATABASE_URL = os.getenv("DATABASE_URL")
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", 2))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", 20))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", 512))
+
+# Most recent rides returned as ride_history by the user analytics endpoints
+USER_ANALYTICS_HISTORY_LIMIT = int(os.getenv("USER_ANALYTICS_HISTORY_LIMIT", 50))
+
+# Keyset pagination of list endpoints
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", 50))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", 500))
+
+# Authenticated principals resolved from access tokens (app.utils.principal_cache)
+# Role changes are only invalidated in the worker that made them; other workers pick them up once
+# their cached principal expires and token role claims older than PRINCIPAL_CLAIMS_MAX_AGE_SECONDS
+# are no longer trusted, so these two bound how long a stale role can be used
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", 60))
+PRINCIPAL_CLAIMS_MAX_AGE_SECONDS = float(os.getenv("PRINCIPAL_CLAIMS_MAX_AGE_SECONDS", 60))
+PRINCIPAL_CACHE_MAX_ENTRIES = int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", 10000))
+
+# Catalog responses (subscription plans, training modules) cached in memory (app.utils.response_cache)
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", 600))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 1000))
+
+# Assignments written per persist_match_result call when saving a matching result
+MATCH_PERSIST_CHUNK_SIZE = int(os.getenv("MATCH_PERSIST_CHUNK_SIZE", 5000))
+
+# Ride fare charges are appended to the wallet ledger in batches (async_crud.fare_charges)
+WALLET_BATCH_MAX_SIZE = int(os.getenv("WALLET_BATCH_MAX_SIZE", 500))
+WALLET_BATCH_MAX_DELAY_SECONDS = float(os.getenv("WALLET_BATCH_MAX_DELAY_SECONDS", 0.5))
+# Failed calls allowed per flush before the rest is requeued (bounds the requests during an outage)
+WALLET_BATCH_MAX_FAILED_FLUSHES = int(os.getenv("WALLET_BATCH_MAX_FAILED_FLUSHES", 32))
+
+# Loyalty points earned per completed ride, accrued in batches (async_crud.loyalty_grants)
+LOYALTY_POINTS_PER_RIDE = int(os.getenv("LOYALTY_POINTS_PER_RIDE", 10))
+LOYALTY_POINTS_PER_FARE_UNIT = float(os.getenv("LOYALTY_POINTS_PER_FARE_UNIT", 1.0))
+LOYALTY_BATCH_MAX_SIZE = int(os.getenv("LOYALTY_BATCH_MAX_SIZE", 500))
+LOYALTY_BATCH_MAX_DELAY_SECONDS = float(os.getenv("LOYALTY_BATCH_MAX_DELAY_SECONDS", 1.0))
+# Failed calls allowed per flush before the rest is requeued (bounds the requests during an outage)
+LOYALTY_BATCH_MAX_FAILED_FLUSHES = int(os.getenv("LOYALTY_BATCH_MAX_FAILED_FLUSHES", 32))
+
+# Driver location pings are buffered and written in bulk (app.location_ingest)
+LOCATION_FLUSH_INTERVAL_MS = float(os.getenv("LOCATION_FLUSH_INTERVAL_MS", 500))
+LOCATION_MAX_BUFFERED_PINGS = int(os.getenv("LOCATION_MAX_BUFFERED_PINGS", 100000))
+LOCATION_INSERT_CHUNK_SIZE = int(os.getenv("LOCATION_INSERT_CHUNK_SIZE", 5000))
+# A row that fails to insert on its own this many flushes is stored as a dead letter instead
+LOCATION_MAX_WRITE_ATTEMPTS = int(os.getenv("LOCATION_MAX_WRITE_ATTEMPTS", 5))
+# Failed inserts allowed per flush while isolating rejected rows (bounds the requests during an outage)
+LOCATION_MAX_FAILED_INSERTS = int(os.getenv("LOCATION_MAX_FAILED_INSERTS", 32))
+
+# Live location fan-out to WebSocket subscribers (app.utils.pubsub)
+PUBSUB_SUBSCRIBER_QUEUE_SIZE = int(os.getenv("PUBSUB_SUBSCRIBER_QUEUE_SIZE", 16))
+
+# Live driver positions kept in memory for matching, pricing and tracking (app.fleet_index)
+FLEET_INDEX_CELL_KM = float(os.getenv("FLEET_INDEX_CELL_KM", 1.0))
+FLEET_INDEX_RESYNC_SECONDS = float(os.getenv("FLEET_INDEX_RESYNC_SECONDS", 60))
+FLEET_NEARBY_RADIUS_KM = float(os.getenv("FLEET_NEARBY_RADIUS_KM", 3.0))
+
+# Tracking history: daily partitions, trajectory compaction and retention (app.tracking_storage)
+TRACKING_PARTITION_DAYS_AHEAD = int(os.getenv("TRACKING_PARTITION_DAYS_AHEAD", 3))
+TRACKING_COMPACT_AFTER_DAYS = int(os.getenv("TRACKING_COMPACT_AFTER_DAYS", 2))
+TRACKING_COMPACTION_TOLERANCE_M = float(os.getenv("TRACKING_COMPACTION_TOLERANCE_M", 10))
+TRACKING_RETENTION_DAYS = int(os.getenv("TRACKING_RETENTION_DAYS", 90))
+# Days compacted per tracking_maintenance call (keeps each statement well inside the statement timeout)
+TRACKING_COMPACT_DAYS_PER_CALL = int(os.getenv("TRACKING_COMPACT_DAYS_PER_CALL", 1))
+TRACKING_TRAJECTORY_MAX_HOURS = float(os.getenv("TRACKING_TRAJECTORY_MAX_HOURS", 24))
+TRACKING_TRAJECTORY_MAX_POINTS = int(os.getenv("TRACKING_TRAJECTORY_MAX_POINTS", 10000))
+
+# Smoothed driver speed from consecutive pings, used for pickup ETAs (app.fleet_index)
+FLEET_SPEED_SMOOTHING = float(os.getenv("FLEET_SPEED_SMOOTHING", 0.3))
+FLEET_SPEED_MIN_SAMPLES = int(os.getenv("FLEET_SPEED_MIN_SAMPLES", 3))
+FLEET_SPEED_MAX_GAP_SECONDS = float(os.getenv("FLEET_SPEED_MAX_GAP_SECONDS", 300))
+FLEET_MAX_SPEED_KMH = float(os.getenv("FLEET_MAX_SPEED_KMH", 200))
+FLEET_MIN_ETA_SPEED_KMH = float(os.getenv("FLEET_MIN_ETA_SPEED_KMH", 8))
@@ -1,14 +1,74 @@
-from typing import List, Optional
-from uuid import UUID
+from typing import Iterator, List, Optional, Sequence
+from uuid import UUID, uuid4
 from datetime import datetime
 import secrets
 from .database import get_supabase_client
-from .schemas import RiderCreate, RiderResponse, DriverCreate, DriverResponse, RideCreate, RideResponse, UserCreate, UserResponse, RatingCreate, RatingResponse, NotificationCreate, NotificationResponse, DriverEarnings, OTPRequest, OTPVerifyRequest
+from .schemas import RiderCreate, RiderResponse, DriverCreate, DriverResponse, RideCreate, RideResponse, UserCreate, UserResponse, RatingCreate, RatingResponse, NotificationCreate, NotificationResponse, DriverEarnings, OTPRequest, OTPVerifyRequest, DriverLocation, RiderTrip, MatchResponse, projection
 from .utils.datetime_serializer import simple_datetime_handler
+from .serialization import validate_row, validate_rows
 from .utils.jwt_utils import get_password_hash  # This now returns password as-is
+from .utils.principal_cache import invalidate_principal
+from .utils.response_cache import invalidate_responses
+from .fleet_index import fleet_index
+from .utils.profiling import runtime_bucket, fleet_size_bucket, utility_histogram
+from .config import USER_ANALYTICS_HISTORY_LIMIT, MATCH_PERSIST_CHUNK_SIZE
+from .async_database import format_filter, filter_conditions
+from .pagination import Page, page_size, decode_cursor, cursor_after, keyset_condition
 
 supabase = get_supabase_client()
 
+# Filtering and keyset pagination helpers (filters use the async_database format)
+def _apply_filters(query, filters: Optional[dict]):
+    for column, value in (filters or {}).items():
+        if isinstance(column, tuple):
+            operator, values = value
+            query = query.or_(keyset_condition(column, values, operator))
+        else:
+            for condition in filter_conditions(value):
+                operator, criteria = format_filter(condition).split(".", 1)
+                query = query.filter(column, operator, criteria)
+    return query
+
+def _select_rows(table: str, columns: str, filters: Optional[dict], sort_columns: Sequence[str],
+                 descending: bool, limit: int, after: Optional[Sequence[str]] = None) -> List[dict]:
+    filters = dict(filters or {})
+    if after is not None:
+        filters[tuple(sort_columns)] = ("lt" if descending else "gt", list(after))
+    query = _apply_filters(supabase.table(table).select(columns), filters)
+    for column in sort_columns:
+        query = query.order(column, desc=descending)
+    return query.limit(limit).execute().data or []
+
+def _select_page(table: str, filters: Optional[dict], sort_columns: Sequence[str], descending: bool,
+                 limit: Optional[int], cursor: Optional[str]) -> Page:
+    """
+    One keyset page of rows ordered by sort_columns (which must end in a unique column)
+    """
+    size = page_size(limit)
+    after = decode_cursor(cursor, len(sort_columns)) if cursor else None
+    rows = _select_rows(table, "*", filters, sort_columns, descending, size + 1, after)
+    next_cursor = cursor_after(rows[size - 1], sort_columns) if len(rows) > size else None
+    return Page(rows[:size], next_cursor)
+
+def iter_table(table: str, columns: str = "*", filters: Optional[dict] = None,
+               sort_columns: Sequence[str] = ("id",), batch_size: int = 1000) -> Iterator[dict]:
+    """
+    Stream every matching row in sort order, one keyset page per request
+
+    For batch jobs: each request is an index range scan, so the cost per page
+    stays flat however deep into the table the iteration is (unlike offsets).
+    """
+    if columns.strip() != "*":
+        missing = [column for column in sort_columns if column not in columns.replace(" ", "").split(",")]
+        columns = ",".join([columns] + missing)
+    after = None
+    while True:
+        rows = _select_rows(table, columns, filters, sort_columns, False, batch_size, after)
+        yield from rows
+        if len(rows) < batch_size:
+            break
+        after = [str(rows[-1][column]) for column in sort_columns]
+
 # User CRUD operations
 def create_user(user: UserCreate) -> UserResponse:
     # Store the password as-is (no hashing) - INSECURE FOR PRODUCTION
@@ -22,24 +82,18 @@ def create_user(user: UserCreate) -> UserResponse:
     user_data['email_verification_sent_at'] = datetime.now().isoformat()
     
     response = supabase.table("users").insert(user_data).execute()
-    # Use simple datetime handler for serialization
-    result_data = simple_datetime_handler(response.data[0])
-    return UserResponse(**result_data)
+    return validate_row(UserResponse, response.data[0])
 
 def get_user_by_email(email: str) -> Optional[UserResponse]:
     response = supabase.table("users").select("*").eq("email", email).execute()
     if response.data:
-        # Use simple datetime handler for serialization
-        user_data = simple_datetime_handler(response.data[0])
-        return UserResponse(**user_data)
+        return validate_row(UserResponse, response.data[0])
     return None
 
 def get_user_by_verification_token(token: str) -> Optional[UserResponse]:
     response = supabase.table("users").select("*").eq("email_verification_token", token).execute()
     if response.data:
-        # Use simple datetime handler for serialization
-        user_data = simple_datetime_handler(response.data[0])
-        return UserResponse(**user_data)
+        return validate_row(UserResponse, response.data[0])
     return None
 
 def verify_user_email(token: str) -> Optional[UserResponse]:
@@ -56,9 +110,7 @@ def verify_user_email(token: str) -> Optional[UserResponse]:
     }
     response = supabase.table("users").update(update_data).eq("id", str(user.id)).execute()
     if response.data:
-        # Use simple datetime handler for serialization
-        user_data = simple_datetime_handler(response.data[0])
-        return UserResponse(**user_data)
+        return validate_row(UserResponse, response.data[0])
     return None
 
 def resend_verification_email(user_id: UUID) -> Optional[UserResponse]:
@@ -70,9 +122,7 @@ def resend_verification_email(user_id: UUID) -> Optional[UserResponse]:
     }
     response = supabase.table("users").update(update_data).eq("id", str(user_id)).execute()
     if response.data:
-        # Use simple datetime handler for serialization
-        user_data = simple_datetime_handler(response.data[0])
-        return UserResponse(**user_data)
+        return validate_row(UserResponse, response.data[0])
     return None
 
 def update_user_last_login(user_id: UUID) -> Optional[UserResponse]:
@@ -81,9 +131,7 @@ def update_user_last_login(user_id: UUID) -> Optional[UserResponse]:
     }
     response = supabase.table("users").update(update_data).eq("id", user_id).execute()
     if response.data:
-        # Use simple datetime handler for serialization
-        user_data = simple_datetime_handler(response.data[0])
-        return UserResponse(**user_data)
+        return validate_row(UserResponse, response.data[0])
     return None
 
 def get_user_by_id(user_id: UUID) -> Optional[UserResponse]:
@@ -93,9 +141,7 @@ def get_user_by_id(user_id: UUID) -> Optional[UserResponse]:
     try:
         response = supabase.table("users").select("*").eq("id", str(user_id)).execute()
         if response.data:
-            # Use simple datetime handler for serialization
-            user_data = simple_datetime_handler(response.data[0])
-            return UserResponse(**user_data)
+            return validate_row(UserResponse, response.data[0])
         return None
     except Exception as e:
         print(f"Error getting user by ID: {e}")
@@ -126,10 +172,9 @@ def update_user_role(user_id: UUID, role: str) -> Optional[UserResponse]:
             
         update_data = {"role": new_role}
         response = supabase.table("users").update(update_data).eq("id", str(user_id)).execute()
+        invalidate_principal(user_id)
         if response.data:
-            # Use simple datetime handler for serialization
-            user_data = simple_datetime_handler(response.data[0])
-            return UserResponse(**user_data)
+            return validate_row(UserResponse, response.data[0])
         return None
     except Exception as e:
         print(f"Error updating user role: {e}")
@@ -152,10 +197,9 @@ def update_user_profile(user_id: UUID, name: Optional[str] = None, email: Option
             return get_user_by_id(user_id)
             
         response = supabase.table("users").update(update_data).eq("id", str(user_id)).execute()
+        invalidate_principal(user_id)
         if response.data:
-            # Use simple datetime handler for serialization
-            user_data = simple_datetime_handler(response.data[0])
-            return UserResponse(**user_data)
+            return validate_row(UserResponse, response.data[0])
         return None
     except Exception as e:
         print(f"Error updating user profile: {e}")
@@ -167,34 +211,30 @@ def create_rider(rider: RiderCreate) -> RiderResponse:
     # Use model_dump with mode="json" to apply Pydantic's json_encoders
     rider_data = rider.model_dump(mode="json")
     response = supabase.table("riders").insert(rider_data).execute()
-    # Use simple datetime handler for serialization
-    result_data = simple_datetime_handler(response.data[0])
-    return RiderResponse(**result_data)
+    return validate_row(RiderResponse, response.data[0])
 
 def get_rider_by_user_id(user_id: UUID) -> Optional[RiderResponse]:
     response = supabase.table("riders").select("*").eq("user_id", user_id).execute()
     if response.data:
-        # Use simple datetime handler for serialization
-        rider_data = simple_datetime_handler(response.data[0])
-        return RiderResponse(**rider_data)
+        return validate_row(RiderResponse, response.data[0])
     return None
 
 def get_rider(rider_id: UUID) -> Optional[RiderResponse]:
     response = supabase.table("riders").select("*").eq("id", rider_id).execute()
     if response.data:
-        # Use simple datetime handler for serialization
-        rider_data = simple_datetime_handler(response.data[0])
-        return RiderResponse(**rider_data)
+        return validate_row(RiderResponse, response.data[0])
     return None
 
 def get_riders() -> List[RiderResponse]:
     response = supabase.table("riders").select("*").execute()
-    riders = []
-    for rider_data in response.data:
-        # Use simple datetime handler for serialization
-        serialized_data = simple_datetime_handler(rider_data)
-        riders.append(RiderResponse(**serialized_data))
-    return riders
+    return validate_rows(RiderResponse, response.data)
+
+def get_rider_trips() -> List[RiderTrip]:
+    """
+    Get the trip columns of all riders (what the matching algorithms read)
+    """
+    response = supabase.table("riders").select(projection(RiderTrip)).execute()
+    return validate_rows(RiderTrip, response.data)
 
 def update_rider(rider_id: UUID, rider: RiderCreate) -> Optional[RiderResponse]:
     # Serialize datetime objects before sending to Supabase
@@ -202,9 +242,7 @@ def update_rider(rider_id: UUID, rider: RiderCreate) -> Optional[RiderResponse]:
     rider_data = rider.model_dump(mode="json")
     response = supabase.table("riders").update(rider_data).eq("id", rider_id).execute()
     if response.data:
-        # Use simple datetime handler for serialization
-        result_data = simple_datetime_handler(response.data[0])
-        return RiderResponse(**result_data)
+        return validate_row(RiderResponse, response.data[0])
     return None
 
 def delete_rider(rider_id: UUID) -> bool:
@@ -217,34 +255,35 @@ def create_driver(driver: DriverCreate) -> DriverResponse:
     # Use model_dump with mode="json" to apply Pydantic's json_encoders
     driver_data = driver.model_dump(mode="json")
     response = supabase.table("drivers").insert(driver_data).execute()
-    # Use simple datetime handler for serialization
-    result_data = simple_datetime_handler(response.data[0])
-    return DriverResponse(**result_data)
+    driver = validate_row(DriverResponse, response.data[0])
+    fleet_index.track(driver)
+    return driver
 
 def get_driver_by_user_id(user_id: UUID) -> Optional[DriverResponse]:
     response = supabase.table("drivers").select("*").eq("user_id", user_id).execute()
     if response.data:
-        # Use simple datetime handler for serialization
-        driver_data = simple_datetime_handler(response.data[0])
-        return DriverResponse(**driver_data)
+        return validate_row(DriverResponse, response.data[0])
     return None
 
 def get_driver(driver_id: UUID) -> Optional[DriverResponse]:
     response = supabase.table("drivers").select("*").eq("id", driver_id).execute()
     if response.data:
-        # Use simple datetime handler for serialization
-        driver_data = simple_datetime_handler(response.data[0])
-        return DriverResponse(**driver_data)
+        return validate_row(DriverResponse, response.data[0])
     return None
 
 def get_drivers() -> List[DriverResponse]:
     response = supabase.table("drivers").select("*").execute()
-    drivers = []
-    for driver_data in response.data:
-        # Use simple datetime handler for serialization
-        serialized_data = simple_datetime_handler(driver_data)
-        drivers.append(DriverResponse(**serialized_data))
-    return drivers
+    return validate_rows(DriverResponse, response.data)
+
+def get_driver_locations(available_only: bool = False) -> List[DriverLocation]:
+    """
+    Get the position and availability of drivers, optionally only available ones
+    """
+    query = supabase.table("drivers").select(projection(DriverLocation))
+    if available_only:
+        query = query.eq("available", True)
+    response = query.execute()
+    return validate_rows(DriverLocation, response.data)
 
 def update_driver(driver_id: UUID, driver: DriverCreate) -> Optional[DriverResponse]:
     # Serialize datetime objects before sending to Supabase
@@ -252,9 +291,9 @@ def update_driver(driver_id: UUID, driver: DriverCreate) -> Optional[DriverRespo
     driver_data = driver.model_dump(mode="json")
     response = supabase.table("drivers").update(driver_data).eq("id", driver_id).execute()
     if response.data:
-        # Use simple datetime handler for serialization
-        result_data = simple_datetime_handler(response.data[0])
-        return DriverResponse(**result_data)
+        driver = validate_row(DriverResponse, response.data[0])
+        fleet_index.track(driver)
+        return driver
     return None
 
 def update_driver_location(driver_id: UUID, lat: float, lon: float, available: bool = True) -> Optional[DriverResponse]:
@@ -265,13 +304,14 @@ def update_driver_location(driver_id: UUID, lat: float, lon: float, available: b
     }
     response = supabase.table("drivers").update(update_data).eq("id", driver_id).execute()
     if response.data:
-        # Use simple datetime handler for serialization
-        driver_data = simple_datetime_handler(response.data[0])
-        return DriverResponse(**driver_data)
+        driver = validate_row(DriverResponse, response.data[0])
+        fleet_index.track(driver)
+        return driver
     return None
 
 def delete_driver(driver_id: UUID) -> bool:
     response = supabase.table("drivers").delete().eq("id", driver_id).execute()
+    fleet_index.remove(driver_id)
     return len(response.data) > 0
 
 # Ride CRUD operations
@@ -280,9 +320,7 @@ def create_ride(ride: RideCreate) -> RideResponse:
     # Use model_dump with mode="json" to apply Pydantic's json_encoders
     ride_data = ride.model_dump(mode="json")
     response = supabase.table("rides").insert(ride_data).execute()
-    # Use simple datetime handler for serialization
-    result_data = simple_datetime_handler(response.data[0])
-    return RideResponse(**result_data)
+    return validate_row(RideResponse, response.data[0])
 
 def get_rides_by_user_id(user_id: UUID) -> List[RideResponse]:
     """
@@ -290,12 +328,7 @@ def get_rides_by_user_id(user_id: UUID) -> List[RideResponse]:
     """
     try:
         response = supabase.table("rides").select("*").eq("user_id", str(user_id)).execute()
-        rides = []
-        for ride_data in response.data:
-            # Use simple datetime handler for serialization
-            serialized_data = simple_datetime_handler(ride_data)
-            rides.append(RideResponse(**serialized_data))
-        return rides
+        return validate_rows(RideResponse, response.data)
     except Exception as e:
         print(f"Error getting rides by user: {e}")
         return []
@@ -306,12 +339,7 @@ def get_rides() -> List[RideResponse]:
     """
     try:
         response = supabase.table("rides").select("*").execute()
-        rides = []
-        for ride_data in response.data:
-            # Use simple datetime handler for serialization
-            serialized_data = simple_datetime_handler(ride_data)
-            rides.append(RideResponse(**serialized_data))
-        return rides
+        return validate_rows(RideResponse, response.data)
     except Exception as e:
         print(f"Error getting rides: {e}")
         return []
@@ -323,9 +351,7 @@ def get_ride(ride_id: UUID) -> Optional[RideResponse]:
     try:
         response = supabase.table("rides").select("*").eq("id", str(ride_id)).execute()
         if response.data:
-            # Use simple datetime handler for serialization
-            ride_data = simple_datetime_handler(response.data[0])
-            return RideResponse(**ride_data)
+            return validate_row(RideResponse, response.data[0])
         return None
     except Exception as e:
         print(f"Error getting ride: {e}")
@@ -341,9 +367,7 @@ def update_ride(ride_id: UUID, ride: RideCreate) -> Optional[RideResponse]:
         ride_data = ride.model_dump(mode="json")
         response = supabase.table("rides").update(ride_data).eq("id", str(ride_id)).execute()
         if response.data:
-            # Use simple datetime handler for serialization
-            result_data = simple_datetime_handler(response.data[0])
-            return RideResponse(**result_data)
+            return validate_row(RideResponse, response.data[0])
         return None
     except Exception as e:
         print(f"Error updating ride: {e}")
@@ -355,12 +379,7 @@ def get_rides_by_rider(rider_id: UUID) -> List[RideResponse]:
     """
     try:
         response = supabase.table("rides").select("*").eq("rider_id", str(rider_id)).execute()
-        rides = []
-        for ride_data in response.data:
-            # Use simple datetime handler for serialization
-            serialized_data = simple_datetime_handler(ride_data)
-            rides.append(RideResponse(**serialized_data))
-        return rides
+        return validate_rows(RideResponse, response.data)
     except Exception as e:
         print(f"Error getting rides by rider: {e}")
         return []
@@ -385,9 +404,7 @@ def update_ride_status(ride_id: UUID, status: str) -> Optional[RideResponse]:
         update_data = {"status": status}
         response = supabase.table("rides").update(update_data).eq("id", str(ride_id)).execute()
         if response.data:
-            # Use simple datetime handler for serialization
-            result_data = simple_datetime_handler(response.data[0])
-            return RideResponse(**result_data)
+            return validate_row(RideResponse, response.data[0])
         return None
     except Exception as e:
         print(f"Error updating ride status: {e}")
@@ -399,12 +416,7 @@ def get_rides_by_driver(driver_id: UUID) -> List[RideResponse]:
     """
     try:
         response = supabase.table("rides").select("*").eq("driver_id", str(driver_id)).execute()
-        rides = []
-        for ride_data in response.data:
-            # Use simple datetime handler for serialization
-            serialized_data = simple_datetime_handler(ride_data)
-            rides.append(RideResponse(**serialized_data))
-        return rides
+        return validate_rows(RideResponse, response.data)
     except Exception as e:
         print(f"Error getting rides by driver: {e}")
         return []
@@ -474,87 +486,121 @@ def delete_expired_otps() -> int:
 
 # Rating CRUD operations
 def create_rating(ride_id: UUID, rating: RatingCreate, user_id: UUID) -> RatingResponse:
-    # First, get the ride to get rider_id and driver_id
-    ride = get_ride(ride_id)
-    if not ride:
-        raise Exception("Ride not found")
-    
-    rating_data = rating.dict()
-    rating_data['user_id'] = str(user_id)
-    rating_data['ride_id'] = str(ride_id)
-    rating_data['rider_id'] = str(ride.rider_id)
-    rating_data['driver_id'] = str(ride.driver_id)
-    
-    response = supabase.table("ratings").insert(rating_data).execute()
-    result_data = simple_datetime_handler(response.data[0])
-    return RatingResponse(**result_data)
+    """
+    Rate a ride; the driver's rating aggregates are updated in the same transaction
+    (record_driver_rating in models/driver_ratings.sql), which also looks up the ride
+    """
+    response = supabase.rpc("record_driver_rating", {
+        "p_user_id": str(user_id),
+        "p_ride_id": str(ride_id),
+        "p_rating": rating.rating,
+        "p_review": rating.review,
+        "p_tip": rating.tip
+    }).execute()
+    data = response.data[0] if isinstance(response.data, list) else response.data
+    return validate_row(RatingResponse, data)
 
 def get_driver_ratings(driver_id: UUID) -> List[RatingResponse]:
     response = supabase.table("ratings").select("*").eq("driver_id", str(driver_id)).execute()
-    ratings = []
-    for rating_data in response.data:
-        serialized_data = simple_datetime_handler(rating_data)
-        ratings.append(RatingResponse(**serialized_data))
-    return ratings
+    return validate_rows(RatingResponse, response.data)
+
+def get_driver_rating_summary(driver_id: UUID) -> dict:
+    """
+    Rating count, average and Bayesian-smoothed average of a driver
+
+    Read from the aggregates kept on the driver row, so the cost does not grow
+    with the number of ratings. Averages are None while the driver has none.
+    """
+    response = supabase.table("drivers").select("rating_sum,rating_count,rating_bayesian").eq("id", str(driver_id)).execute()
+    row = response.data[0] if response.data else {}
+    rating_count = row.get("rating_count") or 0
+    return {
+        "rating_count": rating_count,
+        "average_rating": row["rating_sum"] / rating_count if rating_count else None,
+        "bayesian_rating": row.get("rating_bayesian") if rating_count else None
+    }
 
 def get_driver_average_rating(driver_id: UUID) -> float:
-    response = supabase.table("ratings").select("rating").eq("driver_id", str(driver_id)).execute()
-    if not response.data:
-        return 5.0  # Default rating
-    
-    ratings = [rating['rating'] for rating in response.data]
-    return sum(ratings) / len(ratings) if ratings else 5.0
+    average_rating = get_driver_rating_summary(driver_id)["average_rating"]
+    return average_rating if average_rating is not None else 5.0  # Default rating
+
+# Aggregate helpers (Postgres functions in models/aggregates.sql)
+# PostgREST's "function not in the schema cache" (answered with 404) and Postgres' undefined_function
+MISSING_FUNCTION_CODES = ("PGRST202", "42883")
+
+def _aggregate(function: str, params: Optional[dict] = None) -> Optional[dict]:
+    """
+    Single-row result of an aggregate function, or None if it is not installed
+
+    Other errors (timeouts, server errors) propagate: counting client-side
+    instead would add load to a database that is already struggling.
+    """
+    try:
+        response = supabase.rpc(function, params or {}).execute()
+    except Exception as e:
+        if getattr(e, "code", None) not in MISSING_FUNCTION_CODES and getattr(e, "status_code", None) != 404:
+            raise
+        print(f"Aggregate function {function} not installed, falling back to client-side counting: {e}")
+        return None
+    data = response.data
+    if isinstance(data, list):
+        return data[0] if data else {}
+    return data or {}
+
+def _count_rows(table: str, **filters) -> int:
+    """
+    Exact row count via a count request that transfers at most one row
+    """
+    query = supabase.table(table).select("id", count="exact")
+    for column, value in filters.items():
+        query = query.eq(column, value)
+    response = query.limit(1).execute()
+    return response.count or 0
 
 # Notification CRUD operations
 def create_notification(notification: NotificationCreate) -> NotificationResponse:
     notification_data = notification.dict()
     response = supabase.table("notifications").insert(notification_data).execute()
-    result_data = simple_datetime_handler(response.data[0])
-    return NotificationResponse(**result_data)
+    return validate_row(NotificationResponse, response.data[0])
 
 def get_user_notifications(user_id: UUID) -> List[NotificationResponse]:
     response = supabase.table("notifications").select("*").eq("user_id", str(user_id)).order("created_at", desc=True).execute()
-    notifications = []
-    for notification_data in response.data:
-        serialized_data = simple_datetime_handler(notification_data)
-        notifications.append(NotificationResponse(**serialized_data))
-    return notifications
+    return validate_rows(NotificationResponse, response.data)
+
+def get_user_notifications_page(user_id: UUID, limit: Optional[int] = None, cursor: Optional[str] = None) -> Page:
+    """
+    Notifications of a user, newest first, one page at a time
+    """
+    page = _select_page("notifications", {"user_id": str(user_id)}, ("created_at", "id"), True, limit, cursor)
+    return Page(validate_rows(NotificationResponse, page.items), page.next_cursor)
 
 def mark_notification_as_read(notification_id: UUID) -> Optional[NotificationResponse]:
     update_data = {"read": True}
     response = supabase.table("notifications").update(update_data).eq("id", str(notification_id)).execute()
     if response.data:
-        notification_data = simple_datetime_handler(response.data[0])
-        return NotificationResponse(**notification_data)
+        return validate_row(NotificationResponse, response.data[0])
     return None
 
 # Analytics operations
 def get_system_metrics() -> dict:
-    # Get total rides
-    rides_response = supabase.table("rides").select("id").execute()
-    total_rides = len(rides_response.data)
-    
-    # Get active riders (riders with recent rides)
-    riders_response = supabase.table("riders").select("id").execute()
-    active_riders = len(riders_response.data)
-    
-    # Get active drivers
-    drivers_response = supabase.table("drivers").select("id").eq("available", True).execute()
-    active_drivers = len(drivers_response.data)
-    
-    # Get average rating
-    ratings_response = supabase.table("ratings").select("rating").execute()
-    if ratings_response.data:
-        ratings = [rating['rating'] for rating in ratings_response.data]
-        average_rating = sum(ratings) / len(ratings) if ratings else 5.0
-    else:
-        average_rating = 5.0
+    """
+    Dashboard totals, computed in Postgres so the work does not grow with table sizes
+    """
+    summary = _aggregate("system_metrics")
+    if summary is None:
+        # Counts only; the average needs aggregates.sql (reported as the default until it is installed)
+        summary = {
+            "total_rides": _count_rows("rides"),
+            "active_riders": _count_rows("riders"),
+            "active_drivers": _count_rows("drivers", available=True)
+        }
+    average_rating = summary.get("average_rating")
     
     return {
-        "total_rides": total_rides,
-        "active_riders": active_riders,
-        "active_drivers": active_drivers,
-        "average_rating": round(average_rating, 2)
+        "total_rides": summary.get("total_rides") or 0,
+        "active_riders": summary.get("active_riders") or 0,
+        "active_drivers": summary.get("active_drivers") or 0,
+        "average_rating": round(average_rating if average_rating is not None else 5.0, 2)
     }
 
 def get_driver_earnings(driver_id: UUID) -> DriverEarnings:
@@ -600,6 +646,41 @@ def create_schedule(algorithm: str, metadata: Optional[dict] = None, user_id: Op
         print(f"Error creating schedule: {e}")
         return None
 
+def persist_match_result(result: MatchResponse, user_id: Optional[UUID] = None,
+                         chunk_size: int = MATCH_PERSIST_CHUNK_SIZE, schedule_id: Optional[UUID] = None) -> Optional[dict]:
+    """
+    Write a whole matching result (a schedule row plus the assigned rides)
+    with the persist_match_result function, one request per chunk of assignments
+
+    Only riders with an open ride request are assigned; the others come back in
+    skipped_rider_ids. Every chunk names the same schedule and a chunk is never
+    applied twice to it, so a failed chunk is simply retried once.
+    """
+    schedule_id = schedule_id or uuid4()
+    assigned, skipped = 0, []
+    try:
+        assignments = [assignment.model_dump(mode="json") for assignment in result.assignments]
+        metrics = simple_datetime_handler(result.metrics or {})
+        for start in range(0, max(len(assignments), 1), chunk_size):
+            params = {
+                "p_algorithm": result.algorithm,
+                "p_assignments": assignments[start:start + chunk_size],
+                "p_metrics": metrics,
+                "p_user_id": str(user_id) if user_id else None,
+                "p_schedule_id": str(schedule_id)
+            }
+            try:
+                response = supabase.rpc("persist_match_result", params).execute()
+            except Exception as e:
+                print(f"Error persisting match result chunk, retrying: {e}")
+                response = supabase.rpc("persist_match_result", params).execute()
+            assigned += response.data["assigned"]
+            skipped.extend(response.data["skipped_rider_ids"])
+        return {"schedule_id": str(schedule_id), "rides_written": assigned, "skipped_rider_ids": skipped}
+    except Exception as e:
+        print(f"Error persisting match result: {e}")
+        return None
+
 def get_schedules() -> List[dict]:
     """
     Get all schedules
@@ -614,6 +695,12 @@ def get_schedules() -> List[dict]:
         print(f"Error getting schedules: {e}")
         return []
 
+def get_schedules_page(limit: Optional[int] = None, cursor: Optional[str] = None) -> Page:
+    """
+    Schedules, newest first, one page at a time
+    """
+    return _select_page("schedules", None, ("created_at", "id"), True, limit, cursor)
+
 def get_schedule(schedule_id: UUID) -> Optional[dict]:
     """
     Get a specific schedule by ID
@@ -638,6 +725,39 @@ def delete_schedule(schedule_id: UUID) -> bool:
         print(f"Error deleting schedule: {e}")
         return False
 
+# Algorithm run statistics operations
+def record_algorithm_run(algorithm: str, fleet_size: int, timings_ms: dict, utilities: List[float]) -> bool:
+    """
+    Add one matching run to the pre-aggregated runtime and utility histograms
+    """
+    try:
+        total_ms = timings_ms.get("total", 0.0)
+        supabase.rpc("record_algorithm_run", {
+            "p_algorithm": algorithm,
+            "p_fleet_size_bucket": fleet_size_bucket(fleet_size),
+            "p_runtime_bucket": runtime_bucket(total_ms) + 1,  # Postgres arrays are 1-based
+            "p_runtime_ms": total_ms,
+            "p_phase_ms": {phase: ms for phase, ms in timings_ms.items() if phase != "total"},
+            "p_utility_histogram": utility_histogram(utilities),
+            "p_utility_sum": sum(utilities),
+            "p_assignment_count": len(utilities)
+        }).execute()
+        return True
+    except Exception as e:
+        print(f"Error recording algorithm run: {e}")
+        return False
+
+def get_algorithm_run_stats() -> List[dict]:
+    """
+    Get the pre-aggregated run statistics of every algorithm and fleet size bucket
+    """
+    try:
+        response = supabase.table("algorithm_run_stats").select("*").order("algorithm").order("fleet_size_bucket").execute()
+        return response.data or []
+    except Exception as e:
+        print(f"Error getting algorithm run stats: {e}")
+        return []
+
 # Fare estimation operations
 def estimate_fare(origin_lat: float, origin_lon: float, dest_lat: float, dest_lon: float, 
                   rider_beta: float = 0.5, traffic_multiplier: float = 1.0) -> dict:
@@ -645,17 +765,17 @@ def estimate_fare(origin_lat: float, origin_lon: float, dest_lat: float, dest_lo
     Estimate fare based on distance, time, and other factors
     """
     try:
-        # Calculate distance using haversine formula
-        from .utils.distance_calc import calculate_distance
-        distance_km = calculate_distance(origin_lat, origin_lon, dest_lat, dest_lon)
+        # Look up distance and duration (learned travel times when available)
+        from .utils.distance_cache import estimate_route
+        distance_km, base_duration_minutes = estimate_route(origin_lat, origin_lon, dest_lat, dest_lon)
         
         # Base fare components
         base_fare = 2.50  # Base fare in currency units
         distance_rate = 1.25  # Per kilometer
         time_rate = 0.50  # Per minute
         
-        # Estimated time (assuming average speed of 30 km/h)
-        estimated_duration_minutes = (distance_km / 30) * 60 * traffic_multiplier
+        # Estimated time adjusted for traffic
+        estimated_duration_minutes = base_duration_minutes * traffic_multiplier
         
         # Calculate fare components
         distance_fare = distance_km * distance_rate
@@ -752,47 +872,25 @@ def update_scheduled_ride_status(ride_id: UUID, status: str) -> Optional[dict]:
 
 # Wallet operations
 def create_wallet_transaction(user_id: UUID, amount: float, transaction_type: str, 
-                             description: str) -> Optional[dict]:
+                             description: str, idempotency_key: Optional[str] = None) -> Optional[dict]:
     """
     Create a wallet transaction
+
+    The balance update and the transaction row are written atomically by the
+    wallet_apply_transaction function in one round trip. Repeating a call with
+    the same idempotency key returns the original transaction.
     """
     try:
-        # First, get current balance
-        wallet_response = supabase.table("wallets").select("balance").eq("user_id", str(user_id)).execute()
-        current_balance = 0.0
-        if wallet_response.data:
-            current_balance = wallet_response.data[0].get("balance", 0.0)
-        
-        # Calculate new balance
-        if transaction_type == "credit":
-            new_balance = current_balance + amount
-        else:
-            new_balance = current_balance - amount
-        
-        # Update wallet balance
-        wallet_update = {
-            "user_id": str(user_id),
-            "balance": new_balance
-        }
-        
-        # Insert or update wallet record
-        if wallet_response.data:
-            supabase.table("wallets").update(wallet_update).eq("user_id", str(user_id)).execute()
-        else:
-            supabase.table("wallets").insert(wallet_update).execute()
-        
-        # Create transaction record
-        transaction_data = {
-            "user_id": str(user_id),
-            "amount": amount,
-            "transaction_type": transaction_type,
-            "description": description,
-            "balance_after": new_balance
-        }
-        
-        response = supabase.table("wallet_transactions").insert(transaction_data).execute()
-        if response.data:
-            return simple_datetime_handler(response.data[0])
+        response = supabase.rpc("wallet_apply_transaction", {
+            "p_user_id": str(user_id),
+            "p_amount": amount,
+            "p_transaction_type": transaction_type,
+            "p_description": description,
+            "p_idempotency_key": idempotency_key
+        }).execute()
+        data = response.data[0] if isinstance(response.data, list) and response.data else response.data
+        if data and data.get("id"):
+            return simple_datetime_handler(data)
         return None
     except Exception as e:
         print(f"Error creating wallet transaction: {e}")
@@ -800,79 +898,43 @@ def create_wallet_transaction(user_id: UUID, amount: float, transaction_type: st
 
 def get_wallet_balance(user_id: UUID) -> float:
     """
-    Get wallet balance for a user
+    Get wallet balance for a user (latest ledger snapshot plus the rows after it)
     """
     try:
-        response = supabase.table("wallets").select("balance").eq("user_id", str(user_id)).execute()
-        if response.data:
-            return response.data[0].get("balance", 0.0)
-        return 0.0
+        response = supabase.rpc("wallet_balance", {"p_user_id": str(user_id)}).execute()
+        return float(response.data or 0.0)
     except Exception as e:
         print(f"Error getting wallet balance: {e}")
         return 0.0
 
-def get_wallet_transactions(user_id: UUID) -> List[dict]:
+def get_wallet_transactions(user_id: UUID, limit: Optional[int] = None) -> List[dict]:
     """
-    Get transaction history for a user
+    Most recent transactions of a user (one page; use get_wallet_transactions_page for more)
     """
     try:
-        response = supabase.table("wallet_transactions").select("*").eq("user_id", str(user_id)).order("created_at", desc=True).execute()
-        transactions = []
-        for transaction_data in response.data:
-            transactions.append(simple_datetime_handler(transaction_data))
-        return transactions
+        return get_wallet_transactions_page(user_id, limit).items
     except Exception as e:
         print(f"Error getting wallet transactions: {e}")
         return []
 
+def get_wallet_transactions_page(user_id: UUID, limit: Optional[int] = None, cursor: Optional[str] = None) -> Page:
+    """
+    Transaction history of a user in ledger order, newest first, one page at a time
+    """
+    return _select_page("wallet_transactions", {"user_id": str(user_id)}, ("seq",), True, limit, cursor)
+
 # Loyalty operations
 def update_loyalty_points(user_id: UUID, points: int) -> Optional[dict]:
     """
     Update loyalty points for a user
+
+    The increment and the tier recomputation (thresholds from loyalty_tiers) are
+    done atomically by the loyalty_accrue_batch function in one round trip.
     """
     try:
-        # First, get current points
-        loyalty_response = supabase.table("loyalty_points").select("*").eq("user_id", str(user_id)).execute()
-        current_points = 0
-        if loyalty_response.data:
-            current_points = loyalty_response.data[0].get("points", 0)
-        
-        # Calculate new points
-        new_points = current_points + points
-        
-        # Determine level based on points
-        if new_points >= 1000:
-            level = "platinum"
-        elif new_points >= 500:
-            level = "gold"
-        elif new_points >= 200:
-            level = "silver"
-        else:
-            level = "bronze"
-        
-        # Calculate points needed for next level
-        if level == "platinum":
-            next_level_points = 0  # Max level
-        elif level == "gold":
-            next_level_points = 1000 - new_points
-        elif level == "silver":
-            next_level_points = 500 - new_points
-        else:
-            next_level_points = 200 - new_points
-        
-        loyalty_data = {
-            "user_id": str(user_id),
-            "points": new_points,
-            "level": level,
-            "next_level_points": next_level_points
-        }
-        
-        # Insert or update loyalty record
-        if loyalty_response.data:
-            response = supabase.table("loyalty_points").update(loyalty_data).eq("user_id", str(user_id)).execute()
-        else:
-            response = supabase.table("loyalty_points").insert(loyalty_data).execute()
-        
+        response = supabase.rpc("loyalty_accrue_batch", {
+            "p_grants": [{"user_id": str(user_id), "points": points}]
+        }).execute()
         if response.data:
             return simple_datetime_handler(response.data[0])
         return None
@@ -1050,6 +1112,12 @@ def get_chat_messages(ride_id: UUID) -> List[dict]:
         print(f"Error getting chat messages: {e}")
         return []
 
+def get_chat_messages_page(ride_id: UUID, limit: Optional[int] = None, cursor: Optional[str] = None) -> Page:
+    """
+    Chat messages of a ride in the order they were sent, one page at a time
+    """
+    return _select_page("chat_messages", {"ride_id": str(ride_id)}, ("created_at", "id"), False, limit, cursor)
+
 def mark_message_as_read(message_id: UUID) -> Optional[dict]:
     """
     Mark a chat message as read
@@ -1117,20 +1185,30 @@ def get_user_analytics(user_id: UUID, start_date: Optional[datetime] = None,
     Get analytics for a user
     """
     try:
-        # Get ride history
-        rides_response = supabase.table("rides").select("*").eq("rider_id", str(user_id)).execute()
-        
-        total_rides = len(rides_response.data)
-        total_spent = sum(ride.get("fare", 0) or 0 for ride in rides_response.data)
-        
-        # Get ratings
-        ratings_response = supabase.table("ratings").select("rating").eq("rider_id", str(user_id)).execute()
-        if ratings_response.data:
-            ratings = [rating["rating"] for rating in ratings_response.data]
-            average_rating = sum(ratings) / len(ratings) if ratings else 5.0
-        else:
+        # Ride, spending and rating totals are aggregated in Postgres
+        summary = _aggregate("rider_ride_summary", {
+            "p_rider_id": str(user_id),
+            "p_start": start_date.isoformat() if start_date else None,
+            "p_end": end_date.isoformat() if end_date else None
+        })
+        if summary is None:
+            fares_response = supabase.table("rides").select("fare").eq("rider_id", str(user_id)).execute()
+            ratings_response = supabase.table("ratings").select("rating").eq("rider_id", str(user_id)).execute()
+            ratings = [rating["rating"] for rating in ratings_response.data if rating["rating"] is not None]
+            summary = {
+                "total_rides": len(fares_response.data),
+                "total_spent": sum(ride.get("fare") or 0 for ride in fares_response.data),
+                "average_rating": sum(ratings) / len(ratings) if ratings else None
+            }
+        total_rides = summary.get("total_rides") or 0
+        total_spent = summary.get("total_spent") or 0.0
+        average_rating = summary.get("average_rating")
+        if average_rating is None:
             average_rating = 5.0
         
+        # Only the most recent rides are returned as history
+        rides_response = supabase.table("rides").select("*").eq("rider_id", str(user_id)).order("start_time", desc=True).limit(USER_ANALYTICS_HISTORY_LIMIT).execute()
+        
         # Get favorite destinations (simplified)
         destinations = {}
         for ride in rides_response.data:
@@ -1474,6 +1552,7 @@ def create_driver_training_module(title: str, description: Optional[str] = None,
         }
         
         response = supabase.table("driver_training_modules").insert(module_data).execute()
+        invalidate_responses("driver_training_modules")
         if response.data:
             return simple_datetime_handler(response.data[0])
         return None
@@ -1531,6 +1610,7 @@ def update_driver_training_module(module_id: UUID, title: Optional[str] = None,
         update_data["updated_at"] = datetime.now().isoformat()
         
         response = supabase.table("driver_training_modules").update(update_data).eq("id", str(module_id)).execute()
+        invalidate_responses("driver_training_modules")
         if response.data:
             return simple_datetime_handler(response.data[0])
         return None
@@ -1544,6 +1624,7 @@ def delete_driver_training_module(module_id: UUID) -> bool:
     """
     try:
         response = supabase.table("driver_training_modules").delete().eq("id", str(module_id)).execute()
+        invalidate_responses("driver_training_modules")
         return len(response.data) > 0
     except Exception as e:
         print(f"Error deleting driver training module: {e}")
@@ -1838,6 +1919,7 @@ def create_subscription_plan(name: str, description: Optional[str], price: float
         }
         
         response = supabase.table("subscription_plans").insert(plan_data).execute()
+        invalidate_responses("subscription_plans")
         if response.data:
             return simple_datetime_handler(response.data[0])
         return None
@@ -1906,6 +1988,7 @@ def update_subscription_plan(plan_id: UUID, name: Optional[str] = None, descript
         update_data["updated_at"] = datetime.now().isoformat()
         
         response = supabase.table("subscription_plans").update(update_data).eq("id", str(plan_id)).execute()
+        invalidate_responses("subscription_plans")
         if response.data:
             return simple_datetime_handler(response.data[0])
         return None
@@ -1919,6 +2002,7 @@ def delete_subscription_plan(plan_id: UUID) -> bool:
     """
     try:
         response = supabase.table("subscription_plans").delete().eq("id", str(plan_id)).execute()
+        invalidate_responses("subscription_plans")
         return len(response.data) > 0
     except Exception as e:
         print(f"Error deleting subscription plan: {e}")
@@ -1,6 +1,12 @@
+from functools import lru_cache
 from supabase import create_client, Client
 from .config import SUPABASE_URL, SUPABASE_KEY
+from .async_database import record_round_trip
 
-# Initialize Supabase client
+# Initialize Supabase client (one shared instance per process)
+@lru_cache(maxsize=1)
 def get_supabase_client() -> Client:
-    return create_client(SUPABASE_URL, SUPABASE_KEY)
\ No newline at end of file
+    client = create_client(SUPABASE_URL, SUPABASE_KEY)
+    # Count every PostgREST call made through the sync client towards the request's round trips
+    client.postgrest.session.event_hooks["request"].append(lambda request: record_round_trip())
+    return client
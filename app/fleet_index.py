@@ -0,0 +1,344 @@
+"""
+In-memory index of live driver positions
+
+Every accepted location ping and every driver write made through crud updates
+the index, so matching, pricing and tracking read positions from memory
+instead of re-selecting the drivers table. Positions, availability and speed
+live in parallel arrays (one slot per driver) and a uniform grid of
+FLEET_INDEX_CELL_KM cells maps each cell to the slots inside it, which keeps
+radius and k-nearest queries to the handful of cells around the query point.
+Each ping also updates an exponentially smoothed speed per driver (measured
+from consecutive positions), which ETAs use instead of scanning tracking rows.
+
+Each worker process has its own index and only sees the pings it handled, so
+the whole fleet is re-read from the database every FLEET_INDEX_RESYNC_SECONDS;
+drivers this process heard from more recently keep their in-memory position.
+"""
+import math
+import threading
+import time
+from array import array
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+from uuid import UUID
+from .schemas import DriverLocation
+from .utils.distance_calc import calculate_distance
+from .config import (
+    FLEET_INDEX_CELL_KM, FLEET_INDEX_RESYNC_SECONDS, FLEET_SPEED_SMOOTHING, FLEET_SPEED_MIN_SAMPLES,
+    FLEET_SPEED_MAX_GAP_SECONDS, FLEET_MAX_SPEED_KMH, FLEET_MIN_ETA_SPEED_KMH
+)
+
+KM_PER_DEGREE = 111.32
+
+
+class FleetPosition(NamedTuple):
+    """
+    Indexed state of a driver (field names match DriverLocation)
+    """
+    id: UUID
+    current_lat: float
+    current_lon: float
+    available: bool
+    speed: float
+
+
+def _load_driver_locations() -> List[DriverLocation]:
+    from .crud import get_driver_locations
+    return get_driver_locations()
+
+
+class FleetIndex:
+    """
+    Latest position, availability and speed per driver with a grid for spatial queries
+    """
+
+    def __init__(self, cell_km: float = FLEET_INDEX_CELL_KM, resync_seconds: float = FLEET_INDEX_RESYNC_SECONDS,
+                 loader: Callable[[], List[DriverLocation]] = _load_driver_locations):
+        self.cell_degrees = cell_km / KM_PER_DEGREE
+        self.resync_seconds = resync_seconds
+        self._loader = loader
+        self._ids: List[UUID] = []
+        self._slots: Dict[UUID, int] = {}
+        self._lat = array("d")
+        self._lon = array("d")
+        self._speed = array("d")
+        self._available = array("b")
+        # monotonic time of the last in-process update and of the last ping of each slot
+        self._touched = array("d")
+        self._pinged = array("d")
+        self._speed_kmh = array("d")
+        self._speed_samples = array("I")
+        self._cell_of: List[Tuple[int, int]] = []
+        self._cells: Dict[Tuple[int, int], Set[int]] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return int(math.floor(lat / self.cell_degrees)), int(math.floor(lon / self.cell_degrees))
+
+    def _place(self, slot: int, lat: float, lon: float) -> None:
+        cell = self._cell(lat, lon)
+        previous = self._cell_of[slot]
+        if previous != cell:
+            self._cells[previous].discard(slot)
+            if not self._cells[previous]:
+                del self._cells[previous]
+            self._cells.setdefault(cell, set()).add(slot)
+            self._cell_of[slot] = cell
+        self._lat[slot], self._lon[slot] = lat, lon
+
+    def _set(self, driver_id: UUID, lat: float, lon: float, available: Optional[bool],
+             speed: Optional[float], touched: float) -> None:
+        slot = self._slots.get(driver_id)
+        if slot is None:
+            # Slots are only created from driver rows (track, reload), which always carry availability
+            if available is None:
+                return
+            slot = len(self._ids)
+            cell = self._cell(lat, lon)
+            self._slots[driver_id] = slot
+            self._ids.append(driver_id)
+            self._lat.append(lat)
+            self._lon.append(lon)
+            self._speed.append(speed or 0.0)
+            self._available.append(1 if available else 0)
+            self._touched.append(touched)
+            self._pinged.append(0.0)
+            self._speed_kmh.append(0.0)
+            self._speed_samples.append(0)
+            self._cell_of.append(cell)
+            self._cells.setdefault(cell, set()).add(slot)
+            return
+        self._place(slot, lat, lon)
+        if available is not None:
+            self._available[slot] = 1 if available else 0
+        if speed is not None:
+            self._speed[slot] = speed
+        self._touched[slot] = max(self._touched[slot], touched)
+
+    def _remove(self, driver_id: UUID) -> None:
+        slot = self._slots.pop(driver_id, None)
+        if slot is None:
+            return
+        self._cells[self._cell_of[slot]].discard(slot)
+        if not self._cells[self._cell_of[slot]]:
+            del self._cells[self._cell_of[slot]]
+        last = len(self._ids) - 1
+        if slot != last:
+            # Move the last driver into the freed slot so the arrays stay dense
+            moved = self._ids[last]
+            self._cells[self._cell_of[last]].discard(last)
+            self._cells[self._cell_of[last]].add(slot)
+            self._ids[slot], self._slots[moved], self._cell_of[slot] = moved, slot, self._cell_of[last]
+            for column in self._columns():
+                column[slot] = column[last]
+        for column in self._columns() + (self._ids, self._cell_of):
+            column.pop()
+
+    def _columns(self) -> tuple:
+        return (self._lat, self._lon, self._speed, self._available, self._touched,
+                self._pinged, self._speed_kmh, self._speed_samples)
+
+    def update(self, driver_id: UUID, lat: float, lon: float, available: Optional[bool] = None,
+               speed: Optional[float] = None) -> None:
+        """
+        Move an indexed driver (availability and speed are kept when not given); unknown drivers are ignored
+        """
+        if lat is None or lon is None:
+            return
+        with self._lock:
+            if driver_id in self._slots:
+                self._set(driver_id, float(lat), float(lon), available, speed, time.monotonic())
+
+    def ping(self, driver_id: UUID, lat: float, lon: float, speed: float = 0.0) -> None:
+        """
+        Record a location ping and fold the driver's speed since the previous one into the smoothed speed
+        """
+        now = time.monotonic()
+        with self._lock:
+            slot = self._slots.get(driver_id)
+            if slot is None:
+                return
+            elapsed = now - self._pinged[slot] if self._pinged[slot] else None
+            sample = None
+            if elapsed is not None and elapsed <= FLEET_SPEED_MAX_GAP_SECONDS:
+                if elapsed >= 1:
+                    measured = calculate_distance(self._lat[slot], self._lon[slot], lat, lon) / elapsed * 3600
+                    # Anything faster is a GPS jump rather than driving
+                    if measured <= FLEET_MAX_SPEED_KMH:
+                        sample = measured
+            elif speed and 0 < speed <= FLEET_MAX_SPEED_KMH:
+                # No recent ping to measure from: use the speed the device reported
+                sample = speed
+            self._set(driver_id, float(lat), float(lon), None, speed, now)
+            self._pinged[slot] = now
+            if sample is not None:
+                if self._speed_samples[slot] == 0:
+                    self._speed_kmh[slot] = sample
+                else:
+                    self._speed_kmh[slot] += FLEET_SPEED_SMOOTHING * (sample - self._speed_kmh[slot])
+                self._speed_samples[slot] += 1
+
+    def smoothed_speed(self, driver_id: UUID) -> Optional[float]:
+        """
+        A driver's smoothed speed in km/h, or None until FLEET_SPEED_MIN_SAMPLES pings have been measured
+        """
+        with self._lock:
+            slot = self._slots.get(driver_id)
+            if slot is None or self._speed_samples[slot] < FLEET_SPEED_MIN_SAMPLES:
+                return None
+            if time.monotonic() - self._pinged[slot] > FLEET_SPEED_MAX_GAP_SECONDS:
+                return None
+            return self._speed_kmh[slot]
+
+    def eta_minutes(self, driver_id: UUID, distance_km: float, route_minutes: float) -> float:
+        """
+        Minutes for a driver to cover distance_km at their smoothed speed (the route estimate when unknown)
+        """
+        speed = self.smoothed_speed(driver_id)
+        if speed is None:
+            return route_minutes
+        return distance_km / max(speed, FLEET_MIN_ETA_SPEED_KMH) * 60
+
+    def track(self, driver) -> None:
+        """
+        Record a driver row read from or just written to the database (DriverResponse or DriverLocation)
+        """
+        if driver is not None and driver.current_lat is not None and driver.current_lon is not None:
+            with self._lock:
+                self._set(driver.id, float(driver.current_lat), float(driver.current_lon), bool(driver.available),
+                          None, time.monotonic())
+
+    def known(self, driver_id: UUID) -> bool:
+        """
+        Whether the driver has been indexed from a driver row
+        """
+        with self._lock:
+            return driver_id in self._slots
+
+    def remove(self, driver_id: UUID) -> None:
+        with self._lock:
+            self._remove(driver_id)
+
+    def reload(self) -> bool:
+        """
+        Re-read every driver from the database, keeping positions this process updated since
+        """
+        started = time.monotonic()
+        try:
+            drivers = self._loader()
+        except Exception as e:
+            print(f"Error loading driver positions into the fleet index: {e}")
+            return False
+        with self._lock:
+            seen = set()
+            for driver in drivers:
+                seen.add(driver.id)
+                slot = self._slots.get(driver.id)
+                if slot is not None and self._touched[slot] >= started:
+                    continue
+                self._set(driver.id, driver.current_lat, driver.current_lon, bool(driver.available), None, 0.0)
+            for driver_id in [driver_id for driver_id in self._ids if driver_id not in seen]:
+                if self._touched[self._slots[driver_id]] < started:
+                    self._remove(driver_id)
+            self._loaded_at = time.monotonic()
+        return True
+
+    def _stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at >= self.resync_seconds
+
+    def _ensure_loaded(self) -> None:
+        # One caller reloads (without holding the index lock, so pings keep landing); the others don't wait
+        if self._stale() and self._reload_lock.acquire(blocking=self._loaded_at is None):
+            try:
+                if self._stale() and not self.reload():
+                    # Serve what pings have filled in rather than retrying the database on every call
+                    self._loaded_at = time.monotonic()
+            finally:
+                self._reload_lock.release()
+
+    def _position(self, slot: int) -> FleetPosition:
+        return FleetPosition(self._ids[slot], self._lat[slot], self._lon[slot], bool(self._available[slot]), self._speed[slot])
+
+    def position(self, driver_id: UUID) -> Optional[FleetPosition]:
+        """
+        A driver's indexed state, or None when it isn't known to be current (callers fall back to the database)
+        """
+        with self._lock:
+            slot = self._slots.get(driver_id)
+            if slot is None:
+                return None
+            now = time.monotonic()
+            loaded_recently = self._loaded_at is not None and now - self._loaded_at < self.resync_seconds
+            if not loaded_recently and now - self._touched[slot] >= self.resync_seconds:
+                return None
+            return self._position(slot)
+
+    def available_drivers(self) -> List[DriverLocation]:
+        """
+        Every available driver, in the shape matching reads
+        """
+        self._ensure_loaded()
+        with self._lock:
+            return [
+                DriverLocation(id=self._ids[slot], current_lat=self._lat[slot], current_lon=self._lon[slot], available=True)
+                for slot in range(len(self._ids)) if self._available[slot]
+            ]
+
+    def available_count(self) -> int:
+        self._ensure_loaded()
+        with self._lock:
+            return sum(self._available)
+
+    def within(self, lat: float, lon: float, radius_km: float, available_only: bool = True) -> List[Tuple[FleetPosition, float]]:
+        """
+        Drivers within radius_km of a point with their distance in km, nearest first
+        """
+        self._ensure_loaded()
+        row, column = self._cell(lat, lon)
+        rows = int(math.ceil(radius_km / KM_PER_DEGREE / self.cell_degrees))
+        # Longitude degrees shrink towards the poles, so more columns cover the same distance
+        columns = int(math.ceil(radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01)) / self.cell_degrees))
+        found = []
+        with self._lock:
+            if (2 * rows + 1) * (2 * columns + 1) > len(self._cells):
+                candidates = [slot for slots in self._cells.values() for slot in slots]
+            else:
+                candidates = [
+                    slot
+                    for r in range(row - rows, row + rows + 1)
+                    for c in range(column - columns, column + columns + 1)
+                    for slot in self._cells.get((r, c), ())
+                ]
+            for slot in candidates:
+                if available_only and not self._available[slot]:
+                    continue
+                distance = calculate_distance(lat, lon, self._lat[slot], self._lon[slot])
+                if distance <= radius_km:
+                    found.append((self._position(slot), distance))
+        found.sort(key=lambda item: item[1])
+        return found
+
+    def nearest(self, lat: float, lon: float, k: int = 1, available_only: bool = True) -> List[Tuple[FleetPosition, float]]:
+        """
+        The k nearest drivers with their distance in km, searching outwards one ring of cells at a time
+        """
+        radius_km = self.cell_degrees * KM_PER_DEGREE
+        while True:
+            found = self.within(lat, lon, radius_km, available_only)
+            if len(found) >= k or radius_km >= math.pi * 6371:
+                return found[:k]
+            radius_km *= 2
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "drivers": len(self._ids),
+                "available": sum(self._available),
+                "cells": len(self._cells),
+                "loaded_seconds_ago": round(time.monotonic() - self._loaded_at, 3) if self._loaded_at is not None else None
+            }
+
+
+# Shared instance for the process
+fleet_index = FleetIndex()
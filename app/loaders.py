@@ -0,0 +1,115 @@
+"""
+Request-scoped loaders that batch and deduplicate row lookups
+
+Within one request, every lookup of the same row by key shares a single
+future, and all keys requested in the same event-loop tick are fetched with
+one `key=in.(...)` query. Routes fan out independent lookups with
+asyncio.gather and the loaders collapse them into as few round trips as the
+data dependencies allow.
+"""
+import asyncio
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+from .async_database import get_async_db
+from .schemas import UserResponse, RiderResponse, DriverResponse, RideResponse, DriverLocation, RiderTrip, projection
+from .serialization import validate_row
+
+
+class DataLoader:
+    """
+    Loads rows of one table by a key column, one batched query per loop tick
+    """
+
+    def __init__(self, table: str, model: type, key: str = "id", columns: str = "*"):
+        self.table = table
+        self.model = model
+        self.key = key
+        self.columns = columns
+        self._futures: Dict[str, asyncio.Future] = {}
+        self._pending: List[str] = []
+
+    def load(self, key: Any) -> "asyncio.Future":
+        """
+        Future resolving to the row with this key as a model (None if missing)
+        """
+        key = str(key)
+        future = self._futures.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._futures[key] = future
+            self._pending.append(key)
+            if len(self._pending) == 1:
+                loop.call_soon(lambda: asyncio.ensure_future(self._dispatch()))
+        return future
+
+    async def load_many(self, keys: List[Any]) -> List[Optional[Any]]:
+        return list(await asyncio.gather(*(self.load(key) for key in keys)))
+
+    def clear(self) -> None:
+        """
+        Forget loaded rows (after a write to the table); in-flight loads still resolve
+        """
+        self._futures = {key: future for key, future in self._futures.items() if key in self._pending}
+
+    async def _dispatch(self) -> None:
+        keys, self._pending = self._pending, []
+        futures = [self._futures[key] for key in keys]
+        try:
+            filters = {self.key: keys[0] if len(keys) == 1 else ("in", keys)}
+            rows = await get_async_db().select(self.table, self.columns, filters)
+            by_key = {str(row[self.key]): row for row in rows}
+            for key, future in zip(keys, futures):
+                row = by_key.get(key)
+                if not future.done():
+                    future.set_result(validate_row(self.model, row))
+        except Exception as e:
+            for key, future in zip(keys, futures):
+                # Failed loads are not cached, so a later lookup retries
+                if self._futures.get(key) is future:
+                    del self._futures[key]
+                if not future.done():
+                    future.set_exception(e)
+
+
+class RequestLoaders:
+    """
+    The loaders of one request
+    """
+
+    def __init__(self):
+        self.users = DataLoader("users", UserResponse)
+        self.users_by_email = DataLoader("users", UserResponse, key="email")
+        self.riders = DataLoader("riders", RiderResponse)
+        self.rider_trips = DataLoader("riders", RiderTrip, columns=projection(RiderTrip))
+        self.drivers = DataLoader("drivers", DriverResponse)
+        self.driver_locations = DataLoader("drivers", DriverLocation, columns=projection(DriverLocation))
+        self.rides = DataLoader("rides", RideResponse)
+
+    def invalidate(self, table: str) -> None:
+        """
+        Drop cached rows of a table so reads after a write see the new values
+        """
+        for loader in vars(self).values():
+            if loader.table == table:
+                loader.clear()
+
+
+_request_loaders: ContextVar[Optional[RequestLoaders]] = ContextVar("request_loaders", default=None)
+
+
+def start_request_loaders() -> RequestLoaders:
+    """
+    Give the current context (one HTTP request) its own loaders
+    """
+    loaders = RequestLoaders()
+    _request_loaders.set(loaders)
+    return loaders
+
+
+def get_loaders() -> RequestLoaders:
+    """
+    Loaders of the current request; outside a request every call gets fresh
+    loaders, so rows are never cached beyond the caller's own batch
+    """
+    return _request_loaders.get() or RequestLoaders()
@@ -0,0 +1,239 @@
+"""
+Write-behind buffer for high-frequency driver location pings
+
+A ping is accepted in memory and the request returns immediately. Every
+LOCATION_FLUSH_INTERVAL_MS the buffer writes what it holds with two
+statements: the tracking rows as one bulk insert (chunked), and the driver
+positions, coalesced to the latest ping per driver, through the
+apply_driver_positions function (models/location_ingest.sql). Once
+LOCATION_MAX_BUFFERED_PINGS pings are waiting, new ones are refused, so a slow
+database shows up as rejected pings and a growing flush lag in `stats()`
+instead of unbounded memory. A failed insert is retried in halves, so a row the
+database rejects on its own doesn't hold back the rest; once it has failed
+LOCATION_MAX_WRITE_ATTEMPTS flushes it is stored in dead_letters instead of
+being requeued forever. `close()` flushes everything on shutdown.
+"""
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from uuid import UUID
+from .async_database import get_async_db
+from .async_crud import record_dead_letters
+from .config import (
+    LOCATION_FLUSH_INTERVAL_MS, LOCATION_MAX_BUFFERED_PINGS, LOCATION_INSERT_CHUNK_SIZE, LOCATION_MAX_WRITE_ATTEMPTS,
+    LOCATION_MAX_FAILED_INSERTS
+)
+
+
+class PendingPing(NamedTuple):
+    """
+    A tracking row waiting to be written, with the monotonic time it was accepted
+    and the number of flushes in which it failed to insert on its own
+    """
+    enqueued_at: float
+    row: dict
+    attempts: int = 0
+
+
+class LocationIngestBuffer:
+    """
+    Buffers tracking rows and latest driver positions between periodic bulk flushes
+    """
+
+    def __init__(self, flush_interval_ms: float = LOCATION_FLUSH_INTERVAL_MS,
+                 max_buffered_pings: int = LOCATION_MAX_BUFFERED_PINGS,
+                 insert_chunk_size: int = LOCATION_INSERT_CHUNK_SIZE,
+                 max_write_attempts: int = LOCATION_MAX_WRITE_ATTEMPTS,
+                 max_failed_inserts: int = LOCATION_MAX_FAILED_INSERTS):
+        self.flush_interval_ms = flush_interval_ms
+        self.max_buffered_pings = max_buffered_pings
+        self.insert_chunk_size = insert_chunk_size
+        self.max_write_attempts = max_write_attempts
+        self.max_failed_inserts = max_failed_inserts
+        # in acceptance order, so the first row is the oldest one still waiting
+        self._tracking: List[PendingPing] = []
+        # driver id -> latest position, so each driver is updated once per flush
+        self._positions: Dict[str, dict] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self.accepted = 0
+        self.rejected = 0
+        self.dropped = 0
+        self.dead_lettered = 0
+        self.flushed_pings = 0
+        self.flushed_positions = 0
+        self.failed_flushes = 0
+        self.last_flush_ms = 0.0
+        # acceptance time of the oldest row of the flush in progress
+        self._flushing_since: Optional[float] = None
+
+    def submit(self, driver_id: UUID, lat: float, lon: float, speed: float = 0.0, heading: float = 0.0,
+               user_id: Optional[UUID] = None) -> bool:
+        """
+        Queue a ping (must be called from the event loop); False when the buffer is full
+        """
+        if len(self._tracking) >= self.max_buffered_pings:
+            self.rejected += 1
+            return False
+        pinged_at = datetime.now(timezone.utc).isoformat()
+        self._tracking.append(PendingPing(time.monotonic(), {
+            "user_id": str(user_id) if user_id else None,
+            "driver_id": str(driver_id),
+            "lat": lat,
+            "lon": lon,
+            "speed": speed,
+            "heading": heading,
+            "updated_at": pinged_at
+        }))
+        self._positions[str(driver_id)] = {"driver_id": str(driver_id), "lat": lat, "lon": lon, "pinged_at": pinged_at}
+        self.accepted += 1
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval_ms / 1000)
+            await self.flush()
+
+    async def _write_tracking(self, pings: List[PendingPing]) -> Tuple[List[PendingPing], List[Tuple[PendingPing, str]]]:
+        """
+        Insert tracking rows chunk by chunk, returning the pings to retry and those to give up on (with the error)
+
+        A failed chunk is retried in halves down to single rows. After max_failed_inserts failures the
+        rest is kept for the next flush untried, so an unreachable database costs a few requests per flush.
+        """
+        # A stack of chunks, first chunk on top, so rows are tried and kept in acceptance order
+        groups = [pings[start:start + self.insert_chunk_size] for start in range(0, len(pings), self.insert_chunk_size)][::-1]
+        retry, rejected, failures = [], [], 0
+        while groups:
+            group = groups.pop()
+            if failures >= self.max_failed_inserts:
+                retry.extend(group)
+                continue
+            try:
+                await get_async_db().insert("tracking", [ping.row for ping in group], returning=False)
+            except Exception as e:
+                failures += 1
+                print(f"Error inserting {len(group)} tracking rows: {e}")
+                if len(group) > 1:
+                    middle = len(group) // 2
+                    groups += [group[middle:], group[:middle]]
+                    continue
+                ping = group[0]._replace(attempts=group[0].attempts + 1)
+                if ping.attempts >= self.max_write_attempts:
+                    rejected.append((ping, str(e)))
+                else:
+                    retry.append(ping)
+        return retry, rejected
+
+    async def _dead_letter(self, rejected: List[Tuple[PendingPing, str]]) -> List[PendingPing]:
+        """
+        Store rows that keep failing in dead_letters, returning those that could not be stored either
+        """
+        by_error: Dict[str, List[PendingPing]] = {}
+        for ping, error in rejected:
+            by_error.setdefault(error, []).append(ping)
+        kept = []
+        for error, pings in by_error.items():
+            try:
+                await record_dead_letters("tracking", [ping.row for ping in pings], error)
+                self.dead_lettered += len(pings)
+            except Exception as e:
+                print(f"Error storing {len(pings)} rejected tracking rows as dead letters: {e}")
+                kept.extend(pings)
+        return kept
+
+    async def _write_positions(self, positions: Dict[str, dict]) -> bool:
+        if not positions:
+            return True
+        try:
+            await get_async_db().rpc("apply_driver_positions", {"p_positions": list(positions.values())})
+            return True
+        except Exception as e:
+            print(f"Error updating {len(positions)} driver positions: {e}")
+            return False
+
+    def _requeue(self, tracking: List[PendingPing], positions: Dict[str, dict]) -> None:
+        """
+        Put back what a failed flush did not write (with its acceptance times), keeping newer pings and the size bound
+        """
+        room = max(0, self.max_buffered_pings - len(self._tracking))
+        self.dropped += max(0, len(tracking) - room)
+        self._tracking = tracking[len(tracking) - room:] + self._tracking if room else self._tracking
+        for driver_id, position in positions.items():
+            self._positions.setdefault(driver_id, position)
+
+    async def flush(self) -> None:
+        """
+        Write everything buffered so far
+        """
+        async with self._flush_lock:
+            tracking, self._tracking = self._tracking, []
+            positions, self._positions = self._positions, {}
+            if not tracking and not positions:
+                return
+            self._flushing_since = tracking[0].enqueued_at if tracking else None
+            start = time.perf_counter()
+            try:
+                (unwritten, rejected), positions_written = await asyncio.gather(
+                    self._write_tracking(tracking), self._write_positions(positions)
+                )
+                self.flushed_pings += len(tracking) - len(unwritten) - len(rejected)
+                if rejected:
+                    unwritten = sorted(unwritten + await self._dead_letter(rejected), key=lambda ping: ping.enqueued_at)
+            finally:
+                self._flushing_since = None
+            self.last_flush_ms = (time.perf_counter() - start) * 1000
+            if positions_written:
+                self.flushed_positions += len(positions)
+            if unwritten or rejected or not positions_written:
+                self.failed_flushes += 1
+                self._requeue(unwritten, {} if positions_written else positions)
+
+    async def close(self, attempts: int = 3) -> None:
+        """
+        Stop the periodic flush and write what is still buffered (called on shutdown)
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for _ in range(attempts):
+            if not self._tracking and not self._positions:
+                break
+            await self.flush()
+        if self._tracking:
+            print(f"Dropping {len(self._tracking)} tracking rows that could not be written on shutdown")
+            self.dropped += len(self._tracking)
+            self._tracking = []
+
+    def stats(self) -> dict:
+        """
+        Backpressure and throughput counters for monitoring
+        """
+        oldest = [since for since in (self._flushing_since, self._tracking[0].enqueued_at if self._tracking else None)
+                  if since is not None]
+        lag = time.monotonic() - min(oldest) if oldest else 0.0
+        return {
+            "pending_pings": len(self._tracking),
+            "pending_positions": len(self._positions),
+            "max_buffered_pings": self.max_buffered_pings,
+            "oldest_pending_seconds": round(lag, 3),
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "dropped": self.dropped,
+            "dead_lettered": self.dead_lettered,
+            "flushed_pings": self.flushed_pings,
+            "flushed_positions": self.flushed_positions,
+            "failed_flushes": self.failed_flushes,
+            "last_flush_ms": round(self.last_flush_ms, 3)
+        }
+
+
+# Shared instance for the process
+location_ingest = LocationIngestBuffer()
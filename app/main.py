@@ -1,4 +1,4 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from .routes import (
     auth, riders, drivers, matching, metrics, rides, tracking, ratings, 
@@ -7,6 +7,12 @@ from .routes import (
 )
 from .utils.jwt_utils import verify_token
 from .utils.auth_utils import oauth2_scheme, get_current_user
+from .async_database import close_async_db, start_round_trip_count, ROUND_TRIPS_HEADER
+from .loaders import start_request_loaders
+from .async_crud import fare_charges, loyalty_grants
+from .location_ingest import location_ingest
+from .pagination import NEXT_CURSOR_HEADER
+from .serialization import FastJSONResponse
 
 app = FastAPI(
     title="FairRide API",
@@ -52,6 +58,7 @@ For detailed API documentation with request/response examples, see [apidocs.md](
         "name": "MIT License",
         "url": "https://opensource.org/licenses/MIT",
     },
+    default_response_class=FastJSONResponse,
 )
 
 # Add CORS middleware
@@ -61,8 +68,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, ROUND_TRIPS_HEADER, "ETag"],
 )
 
+@app.middleware("http")
+async def request_data_scope(request: Request, call_next):
+    """
+    Give each request its own loaders and report its database round trips
+    """
+    round_trips = start_round_trip_count()
+    start_request_loaders()
+    response = await call_next(request)
+    response.headers[ROUND_TRIPS_HEADER] = str(round_trips.count)
+    return response
+
 # Include routers
 app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 app.include_router(riders.router, prefix="/riders", tags=["Riders"])
@@ -88,6 +107,16 @@ app.include_router(ride_groups.router, prefix="/ride-groups", tags=["Ride Groups
 app.include_router(driver_safety.router, prefix="/driver-safety", tags=["Driver Safety"])
 app.include_router(subscriptions.router, prefix="/subscriptions", tags=["Subscriptions"])
 
+@app.on_event("shutdown")
+async def shutdown_database_client():
+    """
+    Flush buffered location pings and queued ledger appends, then close the pooled async database connections
+    """
+    await location_ingest.close()
+    await fare_charges.drain()
+    await loyalty_grants.drain()
+    await close_async_db()
+
 @app.get("/")
 async def root():
     """
@@ -0,0 +1,52 @@
+-- Server-side aggregates for dashboards, so counts and averages never ship whole tables
+
+-- System dashboard: constant-size result regardless of table sizes
+CREATE OR REPLACE FUNCTION system_metrics()
+RETURNS TABLE (
+  total_rides BIGINT,
+  active_riders BIGINT,
+  active_drivers BIGINT,
+  rating_count BIGINT,
+  average_rating DOUBLE PRECISION
+) AS $$
+  SELECT
+    (SELECT count(*) FROM rides),
+    (SELECT count(*) FROM riders),
+    (SELECT count(*) FROM drivers WHERE available),
+    r.rating_count,
+    r.average_rating
+  FROM (SELECT count(rating) AS rating_count, avg(rating)::DOUBLE PRECISION AS average_rating FROM ratings) r;
+$$ LANGUAGE sql STABLE;
+
+-- Driver averages are stored on the driver row now (driver_ratings.sql)
+DROP FUNCTION IF EXISTS driver_rating_summary(UUID);
+
+-- Ride, spending and rating totals of one rider, optionally within [p_start, p_end)
+CREATE OR REPLACE FUNCTION rider_ride_summary(p_rider_id UUID, p_start TIMESTAMPTZ DEFAULT NULL, p_end TIMESTAMPTZ DEFAULT NULL)
+RETURNS TABLE (
+  total_rides BIGINT,
+  total_spent DOUBLE PRECISION,
+  rating_count BIGINT,
+  average_rating DOUBLE PRECISION
+) AS $$
+  SELECT
+    ride_totals.total_rides,
+    ride_totals.total_spent,
+    rating_totals.rating_count,
+    rating_totals.average_rating
+  FROM (
+    SELECT count(*) AS total_rides, COALESCE(sum(fare), 0)::DOUBLE PRECISION AS total_spent
+    FROM rides
+    WHERE rider_id = p_rider_id
+      AND (p_start IS NULL OR start_time >= p_start)
+      AND (p_end IS NULL OR start_time < p_end)
+  ) ride_totals,
+  (
+    SELECT count(rating) AS rating_count, avg(rating)::DOUBLE PRECISION AS average_rating
+    FROM ratings
+    WHERE rider_id = p_rider_id
+  ) rating_totals;
+$$ LANGUAGE sql STABLE;
+
+CREATE INDEX IF NOT EXISTS idx_ratings_driver_id ON ratings(driver_id);
+CREATE INDEX IF NOT EXISTS idx_ratings_rider_id ON ratings(rider_id);
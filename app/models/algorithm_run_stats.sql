@@ -0,0 +1,50 @@
+-- Pre-aggregated matching algorithm runs, one row per algorithm and fleet size bucket
+-- Histogram layouts match app/utils/profiling.py (100 log-spaced runtime buckets, 100 utility bins)
+CREATE TABLE IF NOT EXISTS algorithm_run_stats (
+  algorithm TEXT NOT NULL,
+  fleet_size_bucket INTEGER NOT NULL,
+  run_count BIGINT NOT NULL DEFAULT 0,
+  runtime_ms_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+  runtime_histogram INTEGER[] NOT NULL DEFAULT array_fill(0, ARRAY[100]),
+  phase_ms_sum JSONB NOT NULL DEFAULT '{}'::jsonb,
+  assignment_count BIGINT NOT NULL DEFAULT 0,
+  utility_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+  utility_histogram INTEGER[] NOT NULL DEFAULT array_fill(0, ARRAY[100]),
+  updated_at TIMESTAMPTZ DEFAULT NOW(),
+  PRIMARY KEY (algorithm, fleet_size_bucket)
+);
+
+-- Atomically add one run to its row
+CREATE OR REPLACE FUNCTION record_algorithm_run(
+  p_algorithm TEXT,
+  p_fleet_size_bucket INTEGER,
+  p_runtime_bucket INTEGER,
+  p_runtime_ms DOUBLE PRECISION,
+  p_phase_ms JSONB,
+  p_utility_histogram INTEGER[],
+  p_utility_sum DOUBLE PRECISION,
+  p_assignment_count INTEGER
+) RETURNS VOID AS $$
+BEGIN
+  INSERT INTO algorithm_run_stats (algorithm, fleet_size_bucket)
+  VALUES (p_algorithm, p_fleet_size_bucket)
+  ON CONFLICT (algorithm, fleet_size_bucket) DO NOTHING;
+
+  UPDATE algorithm_run_stats s SET
+    run_count = s.run_count + 1,
+    runtime_ms_sum = s.runtime_ms_sum + p_runtime_ms,
+    runtime_histogram[p_runtime_bucket] = COALESCE(s.runtime_histogram[p_runtime_bucket], 0) + 1,
+    phase_ms_sum = s.phase_ms_sum || COALESCE((
+      SELECT jsonb_object_agg(key, COALESCE((s.phase_ms_sum ->> key)::DOUBLE PRECISION, 0) + value::DOUBLE PRECISION)
+      FROM jsonb_each_text(p_phase_ms)
+    ), '{}'::jsonb),
+    assignment_count = s.assignment_count + p_assignment_count,
+    utility_sum = s.utility_sum + p_utility_sum,
+    utility_histogram = (
+      SELECT array_agg(COALESCE(old_count, 0) + COALESCE(new_count, 0) ORDER BY position)
+      FROM unnest(s.utility_histogram, p_utility_histogram) WITH ORDINALITY AS t(old_count, new_count, position)
+    ),
+    updated_at = NOW()
+  WHERE s.algorithm = p_algorithm AND s.fleet_size_bucket = p_fleet_size_bucket;
+END;
+$$ LANGUAGE plpgsql;
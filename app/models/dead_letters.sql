@@ -0,0 +1,13 @@
+-- Entries a background writer gave up on (async_crud.record_dead_letters)
+-- Batched fare charges, loyalty grants and location pings that the database keeps
+-- rejecting are stored here instead of being retried forever or dropped, so they
+-- can be inspected and replayed (the batched writes are keyed, so a replay is safe).
+CREATE TABLE IF NOT EXISTS dead_letters (
+  id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  source TEXT NOT NULL, -- 'fare charge', 'loyalty grant', 'tracking'
+  payload JSONB NOT NULL,
+  error TEXT,
+  created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_dead_letters_source ON dead_letters (source, created_at);
@@ -0,0 +1,72 @@
+-- Driver rating aggregates kept on the driver row (crud.create_rating, crud.get_driver_rating_summary)
+-- Every new rating increments rating_sum/rating_count in the same transaction that inserts it,
+-- so reading a driver's average is a primary-key lookup however many ratings they have.
+
+ALTER TABLE drivers ADD COLUMN IF NOT EXISTS rating_sum BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE drivers ADD COLUMN IF NOT EXISTS rating_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE drivers ADD COLUMN IF NOT EXISTS rating_bayesian DOUBLE PRECISION;
+
+-- Average pulled towards a prior of 4.5 stars worth 5 ratings, so a driver with a single
+-- 5-star rating does not outrank one with hundreds of 4.9s
+CREATE OR REPLACE FUNCTION driver_bayesian_rating(p_rating_sum BIGINT, p_rating_count INTEGER)
+RETURNS DOUBLE PRECISION AS $$
+  SELECT (4.5 * 5 + p_rating_sum)::DOUBLE PRECISION / (5 + p_rating_count);
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Insert a rating for a ride and fold it into the driver's aggregates, in one round trip
+CREATE OR REPLACE FUNCTION record_driver_rating(
+  p_user_id UUID,
+  p_ride_id UUID,
+  p_rating INTEGER,
+  p_review TEXT DEFAULT NULL,
+  p_tip NUMERIC DEFAULT NULL
+)
+RETURNS ratings AS $$
+DECLARE
+  v_ride rides;
+  v_rating ratings;
+BEGIN
+  SELECT * INTO v_ride FROM rides WHERE id = p_ride_id;
+  IF NOT FOUND THEN
+    RAISE EXCEPTION 'Ride not found' USING ERRCODE = 'P0002';
+  END IF;
+
+  INSERT INTO ratings (user_id, ride_id, rider_id, driver_id, rating, review, tip)
+  VALUES (p_user_id, p_ride_id, v_ride.rider_id, v_ride.driver_id, p_rating, p_review, p_tip)
+  RETURNING * INTO v_rating;
+
+  -- The row lock taken here serializes concurrent ratings of the same driver
+  UPDATE drivers
+  SET rating_sum = rating_sum + p_rating,
+      rating_count = rating_count + 1,
+      rating_bayesian = driver_bayesian_rating(rating_sum + p_rating, rating_count + 1)
+  WHERE id = v_ride.driver_id;
+
+  RETURN v_rating;
+END;
+$$ LANGUAGE plpgsql;
+
+-- One-shot backfill from the ratings already stored (safe to re-run: values are recomputed).
+-- New ratings are blocked while it runs so none is counted twice or missed.
+CREATE OR REPLACE FUNCTION backfill_driver_rating_aggregates()
+RETURNS INTEGER AS $$
+DECLARE
+  v_updated INTEGER;
+BEGIN
+  LOCK TABLE ratings IN SHARE MODE;
+  UPDATE drivers d
+  SET rating_sum = COALESCE(totals.rating_sum, 0),
+      rating_count = COALESCE(totals.rating_count, 0),
+      rating_bayesian = driver_bayesian_rating(COALESCE(totals.rating_sum, 0), COALESCE(totals.rating_count, 0))
+  FROM drivers base
+  LEFT JOIN (
+    SELECT driver_id, sum(rating)::BIGINT AS rating_sum, count(rating)::INTEGER AS rating_count
+    FROM ratings GROUP BY driver_id
+  ) totals ON totals.driver_id = base.id
+  WHERE d.id = base.id;
+  GET DIAGNOSTICS v_updated = ROW_COUNT;
+  RETURN v_updated;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT backfill_driver_rating_aggregates();
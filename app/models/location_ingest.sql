@@ -0,0 +1,29 @@
+-- Bulk driver position updates from the location ingest buffer (app/location_ingest.py)
+-- Pings are coalesced in memory to the latest position per driver and written here in one
+-- statement per flush; the tracking rows themselves are bulk-inserted separately.
+
+-- Time of the ping the stored position came from, so a late flush never moves a driver back
+ALTER TABLE drivers ADD COLUMN IF NOT EXISTS location_updated_at TIMESTAMPTZ;
+
+-- p_positions: [{"driver_id": ..., "lat": ..., "lon": ..., "pinged_at": ...}, ...]
+-- Returns the number of drivers moved. Rows are locked in driver order so concurrent
+-- flushes from several workers can't deadlock.
+CREATE OR REPLACE FUNCTION apply_driver_positions(p_positions JSONB)
+RETURNS INTEGER AS $$
+  WITH position AS (
+    SELECT * FROM jsonb_to_recordset(p_positions) AS p(driver_id UUID, lat NUMERIC, lon NUMERIC, pinged_at TIMESTAMPTZ)
+  ), locked AS (
+    SELECT drivers.id FROM drivers JOIN position ON position.driver_id = drivers.id
+    ORDER BY drivers.id
+    FOR UPDATE OF drivers
+  ), moved AS (
+    UPDATE drivers
+    SET current_lat = position.lat, current_lon = position.lon, location_updated_at = position.pinged_at
+    FROM position
+    WHERE drivers.id = position.driver_id
+      AND drivers.id IN (SELECT id FROM locked)
+      AND (drivers.location_updated_at IS NULL OR drivers.location_updated_at < position.pinged_at)
+    RETURNING drivers.id
+  )
+  SELECT count(*)::INTEGER FROM moved;
+$$ LANGUAGE sql;
@@ -0,0 +1,77 @@
+-- Atomic loyalty point accrual (crud.update_loyalty_points, async_crud.loyalty_grants)
+-- Points are added with one increment per user and the tier is recomputed in the same
+-- statement from loyalty_tiers, so concurrent grants never overwrite each other and the
+-- thresholds can be changed without a deploy.
+
+-- Tier thresholds: a user is in the highest tier whose min_points they have reached
+CREATE TABLE IF NOT EXISTS loyalty_tiers (
+  level TEXT PRIMARY KEY,
+  min_points INTEGER NOT NULL UNIQUE
+);
+
+INSERT INTO loyalty_tiers (level, min_points) VALUES
+  ('bronze', 0),
+  ('silver', 200),
+  ('gold', 500),
+  ('platinum', 1000)
+ON CONFLICT (level) DO NOTHING;
+
+-- Grant keys already applied (e.g. 'ride:<ride id>'), so a retried batch adds nothing twice
+CREATE TABLE IF NOT EXISTS loyalty_point_grants (
+  user_id UUID REFERENCES users(id),
+  grant_key TEXT NOT NULL,
+  points INTEGER NOT NULL,
+  created_at TIMESTAMPTZ DEFAULT NOW(),
+  PRIMARY KEY (user_id, grant_key)
+);
+
+-- Tier of a point balance (the lowest tier when below every threshold)
+CREATE OR REPLACE FUNCTION loyalty_level(p_points INTEGER)
+RETURNS TEXT AS $$
+  SELECT COALESCE(
+    (SELECT level FROM loyalty_tiers WHERE min_points <= p_points ORDER BY min_points DESC LIMIT 1),
+    (SELECT level FROM loyalty_tiers ORDER BY min_points LIMIT 1)
+  );
+$$ LANGUAGE sql STABLE;
+
+-- Points still missing for the next tier (0 in the top tier)
+CREATE OR REPLACE FUNCTION loyalty_next_level_points(p_points INTEGER)
+RETURNS INTEGER AS $$
+  SELECT COALESCE(min(min_points) - p_points, 0) FROM loyalty_tiers WHERE min_points > p_points;
+$$ LANGUAGE sql STABLE;
+
+-- Add points for many users in one call and return their updated rows.
+-- p_grants: [{"user_id": ..., "points": ..., "grant_key": ...}, ...] (grant_key optional).
+-- Grants of the same user are summed first; a grant whose key was already applied is skipped.
+-- The increment and the new tier are written by the same upsert, so it is atomic per user;
+-- rows are locked in user order so concurrent batches can't deadlock.
+CREATE OR REPLACE FUNCTION loyalty_accrue_batch(p_grants JSONB)
+RETURNS SETOF loyalty_points AS $$
+  WITH grant_row AS (
+    SELECT * FROM jsonb_to_recordset(p_grants) AS g(user_id UUID, points INTEGER, grant_key TEXT)
+  ), recorded AS (
+    INSERT INTO loyalty_point_grants (user_id, grant_key, points)
+    SELECT DISTINCT ON (user_id, grant_key) user_id, grant_key, points
+    FROM grant_row WHERE grant_key IS NOT NULL
+    ORDER BY user_id, grant_key
+    ON CONFLICT (user_id, grant_key) DO NOTHING
+    RETURNING user_id, points
+  ), total AS (
+    SELECT user_id, sum(points)::INTEGER AS points
+    FROM (
+      SELECT user_id, points FROM recorded
+      UNION ALL
+      SELECT user_id, points FROM grant_row WHERE grant_key IS NULL
+    ) applied
+    GROUP BY user_id
+  )
+  INSERT INTO loyalty_points AS lp (user_id, points, level, next_level_points)
+  SELECT user_id, points, loyalty_level(points), loyalty_next_level_points(points) FROM total
+  ORDER BY user_id
+  ON CONFLICT (user_id) DO UPDATE SET
+    points = lp.points + EXCLUDED.points,
+    level = loyalty_level(lp.points + EXCLUDED.points),
+    next_level_points = loyalty_next_level_points(lp.points + EXCLUDED.points),
+    updated_at = NOW()
+  RETURNING lp.*;
+$$ LANGUAGE sql;
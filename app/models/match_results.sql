@@ -0,0 +1,82 @@
+-- Bulk persistence of a matching result (crud.persist_match_result)
+-- One call writes a chunk of assignments to the rides plus the schedule row they belong to,
+-- so a whole matching run costs one round trip per chunk instead of one per rider
+
+-- p_assignments: [{"rider_id": ..., "driver_id": ..., "utility": ...}, ...]
+-- Every chunk of a run passes the same p_schedule_id (NULL creates a new schedule); the
+-- schedule row is created by the first chunk and its metadata collects the assignments.
+-- Only a rider's open 'requested' ride is assigned (the earliest one if there are several);
+-- riders without one are not given a new ride but returned in skipped_rider_ids.
+-- Riders already recorded in the schedule are left alone, so a chunk or a whole run can
+-- be repeated with the same schedule id without assigning anything twice.
+-- Returns {"schedule_id": ..., "assigned": <rides assigned>, "skipped_rider_ids": [...]}.
+DROP FUNCTION IF EXISTS persist_match_result(TEXT, JSONB, JSONB, UUID, UUID);
+
+CREATE OR REPLACE FUNCTION persist_match_result(
+  p_algorithm TEXT,
+  p_assignments JSONB,
+  p_metrics JSONB DEFAULT '{}'::JSONB,
+  p_user_id UUID DEFAULT NULL,
+  p_schedule_id UUID DEFAULT NULL
+)
+RETURNS JSONB AS $$
+DECLARE
+  v_schedule_id UUID := COALESCE(p_schedule_id, gen_random_uuid());
+  v_recorded JSONB;
+  v_recorded_riders JSONB;
+  v_assigned JSONB;
+  v_skipped JSONB;
+BEGIN
+  INSERT INTO schedules (id, user_id, algorithm, metadata)
+  VALUES (v_schedule_id, p_user_id, p_algorithm, jsonb_build_object('assignments', '[]'::JSONB, 'metrics', p_metrics))
+  ON CONFLICT (id) DO NOTHING;
+
+  -- Chunks of the same schedule are applied one at a time
+  SELECT COALESCE(metadata->'assignments', '[]'::JSONB) INTO v_recorded
+  FROM schedules WHERE id = v_schedule_id FOR UPDATE;
+  -- Keyed by rider id, so checking a rider is one lookup however many are already recorded
+  SELECT COALESCE(jsonb_object_agg(r.rider_id, TRUE), '{}'::JSONB) INTO v_recorded_riders
+  FROM jsonb_to_recordset(v_recorded) AS r(rider_id TEXT);
+
+  WITH assignment AS (
+    SELECT DISTINCT ON (a.rider_id) a.*
+    FROM jsonb_to_recordset(p_assignments) AS a(rider_id UUID, driver_id UUID, utility DOUBLE PRECISION)
+    WHERE NOT v_recorded_riders ? a.rider_id::TEXT
+  ), open_ride AS (
+    SELECT DISTINCT ON (rides.rider_id) rides.id, rides.rider_id
+    FROM rides JOIN assignment ON assignment.rider_id = rides.rider_id
+    WHERE rides.status = 'requested'
+    ORDER BY rides.rider_id, rides.start_time NULLS LAST, rides.id
+  ), assigned AS (
+    -- The status is checked again after the row lock, so a ride a concurrent run just assigned is skipped
+    UPDATE rides
+    SET driver_id = assignment.driver_id, utility = assignment.utility, algorithm = p_algorithm, status = 'assigned'
+    FROM open_ride JOIN assignment ON assignment.rider_id = open_ride.rider_id
+    WHERE rides.id = open_ride.id AND rides.status = 'requested'
+    RETURNING assignment.rider_id, assignment.driver_id, assignment.utility
+  )
+  SELECT
+    (SELECT COALESCE(jsonb_agg(jsonb_build_object('rider_id', rider_id, 'driver_id', driver_id, 'utility', utility)), '[]'::JSONB)
+     FROM assigned),
+    (SELECT COALESCE(jsonb_agg(rider_id), '[]'::JSONB)
+     FROM assignment WHERE NOT EXISTS (SELECT 1 FROM assigned WHERE assigned.rider_id = assignment.rider_id))
+  INTO v_assigned, v_skipped;
+
+  UPDATE schedules
+  SET metadata = COALESCE(metadata, '{}'::JSONB) || jsonb_build_object(
+    'assignments', v_recorded || v_assigned,
+    'skipped_rider_ids', (
+      SELECT COALESCE(jsonb_agg(DISTINCT skipped), '[]'::JSONB)
+      FROM jsonb_array_elements(COALESCE(metadata->'skipped_rider_ids', '[]'::JSONB) || v_skipped) AS s(skipped)
+    ),
+    'metrics', p_metrics
+  )
+  WHERE id = v_schedule_id;
+
+  RETURN jsonb_build_object('schedule_id', v_schedule_id, 'assigned', jsonb_array_length(v_assigned),
+                            'skipped_rider_ids', v_skipped);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Open rides of a rider are looked up by (rider_id, status) on every chunk
+CREATE INDEX IF NOT EXISTS idx_rides_rider_id_status ON rides(rider_id, status);
@@ -0,0 +1,12 @@
+-- Composite indexes backing keyset pagination (app/pagination.py)
+-- Each list is filtered by its owner column and ordered by (created_at, id), so a
+-- page is one index range scan however far into the history the cursor points
+CREATE INDEX IF NOT EXISTS idx_riders_created_at_id ON riders(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_schedules_created_at_id ON schedules(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_notifications_user_created_at_id ON notifications(user_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_chat_messages_ride_created_at_id ON chat_messages(ride_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_wallet_transactions_user_created_at_id ON wallet_transactions(user_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_tracking_updated_at_id ON tracking(updated_at, id);
+
+-- Drivers and rides have no creation time and page by primary key (rides filtered by user)
+CREATE INDEX IF NOT EXISTS idx_rides_user_id_id ON rides(user_id, id);
@@ -0,0 +1,275 @@
+-- Time-partitioned tracking storage (app/tracking_storage.py)
+-- The tracking table is range-partitioned by updated_at into one partition per UTC day, so a
+-- trajectory query only touches the days it asks for, compaction rewrites one day at a time and
+-- retention drops whole partitions instead of deleting rows. Run after tracking.sql; an existing
+-- unpartitioned tracking table is migrated in place.
+
+-- Move an unpartitioned table (and its index names) out of the way; its rows are copied below
+DO $$
+DECLARE
+  v_index RECORD;
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_class WHERE oid = to_regclass('tracking') AND relkind = 'r') THEN
+    FOR v_index IN
+      SELECT index_class.oid::regclass AS index_name, index_class.relname
+      FROM pg_index JOIN pg_class index_class ON index_class.oid = pg_index.indexrelid
+      WHERE pg_index.indrelid = to_regclass('tracking')
+    LOOP
+      EXECUTE format('ALTER INDEX %s RENAME TO %I', v_index.index_name, left('unpartitioned_' || v_index.relname, 63));
+    END LOOP;
+    ALTER TABLE tracking RENAME TO tracking_unpartitioned;
+  END IF;
+END $$;
+
+CREATE TABLE IF NOT EXISTS tracking (
+  id UUID NOT NULL DEFAULT gen_random_uuid(),
+  user_id UUID REFERENCES users(id),
+  driver_id UUID REFERENCES drivers(id),
+  lat NUMERIC NOT NULL,
+  lon NUMERIC NOT NULL,
+  speed NUMERIC DEFAULT 0,
+  heading NUMERIC DEFAULT 0,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (id, updated_at)
+) PARTITION BY RANGE (updated_at);
+
+-- Catches pings outside every daily partition until ensure_tracking_partitions covers their day
+CREATE TABLE IF NOT EXISTS tracking_default PARTITION OF tracking DEFAULT;
+
+CREATE INDEX IF NOT EXISTS idx_tracking_driver_updated_at ON tracking(driver_id, updated_at);
+CREATE INDEX IF NOT EXISTS idx_tracking_updated_at_id ON tracking(updated_at, id);
+
+-- Days that have been simplified, so compaction runs once per day
+CREATE TABLE IF NOT EXISTS tracking_compactions (
+  day DATE PRIMARY KEY,
+  tolerance_m DOUBLE PRECISION NOT NULL,
+  rows_before BIGINT NOT NULL,
+  rows_after BIGINT NOT NULL,
+  compacted_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Start of a UTC day
+CREATE OR REPLACE FUNCTION tracking_day_start(p_day DATE)
+RETURNS TIMESTAMPTZ AS $$
+  SELECT p_day::TIMESTAMP AT TIME ZONE 'UTC';
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Days that have their own partition
+CREATE OR REPLACE FUNCTION tracking_partition_days()
+RETURNS SETOF DATE AS $$
+  SELECT to_date(substr(child.relname, 11), 'YYYYMMDD')
+  FROM pg_inherits
+  JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+  WHERE pg_inherits.inhparent = to_regclass('tracking') AND child.relname ~ '^tracking_p[0-9]{8}$'
+  ORDER BY 1;
+$$ LANGUAGE sql STABLE;
+
+-- Create the daily partitions from p_from to p_to (inclusive) that don't exist yet, moving any
+-- rows of those days out of the default partition. Returns the number created.
+CREATE OR REPLACE FUNCTION ensure_tracking_partitions(p_from DATE, p_to DATE)
+RETURNS INTEGER AS $$
+DECLARE
+  v_day DATE;
+  v_name TEXT;
+  v_created INTEGER := 0;
+BEGIN
+  FOR v_day IN SELECT generate_series(p_from, p_to, INTERVAL '1 day')::DATE LOOP
+    v_name := 'tracking_p' || to_char(v_day, 'YYYYMMDD');
+    CONTINUE WHEN to_regclass(v_name) IS NOT NULL;
+    EXECUTE format('CREATE TABLE %I (LIKE tracking INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', v_name);
+    EXECUTE format('WITH moved AS (DELETE FROM tracking_default WHERE updated_at >= $1 AND updated_at < $2 RETURNING *) '
+                   'INSERT INTO %I SELECT * FROM moved', v_name)
+      USING tracking_day_start(v_day), tracking_day_start(v_day + 1);
+    EXECUTE format('ALTER TABLE tracking ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                   v_name, tracking_day_start(v_day), tracking_day_start(v_day + 1));
+    v_created := v_created + 1;
+  END LOOP;
+  RETURN v_created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Copy the rows of a migrated unpartitioned table into their daily partitions
+DO $$
+DECLARE
+  v_day DATE;
+BEGIN
+  IF to_regclass('tracking_unpartitioned') IS NOT NULL THEN
+    FOR v_day IN
+      SELECT DISTINCT (updated_at AT TIME ZONE 'UTC')::DATE FROM tracking_unpartitioned WHERE updated_at IS NOT NULL
+    LOOP
+      PERFORM ensure_tracking_partitions(v_day, v_day);
+    END LOOP;
+    INSERT INTO tracking (id, user_id, driver_id, lat, lon, speed, heading, updated_at)
+    SELECT id, user_id, driver_id, lat, lon, speed, heading, COALESCE(updated_at, NOW())
+    FROM tracking_unpartitioned;
+    DROP TABLE tracking_unpartitioned;
+  END IF;
+END $$;
+
+-- Douglas-Peucker over a trajectory using the synchronized euclidean distance: a point's error is
+-- its distance from where the driver would be at that moment moving at constant speed between the
+-- segment's end points, so stops and speed changes are kept along with turns. Returns the
+-- positions (1-based, ascending) of the points to keep; the first and last are always kept.
+CREATE OR REPLACE FUNCTION trajectory_simplify(p_lat DOUBLE PRECISION[], p_lon DOUBLE PRECISION[],
+                                               p_epoch DOUBLE PRECISION[], p_tolerance_m DOUBLE PRECISION)
+RETURNS INTEGER[] AS $$
+DECLARE
+  v_count INTEGER := COALESCE(array_length(p_lat, 1), 0);
+  v_keep BOOLEAN[];
+  v_stack INTEGER[];
+  v_first INTEGER;
+  v_last INTEGER;
+  v_worst INTEGER;
+  v_worst_m DOUBLE PRECISION;
+  v_ratio DOUBLE PRECISION;
+  v_dx DOUBLE PRECISION;
+  v_dy DOUBLE PRECISION;
+  v_m DOUBLE PRECISION;
+BEGIN
+  IF v_count <= 2 THEN
+    RETURN ARRAY(SELECT generate_series(1, v_count));
+  END IF;
+  v_keep := array_fill(FALSE, ARRAY[v_count]);
+  v_keep[1] := TRUE;
+  v_keep[v_count] := TRUE;
+  -- Pending segments as (first, last) pairs
+  v_stack := ARRAY[1, v_count];
+  WHILE COALESCE(array_length(v_stack, 1), 0) > 0 LOOP
+    v_first := v_stack[array_length(v_stack, 1) - 1];
+    v_last := v_stack[array_length(v_stack, 1)];
+    v_stack := v_stack[1:array_length(v_stack, 1) - 2];
+    CONTINUE WHEN v_last - v_first < 2;
+    v_worst := NULL;
+    v_worst_m := p_tolerance_m;
+    FOR i IN v_first + 1 .. v_last - 1 LOOP
+      v_ratio := CASE WHEN p_epoch[v_last] > p_epoch[v_first]
+                      THEN (p_epoch[i] - p_epoch[v_first]) / (p_epoch[v_last] - p_epoch[v_first]) ELSE 0.5 END;
+      -- Equirectangular metres between the point and the interpolated position
+      v_dy := (p_lat[i] - (p_lat[v_first] + (p_lat[v_last] - p_lat[v_first]) * v_ratio)) * 111320.0;
+      v_dx := (p_lon[i] - (p_lon[v_first] + (p_lon[v_last] - p_lon[v_first]) * v_ratio)) * 111320.0 * cos(radians(p_lat[i]));
+      v_m := sqrt(v_dx * v_dx + v_dy * v_dy);
+      IF v_m > v_worst_m THEN
+        v_worst := i;
+        v_worst_m := v_m;
+      END IF;
+    END LOOP;
+    IF v_worst IS NOT NULL THEN
+      v_keep[v_worst] := TRUE;
+      v_stack := v_stack || ARRAY[v_first, v_worst, v_worst, v_last];
+    END IF;
+  END LOOP;
+  RETURN ARRAY(SELECT i FROM generate_series(1, v_count) AS i WHERE v_keep[i]);
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+-- Simplify every driver's trajectory of one UTC day to within p_tolerance_m and record it.
+-- A day that was already compacted is left alone and its earlier record returned.
+CREATE OR REPLACE FUNCTION compact_tracking_day(p_day DATE, p_tolerance_m DOUBLE PRECISION)
+RETURNS tracking_compactions AS $$
+DECLARE
+  v_record tracking_compactions;
+  v_from TIMESTAMPTZ := tracking_day_start(p_day);
+  v_to TIMESTAMPTZ := tracking_day_start(p_day + 1);
+  v_before BIGINT;
+  v_removed BIGINT := 0;
+  v_deleted BIGINT;
+  v_trajectory RECORD;
+BEGIN
+  SELECT * INTO v_record FROM tracking_compactions WHERE day = p_day;
+  IF FOUND THEN
+    RETURN v_record;
+  END IF;
+
+  SELECT count(*) INTO v_before FROM tracking WHERE updated_at >= v_from AND updated_at < v_to;
+  FOR v_trajectory IN
+    SELECT driver_id,
+           array_agg(id ORDER BY updated_at, id) AS ids,
+           array_agg(lat::DOUBLE PRECISION ORDER BY updated_at, id) AS lats,
+           array_agg(lon::DOUBLE PRECISION ORDER BY updated_at, id) AS lons,
+           array_agg(extract(epoch FROM updated_at)::DOUBLE PRECISION ORDER BY updated_at, id) AS epochs
+    FROM tracking
+    WHERE updated_at >= v_from AND updated_at < v_to AND driver_id IS NOT NULL
+    GROUP BY driver_id
+    HAVING count(*) > 2
+  LOOP
+    DELETE FROM tracking
+    WHERE updated_at >= v_from AND updated_at < v_to AND driver_id = v_trajectory.driver_id
+      AND id <> ALL (ARRAY(
+        SELECT v_trajectory.ids[position]
+        FROM unnest(trajectory_simplify(v_trajectory.lats, v_trajectory.lons, v_trajectory.epochs, p_tolerance_m)) AS position
+      ));
+    GET DIAGNOSTICS v_deleted = ROW_COUNT;
+    v_removed := v_removed + v_deleted;
+  END LOOP;
+
+  INSERT INTO tracking_compactions (day, tolerance_m, rows_before, rows_after)
+  VALUES (p_day, p_tolerance_m, v_before, v_before - v_removed)
+  RETURNING * INTO v_record;
+  RETURN v_record;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Periodic upkeep: create partitions ahead of time, compact days older than p_compact_after_days
+-- and drop days older than p_retention_days. Returns a summary of what was done.
+-- At most p_max_compactions days (oldest first) are compacted per call so the statement stays
+-- well inside the statement timeout on a first run over a long history; 'days_to_compact' says
+-- how many are left for the next call (app/tracking_storage.py calls until none are).
+DROP FUNCTION IF EXISTS tracking_maintenance(INTEGER, INTEGER, DOUBLE PRECISION, INTEGER);
+CREATE OR REPLACE FUNCTION tracking_maintenance(
+  p_days_ahead INTEGER DEFAULT 3,
+  p_compact_after_days INTEGER DEFAULT 2,
+  p_tolerance_m DOUBLE PRECISION DEFAULT 10,
+  p_retention_days INTEGER DEFAULT 90,
+  p_max_compactions INTEGER DEFAULT 1
+)
+RETURNS JSONB AS $$
+DECLARE
+  v_today DATE := (NOW() AT TIME ZONE 'UTC')::DATE;
+  v_created INTEGER;
+  v_day DATE;
+  v_compaction tracking_compactions;
+  v_compacted JSONB := '[]'::JSONB;
+  v_dropped INTEGER := 0;
+  v_purged BIGINT;
+  v_pending INTEGER;
+BEGIN
+  v_created := ensure_tracking_partitions(v_today - 1, v_today + p_days_ahead);
+
+  FOR v_day IN
+    SELECT partition_day FROM tracking_partition_days() AS partition_day
+    WHERE partition_day < v_today - p_retention_days
+  LOOP
+    EXECUTE format('DROP TABLE %I', 'tracking_p' || to_char(v_day, 'YYYYMMDD'));
+    DELETE FROM tracking_compactions WHERE day = v_day;
+    v_dropped := v_dropped + 1;
+  END LOOP;
+  DELETE FROM tracking_default WHERE updated_at < tracking_day_start(v_today - p_retention_days);
+  GET DIAGNOSTICS v_purged = ROW_COUNT;
+
+  FOR v_day IN
+    SELECT partition_day FROM tracking_partition_days() AS partition_day
+    WHERE partition_day < v_today - p_compact_after_days
+      AND NOT EXISTS (SELECT 1 FROM tracking_compactions WHERE tracking_compactions.day = partition_day)
+    ORDER BY partition_day
+    LIMIT p_max_compactions
+  LOOP
+    v_compaction := compact_tracking_day(v_day, p_tolerance_m);
+    v_compacted := v_compacted || jsonb_build_object(
+      'day', v_day, 'rows_before', v_compaction.rows_before, 'rows_after', v_compaction.rows_after
+    );
+  END LOOP;
+
+  SELECT count(*) INTO v_pending
+  FROM tracking_partition_days() AS partition_day
+  WHERE partition_day < v_today - p_compact_after_days
+    AND NOT EXISTS (SELECT 1 FROM tracking_compactions WHERE tracking_compactions.day = partition_day);
+
+  RETURN jsonb_build_object(
+    'partitions_created', v_created,
+    'partitions_dropped', v_dropped,
+    'default_rows_purged', v_purged,
+    'compacted', v_compacted,
+    'days_to_compact', v_pending
+  );
+END;
+$$ LANGUAGE plpgsql;
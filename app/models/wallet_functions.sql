@@ -0,0 +1,128 @@
+-- Append-only wallet ledger (crud.create_wallet_transaction, async_crud.fare_charges)
+-- wallet_transactions is the ledger: rows are only ever inserted. A user's balance is the
+-- latest row of wallet_balance_snapshots plus the ledger rows after it, and a snapshot is
+-- appended every 100 rows (v_snapshot_interval), so reading a balance touches at most that
+-- many rows however long the history grows. The wallets table is no longer written.
+
+-- Client-supplied key making retries of the same transaction free
+ALTER TABLE wallet_transactions ADD COLUMN IF NOT EXISTS idempotency_key TEXT;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_wallet_transactions_user_idempotency_key
+  ON wallet_transactions(user_id, idempotency_key) WHERE idempotency_key IS NOT NULL;
+
+-- Ledger order (history pages and snapshot boundaries use it)
+ALTER TABLE wallet_transactions ADD COLUMN IF NOT EXISTS seq BIGINT GENERATED BY DEFAULT AS IDENTITY;
+CREATE INDEX IF NOT EXISTS idx_wallet_transactions_user_seq ON wallet_transactions(user_id, seq);
+
+-- Balance of a user as of ledger row through_seq (inclusive)
+CREATE TABLE IF NOT EXISTS wallet_balance_snapshots (
+  user_id UUID REFERENCES users(id),
+  through_seq BIGINT NOT NULL,
+  balance NUMERIC NOT NULL,
+  created_at TIMESTAMPTZ DEFAULT NOW(),
+  PRIMARY KEY (user_id, through_seq)
+);
+
+-- One-time migration: the mutable wallets rows become each user's first snapshot
+INSERT INTO wallet_balance_snapshots (user_id, through_seq, balance)
+SELECT w.user_id,
+       COALESCE((SELECT max(t.seq) FROM wallet_transactions t WHERE t.user_id = w.user_id), 0),
+       COALESCE(w.balance, 0)
+FROM wallets w
+WHERE w.user_id IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM wallet_balance_snapshots s WHERE s.user_id = w.user_id);
+
+-- Current balance: latest snapshot plus the ledger tail after it
+CREATE OR REPLACE FUNCTION wallet_balance(p_user_id UUID)
+RETURNS NUMERIC AS $$
+  SELECT COALESCE(snapshot.balance, 0) + COALESCE((
+    SELECT sum(CASE WHEN t.transaction_type = 'credit' THEN t.amount ELSE -t.amount END)
+    FROM wallet_transactions t
+    WHERE t.user_id = p_user_id AND t.seq > COALESCE(snapshot.through_seq, 0)
+  ), 0)
+  FROM (SELECT 1) one
+  LEFT JOIN LATERAL (
+    SELECT balance, through_seq FROM wallet_balance_snapshots
+    WHERE user_id = p_user_id ORDER BY through_seq DESC LIMIT 1
+  ) snapshot ON true;
+$$ LANGUAGE sql STABLE;
+
+-- Append a credit or debit and return its ledger row (balance_after is the new balance).
+-- With an idempotency key already used by this user, the original row is returned and
+-- nothing is appended.
+CREATE OR REPLACE FUNCTION wallet_apply_transaction(
+  p_user_id UUID,
+  p_amount NUMERIC,
+  p_transaction_type TEXT,
+  p_description TEXT DEFAULT NULL,
+  p_idempotency_key TEXT DEFAULT NULL
+)
+RETURNS wallet_transactions AS $$
+DECLARE
+  -- Ledger rows between balance snapshots
+  v_snapshot_interval CONSTANT INT := 100;
+  v_snapshot_balance NUMERIC;
+  v_snapshot_seq BIGINT;
+  v_tail_count BIGINT;
+  v_tail_sum NUMERIC;
+  v_transaction wallet_transactions;
+BEGIN
+  IF p_transaction_type NOT IN ('credit', 'debit') THEN
+    RAISE EXCEPTION 'Transaction type must be ''credit'' or ''debit''' USING ERRCODE = '22023';
+  END IF;
+
+  -- Appends for one user are serialized until commit, so each sees the previous balance
+  PERFORM pg_advisory_xact_lock(hashtextextended('wallet:' || p_user_id::TEXT, 0));
+
+  IF p_idempotency_key IS NOT NULL THEN
+    SELECT * INTO v_transaction FROM wallet_transactions
+    WHERE user_id = p_user_id AND idempotency_key = p_idempotency_key;
+    IF FOUND THEN
+      RETURN v_transaction;
+    END IF;
+  END IF;
+
+  SELECT balance, through_seq INTO v_snapshot_balance, v_snapshot_seq
+  FROM wallet_balance_snapshots WHERE user_id = p_user_id ORDER BY through_seq DESC LIMIT 1;
+  SELECT count(*), COALESCE(sum(CASE WHEN transaction_type = 'credit' THEN amount ELSE -amount END), 0)
+  INTO v_tail_count, v_tail_sum
+  FROM wallet_transactions WHERE user_id = p_user_id AND seq > COALESCE(v_snapshot_seq, 0);
+
+  INSERT INTO wallet_transactions (user_id, amount, transaction_type, description, balance_after, idempotency_key)
+  VALUES (
+    p_user_id, p_amount, p_transaction_type, p_description,
+    COALESCE(v_snapshot_balance, 0) + v_tail_sum + CASE WHEN p_transaction_type = 'credit' THEN p_amount ELSE -p_amount END,
+    p_idempotency_key
+  )
+  RETURNING * INTO v_transaction;
+
+  IF v_tail_count + 1 >= v_snapshot_interval THEN
+    INSERT INTO wallet_balance_snapshots (user_id, through_seq, balance)
+    VALUES (p_user_id, v_transaction.seq, v_transaction.balance_after);
+  END IF;
+
+  RETURN v_transaction;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Append many transactions in one call, e.g. a batch of ride fare charges.
+-- p_entries: [{"user_id", "amount", "transaction_type", "description", "idempotency_key"}, ...]
+-- Users are locked in a fixed order so concurrent batches can't deadlock.
+CREATE OR REPLACE FUNCTION wallet_apply_transactions(p_entries JSONB)
+RETURNS SETOF wallet_transactions AS $$
+DECLARE
+  v_entry JSONB;
+BEGIN
+  FOR v_entry IN
+    SELECT value FROM jsonb_array_elements(p_entries) WITH ORDINALITY AS entry(value, position)
+    ORDER BY (value->>'user_id')::UUID, position
+  LOOP
+    RETURN NEXT wallet_apply_transaction(
+      (v_entry->>'user_id')::UUID,
+      (v_entry->>'amount')::NUMERIC,
+      v_entry->>'transaction_type',
+      v_entry->>'description',
+      v_entry->>'idempotency_key'
+    );
+  END LOOP;
+END;
+$$ LANGUAGE plpgsql;
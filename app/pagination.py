@@ -0,0 +1,78 @@
+import base64
+import json
+from typing import Any, List, NamedTuple, Optional, Sequence
+from .config import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+
+# Response header carrying the cursor of the next page (absent on the last page)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class Page(NamedTuple):
+    items: list
+    next_cursor: Optional[str]
+
+
+class InvalidCursor(ValueError):
+    """
+    Raised when a client sends a cursor that was not produced by this API
+    """
+
+
+def page_size(limit: Optional[int]) -> int:
+    """
+    Clamp a requested page size to [1, MAX_PAGE_SIZE], defaulting to DEFAULT_PAGE_SIZE
+    """
+    if limit is None:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(int(limit), MAX_PAGE_SIZE))
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """
+    Opaque cursor holding the sort key of the last row of a page
+    """
+    payload = json.dumps([str(value) for value in values], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, key_length: int) -> List[str]:
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(payload)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {e}")
+    if not isinstance(values, list) or len(values) != key_length or not all(isinstance(v, str) for v in values):
+        raise InvalidCursor("Invalid cursor")
+    return values
+
+
+def cursor_after(row: dict, sort_columns: Sequence[str]) -> str:
+    return encode_cursor([row[column] for column in sort_columns])
+
+
+def _quote(value: str) -> str:
+    escaped = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{escaped}"'
+
+
+def keyset_condition(sort_columns: Sequence[str], values: Sequence[Any], operator: str) -> str:
+    """
+    PostgREST logic tree for the row comparison (c1, c2, ...) <operator> (v1, v2, ...)
+
+    ("created_at", "id") > (t, i) becomes created_at.gt.t OR (created_at.eq.t AND id.gt.i).
+    The result is the body of an or=(...) filter.
+    """
+    clauses = []
+    for index, column in enumerate(sort_columns):
+        terms = [f"{sort_columns[i]}.eq.{_quote(values[i])}" for i in range(index)]
+        terms.append(f"{column}.{operator}.{_quote(values[index])}")
+        clauses.append(terms[0] if len(terms) == 1 else f"and({','.join(terms)})")
+    return ",".join(clauses)
+
+
+def set_next_cursor(response, page: Page) -> None:
+    """
+    Expose the next page's cursor on a FastAPI response
+    """
+    if page.next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = page.next_cursor
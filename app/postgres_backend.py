@@ -0,0 +1,343 @@
+import asyncio
+import json
+import re
+import uuid
+from collections import OrderedDict
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, List, Optional, Sequence, Tuple, Union
+from .async_database import StorageBackend, Filters, FilterValue, filter_conditions, record_round_trip
+from .config import DATABASE_URL, DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_STATEMENT_CACHE_SIZE
+
+try:
+    import asyncpg
+except ImportError:  # Only needed when STORAGE_BACKEND=postgres
+    asyncpg = None
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+# PostgREST comparison operators and their SQL spelling
+_OPERATORS = {
+    "eq": "=", "neq": "<>", "gt": ">", "gte": ">=", "lt": "<", "lte": "<=",
+    "like": "LIKE", "ilike": "ILIKE"
+}
+
+# Parameter types whose values arrive as JSON strings and need converting before binary encoding
+_INTEGER_TYPES = {"int2", "int4", "int8"}
+_FLOAT_TYPES = {"float4", "float8"}
+
+# Distinct SQL shapes whose parameter types are remembered
+_PARAMETER_TYPE_CACHE_SIZE = 1024
+
+
+def quote_identifier(name: str) -> str:
+    """
+    Double-quote a table/column name, rejecting anything that is not a plain identifier
+    """
+    if not _IDENTIFIER.match(name):
+        raise ValueError(f"Invalid identifier: {name!r}")
+    return f'"{name}"'
+
+
+def _column_list(columns: str) -> str:
+    if columns.strip() == "*":
+        return "*"
+    return ", ".join(quote_identifier(column.strip()) for column in columns.split(","))
+
+
+def _order_clause(order: Union[str, Sequence[str]]) -> str:
+    terms = order.split(",") if isinstance(order, str) else order
+    clauses = []
+    for term in terms:
+        column, *modifiers = term.strip().split(".")
+        clause = quote_identifier(column)
+        for modifier in modifiers:
+            if modifier in ("asc", "desc"):
+                clause += f" {modifier.upper()}"
+            elif modifier in ("nullsfirst", "nullslast"):
+                clause += f" NULLS {modifier[5:].upper()}"
+            else:
+                raise ValueError(f"Invalid order modifier: {modifier!r}")
+        clauses.append(clause)
+    return ", ".join(clauses)
+
+
+def _condition(column: Union[str, Tuple[str, ...]], value: FilterValue, params: List[Any]) -> str:
+    if isinstance(column, tuple):
+        # Row comparison for keyset pagination, e.g. ("created_at", "id") < ($1, $2)
+        operator, values = value
+        if operator not in ("gt", "lt"):
+            raise ValueError(f"Unsupported keyset operator: {operator!r}")
+        placeholders = []
+        for item in values:
+            params.append(item)
+            placeholders.append(f"${len(params)}")
+        columns = ", ".join(quote_identifier(name) for name in column)
+        return f"({columns}) {_OPERATORS[operator]} ({', '.join(placeholders)})"
+    column = quote_identifier(column)
+    operator, operand = value if isinstance(value, tuple) else ("eq", value)
+    if operator == "is" or (operator == "eq" and operand is None):
+        if operand is None:
+            return f"{column} IS NULL"
+        if isinstance(operand, bool):
+            return f"{column} IS {'TRUE' if operand else 'FALSE'}"
+        raise ValueError(f"Invalid IS operand: {operand!r}")
+    if operator == "in":
+        params.append(list(operand))
+        return f"{column} = ANY(${len(params)})"
+    if operator not in _OPERATORS:
+        raise ValueError(f"Unsupported filter operator: {operator!r}")
+    params.append(operand)
+    return f"{column} {_OPERATORS[operator]} ${len(params)}"
+
+
+def _where_clause(filters: Optional[Filters], params: List[Any]) -> str:
+    if not filters:
+        return ""
+    return " WHERE " + " AND ".join(_condition(column, condition, params)
+                                    for column, value in filters.items()
+                                    for condition in ([value] if isinstance(column, tuple) else filter_conditions(value)))
+
+
+def build_select(table: str, columns: str = "*", filters: Optional[Filters] = None,
+                 order: Optional[Union[str, Sequence[str]]] = None, limit: Optional[int] = None,
+                 offset: Optional[int] = None) -> Tuple[str, List[Any]]:
+    params: List[Any] = []
+    sql = f"SELECT {_column_list(columns)} FROM {quote_identifier(table)}" + _where_clause(filters, params)
+    if order:
+        sql += f" ORDER BY {_order_clause(order)}"
+    if limit is not None:
+        params.append(int(limit))
+        sql += f" LIMIT ${len(params)}"
+    if offset is not None:
+        params.append(int(offset))
+        sql += f" OFFSET ${len(params)}"
+    return sql, params
+
+
+def build_count(table: str, filters: Optional[Filters] = None) -> Tuple[str, List[Any]]:
+    params: List[Any] = []
+    sql = f"SELECT count(*) FROM {quote_identifier(table)}" + _where_clause(filters, params)
+    return sql, params
+
+
+def _returning(returning: bool) -> str:
+    return " RETURNING *" if returning else ""
+
+
+def build_insert(table: str, rows: List[dict], returning: bool = True) -> Tuple[str, List[Any]]:
+    """
+    Multi-row INSERT; columns missing from a row take their DEFAULT
+    """
+    columns: List[str] = []
+    for row in rows:
+        columns.extend(column for column in row if column not in columns)
+    params: List[Any] = []
+    values = []
+    for row in rows:
+        placeholders = []
+        for column in columns:
+            if column in row:
+                params.append(row[column])
+                placeholders.append(f"${len(params)}")
+            else:
+                placeholders.append("DEFAULT")
+        values.append(f"({', '.join(placeholders)})")
+    column_sql = ", ".join(quote_identifier(column) for column in columns)
+    sql = f"INSERT INTO {quote_identifier(table)} ({column_sql}) VALUES {', '.join(values)}" + _returning(returning)
+    return sql, params
+
+
+def build_update(table: str, values: dict, filters: Filters, returning: bool = True) -> Tuple[str, List[Any]]:
+    params: List[Any] = []
+    assignments = []
+    for column, value in values.items():
+        params.append(value)
+        assignments.append(f"{quote_identifier(column)} = ${len(params)}")
+    sql = f"UPDATE {quote_identifier(table)} SET {', '.join(assignments)}" + _where_clause(filters, params)
+    return sql + _returning(returning), params
+
+
+def build_delete(table: str, filters: Filters, returning: bool = True) -> Tuple[str, List[Any]]:
+    params: List[Any] = []
+    sql = f"DELETE FROM {quote_identifier(table)}" + _where_clause(filters, params)
+    return sql + _returning(returning), params
+
+
+def build_rpc(function: str, params: Optional[dict] = None) -> Tuple[str, List[Any]]:
+    """
+    Call a function with named arguments, as PostgREST's /rpc endpoint does
+    """
+    values: List[Any] = []
+    arguments = []
+    for name, value in (params or {}).items():
+        values.append(value)
+        arguments.append(f"{quote_identifier(name)} => ${len(values)}")
+    return f"SELECT * FROM {quote_identifier(function)}({', '.join(arguments)})", values
+
+
+def _coerce_parameter(value: Any, type_name: str, kind: str) -> Any:
+    """
+    Convert a JSON-style value (as produced by model_dump(mode="json")) to the
+    Python type asyncpg's binary codec expects for the parameter
+    """
+    if value is None:
+        return None
+    if kind == "array" and isinstance(value, (list, tuple)):
+        element_type = type_name[1:] if type_name.startswith("_") else type_name.rstrip("[]")
+        return [_coerce_parameter(item, element_type, "scalar") for item in value]
+    if type_name in ("json", "jsonb"):
+        return value
+    if type_name == "uuid" and isinstance(value, str):
+        return uuid.UUID(value)
+    if type_name in ("timestamptz", "timestamp") and isinstance(value, str):
+        return datetime.fromisoformat(value)
+    if type_name == "date" and isinstance(value, str):
+        return date.fromisoformat(value)
+    if type_name in ("time", "timetz") and isinstance(value, str):
+        return time.fromisoformat(value)
+    if type_name == "numeric" and not isinstance(value, Decimal):
+        return Decimal(str(value))
+    if type_name in _INTEGER_TYPES and isinstance(value, (float, str)):
+        return int(value)
+    if type_name in _FLOAT_TYPES and isinstance(value, (int, str)):
+        return float(value)
+    if type_name in ("text", "varchar", "bpchar") and not isinstance(value, str):
+        return str(value)
+    return value
+
+
+def _json_value(value: Any) -> Any:
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, list):
+        return [_json_value(item) for item in value]
+    return value
+
+
+def _row(record) -> dict:
+    return {key: _json_value(value) for key, value in record.items()}
+
+
+async def _init_connection(connection) -> None:
+    for type_name in ("json", "jsonb"):
+        await connection.set_type_codec(type_name, encoder=json.dumps, decoder=json.loads, schema="pg_catalog")
+
+
+class AsyncpgBackend(StorageBackend):
+    """
+    Storage backend talking to Postgres directly over asyncpg
+
+    Queries are built from the same filter format as the PostgREST client and
+    run as prepared statements (asyncpg caches them per connection), with
+    results in Postgres' binary format; no HTTP hop, JSON encoding or
+    PostgREST parsing on the way.
+    """
+
+    def __init__(self, dsn: Optional[str] = DATABASE_URL, min_size: int = DB_POOL_MIN_SIZE,
+                 max_size: int = DB_POOL_MAX_SIZE, statement_cache_size: int = DB_STATEMENT_CACHE_SIZE):
+        if asyncpg is None:
+            raise RuntimeError("asyncpg is required for STORAGE_BACKEND=postgres")
+        if not dsn:
+            raise RuntimeError("DATABASE_URL must be set for STORAGE_BACKEND=postgres")
+        self._dsn = dsn
+        self._min_size = min_size
+        self._max_size = max_size
+        self._statement_cache_size = statement_cache_size
+        self._pool = None
+        self._pool_lock = asyncio.Lock()
+        # SQL text -> [(type name, kind)] of its parameters, learned from the first prepare
+        self._parameter_types: "OrderedDict[str, List[Tuple[str, str]]]" = OrderedDict()
+
+    async def _get_pool(self):
+        if self._pool is None:
+            async with self._pool_lock:
+                if self._pool is None:
+                    self._pool = await asyncpg.create_pool(
+                        self._dsn,
+                        min_size=self._min_size,
+                        max_size=self._max_size,
+                        statement_cache_size=self._statement_cache_size,
+                        init=_init_connection
+                    )
+        return self._pool
+
+    async def _arguments(self, connection, sql: str, params: List[Any]) -> List[Any]:
+        if not params:
+            return []
+        types = self._parameter_types.get(sql)
+        if types is None:
+            statement = await connection.prepare(sql)
+            types = [(parameter.name, parameter.kind) for parameter in statement.get_parameters()]
+            self._parameter_types[sql] = types
+            if len(self._parameter_types) > _PARAMETER_TYPE_CACHE_SIZE:
+                self._parameter_types.popitem(last=False)
+        return [_coerce_parameter(value, name, kind) for value, (name, kind) in zip(params, types)]
+
+    async def _fetch(self, sql: str, params: List[Any]) -> list:
+        pool = await self._get_pool()
+        record_round_trip()
+        async with pool.acquire() as connection:
+            return await connection.fetch(sql, *await self._arguments(connection, sql, params))
+
+    async def _execute(self, sql: str, params: List[Any]) -> None:
+        pool = await self._get_pool()
+        record_round_trip()
+        async with pool.acquire() as connection:
+            await connection.execute(sql, *await self._arguments(connection, sql, params))
+
+    async def select(self, table: str, columns: str = "*", filters: Optional[Filters] = None,
+                     order: Optional[Union[str, Sequence[str]]] = None, limit: Optional[int] = None,
+                     offset: Optional[int] = None) -> List[dict]:
+        records = await self._fetch(*build_select(table, columns, filters, order, limit, offset))
+        return [_row(record) for record in records]
+
+    async def count(self, table: str, filters: Optional[Filters] = None) -> int:
+        records = await self._fetch(*build_count(table, filters))
+        return records[0][0]
+
+    async def insert(self, table: str, rows: Union[dict, List[dict]], returning: bool = True) -> List[dict]:
+        rows = [rows] if isinstance(rows, dict) else rows
+        if not rows:
+            return []
+        sql, params = build_insert(table, rows, returning)
+        if not returning:
+            await self._execute(sql, params)
+            return []
+        return [_row(record) for record in await self._fetch(sql, params)]
+
+    async def update(self, table: str, values: dict, filters: Filters, returning: bool = True) -> List[dict]:
+        if not filters:
+            raise ValueError("update requires at least one filter")
+        sql, params = build_update(table, values, filters, returning)
+        if not returning:
+            await self._execute(sql, params)
+            return []
+        return [_row(record) for record in await self._fetch(sql, params)]
+
+    async def delete(self, table: str, filters: Filters, returning: bool = True) -> List[dict]:
+        if not filters:
+            raise ValueError("delete requires at least one filter")
+        sql, params = build_delete(table, filters, returning)
+        if not returning:
+            await self._execute(sql, params)
+            return []
+        return [_row(record) for record in await self._fetch(sql, params)]
+
+    async def rpc(self, function: str, params: Optional[dict] = None) -> Any:
+        """
+        Scalar functions return their value, set/record functions a list of rows
+        """
+        records = await self._fetch(*build_rpc(function, params))
+        if len(records) == 1 and list(records[0].keys()) == [function]:
+            return _json_value(records[0][0])
+        return [_row(record) for record in records]
+
+    async def aclose(self) -> None:
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
@@ -2,9 +2,10 @@ from fastapi import APIRouter, HTTPException
 from uuid import UUID
 from datetime import datetime, timezone
 from ..schemas import AnalyticsRequest, AnalyticsResponse
-from ..crud import get_user_analytics, get_system_metrics, get_rides, get_rider, get_driver, get_driver_earnings
+from ..crud import get_user_analytics, get_system_metrics, get_rides, get_rider, get_driver, get_driver_earnings, get_algorithm_run_stats
 from ..utils.datetime_serializer import simple_datetime_handler
-from ..utils.utility_function import gini_index, social_welfare
+from ..utils.gini_index import weighted_gini_index
+from ..utils.profiling import histogram_percentile, utility_bin_values
 import traceback
 
 router = APIRouter()
@@ -60,40 +61,48 @@ async def get_system_metrics_endpoint():
 async def get_algorithm_performance():
     """
     Retrieve performance metrics for matching algorithms
+    Runtimes (ms) and utilities come from the pre-aggregated algorithm_run_stats rows
+    that every algorithm run updates; execution_time is the mean runtime in ms
     """
     try:
-        # In a real implementation, this would query the database for historical algorithm performance
-        # For now, we'll return real data based on existing rides
+        rows = get_algorithm_run_stats()
         
-        # Get all rides to analyze algorithm usage
-        rides = get_rides()
-        
-        # Group rides by algorithm
-        algorithm_stats = {}
-        for ride in rides:
-            algorithm = ride.algorithm or "Unknown"
-            if algorithm not in algorithm_stats:
-                algorithm_stats[algorithm] = {
-                    "count": 0,
-                    "utilities": [],
-                    "total_time": 0
-                }
-            algorithm_stats[algorithm]["count"] += 1
-            if ride.utility:
-                algorithm_stats[algorithm]["utilities"].append(ride.utility)
+        # Group fleet size buckets by algorithm
+        algorithm_rows = {}
+        for row in rows:
+            algorithm_rows.setdefault(row["algorithm"], []).append(row)
         
         # Calculate metrics for each algorithm
+        bin_values = utility_bin_values()
         algorithms = []
-        for algorithm, stats in algorithm_stats.items():
-            gini = gini_index(stats["utilities"]) if stats["utilities"] else 0.0
-            sw = social_welfare(stats["utilities"]) if stats["utilities"] else 0.0
+        for algorithm, buckets in algorithm_rows.items():
+            run_count = sum(row["run_count"] for row in buckets)
+            assignment_count = sum(row["assignment_count"] for row in buckets)
+            runtime_histogram = _sum_histograms(row["runtime_histogram"] for row in buckets)
+            utility_counts = _sum_histograms(row["utility_histogram"] for row in buckets)
+            
+            gini = weighted_gini_index(bin_values, utility_counts) if assignment_count else 0.0
+            sw = sum(row["utility_sum"] for row in buckets) / assignment_count if assignment_count else 0.0
+            runtime_ms_sum = sum(row["runtime_ms_sum"] for row in buckets)
             
             algorithms.append({
                 "name": algorithm,
                 "gini_index": round(gini, 4),
                 "social_welfare": round(sw, 4),
-                "execution_time": round(stats["total_time"] / stats["count"] if stats["count"] > 0 else 0, 4),
-                "usage_count": stats["count"]
+                "execution_time": round(runtime_ms_sum / run_count if run_count > 0 else 0, 4),
+                "usage_count": assignment_count,
+                "run_count": run_count,
+                "runtime_ms": _runtime_percentiles(runtime_histogram),
+                "phases_ms": _mean_phases(buckets, run_count),
+                "by_fleet_size": [
+                    {
+                        "fleet_size_bucket": row["fleet_size_bucket"],
+                        "run_count": row["run_count"],
+                        "runtime_ms": _runtime_percentiles(row["runtime_histogram"]),
+                        "phases_ms": _mean_phases([row], row["run_count"])
+                    }
+                    for row in buckets
+                ]
             })
         
         response = {
@@ -107,6 +116,27 @@ async def get_algorithm_performance():
         print(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Error retrieving algorithm performance: {str(e)}")
 
+def _sum_histograms(histograms) -> list:
+    total = []
+    for histogram in histograms:
+        histogram = histogram or []
+        if len(histogram) > len(total):
+            total.extend([0] * (len(histogram) - len(total)))
+        for index, count in enumerate(histogram):
+            total[index] += count or 0
+    return total
+
+def _runtime_percentiles(histogram) -> dict:
+    histogram = [count or 0 for count in (histogram or [])]
+    return {f"p{p}": histogram_percentile(histogram, p) for p in (50, 95, 99)}
+
+def _mean_phases(rows, run_count: int) -> dict:
+    phases = {}
+    for row in rows:
+        for phase, ms in (row.get("phase_ms_sum") or {}).items():
+            phases[phase] = phases.get(phase, 0.0) + ms
+    return {phase: round(ms / run_count, 3) for phase, ms in phases.items()} if run_count else {}
+
 @router.get("/users/{user_id}")
 async def get_user_analytics(user_id: UUID):
     """
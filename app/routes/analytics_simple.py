@@ -1,8 +1,8 @@
 from fastapi import APIRouter, HTTPException, Depends
 from uuid import UUID
 from datetime import datetime
-from ..schemas import AnalyticsRequest, AnalyticsResponse
-from ..crud import get_user_analytics, get_user_by_email
+from ..schemas import AnalyticsRequest, AnalyticsResponse, Principal
+from ..crud import get_user_analytics
 from ..utils.datetime_serializer import simple_datetime_handler
 from ..utils.auth_utils import get_current_user
 import traceback
@@ -10,16 +10,11 @@ import traceback
 router = APIRouter()
 
 @router.post("/user", response_model=AnalyticsResponse)
-async def get_user_analytics_endpoint(request: AnalyticsRequest, current_user_email: str = Depends(get_current_user)):
+async def get_user_analytics_endpoint(request: AnalyticsRequest, user: Principal = Depends(get_current_user)):
     """
     Get analytics for the authenticated user
     """
     try:
-        # Get the current user
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         # Use the authenticated user's ID
         user_id = user.id
         
@@ -36,16 +31,11 @@ async def get_user_analytics_endpoint(request: AnalyticsRequest, current_user_em
         raise HTTPException(status_code=500, detail=f"Error retrieving user analytics: {str(e)}")
 
 @router.get("/user")
-async def get_user_analytics_simple(current_user_email: str = Depends(get_current_user)):
+async def get_user_analytics_simple(user: Principal = Depends(get_current_user)):
     """
     Get analytics for the authenticated user (simple endpoint)
     """
     try:
-        # Get the current user
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         analytics = get_user_analytics(user.id)
         return simple_datetime_handler(analytics)
     except Exception as e:
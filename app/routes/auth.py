@@ -3,10 +3,10 @@ from fastapi import APIRouter, HTTPException, Depends, status, Query
 from fastapi.security import OAuth2PasswordRequestForm
 from typing import List
 from uuid import UUID
-from ..schemas import UserCreate, UserLogin, UserResponse, Token, RiderCreate, RiderResponse, DriverCreate, DriverResponse, DriverUpdateLocation, VerifyEmailRequest, ResendVerificationRequest, OTPRequest, OTPVerifyRequest, UserProfileUpdate
+from ..schemas import UserCreate, UserLogin, UserResponse, Token, RiderCreate, RiderResponse, DriverCreate, DriverResponse, DriverUpdateLocation, VerifyEmailRequest, ResendVerificationRequest, OTPRequest, OTPVerifyRequest, UserProfileUpdate, Principal
 from ..crud import create_rider, get_rider, get_riders, create_driver, get_driver, get_drivers, update_driver_location, create_user, get_user_by_email, update_user_last_login, get_user_by_verification_token, verify_user_email, resend_verification_email, create_otp, get_otp_by_email, verify_otp as crud_verify_otp
-from ..utils.datetime_serializer import simple_datetime_handler
-from ..utils.jwt_utils import create_access_token, verify_password
+from ..serialization import json_response
+from ..utils.jwt_utils import create_access_token, verify_password, user_claims
 from ..utils.auth_utils import get_current_user
 from ..sendgrid_client import send_verification_email, send_welcome_email, send_otp_email
 import traceback
@@ -65,7 +65,7 @@ async def signup_user(user: UserCreate):
         if result.email_verification_token:
             send_verification_email(user.email, result.email_verification_token)
         
-        return simple_datetime_handler(result.dict())
+        return json_response(result)
     except Exception as e:
         # Log the full traceback for debugging
         print(f"Error in signup_user: {str(e)}")
@@ -222,7 +222,7 @@ async def login_user(form_data: OAuth2PasswordRequestForm = Depends()):
     
     access_token_expires = timedelta(minutes=30)
     access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data=user_claims(user), expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer", "role": user.role}
 
@@ -267,7 +267,7 @@ async def login_with_otp(request: OTPVerifyRequest):
         # Generate JWT token
         access_token_expires = timedelta(minutes=30)
         access_token = create_access_token(
-            data={"sub": user.email}, expires_delta=access_token_expires
+            data=user_claims(user), expires_delta=access_token_expires
         )
         
         return {"access_token": access_token, "token_type": "bearer", "role": user.role}
@@ -306,8 +306,7 @@ async def signup_rider(rider: RiderCreate):
         from ..crud import create_rider
         result = create_rider(rider_data)
         
-        from ..utils.datetime_serializer import simple_datetime_handler
-        return simple_datetime_handler(result.dict())
+        return json_response(result)
     except HTTPException:
         raise
     except Exception as e:
@@ -317,19 +316,18 @@ async def signup_rider(rider: RiderCreate):
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/profile", response_model=UserResponse)
-async def get_user_profile(current_user_email: str = Depends(get_current_user)):
+async def get_user_profile(current_user: Principal = Depends(get_current_user)):
     """
     Get the current authenticated user's profile
     """
     try:
-        # Get the current user
-        user = get_user_by_email(current_user_email)
+        # The profile has more than the token carries, so load the full user
+        from ..crud import get_user_by_id
+        user = get_user_by_id(current_user.id)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
-        # Use simple datetime handler for serialization
-        serialized_result = simple_datetime_handler(user.dict())
-        return serialized_result
+        return json_response(user)
     except HTTPException:
         raise
     except Exception as e:
@@ -339,16 +337,11 @@ async def get_user_profile(current_user_email: str = Depends(get_current_user)):
         raise HTTPException(status_code=500, detail=f"Error retrieving user profile: {str(e)}")
 
 @router.put("/profile", response_model=UserResponse)
-async def update_user_profile(profile_update: UserProfileUpdate, current_user_email: str = Depends(get_current_user)):
+async def update_user_profile(profile_update: UserProfileUpdate, user: Principal = Depends(get_current_user)):
     """
     Update the current authenticated user's profile
     """
     try:
-        # Get the current user
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         # Import the update function here to avoid circular imports
         from ..crud import update_user_profile as crud_update_user_profile
         
@@ -362,9 +355,7 @@ async def update_user_profile(profile_update: UserProfileUpdate, current_user_em
         if not updated_user:
             raise HTTPException(status_code=500, detail="Error updating user profile")
         
-        # Use simple datetime handler for serialization
-        serialized_result = simple_datetime_handler(updated_user.dict())
-        return serialized_result
+        return json_response(updated_user)
     except HTTPException:
         raise
     except Exception as e:
@@ -374,25 +365,18 @@ async def update_user_profile(profile_update: UserProfileUpdate, current_user_em
         raise HTTPException(status_code=500, detail=f"Error updating user profile: {str(e)}")
 
 @router.get("/user/{user_id}", response_model=UserResponse)
-async def get_user_by_id(user_id: UUID, current_user_email: str = Depends(get_current_user)):
+async def get_user_by_id(user_id: UUID, current_user: Principal = Depends(get_current_user)):
     """
     Get a user by user ID
     """
     try:
-        # Get the current user to verify authentication
-        current_user = get_user_by_email(current_user_email)
-        if not current_user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         # Get the requested user
         from ..crud import get_user_by_id
         user = get_user_by_id(user_id)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
-        # Use simple datetime handler for serialization
-        serialized_result = simple_datetime_handler(user.dict())
-        return serialized_result
+        return json_response(user)
     except HTTPException:
         raise
     except Exception as e:
@@ -1,7 +1,10 @@
-from fastapi import APIRouter, HTTPException, Query, Depends
+from fastapi import APIRouter, HTTPException, Query, Depends, Response
 from uuid import UUID
-from ..schemas import ChatMessageCreate, ChatMessageResponse
-from ..crud import create_chat_message, get_chat_messages, mark_message_as_read, get_user_by_email
+from typing import Optional
+from ..schemas import ChatMessageCreate, ChatMessageResponse, Principal
+from ..crud import create_chat_message, get_chat_messages_page, mark_message_as_read
+from ..pagination import InvalidCursor, set_next_cursor
+from ..config import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 from ..utils.datetime_serializer import simple_datetime_handler
 from ..utils.auth_utils import get_current_user
 import traceback
@@ -11,17 +14,12 @@ router = APIRouter()
 @router.post("/", response_model=ChatMessageResponse)
 async def create_chat_message_endpoint(
     message: ChatMessageCreate,
-    current_user_email: str = Depends(get_current_user)
+    user: Principal = Depends(get_current_user)
 ):
     """
     Create a chat message for the authenticated user
     """
     try:
-        # Get the current user
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         # Determine sender type based on user's role
         # In a real implementation, you would check if the user is a rider or driver
         # for the specific ride they're trying to chat about
@@ -48,35 +46,29 @@ async def create_chat_message_endpoint(
         raise HTTPException(status_code=500, detail=f"Error creating chat message: {str(e)}")
 
 @router.get("/{ride_id}", response_model=list[ChatMessageResponse])
-async def get_chat_messages_endpoint(ride_id: UUID, current_user_email: str = Depends(get_current_user)):
+async def get_chat_messages_endpoint(ride_id: UUID, response: Response, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None, user: Principal = Depends(get_current_user)):
     """
-    Get all chat messages for a ride (authenticated user only)
+    Get the chat messages of a ride in order, one page at a time (authenticated user only)
     """
     try:
-        # Get the current user
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         # In a real implementation, you would verify the user has access to this ride
-        messages = get_chat_messages(ride_id)
+        page = get_chat_messages_page(ride_id, limit, cursor)
+        set_next_cursor(response, page)
+        messages = page.items
         return simple_datetime_handler(messages)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"Error in get_chat_messages_endpoint: {str(e)}")
         print(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Error retrieving chat messages: {str(e)}")
 
 @router.post("/{message_id}/read", response_model=ChatMessageResponse)
-async def mark_message_as_read_endpoint(message_id: UUID, current_user_email: str = Depends(get_current_user)):
+async def mark_message_as_read_endpoint(message_id: UUID, user: Principal = Depends(get_current_user)):
     """
     Mark a chat message as read (authenticated user only)
     """
     try:
-        # Get the current user
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         # In a real implementation, you would verify the user has access to this message
         message = mark_message_as_read(message_id)
         if not message:
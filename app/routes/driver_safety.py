@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from uuid import UUID
 from ..schemas import (
     DriverVerificationCreate, DriverVerificationUpdate, DriverVerificationResponse,
@@ -19,6 +19,7 @@ from ..crud import (
     get_drivers_by_performance_score
 )
 from ..utils.datetime_serializer import simple_datetime_handler
+from ..utils.response_cache import cached_json_response
 import traceback
 
 router = APIRouter()
@@ -130,29 +131,30 @@ async def create_driver_training_module_endpoint(module: DriverTrainingModuleCre
         raise HTTPException(status_code=500, detail=f"Error creating driver training module: {str(e)}")
 
 @router.get("/training-modules", response_model=list[DriverTrainingModuleResponse])
-async def get_driver_training_modules_endpoint():
+async def get_driver_training_modules_endpoint(request: Request):
     """
-    Get all driver training modules
+    Get all driver training modules (cached; send If-None-Match to get a 304 when unchanged)
     """
     try:
-        modules = get_driver_training_modules()
-        return simple_datetime_handler(modules)
+        cached = cached_json_response(request, "driver_training_modules", None, get_driver_training_modules)
+        return cached if cached is not None else []
     except Exception as e:
         print(f"Error in get_driver_training_modules_endpoint: {str(e)}")
         print(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Error retrieving driver training modules: {str(e)}")
 
 @router.get("/training-modules/{module_id}", response_model=DriverTrainingModuleResponse)
-async def get_driver_training_module_endpoint(module_id: UUID):
+async def get_driver_training_module_endpoint(module_id: UUID, request: Request):
     """
-    Get a specific driver training module
+    Get a specific driver training module (cached; send If-None-Match to get a 304 when unchanged)
     """
     try:
-        module = get_driver_training_module(module_id)
-        if not module:
+        cached = cached_json_response(request, "driver_training_modules", str(module_id),
+                                      lambda: get_driver_training_module(module_id))
+        if cached is None:
             raise HTTPException(status_code=404, detail="Driver training module not found")
         
-        return simple_datetime_handler(module)
+        return cached
     except HTTPException:
         raise
     except Exception as e:
@@ -1,15 +1,12 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
+from typing import List, Optional
 from uuid import UUID
-from ..schemas import DriverCreate, DriverResponse, DriverUpdateLocation, RideResponse, NotificationResponse, DriverEarnings
-from ..crud import (
-    create_driver, get_driver, get_drivers, update_driver, delete_driver, update_driver_location,
-    get_rides_by_driver, get_rides,
-    get_user_notifications, mark_notification_as_read,
-    get_driver_earnings, get_driver_ratings, get_driver_average_rating,
-    get_driver_by_user_id
-)
-from ..utils.datetime_serializer import simple_datetime_handler
+from ..schemas import DriverCreate, DriverResponse, DriverUpdateLocation, RideResponse, NotificationResponse, DriverEarnings, Principal
+from ..crud import get_user_notifications_page, mark_notification_as_read, get_driver_earnings, get_driver_ratings, get_driver_rating_summary
+from ..async_crud import create_driver, get_driver, update_driver, delete_driver, update_driver_location, get_rides_by_driver, get_rides, get_driver_by_user_id, get_drivers_page
+from ..pagination import InvalidCursor, set_next_cursor
+from ..config import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from ..serialization import json_response
 from ..utils.auth_utils import get_current_user
 import traceback
 
@@ -23,14 +20,14 @@ async def register_driver(driver: DriverCreate):
     """
     try:
         # Check if email exists in users table
-        from ..crud import get_user_by_email
-        user = get_user_by_email(driver.email)
+        from ..async_crud import get_user_by_email
+        user = await get_user_by_email(driver.email)
         if not user:
             raise HTTPException(status_code=400, detail="Email not found in users table. Please register as a user first.")
         
         # Check if driver already exists for this user
-        from ..crud import get_driver_by_user_id
-        existing_driver = get_driver_by_user_id(user.id)
+        from ..async_crud import get_driver_by_user_id
+        existing_driver = await get_driver_by_user_id(user.id)
         if existing_driver:
             raise HTTPException(status_code=400, detail="Driver profile already exists for this user")
         
@@ -41,16 +38,14 @@ async def register_driver(driver: DriverCreate):
         driver_data = driver.model_copy(update={"user_id": user_id})
         
         # Import CRUD operations
-        from ..crud import create_driver, update_user_role
+        from ..async_crud import create_driver, update_user_role
         
-        result = create_driver(driver_data)
+        result = await create_driver(driver_data)
         
         # Update user role to 'driver'
-        update_user_role(user_id, 'driver')
+        await update_user_role(user_id, 'driver')
         
-        # Use simple datetime handler for serialization
-        serialized_result = simple_datetime_handler(result.dict())
-        return serialized_result
+        return json_response(result)
     except HTTPException:
         raise
     except Exception as e:
@@ -60,15 +55,17 @@ async def register_driver(driver: DriverCreate):
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/")
-async def list_drivers():
+async def list_drivers(response: Response, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None):
     """
-    Get all drivers
+    Get drivers one page at a time (pass the X-Next-Cursor header back as `cursor` for the next page)
     """
     try:
-        result = get_drivers()
-        # Use simple datetime handler for serialization
-        serialized_result = simple_datetime_handler([driver.dict() for driver in result])
-        return serialized_result
+        page = await get_drivers_page(limit, cursor)
+        set_next_cursor(response, page)
+        result = page.items
+        return json_response(result, response)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         # Log the full traceback for debugging
         print(f"Error in list_drivers: {str(e)}")
@@ -76,24 +73,16 @@ async def list_drivers():
         raise HTTPException(status_code=500, detail=f"Error retrieving drivers: {str(e)}")
 
 @router.get("/me")
-async def get_current_driver(current_user_email: str = Depends(get_current_user)):
+async def get_current_driver(user: Principal = Depends(get_current_user)):
     """
     Get the driver profile for the currently authenticated user
     """
     try:
-        # Get the current user
-        from ..crud import get_user_by_email
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=4404, detail="User not found")
-        
         # Get driver by user ID
-        driver = get_driver_by_user_id(user.id)
+        driver = await get_driver_by_user_id(user.id)
         if not driver:
             raise HTTPException(status_code=404, detail="Driver profile not found")
-        # Use simple datetime handler for serialization
-        serialized_result = simple_datetime_handler(driver.dict())
-        return serialized_result
+        return json_response(driver)
     except HTTPException:
         raise
     except Exception as e:
@@ -103,29 +92,21 @@ async def get_current_driver(current_user_email: str = Depends(get_current_user)
         raise HTTPException(status_code=500, detail=f"Error retrieving driver: {str(e)}")
 
 @router.put("/me")
-async def update_current_driver(driver: DriverCreate, current_user_email: str = Depends(get_current_user)):
+async def update_current_driver(driver: DriverCreate, user: Principal = Depends(get_current_user)):
     """
     Update the driver profile for the currently authenticated user
     """
     try:
-        # Get the current user
-        from ..crud import get_user_by_email
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         # Get driver by user ID
-        existing_driver = get_driver_by_user_id(user.id)
+        existing_driver = await get_driver_by_user_id(user.id)
         if not existing_driver:
             raise HTTPException(status_code=404, detail="Driver profile not found")
         
         # Update driver
-        updated_driver = update_driver(existing_driver.id, driver)
+        updated_driver = await update_driver(existing_driver.id, driver)
         if not updated_driver:
             raise HTTPException(status_code=404, detail="Driver not found")
-        # Use simple datetime handler for serialization
-        serialized_result = simple_datetime_handler(updated_driver.dict())
-        return serialized_result
+        return json_response(updated_driver)
     except HTTPException:
         raise
     except Exception as e:
@@ -135,24 +116,18 @@ async def update_current_driver(driver: DriverCreate, current_user_email: str =
         raise HTTPException(status_code=500, detail=f"Error updating driver: {str(e)}")
 
 @router.delete("/me")
-async def delete_current_driver(current_user_email: str = Depends(get_current_user)):
+async def delete_current_driver(user: Principal = Depends(get_current_user)):
     """
     Delete the driver profile for the currently authenticated user
     """
     try:
-        # Get the current user
-        from ..crud import get_user_by_email
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         # Get driver by user ID
-        driver = get_driver_by_user_id(user.id)
+        driver = await get_driver_by_user_id(user.id)
         if not driver:
             raise HTTPException(status_code=404, detail="Driver profile not found")
         
         # Delete driver
-        success = delete_driver(driver.id)
+        success = await delete_driver(driver.id)
         if not success:
             raise HTTPException(status_code=404, detail="Driver not found")
         return {"message": "Driver deleted successfully"}
@@ -165,26 +140,18 @@ async def delete_current_driver(current_user_email: str = Depends(get_current_us
         raise HTTPException(status_code=500, detail=f"Error deleting driver: {str(e)}")
 
 @router.get("/me/rides")
-async def get_current_driver_ride_history(current_user_email: str = Depends(get_current_user)):
+async def get_current_driver_ride_history(user: Principal = Depends(get_current_user)):
     """
     Get ride history for the currently authenticated user
     """
     try:
-        # Get the current user
-        from ..crud import get_user_by_email
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         # Get driver by user ID
-        driver = get_driver_by_user_id(user.id)
+        driver = await get_driver_by_user_id(user.id)
         if not driver:
             raise HTTPException(status_code=404, detail="Driver profile not found")
             
-        rides = get_rides_by_driver(driver.id)
-        # Use simple datetime handler for serialization
-        serialized_result = simple_datetime_handler([ride.dict() for ride in rides])
-        return serialized_result
+        rides = await get_rides_by_driver(driver.id)
+        return json_response(rides)
     except HTTPException:
         raise
     except Exception as e:
@@ -194,26 +161,18 @@ async def get_current_driver_ride_history(current_user_email: str = Depends(get_
         raise HTTPException(status_code=500, detail=f"Error retrieving ride history: {str(e)}")
 
 @router.get("/me/earnings")
-async def get_current_driver_earnings_info(current_user_email: str = Depends(get_current_user)):
+async def get_current_driver_earnings_info(user: Principal = Depends(get_current_user)):
     """
     Get earnings information for the currently authenticated user
     """
     try:
-        # Get the current user
-        from ..crud import get_user_by_email
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         # Get driver by user ID
-        driver = get_driver_by_user_id(user.id)
+        driver = await get_driver_by_user_id(user.id)
         if not driver:
             raise HTTPException(status_code=404, detail="Driver profile not found")
             
         earnings = get_driver_earnings(driver.id)
-        # Use simple datetime handler for serialization
-        serialized_result = simple_datetime_handler(earnings.dict())
-        return serialized_result
+        return json_response(earnings)
     except HTTPException:
         raise
     except Exception as e:
@@ -223,38 +182,31 @@ async def get_current_driver_earnings_info(current_user_email: str = Depends(get
         raise HTTPException(status_code=500, detail=f"Error retrieving earnings: {str(e)}")
 
 @router.get("/me/ratings")
-async def get_current_driver_ratings_info(current_user_email: str = Depends(get_current_user)):
+async def get_current_driver_ratings_info(user: Principal = Depends(get_current_user)):
     """
     Get ratings for the currently authenticated user
     """
     try:
-        # Get the current user
-        from ..crud import get_user_by_email
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         # Get driver by user ID
-        driver = get_driver_by_user_id(user.id)
+        driver = await get_driver_by_user_id(user.id)
         if not driver:
             raise HTTPException(status_code=404, detail="Driver profile not found")
             
         # Get all ratings for this driver
         ratings = get_driver_ratings(driver.id)
         
-        # Get average rating
-        average_rating = get_driver_average_rating(driver.id)
+        # Average and count come from the aggregates on the driver row
+        summary = get_driver_rating_summary(driver.id)
         
         response = {
             "driver_id": str(driver.id),
-            "average_rating": average_rating,
-            "total_ratings": len(ratings),
-            "reviews": [rating.dict() for rating in ratings]
+            "average_rating": summary["average_rating"] if summary["average_rating"] is not None else 5.0,
+            "bayesian_rating": summary["bayesian_rating"],
+            "total_ratings": summary["rating_count"],
+            "reviews": ratings
         }
         
-        # Use simple datetime handler for serialization
-        serialized_result = simple_datetime_handler(response)
-        return serialized_result
+        return json_response(response)
     except HTTPException:
         raise
     except Exception as e:
@@ -264,28 +216,24 @@ async def get_current_driver_ratings_info(current_user_email: str = Depends(get_
         raise HTTPException(status_code=500, detail=f"Error retrieving ratings: {str(e)}")
 
 @router.get("/me/notifications")
-async def get_current_driver_notifications(current_user_email: str = Depends(get_current_user)):
+async def get_current_driver_notifications(response: Response, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None, user: Principal = Depends(get_current_user)):
     """
     Get notifications for the currently authenticated driver
     """
     try:
-        # Get the current user
-        from ..crud import get_user_by_email
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         # Get driver by user ID
-        driver = get_driver_by_user_id(user.id)
+        driver = await get_driver_by_user_id(user.id)
         if not driver:
             raise HTTPException(status_code=404, detail="Driver profile not found")
             
-        notifications = get_user_notifications(driver.id)
-        # Use simple datetime handler for serialization
-        serialized_result = simple_datetime_handler([notification.dict() for notification in notifications])
-        return serialized_result
+        page = get_user_notifications_page(driver.id, limit, cursor)
+        set_next_cursor(response, page)
+        notifications = page.items
+        return json_response(notifications, response)
     except HTTPException:
         raise
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         # Log the full traceback for debugging
         print(f"Error in get_current_driver_notifications: {str(e)}")
@@ -298,12 +246,10 @@ async def get_driver_by_id(driver_id: UUID):
     Get a specific driver by ID
     """
     try:
-        driver = get_driver(driver_id)
+        driver = await get_driver(driver_id)
         if not driver:
             raise HTTPException(status_code=404, detail="Driver not found")
-        # Use simple datetime handler for serialization
-        serialized_result = simple_datetime_handler(driver.dict())
-        return serialized_result
+        return json_response(driver)
     except HTTPException:
         raise
     except Exception as e:
@@ -313,19 +259,13 @@ async def get_driver_by_id(driver_id: UUID):
         raise HTTPException(status_code=500, detail=f"Error retrieving driver: {str(e)}")
 
 @router.post("/me/notifications/{notification_id}/read")
-async def mark_current_driver_notification_read(notification_id: UUID, current_user_email: str = Depends(get_current_user)):
+async def mark_current_driver_notification_read(notification_id: UUID, user: Principal = Depends(get_current_user)):
     """
     Mark a notification as read for the currently authenticated driver
     """
     try:
-        # Get the current user
-        from ..crud import get_user_by_email
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         # Get driver by user ID
-        driver = get_driver_by_user_id(user.id)
+        driver = await get_driver_by_user_id(user.id)
         if not driver:
             raise HTTPException(status_code=404, detail="Driver profile not found")
             
@@ -333,9 +273,7 @@ async def mark_current_driver_notification_read(notification_id: UUID, current_u
         if not notification:
             raise HTTPException(status_code=404, detail="Notification not found")
             
-        # Use simple datetime handler for serialization
-        serialized_result = simple_datetime_handler(notification.dict())
-        return serialized_result
+        return json_response(notification)
     except HTTPException:
         raise
     except Exception as e:
@@ -345,27 +283,22 @@ async def mark_current_driver_notification_read(notification_id: UUID, current_u
         raise HTTPException(status_code=500, detail=f"Error marking notification as read: {str(e)}")
 
 @router.post("/me/rides/{ride_id}/accept")
-async def accept_ride(ride_id: UUID, current_user_email: str = Depends(get_current_user)):
+async def accept_ride(ride_id: UUID, user: Principal = Depends(get_current_user)):
     """
     Accept a ride assignment as the currently authenticated driver
     """
     try:
         print(f"Attempting to accept ride with ID: {ride_id}")
-        # Get the current user
-        from ..crud import get_user_by_email, get_ride, update_ride_status
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
+        from ..async_crud import get_ride, update_ride_status
         print(f"User found: {user.email}")
         # Get driver by user ID
-        driver = get_driver_by_user_id(user.id)
+        driver = await get_driver_by_user_id(user.id)
         if not driver:
             raise HTTPException(status_code=404, detail="Driver profile not found")
             
         print(f"Driver found: {driver.name} with ID: {driver.id}")
         # Get the ride
-        ride = get_ride(ride_id)
+        ride = await get_ride(ride_id)
         if not ride:
             print(f"Ride with ID {ride_id} not found in database")
             raise HTTPException(status_code=404, detail="Ride not found")
@@ -380,13 +313,11 @@ async def accept_ride(ride_id: UUID, current_user_email: str = Depends(get_curre
             raise HTTPException(status_code=400, detail=f"Ride is in {ride.status} status and cannot be accepted")
             
         # Update ride status to 'accepted'
-        updated_ride = update_ride_status(ride_id, "accepted")
+        updated_ride = await update_ride_status(ride_id, "accepted")
         if not updated_ride:
             raise HTTPException(status_code=500, detail="Error updating ride status")
             
-        # Use simple datetime handler for serialization
-        serialized_result = simple_datetime_handler(updated_ride.dict())
-        return serialized_result
+        return json_response(updated_ride)
     except HTTPException:
         raise
     except Exception as e:
@@ -396,27 +327,22 @@ async def accept_ride(ride_id: UUID, current_user_email: str = Depends(get_curre
         raise HTTPException(status_code=500, detail=f"Error accepting ride: {str(e)}")
 
 @router.post("/me/rides/{ride_id}/reject")
-async def reject_ride(ride_id: UUID, current_user_email: str = Depends(get_current_user)):
+async def reject_ride(ride_id: UUID, user: Principal = Depends(get_current_user)):
     """
     Reject a ride assignment as the currently authenticated driver
     """
     try:
         print(f"Attempting to reject ride with ID: {ride_id}")
-        # Get the current user
-        from ..crud import get_user_by_email, get_ride, update_ride_status
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
+        from ..async_crud import get_ride, update_ride_status
         print(f"User found: {user.email}")
         # Get driver by user ID
-        driver = get_driver_by_user_id(user.id)
+        driver = await get_driver_by_user_id(user.id)
         if not driver:
             raise HTTPException(status_code=404, detail="Driver profile not found")
             
         print(f"Driver found: {driver.name} with ID: {driver.id}")
         # Get the ride
-        ride = get_ride(ride_id)
+        ride = await get_ride(ride_id)
         if not ride:
             print(f"Ride with ID {ride_id} not found in database")
             raise HTTPException(status_code=404, detail="Ride not found")
@@ -431,13 +357,11 @@ async def reject_ride(ride_id: UUID, current_user_email: str = Depends(get_curre
             raise HTTPException(status_code=400, detail=f"Ride is in {ride.status} status and cannot be rejected")
             
         # Update ride status to 'rejected'
-        updated_ride = update_ride_status(ride_id, "rejected")
+        updated_ride = await update_ride_status(ride_id, "rejected")
         if not updated_ride:
             raise HTTPException(status_code=500, detail="Error updating ride status")
             
-        # Use simple datetime handler for serialization
-        serialized_result = simple_datetime_handler(updated_ride.dict())
-        return serialized_result
+        return json_response(updated_ride)
     except HTTPException:
         raise
     except Exception as e:
@@ -447,25 +371,20 @@ async def reject_ride(ride_id: UUID, current_user_email: str = Depends(get_curre
         raise HTTPException(status_code=500, detail=f"Error rejecting ride: {str(e)}")
 
 @router.post("/me/rides/{ride_id}/start")
-async def start_ride(ride_id: UUID, current_user_email: str = Depends(get_current_user)):
+async def start_ride(ride_id: UUID, user: Principal = Depends(get_current_user)):
     """
     Start a ride as the currently authenticated driver
     """
     try:
-        # Get the current user
-        from ..crud import get_user_by_email, get_ride, update_ride_status
+        from ..async_crud import get_ride, update_ride_status
         from datetime import datetime
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         # Get driver by user ID
-        driver = get_driver_by_user_id(user.id)
+        driver = await get_driver_by_user_id(user.id)
         if not driver:
             raise HTTPException(status_code=404, detail="Driver profile not found")
             
         # Get the ride
-        ride = get_ride(ride_id)
+        ride = await get_ride(ride_id)
         if not ride:
             raise HTTPException(status_code=404, detail="Ride not found")
             
@@ -478,7 +397,7 @@ async def start_ride(ride_id: UUID, current_user_email: str = Depends(get_curren
             raise HTTPException(status_code=400, detail=f"Ride is in {ride.status} status and cannot be started. Only accepted rides can be started.")
             
         # Update ride status to 'started' and set start time
-        from ..crud import update_ride
+        from ..async_crud import update_ride
         from ..schemas import RideCreate
         updated_ride_data = RideCreate(
             user_id=ride.user_id,
@@ -492,13 +411,11 @@ async def start_ride(ride_id: UUID, current_user_email: str = Depends(get_curren
             status="started"
         )
         
-        updated_ride = update_ride(ride_id, updated_ride_data)
+        updated_ride = await update_ride(ride_id, updated_ride_data)
         if not updated_ride:
             raise HTTPException(status_code=500, detail="Error updating ride status")
             
-        # Use simple datetime handler for serialization
-        serialized_result = simple_datetime_handler(updated_ride.dict())
-        return serialized_result
+        return json_response(updated_ride)
     except HTTPException:
         raise
     except Exception as e:
@@ -508,26 +425,21 @@ async def start_ride(ride_id: UUID, current_user_email: str = Depends(get_curren
         raise HTTPException(status_code=500, detail=f"Error starting ride: {str(e)}")
 
 @router.post("/me/rides/{ride_id}/end")
-async def end_ride(ride_id: UUID, current_user_email: str = Depends(get_current_user)):
+async def end_ride(ride_id: UUID, user: Principal = Depends(get_current_user)):
     """
     End a ride as the currently authenticated driver
     """
     try:
-        # Get the current user
-        from ..crud import get_user_by_email, get_ride, update_ride
+        from ..async_crud import get_ride, update_ride, charge_ride_fare, grant_ride_loyalty_points
         from datetime import datetime
         from ..schemas import RideCreate
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         # Get driver by user ID
-        driver = get_driver_by_user_id(user.id)
+        driver = await get_driver_by_user_id(user.id)
         if not driver:
             raise HTTPException(status_code=404, detail="Driver profile not found")
             
         # Get the ride
-        ride = get_ride(ride_id)
+        ride = await get_ride(ride_id)
         if not ride:
             raise HTTPException(status_code=404, detail="Ride not found")
             
@@ -552,13 +464,15 @@ async def end_ride(ride_id: UUID, current_user_email: str = Depends(get_current_
             status="completed"
         )
         
-        updated_ride = update_ride(ride_id, updated_ride_data)
+        updated_ride = await update_ride(ride_id, updated_ride_data)
         if not updated_ride:
             raise HTTPException(status_code=500, detail="Error updating ride status")
+        
+        # Charge the fare and grant loyalty points (both applied in the next background batch)
+        charge_ride_fare(updated_ride)
+        grant_ride_loyalty_points(updated_ride)
             
-        # Use simple datetime handler for serialization
-        serialized_result = simple_datetime_handler(updated_ride.dict())
-        return serialized_result
+        return json_response(updated_ride)
     except HTTPException:
         raise
     except Exception as e:
@@ -568,22 +482,16 @@ async def end_ride(ride_id: UUID, current_user_email: str = Depends(get_current_
         raise HTTPException(status_code=500, detail=f"Error ending ride: {str(e)}")
 
 @router.post("/{driver_id}/location")
-async def update_location(driver_id: UUID, location: DriverUpdateLocation, current_user_email: str = Depends(get_current_user)):
+async def update_location(driver_id: UUID, location: DriverUpdateLocation, user: Principal = Depends(get_current_user)):
     """
     Update driver location and availability
     """
     try:
-        # Get the current user
-        from ..crud import get_user_by_email
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         # Verify the driver belongs to the authenticated user
         # In a real implementation, you would check if the user is authorized to update this driver's location
         # For now, we'll just process the request
         
-        driver = update_driver_location(
+        driver = await update_driver_location(
             driver_id, 
             location.current_lat, 
             location.current_lon, 
@@ -591,9 +499,7 @@ async def update_location(driver_id: UUID, location: DriverUpdateLocation, curre
         )
         if not driver:
             raise HTTPException(status_code=404, detail="Driver not found")
-        # Use simple datetime handler for serialization
-        serialized_result = simple_datetime_handler({"message": "Location updated successfully"})
-        return serialized_result
+        return {"message": "Location updated successfully"}
     except HTTPException:
         raise
     except Exception as e:
@@ -609,16 +515,14 @@ async def get_driver_rides(driver_id: UUID):
     """
     try:
         # Check if driver exists
-        driver = get_driver(driver_id)
+        driver = await get_driver(driver_id)
         if not driver:
             raise HTTPException(status_code=404, detail="Driver not found")
         
         # Get all rides for this driver
-        rides = get_rides_by_driver(driver_id)
+        rides = await get_rides_by_driver(driver_id)
         
-        # Use simple datetime handler for serialization
-        serialized_result = simple_datetime_handler([ride.dict() for ride in rides])
-        return serialized_result
+        return json_response(rides)
     except HTTPException:
         raise
     except Exception as e:
@@ -628,21 +532,23 @@ async def get_driver_rides(driver_id: UUID):
         raise HTTPException(status_code=500, detail=f"Error retrieving rides: {str(e)}")
 
 @router.get("/{driver_id}/notifications")
-async def get_driver_notifications(driver_id: UUID):
+async def get_driver_notifications(driver_id: UUID, response: Response, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None):
     """
     Get notifications for a specific driver
     """
     try:
-        driver = get_driver(driver_id)
+        driver = await get_driver(driver_id)
         if not driver:
             raise HTTPException(status_code=404, detail="Driver not found")
             
-        notifications = get_user_notifications(driver_id)
-        # Use simple datetime handler for serialization
-        serialized_result = simple_datetime_handler([notification.dict() for notification in notifications])
-        return serialized_result
+        page = get_user_notifications_page(driver_id, limit, cursor)
+        set_next_cursor(response, page)
+        notifications = page.items
+        return json_response(notifications, response)
     except HTTPException:
         raise
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         # Log the full traceback for debugging
         print(f"Error in get_driver_notifications: {str(e)}")
@@ -655,7 +561,7 @@ async def mark_notification_read(driver_id: UUID, notification_id: UUID):
     Mark a notification as read
     """
     try:
-        driver = get_driver(driver_id)
+        driver = await get_driver(driver_id)
         if not driver:
             raise HTTPException(status_code=404, detail="Driver not found")
             
@@ -663,9 +569,7 @@ async def mark_notification_read(driver_id: UUID, notification_id: UUID):
         if not notification:
             raise HTTPException(status_code=404, detail="Notification not found")
             
-        # Use simple datetime handler for serialization
-        serialized_result = simple_datetime_handler(notification.dict())
-        return serialized_result
+        return json_response(notification)
     except HTTPException:
         raise
     except Exception as e:
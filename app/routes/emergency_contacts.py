@@ -1,7 +1,7 @@
 from fastapi import APIRouter, HTTPException, Depends
 from uuid import UUID
-from ..schemas import EmergencyContactCreate, EmergencyContactResponse
-from ..crud import create_emergency_contact, get_emergency_contacts, get_primary_emergency_contact, get_user_by_email
+from ..schemas import EmergencyContactCreate, EmergencyContactResponse, Principal
+from ..crud import create_emergency_contact, get_emergency_contacts, get_primary_emergency_contact
 from ..utils.datetime_serializer import simple_datetime_handler
 from ..utils.auth_utils import get_current_user
 import traceback
@@ -9,16 +9,11 @@ import traceback
 router = APIRouter()
 
 @router.post("/", response_model=EmergencyContactResponse)
-async def create_emergency_contact_endpoint(contact: EmergencyContactCreate, current_user_email: str = Depends(get_current_user)):
+async def create_emergency_contact_endpoint(contact: EmergencyContactCreate, user: Principal = Depends(get_current_user)):
     """
     Create an emergency contact for the authenticated user
     """
     try:
-        # Get the current user
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         emergency_contact = create_emergency_contact(
             user.id,
             contact.name,
@@ -39,16 +34,11 @@ async def create_emergency_contact_endpoint(contact: EmergencyContactCreate, cur
         raise HTTPException(status_code=500, detail=f"Error creating emergency contact: {str(e)}")
 
 @router.get("/", response_model=list[EmergencyContactResponse])
-async def get_emergency_contacts_endpoint(current_user_email: str = Depends(get_current_user)):
+async def get_emergency_contacts_endpoint(user: Principal = Depends(get_current_user)):
     """
     Get all emergency contacts for the authenticated user
     """
     try:
-        # Get the current user
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         contacts = get_emergency_contacts(user.id)
         return simple_datetime_handler(contacts)
     except Exception as e:
@@ -57,16 +47,11 @@ async def get_emergency_contacts_endpoint(current_user_email: str = Depends(get_
         raise HTTPException(status_code=500, detail=f"Error retrieving emergency contacts: {str(e)}")
 
 @router.get("/primary", response_model=EmergencyContactResponse)
-async def get_primary_emergency_contact_endpoint(current_user_email: str = Depends(get_current_user)):
+async def get_primary_emergency_contact_endpoint(user: Principal = Depends(get_current_user)):
     """
     Get the primary emergency contact for the authenticated user
     """
     try:
-        # Get the current user
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         contact = get_primary_emergency_contact(user.id)
         if not contact:
             raise HTTPException(status_code=404, detail="Primary emergency contact not found")
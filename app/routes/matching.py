@@ -1,28 +1,23 @@
 from fastapi import APIRouter, HTTPException, BackgroundTasks, Depends
-from ..schemas import MatchRequest, MatchResponse
+from ..schemas import MatchRequest, MatchResponse, Principal
 from ..algorithms.rga import rga_algorithm
 from ..algorithms.rga_plus import rga_plus_algorithm
 from ..algorithms.rga_enhanced import rga_enhanced_algorithm
 from ..algorithms.iterative_voting import iterative_voting_algorithm
-from ..crud import create_ride, get_user_by_email
+from ..crud import persist_match_result
 from ..sendgrid_client import send_email_sync
-from ..utils.datetime_serializer import simple_datetime_handler
+from ..serialization import json_response
 from ..utils.auth_utils import get_current_user
 import traceback
 
 router = APIRouter()
 
 @router.post("/run")
-async def run_matching_algorithm(request: MatchRequest, background_tasks: BackgroundTasks, current_user_email: str = Depends(get_current_user)):
+async def run_matching_algorithm(request: MatchRequest, background_tasks: BackgroundTasks, user: Principal = Depends(get_current_user)):
     """
     Run selected algorithm (RGA/RGA++/IV) for ride matching
     """
     try:
-        # Get the current user
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         if request.algorithm == "RGA":
             result = rga_algorithm()
         elif request.algorithm == "RGA++":
@@ -34,18 +29,18 @@ async def run_matching_algorithm(request: MatchRequest, background_tasks: Backgr
         else:
             raise HTTPException(status_code=400, detail="Invalid algorithm specified")
         
-        # Process assignments (save to database)
-        for assignment in result.assignments:
-            # In a full implementation, save each ride assignment to the database
-            # create_ride(assignment)
-            pass
+        # Save the assignments as rides, plus the schedule row, in bulk
+        persisted = persist_match_result(result, user.id)
+        if not persisted:
+            raise HTTPException(status_code=500, detail="Error saving match result")
         
         # Send notification emails in the background
         background_tasks.add_task(send_match_notifications, result)
         
-        # Use simple datetime handler for serialization
-        serialized_result = simple_datetime_handler(result.dict())
-        return serialized_result
+        return json_response({**result.model_dump(), "schedule_id": persisted["schedule_id"],
+                              "skipped_rider_ids": persisted["skipped_rider_ids"]})
+    except HTTPException:
+        raise
     except Exception as e:
         # Log the full traceback for debugging
         print(f"Error in run_matching_algorithm: {str(e)}")
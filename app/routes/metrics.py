@@ -1,33 +1,52 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
+from typing import Optional
 from ..schemas import MetricsResponse
-from ..utils.gini_index import gini_index
-from ..utils.utility_function import social_welfare
+from ..utils.fairness_metrics import fairness_metrics, ALL_ALGORITHMS
+from ..utils.distance_cache import distance_cache
+from ..location_ingest import location_ingest
+from ..utils.pubsub import location_pubsub
+from ..fleet_index import fleet_index
 from ..utils.datetime_serializer import simple_datetime_handler
 from datetime import datetime
 
 router = APIRouter()
 
 @router.get("/latest")
-async def get_latest_metrics():
+async def get_latest_metrics(algorithm: str = ALL_ALGORITHMS, window: Optional[float] = None):
     """
     Return latest fairness & efficiency metrics
-    Note: In a real implementation, this would calculate metrics from actual ride data
+    Metrics are computed over the assignments produced by the matching algorithms
+    in a rolling window (seconds, the longest configured window by default)
     """
     try:
-        # Placeholder metrics - in a real implementation, these would be calculated from database data
-        sample_utilities = [0.8, 0.7, 0.9, 0.6, 0.85]  # Sample utility values
+        snapshot = fairness_metrics.snapshot(algorithm, window)
+        if snapshot is None:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown window {window}, available windows: {fairness_metrics.windows}"
+            )
         
-        gini = gini_index(sample_utilities)
-        sw = social_welfare(sample_utilities)
-        
-        result = {
-            "gini": gini,
-            "social_welfare": sw,
-            "timestamp": datetime.now()
-        }
+        result = dict(snapshot, timestamp=datetime.now())
         
         # Use simple datetime handler for serialization
         serialized_result = simple_datetime_handler(result)
         return serialized_result
+    except HTTPException:
+        raise
     except Exception as e:
-        return {"error": f"Error calculating metrics: {str(e)}"}
\ No newline at end of file
+        return {"error": f"Error calculating metrics: {str(e)}"}
+
+@router.get("/cache")
+async def get_cache_metrics():
+    """
+    Return hit/miss counters of the distance/ETA cache for monitoring
+    """
+    return {"distance_cache": distance_cache.stats()}
+
+@router.get("/ingest")
+async def get_ingest_metrics():
+    """
+    Return backlog and throughput counters of the driver location ingest buffer, live fan-out and fleet index
+    """
+    return {"location_ingest": location_ingest.stats(), "location_pubsub": location_pubsub.stats(),
+            "fleet_index": fleet_index.stats()}
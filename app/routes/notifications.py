@@ -1,8 +1,10 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
 from uuid import UUID
-from typing import List
-from ..crud import get_user_notifications, mark_notification_as_read, create_notification, get_user_by_email
-from ..schemas import NotificationCreate, NotificationResponse
+from typing import List, Optional
+from ..crud import get_user_notifications_page, mark_notification_as_read, create_notification
+from ..pagination import InvalidCursor, set_next_cursor
+from ..config import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from ..schemas import NotificationCreate, NotificationResponse, Principal
 from ..utils.datetime_serializer import simple_datetime_handler
 from ..utils.auth_utils import get_current_user
 import traceback
@@ -11,36 +13,30 @@ from datetime import datetime, timedelta
 router = APIRouter()
 
 @router.get("/user")
-async def get_user_notifications_endpoint(current_user_email: str = Depends(get_current_user)):
+async def get_user_notifications_endpoint(response: Response, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None, user: Principal = Depends(get_current_user)):
     """
     Retrieve notifications for the authenticated user
     """
     try:
-        # Get the current user
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        # Get all notifications for this user
-        notifications = get_user_notifications(user.id)
+        # Get one page of notifications for this user, newest first
+        page = get_user_notifications_page(user.id, limit, cursor)
+        set_next_cursor(response, page)
+        notifications = page.items
         
         return simple_datetime_handler([notification.dict() for notification in notifications])
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"Error in get_user_notifications_endpoint: {str(e)}")
         print(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Error retrieving notifications: {str(e)}")
 
 @router.post("/{notification_id}/read")
-async def mark_notification_as_read_endpoint(notification_id: UUID, current_user_email: str = Depends(get_current_user)):
+async def mark_notification_as_read_endpoint(notification_id: UUID, user: Principal = Depends(get_current_user)):
     """
     Mark a notification as read for the authenticated user
     """
     try:
-        # Get the current user
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         # In a real implementation, you would verify the user owns this notification
         # Mark the notification as read
         notification = mark_notification_as_read(notification_id)
@@ -61,16 +57,11 @@ async def mark_notification_as_read_endpoint(notification_id: UUID, current_user
         raise HTTPException(status_code=500, detail=f"Error marking notification as read: {str(e)}")
 
 @router.post("/", response_model=NotificationResponse)
-async def create_notification_endpoint(notification: NotificationCreate, current_user_email: str = Depends(get_current_user)):
+async def create_notification_endpoint(notification: NotificationCreate, user: Principal = Depends(get_current_user)):
     """
     Create a new notification for the authenticated user
     """
     try:
-        # Get the current user
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         # Use the authenticated user's ID
         notification_data = notification.model_copy(update={"user_id": user.id})
         
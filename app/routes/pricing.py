@@ -6,11 +6,28 @@ from ..utils.datetime_serializer import simple_datetime_handler
 from ..algorithms.rga import rga_algorithm
 from ..algorithms.rga_plus import rga_plus_algorithm
 from ..algorithms.iterative_voting import iterative_voting_algorithm
-from ..utils.distance_calc import calculate_distance
+from ..utils.distance_cache import estimate_route
+from ..fleet_index import fleet_index
+from ..config import FLEET_NEARBY_RADIUS_KM
 import traceback
 
 router = APIRouter()
 
+def driver_supply(lat: float, lon: float) -> dict:
+    """
+    Available drivers near the pickup and the pickup ETA of the nearest one, from the live fleet index
+    """
+    nearest = fleet_index.nearest(lat, lon, 1)
+    pickup_eta_minutes = None
+    if nearest:
+        driver = nearest[0][0]
+        distance_km, minutes = estimate_route(driver.current_lat, driver.current_lon, lat, lon)
+        pickup_eta_minutes = round(fleet_index.eta_minutes(driver.id, distance_km, minutes), 2)
+    return {
+        "nearby_drivers": len(fleet_index.within(lat, lon, FLEET_NEARBY_RADIUS_KM)),
+        "pickup_eta_minutes": pickup_eta_minutes
+    }
+
 @router.post("/estimate", response_model=FareEstimateResponse)
 async def estimate_ride_fare(request: FareEstimateRequest):
     """
@@ -25,6 +42,7 @@ async def estimate_ride_fare(request: FareEstimateRequest):
             request.rider_beta or 0.5,
             request.traffic_multiplier or 1.0
         )
+        fare_estimate.update(driver_supply(request.origin_lat, request.origin_lon))
         
         return simple_datetime_handler(fare_estimate)
     except Exception as e:
@@ -38,8 +56,8 @@ async def estimate_ride_fare_by_algorithm(request: AlgorithmFareEstimateRequest)
     Estimate fare for a ride based on origin, destination, and algorithm
     """
     try:
-        # Calculate distance
-        distance_km = calculate_distance(
+        # Look up distance and duration (learned travel times when available)
+        distance_km, base_duration_minutes = estimate_route(
             request.origin_lat,
             request.origin_lon,
             request.destination_lat,
@@ -51,8 +69,8 @@ async def estimate_ride_fare_by_algorithm(request: AlgorithmFareEstimateRequest)
         distance_rate = 1.25  # Per kilometer
         time_rate = 0.50  # Per minute
         
-        # Estimated time (assuming average speed of 30 km/h)
-        estimated_duration_minutes = (distance_km / 30) * 60 * (request.traffic_multiplier or 1.0)
+        # Estimated time adjusted for traffic
+        estimated_duration_minutes = base_duration_minutes * (request.traffic_multiplier or 1.0)
         
         # Calculate fare components
         distance_fare = distance_km * distance_rate
@@ -104,7 +122,8 @@ async def estimate_ride_fare_by_algorithm(request: AlgorithmFareEstimateRequest)
             time_fare=round(time_fare, 2),
             surge_multiplier=surge_multiplier,
             utility=utility,
-            metrics=metrics
+            metrics=metrics,
+            **driver_supply(request.origin_lat, request.origin_lon)
         )
         
         return simple_datetime_handler(response.dict())
@@ -2,8 +2,8 @@ from fastapi import APIRouter, HTTPException, Depends
 from uuid import UUID
 from typing import List, Optional
 from pydantic import BaseModel
-from ..crud import get_driver, create_rating, get_driver_ratings, get_driver_average_rating, get_ride, get_user_by_email
-from ..schemas import RatingCreate, RatingResponse, DriverRatingsResponse
+from ..crud import get_driver, create_rating, get_driver_ratings, get_driver_rating_summary
+from ..schemas import RatingCreate, RatingResponse, DriverRatingsResponse, Principal
 from ..utils.datetime_serializer import simple_datetime_handler
 from ..utils.auth_utils import get_current_user
 import traceback
@@ -12,30 +12,19 @@ from datetime import datetime, timedelta
 router = APIRouter()
 
 @router.post("/rides/{ride_id}")
-async def submit_ride_rating(ride_id: UUID, rating_data: RatingCreate, current_user_email: str = Depends(get_current_user)):
+async def submit_ride_rating(ride_id: UUID, rating_data: RatingCreate, user: Principal = Depends(get_current_user)):
     """
     Submit a rating and review for a completed ride
     """
     try:
-        # Get the current user
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         # Validate rating
         if not 1 <= rating_data.rating <= 5:
             raise HTTPException(status_code=400, detail="Rating must be between 1 and 5")
         
         # Create the rating in the database with user_id
+        # (the driver's rating aggregates are updated in the same transaction)
         rating_response = create_rating(ride_id, rating_data, user.id)
         
-        # Update driver's average rating
-        ride = get_ride(ride_id)
-        if ride and ride.driver_id:
-            # In a real implementation, we would update the driver's average rating
-            # For now, we'll just return the created rating
-            pass
-        
         response = {
             "message": "Rating submitted successfully",
             "rating": rating_response.dict()
@@ -63,13 +52,15 @@ async def get_driver_ratings_endpoint(driver_id: UUID):
         # Get all ratings for this driver
         ratings = get_driver_ratings(driver_id)
         
-        # Calculate average rating
-        average_rating = get_driver_average_rating(driver_id)
+        # Average and count come from the aggregates on the driver row
+        summary = get_driver_rating_summary(driver_id)
+        average_rating = summary["average_rating"] if summary["average_rating"] is not None else 5.0
         
         ratings_response = {
             "driver_id": str(driver_id),
             "average_rating": round(average_rating, 2),
-            "total_ratings": len(ratings),
+            "bayesian_rating": summary["bayesian_rating"],
+            "total_ratings": summary["rating_count"],
             "reviews": [rating.dict() for rating in ratings]
         }
         
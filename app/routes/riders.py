@@ -1,13 +1,15 @@
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Query, Response
 from typing import List, Optional
 from uuid import UUID
 import random
 from datetime import datetime, timezone
-from ..schemas import RiderCreate, RiderResponse, MatchResponse, DriverResponse, Assignment, RiderMatchResponse, RideCreate, RideResponse, RideRequestCreate
-from ..crud import create_rider, get_rider, get_riders, update_rider, delete_rider, get_user_by_email, get_rider_by_user_id, get_driver, get_drivers, create_ride, update_ride
+from ..schemas import RiderCreate, RiderResponse, MatchResponse, DriverResponse, Assignment, RiderMatchResponse, RideCreate, RideResponse, RideRequestCreate, Principal
+from ..async_crud import create_rider, get_rider, get_riders_page, update_rider, delete_rider, get_user_by_email, get_rider_by_user_id, get_driver, create_ride, update_ride
+from ..pagination import InvalidCursor, set_next_cursor
+from ..config import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 from ..utils.distance_calc import calculate_distance
 from ..utils.utility_function import calculate_time_utility, gini_index, social_welfare
-from ..utils.datetime_serializer import simple_datetime_handler
+from ..serialization import json_response
 from ..utils.auth_utils import get_current_user
 from ..algorithms.rga_plus import rga_plus_algorithm
 import traceback
@@ -22,14 +24,14 @@ async def register_rider(rider: RiderCreate):
     """
     try:
         # Check if email exists in users table
-        from ..crud import get_user_by_email
-        user = get_user_by_email(rider.email)
+        from ..async_crud import get_user_by_email
+        user = await get_user_by_email(rider.email)
         if not user:
             raise HTTPException(status_code=400, detail="Email not found in users table. Please register as a user first.")
         
         # Check if rider already exists for this user
-        from ..crud import get_rider_by_user_id
-        existing_rider = get_rider_by_user_id(user.id)
+        from ..async_crud import get_rider_by_user_id
+        existing_rider = await get_rider_by_user_id(user.id)
         if existing_rider:
             raise HTTPException(status_code=400, detail="Rider profile already exists for this user")
         
@@ -40,16 +42,14 @@ async def register_rider(rider: RiderCreate):
         rider_data = rider.model_copy(update={"user_id": user_id})
         
         # Import CRUD operations
-        from ..crud import create_rider, update_user_role
+        from ..async_crud import create_rider, update_user_role
         
-        result = create_rider(rider_data)
+        result = await create_rider(rider_data)
         
         # Update user role to 'rider'
-        update_user_role(user_id, 'rider')
+        await update_user_role(user_id, 'rider')
         
-        # Use simple datetime handler for serialization
-        serialized_result = simple_datetime_handler(result.dict())
-        return serialized_result
+        return json_response(result)
     except HTTPException:
         raise
     except Exception as e:
@@ -68,22 +68,19 @@ async def request_ride(rider: RideRequestCreate, background_tasks: BackgroundTas
     """
     try:
         # Check if email exists in users table
-        from ..crud import get_user_by_email
-        user = get_user_by_email(rider.email)
+        from ..async_crud import get_user_by_email
+        user = await get_user_by_email(rider.email)
         if not user:
             raise HTTPException(status_code=400, detail="Email not found in users table. Please register as a user first.")
         
         # Check if there are available drivers before proceeding
-        from ..crud import get_drivers
-        all_drivers = get_drivers()
-        available_drivers = [d for d in all_drivers if d.available]
-        
-        if not available_drivers:
+        from ..fleet_index import fleet_index
+        if not fleet_index.available_count():
             raise HTTPException(status_code=400, detail="No drivers available at the moment. Please try again later.")
         
         # Get existing rider profile for this user (if any)
-        from ..crud import get_rider_by_user_id
-        existing_rider = get_rider_by_user_id(user.id)
+        from ..async_crud import get_rider_by_user_id
+        existing_rider = await get_rider_by_user_id(user.id)
         
         # Use user's ID
         user_id = user.id
@@ -106,76 +103,52 @@ async def request_ride(rider: RideRequestCreate, background_tasks: BackgroundTas
                 preferred_arrival=rider.preferred_arrival,
                 beta=rider.beta
             )
-            from ..crud import update_rider
-            result = update_rider(existing_rider.id, updated_rider_data)
+            from ..async_crud import update_rider
+            result = await update_rider(existing_rider.id, updated_rider_data)
         else:
             # Create new rider profile
             rider_data = rider.model_copy(update={"user_id": user_id})
-            from ..crud import create_rider
-            result = create_rider(rider_data)
+            from ..async_crud import create_rider
+            result = await create_rider(rider_data)
             
             # Update user role to 'rider'
-            from ..crud import update_user_role
-            update_user_role(user_id, 'rider')
+            from ..async_crud import update_user_role
+            await update_user_role(user_id, 'rider')
         
         if not result:
             raise HTTPException(status_code=500, detail="Failed to create or update rider profile")
         
-        # Create a ride record in the rides table
-        from ..crud import create_ride
-        ride_create = RideCreate(
-            user_id=user_id,
-            rider_id=result.id,
-            algorithm="RGA++",
-            status="requested"
-        )
-        ride_result = create_ride(ride_create)
-        
         # Run automatic matching using RGA++ algorithm for all riders and drivers
         from ..algorithms.rga_plus import rga_plus_algorithm
-        from ..crud import update_ride, get_driver
+        from ..async_crud import create_ride, get_driver
         match_result = rga_plus_algorithm()
         
         # Find if this specific rider was matched
         rider_match = None
         matched_driver = None
-        matched_ride_updated = False
         
         for assignment in match_result.assignments:
             if str(assignment.rider_id) == str(result.id):
                 rider_match = assignment
                 # Get driver details
-                matched_driver = get_driver(assignment.driver_id)
-                
-                # Update ride with driver assignment
-                if ride_result:
-                    updated_ride = RideCreate(
-                        user_id=ride_result.user_id,
-                        rider_id=ride_result.rider_id,
-                        driver_id=assignment.driver_id,
-                        algorithm="RGA++",
-                        utility=assignment.utility,
-                        status="assigned"
-                    )
-                    # Update the ride record with the matched driver
-                    update_ride(ride_result.id, updated_ride)
-                    matched_ride_updated = True
+                matched_driver = await get_driver(assignment.driver_id)
                 break
         
-        # If this rider wasn't matched but we have a ride record, update its status
-        if not matched_ride_updated and ride_result:
-            updated_ride = RideCreate(
-                user_id=ride_result.user_id,
-                rider_id=ride_result.rider_id,
-                algorithm="RGA++",
-                status="no_drivers_available"
-            )
-            update_ride(ride_result.id, updated_ride)
+        # Create the ride record once, already carrying the match outcome
+        ride_create = RideCreate(
+            user_id=user_id,
+            rider_id=result.id,
+            driver_id=rider_match.driver_id if rider_match else None,
+            algorithm="RGA++",
+            utility=rider_match.utility if rider_match else None,
+            status="assigned" if rider_match else "no_drivers_available"
+        )
+        await create_ride(ride_create)
         
         # Prepare response with rider and driver details
-        response_data = result.dict()
+        response_data = result.model_dump()
         if matched_driver:
-            response_data['matched_driver'] = matched_driver.dict()
+            response_data['matched_driver'] = matched_driver
             response_data['match_details'] = {
                 'algorithm': match_result.algorithm,
                 'utility': rider_match.utility if rider_match else None,
@@ -190,9 +163,7 @@ async def request_ride(rider: RideRequestCreate, background_tasks: BackgroundTas
             response_data['matched_driver'] = None
             response_data['match_details'] = None
             
-        # Use simple datetime handler for serialization
-        serialized_result = simple_datetime_handler(response_data)
-        return serialized_result
+        return json_response(response_data)
     except HTTPException:
         raise
     except Exception as e:
@@ -210,15 +181,17 @@ def send_ride_notification(rider: RiderResponse, driver: DriverResponse, assignm
     print(f"Utility score: {assignment.utility}")
 
 @router.get("/", response_model=List[RiderResponse])
-async def list_riders():
+async def list_riders(response: Response, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None):
     """
-    Get all riders
+    Get riders, newest first, one page at a time (pass the X-Next-Cursor header back as `cursor`)
     """
     try:
-        result = get_riders()
-        # Use simple datetime handler for serialization
-        serialized_result = simple_datetime_handler([rider.dict() for rider in result])
-        return serialized_result
+        page = await get_riders_page(limit, cursor)
+        set_next_cursor(response, page)
+        result = page.items
+        return json_response(result, response)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         # Log the full traceback for debugging
         print(f"Error in list_riders: {str(e)}")
@@ -226,23 +199,16 @@ async def list_riders():
         raise HTTPException(status_code=500, detail=f"Error retrieving riders: {str(e)}")
 
 @router.get("/me", response_model=RiderResponse)
-async def get_current_rider(current_user_email: str = Depends(get_current_user)):
+async def get_current_rider(user: Principal = Depends(get_current_user)):
     """
     Get the rider profile for the currently authenticated user
     """
     try:
-        # Get the current user
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         # Get rider by user ID
-        rider = get_rider_by_user_id(user.id)
+        rider = await get_rider_by_user_id(user.id)
         if not rider:
             raise HTTPException(status_code=404, detail="Rider profile not found")
-        # Use simple datetime handler for serialization
-        serialized_result = simple_datetime_handler(rider.dict())
-        return serialized_result
+        return json_response(rider)
     except HTTPException:
         raise
     except Exception as e:
@@ -257,12 +223,10 @@ async def get_rider_by_id(rider_id: UUID):
     Get a specific rider by ID
     """
     try:
-        rider = get_rider(rider_id)
+        rider = await get_rider(rider_id)
         if not rider:
             raise HTTPException(status_code=404, detail="Rider not found")
-        # Use simple datetime handler for serialization
-        serialized_result = simple_datetime_handler(rider.dict())
-        return serialized_result
+        return json_response(rider)
     except HTTPException:
         raise
     except Exception as e:
@@ -272,28 +236,21 @@ async def get_rider_by_id(rider_id: UUID):
         raise HTTPException(status_code=500, detail=f"Error retrieving rider: {str(e)}")
 
 @router.put("/me", response_model=RiderResponse)
-async def update_current_rider(rider: RiderCreate, current_user_email: str = Depends(get_current_user)):
+async def update_current_rider(rider: RiderCreate, user: Principal = Depends(get_current_user)):
     """
     Update the rider profile for the currently authenticated user
     """
     try:
-        # Get the current user
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         # Get rider by user ID
-        existing_rider = get_rider_by_user_id(user.id)
+        existing_rider = await get_rider_by_user_id(user.id)
         if not existing_rider:
             raise HTTPException(status_code=404, detail="Rider profile not found")
         
         # Update rider
-        updated_rider = update_rider(existing_rider.id, rider)
+        updated_rider = await update_rider(existing_rider.id, rider)
         if not updated_rider:
             raise HTTPException(status_code=404, detail="Rider not found")
-        # Use simple datetime handler for serialization
-        serialized_result = simple_datetime_handler(updated_rider.dict())
-        return serialized_result
+        return json_response(updated_rider)
     except HTTPException:
         raise
     except Exception as e:
@@ -303,23 +260,18 @@ async def update_current_rider(rider: RiderCreate, current_user_email: str = Dep
         raise HTTPException(status_code=500, detail=f"Error updating rider: {str(e)}")
 
 @router.delete("/me")
-async def delete_current_rider(current_user_email: str = Depends(get_current_user)):
+async def delete_current_rider(user: Principal = Depends(get_current_user)):
     """
     Delete the rider profile for the currently authenticated user
     """
     try:
-        # Get the current user
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         # Get rider by user ID
-        rider = get_rider_by_user_id(user.id)
+        rider = await get_rider_by_user_id(user.id)
         if not rider:
             raise HTTPException(status_code=404, detail="Rider profile not found")
         
         # Delete rider
-        success = delete_rider(rider.id)
+        success = await delete_rider(rider.id)
         if not success:
             raise HTTPException(status_code=404, detail="Rider not found")
         return {"message": "Rider deleted successfully"}
@@ -332,28 +284,21 @@ async def delete_current_rider(current_user_email: str = Depends(get_current_use
         raise HTTPException(status_code=500, detail=f"Error deleting rider: {str(e)}")
 
 @router.get("/me/rides", response_model=List[RideResponse])
-async def get_current_rider_rides(current_user_email: str = Depends(get_current_user)):
+async def get_current_rider_rides(user: Principal = Depends(get_current_user)):
     """
     Get all rides for the currently authenticated rider
     """
     try:
-        # Get the current user
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=4404, detail="User not found")
-        
         # Get rider by user ID
-        rider = get_rider_by_user_id(user.id)
+        rider = await get_rider_by_user_id(user.id)
         if not rider:
             raise HTTPException(status_code=404, detail="Rider profile not found")
         
         # Get all rides for this rider
-        from ..crud import get_rides_by_rider
-        rides = get_rides_by_rider(rider.id)
+        from ..async_crud import get_rides_by_rider
+        rides = await get_rides_by_rider(rider.id)
         
-        # Use simple datetime handler for serialization
-        serialized_result = simple_datetime_handler([ride.dict() for ride in rides])
-        return serialized_result
+        return json_response(rides)
     except HTTPException:
         raise
     except Exception as e:
@@ -369,17 +314,15 @@ async def get_rider_rides(rider_id: UUID):
     """
     try:
         # Check if rider exists
-        rider = get_rider(rider_id)
+        rider = await get_rider(rider_id)
         if not rider:
             raise HTTPException(status_code=404, detail="Rider not found")
         
         # Get all rides for this rider
-        from ..crud import get_rides_by_rider
-        rides = get_rides_by_rider(rider_id)
+        from ..async_crud import get_rides_by_rider
+        rides = await get_rides_by_rider(rider_id)
         
-        # Use simple datetime handler for serialization
-        serialized_result = simple_datetime_handler([ride.dict() for ride in rides])
-        return serialized_result
+        return json_response(rides)
     except HTTPException:
         raise
     except Exception as e:
@@ -1,31 +1,31 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
+from typing import List, Optional
 from uuid import UUID
-from ..schemas import RideCreate, RideResponse, EstimatedFareResponse
-from ..crud import get_rides, get_ride, create_ride, update_ride, get_rider, get_user_by_email, get_rider_by_user_id, get_rides_by_user_id
-from ..utils.datetime_serializer import simple_datetime_handler
+from ..schemas import RideCreate, RideResponse, EstimatedFareResponse, Principal
+from ..async_crud import get_rides, get_ride, create_ride, update_ride, get_rider_trip, get_rider_by_user_id, get_rides_by_user_id_page
+from ..pagination import InvalidCursor, set_next_cursor
+from ..config import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from ..serialization import json_response
 from ..utils.auth_utils import get_current_user
 import traceback
 
 router = APIRouter()
 
 @router.get("/", response_model=List[RideResponse])
-async def list_rides(current_user_email: str = Depends(get_current_user)):
+async def list_rides(response: Response, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None, user: Principal = Depends(get_current_user)):
     """
-    Retrieve all ride records for the authenticated user
+    Retrieve the authenticated user's ride records one page at a time (pass the X-Next-Cursor header back as `cursor`)
     """
     try:
-        # Get the current user
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         # Get rides for the current user
-        result = get_rides_by_user_id(user.id)
-        serialized_result = simple_datetime_handler([ride.dict() for ride in result])
-        return serialized_result
+        page = await get_rides_by_user_id_page(user.id, limit, cursor)
+        set_next_cursor(response, page)
+        result = page.items
+        return json_response(result, response)
     except HTTPException:
         raise
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"Error in list_rides: {str(e)}")
         print(traceback.format_exc())
@@ -37,18 +37,17 @@ async def get_ride_by_id(ride_id: UUID):
     Retrieve a specific ride by ID
     """
     try:
-        ride = get_ride(ride_id)
+        ride = await get_ride(ride_id)
         if not ride:
             raise HTTPException(status_code=404, detail="Ride not found")
         
-        # Convert to dict and handle datetime serialization
-        ride_dict = ride.dict()
+        ride_dict = ride.model_dump()
         
         # If fare is null, calculate estimated fare
         if ride_dict.get("fare") is None:
             try:
                 # Get rider information to get origin and destination coordinates
-                rider = get_rider(ride.rider_id) if ride.rider_id else None
+                rider = await get_rider_trip(ride.rider_id) if ride.rider_id else None
                 if rider:
                     # Import the fare estimation function
                     from ..crud import estimate_fare
@@ -69,8 +68,7 @@ async def get_ride_by_id(ride_id: UUID):
                 # If fare estimation fails, continue with null fare
                 print(f"Error estimating fare for ride {ride_id}: {str(e)}")
         
-        serialized_result = simple_datetime_handler(ride_dict)
-        return serialized_result
+        return json_response(ride_dict)
     except HTTPException:
         raise
     except Exception as e:
@@ -79,21 +77,16 @@ async def get_ride_by_id(ride_id: UUID):
         raise HTTPException(status_code=500, detail=f"Error retrieving ride: {str(e)}")
 
 @router.post("/", response_model=RideResponse)
-async def create_new_ride(ride: RideCreate, current_user_email: str = Depends(get_current_user)):
+async def create_new_ride(ride: RideCreate, user: Principal = Depends(get_current_user)):
     """
     Create a new ride record for the authenticated user
     """
     try:
-        # Get the current user
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         # Use current user's ID if not provided in request
         user_id = ride.user_id if ride.user_id else user.id
         
         # Get rider profile for the current user
-        rider = get_rider_by_user_id(user.id)
+        rider = await get_rider_by_user_id(user.id)
         if not rider:
             raise HTTPException(status_code=400, detail="Rider profile not found for current user. Please create a rider profile first.")
         
@@ -103,9 +96,8 @@ async def create_new_ride(ride: RideCreate, current_user_email: str = Depends(ge
         # Add user_id and rider_id to ride data
         ride_data = ride.model_copy(update={"user_id": user_id, "rider_id": rider_id})
         
-        result = create_ride(ride_data)
-        serialized_result = simple_datetime_handler(result.dict())
-        return serialized_result
+        result = await create_ride(ride_data)
+        return json_response(result)
     except HTTPException:
         raise
     except Exception as e:
@@ -119,11 +111,10 @@ async def update_ride_record(ride_id: UUID, ride: RideCreate):
     Update a ride record
     """
     try:
-        result = update_ride(ride_id, ride)
+        result = await update_ride(ride_id, ride)
         if not result:
             raise HTTPException(status_code=404, detail="Ride not found")
-        serialized_result = simple_datetime_handler(result.dict())
-        return serialized_result
+        return json_response(result)
     except HTTPException:
         raise
     except Exception as e:
@@ -137,7 +128,7 @@ async def get_ride_status(ride_id: UUID):
     Get the status of a specific ride
     """
     try:
-        ride = get_ride(ride_id)
+        ride = await get_ride(ride_id)
         if not ride:
             raise HTTPException(status_code=404, detail="Ride not found")
         
@@ -158,7 +149,7 @@ async def get_ride_status(ride_id: UUID):
         if status_info.get("fare") is None:
             try:
                 # Get rider information to get origin and destination coordinates
-                rider = get_rider(ride.rider_id) if ride.rider_id else None
+                rider = await get_rider_trip(ride.rider_id) if ride.rider_id else None
                 if rider:
                     # Import the fare estimation function
                     from ..crud import estimate_fare
@@ -181,7 +172,7 @@ async def get_ride_status(ride_id: UUID):
                 print(f"Error estimating fare for ride {ride_id}: {str(e)}")
         
         # Add location information if available
-        rider = get_rider(ride.rider_id) if ride.rider_id else None
+        rider = await get_rider_trip(ride.rider_id) if ride.rider_id else None
         if rider:
             status_info["pickup_location"] = {
                 "lat": rider.origin_lat,
@@ -192,7 +183,7 @@ async def get_ride_status(ride_id: UUID):
                 "lon": rider.destination_lon
             }
         
-        return simple_datetime_handler(status_info)
+        return json_response(status_info)
     except HTTPException:
         raise
     except Exception as e:
@@ -207,12 +198,12 @@ async def get_ride_estimated_fare(ride_id: UUID):
     """
     try:
         # Get the ride
-        ride = get_ride(ride_id)
+        ride = await get_ride(ride_id)
         if not ride:
             raise HTTPException(status_code=404, detail="Ride not found")
         
         # Get rider information to get origin and destination coordinates
-        rider = get_rider(ride.rider_id) if ride.rider_id else None
+        rider = await get_rider_trip(ride.rider_id) if ride.rider_id else None
         if not rider:
             raise HTTPException(status_code=404, detail="Rider not found")
         
@@ -243,9 +234,7 @@ async def get_ride_estimated_fare(ride_id: UUID):
             "surge_multiplier": fare_estimate["surge_multiplier"]
         }
         
-        # Use simple datetime handler for serialization
-        serialized_result = simple_datetime_handler(response_data)
-        return serialized_result
+        return json_response(response_data)
     except HTTPException:
         raise
     except Exception as e:
@@ -1,8 +1,8 @@
 from fastapi import APIRouter, HTTPException, Depends
 from uuid import UUID
 from typing import List
-from ..schemas import ScheduledRideRequest, ScheduledRideResponse
-from ..crud import create_scheduled_ride, get_scheduled_rides_by_rider, update_scheduled_ride_status, get_user_by_email, get_rider_by_user_id
+from ..schemas import ScheduledRideRequest, ScheduledRideResponse, Principal
+from ..crud import create_scheduled_ride, get_scheduled_rides_by_rider, update_scheduled_ride_status, get_rider_by_user_id
 from ..utils.datetime_serializer import simple_datetime_handler
 from ..utils.auth_utils import get_current_user
 import traceback
@@ -10,16 +10,11 @@ import traceback
 router = APIRouter()
 
 @router.post("/", response_model=ScheduledRideResponse)
-async def schedule_ride(request: ScheduledRideRequest, current_user_email: str = Depends(get_current_user)):
+async def schedule_ride(request: ScheduledRideRequest, user: Principal = Depends(get_current_user)):
     """
     Schedule a ride for a future time
     """
     try:
-        # Get the current user
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         # Use current user's ID if not provided in request
         user_id = request.user_id if request.user_id else user.id
         
@@ -52,16 +47,11 @@ async def schedule_ride(request: ScheduledRideRequest, current_user_email: str =
         raise HTTPException(status_code=500, detail=f"Error scheduling ride: {str(e)}")
 
 @router.get("/rider", response_model=List[ScheduledRideResponse])
-async def get_scheduled_rides(current_user_email: str = Depends(get_current_user)):
+async def get_scheduled_rides(user: Principal = Depends(get_current_user)):
     """
     Get all scheduled rides for the authenticated user
     """
     try:
-        # Get the current user
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         # Get rider by user ID
         rider = get_rider_by_user_id(user.id)
         if not rider:
@@ -75,16 +65,11 @@ async def get_scheduled_rides(current_user_email: str = Depends(get_current_user
         raise HTTPException(status_code=500, detail=f"Error retrieving scheduled rides: {str(e)}")
 
 @router.put("/{ride_id}/status/{status}")
-async def update_scheduled_ride_status_endpoint(ride_id: UUID, status: str, current_user_email: str = Depends(get_current_user)):
+async def update_scheduled_ride_status_endpoint(ride_id: UUID, status: str, user: Principal = Depends(get_current_user)):
     """
     Update the status of a scheduled ride
     """
     try:
-        # Get the current user
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         # Validate status
         valid_statuses = ["scheduled", "confirmed", "completed", "cancelled"]
         if status not in valid_statuses:
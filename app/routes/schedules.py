@@ -1,8 +1,10 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
+from typing import List, Optional
 from uuid import UUID
-from ..schemas import ScheduleCreate, ScheduleResponse, MatchRequest, MatchResponse
-from ..crud import create_schedule, get_schedules, get_schedule, delete_schedule, get_user_by_email
+from ..schemas import ScheduleCreate, ScheduleResponse, MatchRequest, MatchResponse, Principal
+from ..crud import create_schedule, get_schedules_page, get_schedule, delete_schedule
+from ..pagination import InvalidCursor, set_next_cursor
+from ..config import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 from ..utils.datetime_serializer import simple_datetime_handler
 from ..utils.auth_utils import get_current_user
 import traceback
@@ -16,16 +18,11 @@ from ..algorithms.iterative_voting import iterative_voting_algorithm
 router = APIRouter()
 
 @router.post("/run", response_model=dict)
-async def run_scheduling_algorithm(schedule_request: dict, current_user_email: str = Depends(get_current_user)):
+async def run_scheduling_algorithm(schedule_request: dict, user: Principal = Depends(get_current_user)):
     """
     Execute a ride matching algorithm and store the results as a schedule
     """
     try:
-        # Get user from email
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-            
         # Extract algorithm from request
         algorithm = schedule_request.get("algorithm", "RGA++")
         
@@ -78,16 +75,11 @@ async def run_scheduling_algorithm(schedule_request: dict, current_user_email: s
         raise HTTPException(status_code=500, detail=f"Error running scheduling algorithm: {str(e)}")
 
 @router.post("/", response_model=dict)
-async def create_new_schedule(schedule: ScheduleCreate, current_user_email: str = Depends(get_current_user)):
+async def create_new_schedule(schedule: ScheduleCreate, user: Principal = Depends(get_current_user)):
     """
     Create a new schedule
     """
     try:
-        # Get user from email (simplified - in a real implementation you might want to get the full user object)
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-            
         result = create_schedule(
             algorithm=schedule.algorithm,
             metadata=schedule.metadata,
@@ -107,15 +99,19 @@ async def create_new_schedule(schedule: ScheduleCreate, current_user_email: str
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/", response_model=List[dict])
-async def list_schedules():
+async def list_schedules(response: Response, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None):
     """
-    Get all schedules
+    Get schedules, newest first, one page at a time (pass the X-Next-Cursor header back as `cursor`)
     """
     try:
-        result = get_schedules()
+        page = get_schedules_page(limit, cursor)
+        set_next_cursor(response, page)
+        result = page.items
         # Use simple datetime handler for serialization
         serialized_result = simple_datetime_handler(result)
         return serialized_result
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         # Log the full traceback for debugging
         print(f"Error in list_schedules: {str(e)}")
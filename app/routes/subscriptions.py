@@ -1,20 +1,21 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
 from uuid import UUID
 from datetime import datetime, time
 from ..schemas import (
     SubscriptionPlanCreate, SubscriptionPlanUpdate, SubscriptionPlanResponse,
     UserSubscriptionCreate, UserSubscriptionUpdate, UserSubscriptionResponse,
     RecurringRideCreate, RecurringRideUpdate, RecurringRideResponse,
-    GeneratedScheduledRideCreate, GeneratedScheduledRideResponse
+    GeneratedScheduledRideCreate, GeneratedScheduledRideResponse,
+    Principal
 )
 from ..crud import (
     create_subscription_plan, get_subscription_plans, get_subscription_plan, update_subscription_plan, delete_subscription_plan,
     create_user_subscription, get_user_subscriptions, get_user_active_subscription, get_subscription, update_user_subscription, cancel_user_subscription,
     create_recurring_ride, get_user_recurring_rides, get_recurring_ride, update_recurring_ride, pause_recurring_ride, resume_recurring_ride, cancel_recurring_ride, get_active_recurring_rides,
-    create_generated_scheduled_ride, get_generated_scheduled_rides,
-    get_user_by_email
+    create_generated_scheduled_ride, get_generated_scheduled_rides
 )
 from ..utils.datetime_serializer import simple_datetime_handler
+from ..utils.response_cache import cached_json_response
 from ..utils.auth_utils import get_current_user
 import traceback
 
@@ -51,29 +52,29 @@ async def create_subscription_plan_endpoint(plan: SubscriptionPlanCreate):
         raise HTTPException(status_code=500, detail=f"Error creating subscription plan: {str(e)}")
 
 @router.get("/plans", response_model=list[SubscriptionPlanResponse])
-async def get_subscription_plans_endpoint():
+async def get_subscription_plans_endpoint(request: Request):
     """
-    Get all subscription plans
+    Get all subscription plans (cached; send If-None-Match to get a 304 when unchanged)
     """
     try:
-        plans = get_subscription_plans()
-        return simple_datetime_handler(plans)
+        cached = cached_json_response(request, "subscription_plans", None, get_subscription_plans)
+        return cached if cached is not None else []
     except Exception as e:
         print(f"Error in get_subscription_plans_endpoint: {str(e)}")
         print(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Error retrieving subscription plans: {str(e)}")
 
 @router.get("/plans/{plan_id}", response_model=SubscriptionPlanResponse)
-async def get_subscription_plan_endpoint(plan_id: UUID):
+async def get_subscription_plan_endpoint(plan_id: UUID, request: Request):
     """
-    Get a subscription plan by ID
+    Get a subscription plan by ID (cached; send If-None-Match to get a 304 when unchanged)
     """
     try:
-        plan = get_subscription_plan(plan_id)
-        if not plan:
+        cached = cached_json_response(request, "subscription_plans", str(plan_id), lambda: get_subscription_plan(plan_id))
+        if cached is None:
             raise HTTPException(status_code=404, detail="Subscription plan not found")
         
-        return simple_datetime_handler(plan)
+        return cached
     except HTTPException:
         raise
     except Exception as e:
@@ -131,16 +132,11 @@ async def delete_subscription_plan_endpoint(plan_id: UUID):
 
 # User Subscription endpoints
 @router.post("/", response_model=UserSubscriptionResponse)
-async def create_user_subscription_endpoint(subscription: UserSubscriptionCreate, current_user_email: str = Depends(get_current_user)):
+async def create_user_subscription_endpoint(subscription: UserSubscriptionCreate, user: Principal = Depends(get_current_user)):
     """
     Create a new user subscription
     """
     try:
-        # Get the current user
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         # Use authenticated user's ID
         user_id = subscription.user_id if subscription.user_id else user.id
         
@@ -165,16 +161,11 @@ async def create_user_subscription_endpoint(subscription: UserSubscriptionCreate
         raise HTTPException(status_code=500, detail=f"Error creating user subscription: {str(e)}")
 
 @router.get("/user", response_model=list[UserSubscriptionResponse])
-async def get_user_subscriptions_endpoint(current_user_email: str = Depends(get_current_user)):
+async def get_user_subscriptions_endpoint(user: Principal = Depends(get_current_user)):
     """
     Get all subscriptions for the authenticated user
     """
     try:
-        # Get the current user
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         subscriptions = get_user_subscriptions(user.id)
         return simple_datetime_handler(subscriptions)
     except Exception as e:
@@ -183,16 +174,11 @@ async def get_user_subscriptions_endpoint(current_user_email: str = Depends(get_
         raise HTTPException(status_code=500, detail=f"Error retrieving user subscriptions: {str(e)}")
 
 @router.get("/user/active", response_model=UserSubscriptionResponse)
-async def get_user_active_subscription_endpoint(current_user_email: str = Depends(get_current_user)):
+async def get_user_active_subscription_endpoint(user: Principal = Depends(get_current_user)):
     """
     Get the active subscription for the authenticated user
     """
     try:
-        # Get the current user
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         subscription = get_user_active_subscription(user.id)
         if not subscription:
             raise HTTPException(status_code=404, detail="Active subscription not found")
@@ -206,16 +192,11 @@ async def get_user_active_subscription_endpoint(current_user_email: str = Depend
         raise HTTPException(status_code=500, detail=f"Error retrieving user active subscription: {str(e)}")
 
 @router.get("/{subscription_id}", response_model=UserSubscriptionResponse)
-async def get_subscription_endpoint(subscription_id: UUID, current_user_email: str = Depends(get_current_user)):
+async def get_subscription_endpoint(subscription_id: UUID, user: Principal = Depends(get_current_user)):
     """
     Get a subscription by ID
     """
     try:
-        # Get the current user
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         subscription = get_subscription(subscription_id)
         if not subscription:
             raise HTTPException(status_code=404, detail="Subscription not found")
@@ -233,16 +214,11 @@ async def get_subscription_endpoint(subscription_id: UUID, current_user_email: s
         raise HTTPException(status_code=500, detail=f"Error retrieving subscription: {str(e)}")
 
 @router.put("/{subscription_id}", response_model=UserSubscriptionResponse)
-async def update_user_subscription_endpoint(subscription_id: UUID, subscription: UserSubscriptionUpdate, current_user_email: str = Depends(get_current_user)):
+async def update_user_subscription_endpoint(subscription_id: UUID, subscription: UserSubscriptionUpdate, user: Principal = Depends(get_current_user)):
     """
     Update a user subscription
     """
     try:
-        # Get the current user
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         # Verify user owns this subscription
         existing_subscription = get_subscription(subscription_id)
         if not existing_subscription:
@@ -271,16 +247,11 @@ async def update_user_subscription_endpoint(subscription_id: UUID, subscription:
         raise HTTPException(status_code=500, detail=f"Error updating user subscription: {str(e)}")
 
 @router.post("/{subscription_id}/cancel", response_model=UserSubscriptionResponse)
-async def cancel_user_subscription_endpoint(subscription_id: UUID, current_user_email: str = Depends(get_current_user)):
+async def cancel_user_subscription_endpoint(subscription_id: UUID, user: Principal = Depends(get_current_user)):
     """
     Cancel a user subscription
     """
     try:
-        # Get the current user
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         # Verify user owns this subscription
         existing_subscription = get_subscription(subscription_id)
         if not existing_subscription:
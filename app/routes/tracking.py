@@ -1,29 +1,32 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, WebSocket, WebSocketDisconnect, status
 from uuid import UUID
 from typing import Dict, Any, Optional
-from ..schemas import RideResponse
-from ..crud import get_ride, get_driver, get_rider, get_user_by_email, update_driver_location
+from ..schemas import RideResponse, Principal, DriverLocation
+from ..async_crud import (get_ride, get_driver, get_driver_location, get_rider_trip, get_driver_trajectory,
+                          get_driver_by_user_id, get_rider_by_user_id)
+from ..location_ingest import location_ingest
+from ..fleet_index import fleet_index
 from ..utils.datetime_serializer import simple_datetime_handler
 from ..utils.auth_utils import get_current_user
-from ..database import get_supabase_client
+from ..utils.distance_cache import estimate_route
+from ..utils.pubsub import location_pubsub, driver_topic
+from ..serialization import dumps, json_response
+from ..config import TRACKING_TRAJECTORY_MAX_HOURS, TRACKING_TRAJECTORY_MAX_POINTS
+import asyncio
+import orjson
 import traceback
 from datetime import datetime, timedelta, timezone
 
 router = APIRouter()
 
 @router.get("/rides/{ride_id}")
-async def get_ride_tracking(ride_id: UUID, current_user_email: str = Depends(get_current_user)):
+async def get_ride_tracking(ride_id: UUID, user: Principal = Depends(get_current_user)):
     """
     Get real-time tracking information for an active ride
     """
     try:
-        # Get the current user
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         # Get ride information
-        ride = get_ride(ride_id)
+        ride = await get_ride(ride_id)
         if not ride:
             raise HTTPException(status_code=404, detail="Ride not found")
         
@@ -31,23 +34,45 @@ async def get_ride_tracking(ride_id: UUID, current_user_email: str = Depends(get
         # In a real implementation, you would check if the user is authorized to view this ride
         # For now, we'll just verify the ride exists
         
-        # Get driver information
-        driver = get_driver(ride.driver_id) if ride.driver_id else None
+        # Driver position from the live fleet index (the database when it isn't indexed), rider trip concurrently
+        driver = fleet_index.position(ride.driver_id) if ride.driver_id else None
+        driver, rider = await asyncio.gather(
+            get_driver_location(ride.driver_id) if ride.driver_id and driver is None else asyncio.sleep(0, driver),
+            get_rider_trip(ride.rider_id) if ride.rider_id else asyncio.sleep(0)
+        )
         if not driver:
             raise HTTPException(status_code=404, detail="Driver not found")
-        
-        # Get rider information
-        rider = get_rider(ride.rider_id) if ride.rider_id else None
         if not rider:
             raise HTTPException(status_code=404, detail="Rider not found")
         
-        # Calculate estimated arrival time (simplified)
-        # In a real implementation, this would use actual routing algorithms
-        estimated_arrival = datetime.now(timezone.utc) + timedelta(minutes=5)
-        eta_dropoff = estimated_arrival + timedelta(minutes=20)
-        
-        # Calculate distance to pickup (simplified)
-        distance_to_pickup = 1.2  # km
+        # The driver's leg (to the pickup, or to the destination once the rider is on board) is timed
+        # from their smoothed speed over recent pings; the rest, and the driver's leg until enough pings
+        # have been measured, from learned travel times, falling back to route estimates
+        now = datetime.now(timezone.utc)
+        driver_speed = fleet_index.smoothed_speed(ride.driver_id)
+        if ride.status == "started":
+            distance_to_pickup = 0.0
+            estimated_arrival = ride.start_time or now
+            distance_to_dropoff, route_dropoff_minutes = estimate_route(
+                driver.current_lat, driver.current_lon,
+                rider.destination_lat, rider.destination_lon,
+                now
+            )
+            dropoff_minutes = fleet_index.eta_minutes(ride.driver_id, distance_to_dropoff, route_dropoff_minutes)
+            eta_dropoff = now + timedelta(minutes=dropoff_minutes)
+        else:
+            distance_to_pickup, route_pickup_minutes = estimate_route(
+                driver.current_lat, driver.current_lon,
+                rider.origin_lat, rider.origin_lon
+            )
+            pickup_minutes = fleet_index.eta_minutes(ride.driver_id, distance_to_pickup, route_pickup_minutes)
+            estimated_arrival = now + timedelta(minutes=pickup_minutes)
+            _, trip_minutes = estimate_route(
+                rider.origin_lat, rider.origin_lon,
+                rider.destination_lat, rider.destination_lon,
+                estimated_arrival
+            )
+            eta_dropoff = estimated_arrival + timedelta(minutes=trip_minutes)
         
         tracking_info = {
             "ride_id": str(ride_id),
@@ -56,8 +81,9 @@ async def get_ride_tracking(ride_id: UUID, current_user_email: str = Depends(get
                 "lon": driver.current_lon
             },
             "estimated_arrival": estimated_arrival,
-            "distance_to_pickup": distance_to_pickup,
-            "eta_dropoff": eta_dropoff
+            "distance_to_pickup": round(distance_to_pickup, 2),
+            "eta_dropoff": eta_dropoff,
+            "driver_speed_kmh": round(driver_speed, 1) if driver_speed is not None else None
         }
         
         return simple_datetime_handler(tracking_info)
@@ -69,16 +95,11 @@ async def get_ride_tracking(ride_id: UUID, current_user_email: str = Depends(get
         raise HTTPException(status_code=500, detail=f"Error retrieving tracking information: {str(e)}")
 
 @router.post("/drivers/{driver_id}/location")
-async def update_driver_location_realtime(driver_id: UUID, location: Dict[str, float], current_user_email: str = Depends(get_current_user)):
+async def update_driver_location_realtime(driver_id: UUID, location: Dict[str, float], user: Principal = Depends(get_current_user)):
     """
     Update driver location for real-time tracking
     """
     try:
-        # Get the current user
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         # Verify the driver is the authenticated user
         # In a real implementation, you would check if the user is authorized to update this driver's location
         # For now, we'll just process the request
@@ -95,8 +116,13 @@ async def update_driver_location_realtime(driver_id: UUID, location: Dict[str, f
         if not (-90 <= lat <= 90) or not (-180 <= lon <= 180):
             raise HTTPException(status_code=400, detail="Invalid coordinates")
         
-        # Update the driver's location in the database
-        driver = update_driver_location_for_tracking(driver_id, lat, lon, speed, heading, user.id)
+        if not await _is_driver(driver_id, lat, lon):
+            raise HTTPException(status_code=404, detail="Driver not found")
+
+        # Buffer the ping; it is written to the database with the next bulk flush
+        if not update_driver_location_for_tracking(driver_id, lat, lon, speed, heading, user.id):
+            raise HTTPException(status_code=503, detail="Location ingest is overloaded, retry shortly",
+                                headers={"Retry-After": "1"})
         
         response = {
             "message": "Location updated successfully",
@@ -118,33 +144,200 @@ async def update_driver_location_realtime(driver_id: UUID, location: Dict[str, f
         print(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Error updating driver location: {str(e)}")
 
-# Function to update driver location with additional tracking data
-def update_driver_location_for_tracking(driver_id: UUID, lat: float, lon: float, speed: float, heading: float, user_id: Optional[UUID] = None) -> Any:
-    """
-    Update driver location with tracking information
-    In a real implementation, this would update a separate tracking table
-    """
-    # For now, we'll just update the driver's current location
-    # In a real implementation, we would also store speed and heading in a tracking table
-    # Also insert into tracking table with user_id
-    from ..utils.datetime_serializer import simple_datetime_handler
-    
-    supabase = get_supabase_client()
-    
-    # Insert tracking data
-    tracking_data = {
-        "user_id": str(user_id) if user_id else None,
+@router.get("/drivers/{driver_id}/trajectory")
+async def get_driver_trajectory_route(driver_id: UUID, start: Optional[datetime] = Query(None, description="Defaults to one hour before end"),
+                                      end: Optional[datetime] = Query(None, description="Defaults to now"),
+                                      user: Principal = Depends(get_current_user)):
+    """
+    Get a driver's recorded path between two times
+
+    Days older than the compaction age hold a simplified path (every point
+    within the compaction tolerance of the original one). Only the driver
+    themselves and admins may read it.
+    """
+    if user.role != "admin":
+        driver = await get_driver_by_user_id(user.id)
+        if driver is None or driver.id != driver_id:
+            raise HTTPException(status_code=403, detail="Not authorized to view this driver's trajectory")
+    end = end or datetime.now(timezone.utc)
+    start = start or end - timedelta(hours=1)
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    if end - start > timedelta(hours=TRACKING_TRAJECTORY_MAX_HOURS):
+        raise HTTPException(status_code=400, detail=f"Time range is limited to {TRACKING_TRAJECTORY_MAX_HOURS:g} hours")
+    try:
+        points = await get_driver_trajectory(driver_id, start, end, TRACKING_TRAJECTORY_MAX_POINTS + 1)
+    except Exception as e:
+        print(f"Error in get_driver_trajectory: {str(e)}")
+        print(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Error retrieving trajectory: {str(e)}")
+    truncated = len(points) > TRACKING_TRAJECTORY_MAX_POINTS
+    return json_response({
         "driver_id": str(driver_id),
-        "lat": lat,
-        "lon": lon,
-        "speed": speed,
-        "heading": heading,
-        "updated_at": datetime.now(timezone.utc).isoformat()
-    }
-    
+        "start": start,
+        "end": end,
+        "points": points[:TRACKING_TRAJECTORY_MAX_POINTS],
+        "truncated": truncated
+    })
+
+async def _is_driver(driver_id: UUID, lat: float, lon: float) -> bool:
+    """
+    Whether a ping is for a row of the drivers table (only drivers the fleet index doesn't know yet are looked up)
+
+    Pings for other ids would be refused by the tracking foreign key on every flush.
+    """
+    if fleet_index.known(driver_id):
+        return True
+    driver = await get_driver(driver_id)
+    if driver is None:
+        return False
+    # Index the driver at the pinged position so their next pings skip the lookup
+    fleet_index.track(DriverLocation(id=driver.id, current_lat=lat, current_lon=lon, available=driver.available))
+    return True
+
+# Function to update driver location with additional tracking data
+def update_driver_location_for_tracking(driver_id: UUID, lat: float, lon: float, speed: float, heading: float, user_id: Optional[UUID] = None) -> bool:
+    """
+    Queue the ping for the tracking table and the driver's position, update the fleet index and
+    push it to live subscribers (False when the buffer is full)
+    """
+    if not location_ingest.submit(driver_id, lat, lon, speed, heading, user_id):
+        return False
+    fleet_index.ping(driver_id, lat, lon, speed)
+    # Encoded once here, then pushed as-is to every rider watching this driver
+    if location_pubsub.subscriber_count(driver_topic(driver_id)):
+        location_pubsub.publish(driver_topic(driver_id), dumps({
+            "driver_id": str(driver_id),
+            "lat": lat,
+            "lon": lon,
+            "speed": speed,
+            "heading": heading,
+            "timestamp": datetime.now(timezone.utc)
+        }).decode())
+    return True
+
+async def _authenticate_websocket(websocket: WebSocket) -> Optional[Principal]:
+    """
+    Resolve the principal from a `token` query parameter or a bearer Authorization header
+    """
+    token = websocket.query_params.get("token")
+    authorization = websocket.headers.get("authorization", "")
+    if not token and authorization.lower().startswith("bearer "):
+        token = authorization[7:]
+    if not token:
+        return None
     try:
-        supabase.table("tracking").insert(tracking_data).execute()
+        return await get_current_user(token)
+    except HTTPException:
+        return None
+
+async def _may_follow_ride(user: Principal, ride: RideResponse) -> bool:
+    """
+    Only the ride's rider and its assigned driver may follow it live
+    """
+    if ride.user_id is not None and ride.user_id == user.id:
+        return True
+    rider = await get_rider_by_user_id(user.id)
+    if rider is not None and rider.id == ride.rider_id:
+        return True
+    driver = await get_driver_by_user_id(user.id)
+    return driver is not None and driver.id == ride.driver_id
+
+async def _wait_for_disconnect(websocket: WebSocket) -> None:
+    while (await websocket.receive())["type"] != "websocket.disconnect":
+        pass
+
+@router.websocket("/ws/drivers/{driver_id}")
+async def driver_location_socket(websocket: WebSocket, driver_id: UUID):
+    """
+    Persistent channel for a driver's location pings
+
+    Each text frame is a JSON object with lat and lon (speed and heading
+    optional). Frames are handled like POST /tracking/drivers/{driver_id}/location
+    but only errors are answered, so a ping costs no response. Only the
+    driver themselves may send pings.
+    """
+    user = await _authenticate_websocket(websocket)
+    if user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    driver = await get_driver_by_user_id(user.id)
+    if driver is None or driver.id != driver_id:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Not this driver")
+        return
+    await websocket.accept()
+    try:
+        while True:
+            try:
+                location = orjson.loads(await websocket.receive_text())
+                lat, lon = float(location["lat"]), float(location["lon"])
+                speed, heading = float(location.get("speed", 0.0)), float(location.get("heading", 0.0))
+            except (orjson.JSONDecodeError, KeyError, TypeError, ValueError, AttributeError):
+                await websocket.send_text('{"error":"Latitude and longitude are required"}')
+                continue
+            if not (-90 <= lat <= 90) or not (-180 <= lon <= 180):
+                await websocket.send_text('{"error":"Invalid coordinates"}')
+                continue
+            if not await _is_driver(driver_id, lat, lon):
+                await websocket.close(code=4404, reason="Driver not found")
+                return
+            if not update_driver_location_for_tracking(driver_id, lat, lon, speed, heading, user.id):
+                await websocket.send_text('{"error":"Location ingest is overloaded, retry shortly","retry_after":1}')
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print(f"Error in driver_location_socket: {str(e)}")
+        print(traceback.format_exc())
+        await websocket.close(code=status.WS_1011_INTERNAL_ERROR)
+
+@router.websocket("/ws/rides/{ride_id}")
+async def ride_tracking_socket(websocket: WebSocket, ride_id: UUID):
+    """
+    Push the assigned driver's position to a ride's subscribers
+
+    Sends the driver's last stored position on connect, then every ping the
+    driver sends, instead of the client polling GET /tracking/rides/{ride_id}.
+    Only the ride's rider and its assigned driver may subscribe.
+    """
+    user = await _authenticate_websocket(websocket)
+    if user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    ride = await get_ride(ride_id)
+    if not ride or not ride.driver_id:
+        await websocket.close(code=4404, reason="Ride or driver not found")
+        return
+    if not await _may_follow_ride(user, ride):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Not a participant of this ride")
+        return
+    await websocket.accept()
+    try:
+        async with location_pubsub.subscribe(driver_topic(ride.driver_id)) as queue:
+            driver = fleet_index.position(ride.driver_id) or await get_driver_location(ride.driver_id)
+            if driver:
+                await websocket.send_text(dumps({
+                    "driver_id": str(ride.driver_id),
+                    "lat": driver.current_lat,
+                    "lon": driver.current_lon
+                }).decode())
+            disconnected = asyncio.ensure_future(_wait_for_disconnect(websocket))
+            try:
+                while True:
+                    next_message = asyncio.ensure_future(queue.get())
+                    await asyncio.wait({next_message, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+                    if disconnected.done():
+                        next_message.cancel()
+                        break
+                    await websocket.send_text(next_message.result())
+            finally:
+                disconnected.cancel()
+    except WebSocketDisconnect:
+        pass
     except Exception as e:
-        print(f"Error inserting tracking data: {e}")
-    
-    return update_driver_location(driver_id, lat, lon, True)
\ No newline at end of file
+        print(f"Error in ride_tracking_socket: {str(e)}")
+        print(traceback.format_exc())
+        await websocket.close(code=status.WS_1011_INTERNAL_ERROR)
\ No newline at end of file
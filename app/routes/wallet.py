@@ -1,8 +1,10 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Response
 from uuid import UUID
-from typing import List
-from ..schemas import WalletTransactionCreate, WalletTransaction
-from ..crud import create_wallet_transaction, get_wallet_balance, get_wallet_transactions, get_user_by_email
+from typing import List, Optional
+from ..schemas import WalletTransactionCreate, WalletTransaction, Principal
+from ..crud import create_wallet_transaction, get_wallet_balance, get_wallet_transactions_page
+from ..pagination import InvalidCursor, set_next_cursor
+from ..config import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 from ..utils.datetime_serializer import simple_datetime_handler
 from ..utils.auth_utils import get_current_user
 import traceback
@@ -10,16 +12,11 @@ import traceback
 router = APIRouter()
 
 @router.get("/balance")
-async def get_wallet_balance_endpoint(current_user_email: str = Depends(get_current_user)):
+async def get_wallet_balance_endpoint(user: Principal = Depends(get_current_user)):
     """
     Get wallet balance for the authenticated user
     """
     try:
-        # Get the current user
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         balance = get_wallet_balance(user.id)
         return {"user_id": str(user.id), "balance": balance}
     except HTTPException:
@@ -30,16 +27,14 @@ async def get_wallet_balance_endpoint(current_user_email: str = Depends(get_curr
         raise HTTPException(status_code=500, detail=f"Error retrieving wallet balance: {str(e)}")
 
 @router.post("/transaction", response_model=WalletTransaction)
-async def create_wallet_transaction_endpoint(transaction: WalletTransactionCreate, current_user_email: str = Depends(get_current_user)):
+async def create_wallet_transaction_endpoint(transaction: WalletTransactionCreate, idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255), user: Principal = Depends(get_current_user)):
     """
     Create a wallet transaction (credit or debit) for the authenticated user
+
+    Send an Idempotency-Key header to make retries safe: a repeated key returns
+    the original transaction without changing the balance again.
     """
     try:
-        # Get the current user
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         # Use the authenticated user's ID if no user_id is provided in the request
         # If user_id is provided, ensure it matches the authenticated user's ID
         if transaction.user_id is None:
@@ -57,7 +52,8 @@ async def create_wallet_transaction_endpoint(transaction: WalletTransactionCreat
             user_id,
             transaction.amount,
             transaction.transaction_type,
-            transaction.description
+            transaction.description,
+            idempotency_key
         )
         
         if not wallet_transaction:
@@ -72,21 +68,19 @@ async def create_wallet_transaction_endpoint(transaction: WalletTransactionCreat
         raise HTTPException(status_code=500, detail=f"Error creating wallet transaction: {str(e)}")
 
 @router.get("/transactions", response_model=List[WalletTransaction])
-async def get_wallet_transactions_endpoint(current_user_email: str = Depends(get_current_user)):
+async def get_wallet_transactions_endpoint(response: Response, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None, user: Principal = Depends(get_current_user)):
     """
-    Get transaction history for the authenticated user
+    Get the authenticated user's transaction history, newest first, one page at a time
     """
     try:
-        # Get the current user
-        user = get_user_by_email(current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        # Get transactions for the current user
-        transactions = get_wallet_transactions(user.id)
-        return transactions
+        # Get one page of transactions for the current user
+        page = get_wallet_transactions_page(user.id, limit, cursor)
+        set_next_cursor(response, page)
+        return page.items
     except HTTPException:
         raise
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"Error in get_wallet_transactions_endpoint: {str(e)}")
         print(traceback.format_exc())
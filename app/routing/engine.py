@@ -0,0 +1,205 @@
+import math
+import os
+import pickle
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+from .osm import RoadGraph, load_osm_graph
+from .contraction import ContractionHierarchy
+from .travel_time_matrix import estimate_travel_minutes
+from ..utils.distance_calc import calculate_distance
+from ..config import ROUTING_OSM_PATH, ROUTING_CACHE_PATH, AVERAGE_SPEED_KMH
+
+# Grid cell size (degrees) of the node snapping index, roughly 500 m
+SNAP_CELL_DEGREES = 0.005
+
+# Points further than this from any road node are not snapped
+MAX_SNAP_KM = 2.0
+
+# Speed assumed for the leg between a point and its snapped road node
+ACCESS_SPEED_KMH = 20.0
+
+# Bump when the pickled layout changes so stale caches are rebuilt
+CACHE_FORMAT_VERSION = 1
+
+Coordinate = Tuple[float, float]
+
+
+class RoutingEngine:
+    """
+    Offline road-network router backed by a contraction hierarchy
+
+    Coordinates are snapped to the nearest road node through a grid index;
+    the short access legs to and from the snapped nodes are added at
+    ACCESS_SPEED_KMH. All results are (distance_km, duration_minutes).
+    """
+
+    def __init__(self, lats: List[float], lons: List[float], hierarchy: ContractionHierarchy):
+        self.lats = lats
+        self.lons = lons
+        self.hierarchy = hierarchy
+        self._grid: Dict[Tuple[int, int], List[int]] = {}
+        for node, (lat, lon) in enumerate(zip(lats, lons)):
+            self._grid.setdefault(self._cell(lat, lon), []).append(node)
+
+    @classmethod
+    def from_graph(cls, graph: RoadGraph) -> "RoutingEngine":
+        return cls(graph.lats, graph.lons, ContractionHierarchy.build(graph))
+
+    @classmethod
+    def from_osm(cls, osm_path: str, cache_path: Optional[str] = None) -> "RoutingEngine":
+        """
+        Build an engine from an OSM extract, reusing a preprocessed cache file when it is fresh
+        """
+        cache_path = cache_path or f"{osm_path}.ch.pickle"
+        if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(osm_path):
+            try:
+                return cls.load(cache_path)
+            except Exception as e:
+                print(f"Error loading routing cache {cache_path}, rebuilding: {e}")
+
+        engine = cls.from_graph(load_osm_graph(osm_path))
+        try:
+            engine.save(cache_path)
+        except Exception as e:
+            print(f"Error saving routing cache {cache_path}: {e}")
+        return engine
+
+    def save(self, path: str) -> None:
+        with open(path, "wb") as handle:
+            pickle.dump((CACHE_FORMAT_VERSION, self.lats, self.lons, self.hierarchy), handle,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path: str) -> "RoutingEngine":
+        with open(path, "rb") as handle:
+            version, lats, lons, hierarchy = pickle.load(handle)
+        if version != CACHE_FORMAT_VERSION:
+            raise ValueError(f"unsupported routing cache version {version}")
+        return cls(lats, lons, hierarchy)
+
+    @staticmethod
+    def _cell(lat: float, lon: float) -> Tuple[int, int]:
+        return int(math.floor(lat / SNAP_CELL_DEGREES)), int(math.floor(lon / SNAP_CELL_DEGREES))
+
+    def snap(self, lat: float, lon: float) -> Optional[Tuple[int, float]]:
+        """
+        Return (node, distance_km) of the nearest road node, or None if nothing is close
+        """
+        lat_cell, lon_cell = self._cell(lat, lon)
+        max_rings = int(MAX_SNAP_KM / (SNAP_CELL_DEGREES * 111.32)) + 1
+        best: Optional[Tuple[int, float]] = None
+        for ring in range(max_rings + 1):
+            for d_lat in range(-ring, ring + 1):
+                for d_lon in range(-ring, ring + 1):
+                    if max(abs(d_lat), abs(d_lon)) != ring:
+                        continue
+                    for node in self._grid.get((lat_cell + d_lat, lon_cell + d_lon), ()):
+                        distance = calculate_distance(lat, lon, self.lats[node], self.lons[node])
+                        if best is None or distance < best[1]:
+                            best = (node, distance)
+            # Anything found in this ring is closer than every cell beyond the next ring
+            if best is not None and best[1] <= ring * SNAP_CELL_DEGREES * 111.32 * math.cos(math.radians(lat)):
+                break
+        if best is None or best[1] > MAX_SNAP_KM:
+            return None
+        return best
+
+    @staticmethod
+    def _with_access(cost: Tuple[float, float], access_km: float) -> Tuple[float, float]:
+        seconds, meters = cost
+        distance_km = meters / 1000 + access_km
+        duration_minutes = seconds / 60 + (access_km / ACCESS_SPEED_KMH) * 60
+        return distance_km, duration_minutes
+
+    def route(self, origin_lat: float, origin_lon: float, dest_lat: float, dest_lon: float) -> Optional[Tuple[float, float]]:
+        """
+        Road distance and travel time between two points, or None if no route exists
+        """
+        origin = self.snap(origin_lat, origin_lon)
+        destination = self.snap(dest_lat, dest_lon)
+        if origin is None or destination is None:
+            return None
+        cost = self.hierarchy.query(origin[0], destination[0])
+        if cost is None:
+            return None
+        return self._with_access(cost, origin[1] + destination[1])
+
+    def table(self, origins: Sequence[Coordinate], destinations: Sequence[Coordinate]) -> List[List[Optional[Tuple[float, float]]]]:
+        """
+        Many-to-many table of (distance_km, duration_minutes), None where no route exists
+        """
+        origin_snaps = [self.snap(lat, lon) for lat, lon in origins]
+        dest_snaps = [self.snap(lat, lon) for lat, lon in destinations]
+        source_nodes = sorted({s[0] for s in origin_snaps if s is not None})
+        target_nodes = sorted({s[0] for s in dest_snaps if s is not None})
+        source_index = {node: i for i, node in enumerate(source_nodes)}
+        target_index = {node: j for j, node in enumerate(target_nodes)}
+        costs = self.hierarchy.many_to_many(source_nodes, target_nodes)
+
+        table = []
+        for origin in origin_snaps:
+            row: List[Optional[Tuple[float, float]]] = []
+            for destination in dest_snaps:
+                if origin is None or destination is None:
+                    row.append(None)
+                    continue
+                cost = costs[source_index[origin[0]]][target_index[destination[0]]]
+                row.append(None if cost is None else self._with_access(cost, origin[1] + destination[1]))
+            table.append(row)
+        return table
+
+
+_engine: Optional[RoutingEngine] = None
+_engine_loaded = False
+_engine_lock = threading.Lock()
+
+
+def get_routing_engine() -> Optional[RoutingEngine]:
+    """
+    Return the shared routing engine, loading it on first use
+
+    Returns None when no OSM extract is configured (ROUTING_OSM_PATH) or it
+    cannot be loaded, in which case callers fall back to great-circle estimates.
+    """
+    global _engine, _engine_loaded
+    if _engine_loaded:
+        return _engine
+    with _engine_lock:
+        if not _engine_loaded:
+            if ROUTING_OSM_PATH:
+                try:
+                    _engine = RoutingEngine.from_osm(ROUTING_OSM_PATH, ROUTING_CACHE_PATH)
+                except Exception as e:
+                    print(f"Error loading routing engine from {ROUTING_OSM_PATH}: {e}")
+                    _engine = None
+            _engine_loaded = True
+    return _engine
+
+
+def travel_table(origins: Sequence[Coordinate], destinations: Sequence[Coordinate]) -> List[List[Tuple[float, float]]]:
+    """
+    Many-to-many (distance_km, duration_minutes) table for the matching algorithms
+
+    Uses the road network when available and falls back to great-circle
+    distance at AVERAGE_SPEED_KMH for pairs without a road route. Durations
+    come from the learned travel-time matrix where it has data.
+    """
+    engine = get_routing_engine()
+    routed = engine.table(origins, destinations) if engine is not None and origins and destinations else None
+    now = datetime.now(timezone.utc)
+
+    table = []
+    for i, (origin_lat, origin_lon) in enumerate(origins):
+        row = []
+        for j, (dest_lat, dest_lon) in enumerate(destinations):
+            cell = routed[i][j] if routed is not None else None
+            if cell is None:
+                distance_km = calculate_distance(origin_lat, origin_lon, dest_lat, dest_lon)
+                cell = (distance_km, (distance_km / AVERAGE_SPEED_KMH) * 60)
+            learned_minutes = estimate_travel_minutes(origin_lat, origin_lon, dest_lat, dest_lon, now)
+            if learned_minutes is not None:
+                cell = (cell[0], learned_minutes)
+            row.append(cell)
+        table.append(row)
+    return table
\ No newline at end of file
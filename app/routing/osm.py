@@ -0,0 +1,153 @@
+import bz2
+import gzip
+import re
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Optional, Tuple
+from ..utils.distance_calc import calculate_distance
+
+# Default speeds (km/h) for drivable highway classes
+HIGHWAY_SPEEDS_KMH = {
+    "motorway": 100.0,
+    "trunk": 80.0,
+    "primary": 60.0,
+    "secondary": 50.0,
+    "tertiary": 40.0,
+    "unclassified": 30.0,
+    "residential": 25.0,
+    "living_street": 10.0,
+    "service": 15.0,
+    "motorway_link": 60.0,
+    "trunk_link": 50.0,
+    "primary_link": 40.0,
+    "secondary_link": 35.0,
+    "tertiary_link": 30.0,
+    "road": 30.0,
+}
+
+MPH_TO_KMH = 1.609344
+
+
+class RoadGraph:
+    """
+    Directed road graph extracted from an OpenStreetMap file
+
+    Nodes are numbered 0..n-1 with coordinates in `lats`/`lons`. Each edge
+    carries its travel time in seconds and its length in meters.
+    """
+
+    def __init__(self):
+        self.lats: List[float] = []
+        self.lons: List[float] = []
+        self.edges: List[Tuple[int, int, float, float]] = []  # (source, target, seconds, meters)
+
+    @property
+    def node_count(self) -> int:
+        return len(self.lats)
+
+    def add_node(self, lat: float, lon: float) -> int:
+        self.lats.append(lat)
+        self.lons.append(lon)
+        return len(self.lats) - 1
+
+    def add_edge(self, source: int, target: int, seconds: float, meters: float) -> None:
+        self.edges.append((source, target, seconds, meters))
+
+
+def _open_osm_file(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rb")
+    return open(path, "rb")
+
+
+def parse_maxspeed(value: Optional[str]) -> Optional[float]:
+    """
+    Parse an OSM maxspeed tag into km/h, returning None when it is not numeric
+    """
+    if not value:
+        return None
+    match = re.match(r"^\s*(\d+(?:\.\d+)?)\s*(mph)?", value)
+    if not match:
+        return None
+    speed = float(match.group(1))
+    if match.group(2):
+        speed *= MPH_TO_KMH
+    return speed if speed > 0 else None
+
+
+def _way_direction(tags: Dict[str, str]) -> Tuple[bool, bool]:
+    """
+    Return (forward, backward) traversability of a way based on its oneway tags
+    """
+    oneway = tags.get("oneway", "")
+    if oneway in ("yes", "true", "1"):
+        return True, False
+    if oneway == "-1":
+        return False, True
+    if tags.get("junction") == "roundabout" or tags.get("highway") == "motorway":
+        return True, oneway == "no"
+    return True, True
+
+
+def load_osm_graph(path: str) -> RoadGraph:
+    """
+    Load the drivable road network from an OSM XML extract (.osm, .osm.gz or .osm.bz2)
+
+    The file is streamed so that only node coordinates and drivable ways are
+    kept in memory. Node ids are remapped to a dense 0..n-1 range containing
+    only nodes referenced by drivable ways.
+    """
+    node_coords: Dict[int, Tuple[float, float]] = {}
+    ways: List[Tuple[List[int], float, bool, bool]] = []
+
+    with _open_osm_file(path) as handle:
+        way_refs: List[int] = []
+        way_tags: Dict[str, str] = {}
+        for event, element in ET.iterparse(handle, events=("start", "end")):
+            tag = element.tag
+            if event == "start":
+                if tag == "way":
+                    way_refs = []
+                    way_tags = {}
+                continue
+
+            if tag == "node":
+                node_coords[int(element.get("id"))] = (float(element.get("lat")), float(element.get("lon")))
+                element.clear()
+            elif tag == "nd":
+                way_refs.append(int(element.get("ref")))
+            elif tag == "tag":
+                way_tags[element.get("k")] = element.get("v")
+            elif tag == "way":
+                highway = way_tags.get("highway")
+                if highway in HIGHWAY_SPEEDS_KMH and way_tags.get("access") not in ("no", "private") and len(way_refs) > 1:
+                    speed = parse_maxspeed(way_tags.get("maxspeed")) or HIGHWAY_SPEEDS_KMH[highway]
+                    forward, backward = _way_direction(way_tags)
+                    ways.append((way_refs, speed, forward, backward))
+                element.clear()
+            elif tag in ("relation", "osm"):
+                element.clear()
+
+    graph = RoadGraph()
+    index: Dict[int, int] = {}
+    for refs, speed_kmh, forward, backward in ways:
+        previous = None
+        for ref in refs:
+            coords = node_coords.get(ref)
+            if coords is None:
+                previous = None
+                continue
+            if ref not in index:
+                index[ref] = graph.add_node(coords[0], coords[1])
+            current = index[ref]
+            if previous is not None and previous != current:
+                meters = calculate_distance(graph.lats[previous], graph.lons[previous],
+                                            graph.lats[current], graph.lons[current]) * 1000
+                seconds = meters / (speed_kmh / 3.6)
+                if forward:
+                    graph.add_edge(previous, current, seconds, meters)
+                if backward:
+                    graph.add_edge(current, previous, seconds, meters)
+            previous = current
+    return graph
@@ -0,0 +1,330 @@
+import argparse
+import math
+import os
+import struct
+import threading
+import time
+from array import array
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+from ..config import (
+    TRAVEL_MATRIX_PATH, TRAVEL_MATRIX_BBOX, TRAVEL_MATRIX_ZONES,
+    TRAVEL_MATRIX_MIN_SAMPLES, TRAVEL_MATRIX_UTC_OFFSET_HOURS
+)
+
+# File layout: header, float32 mean minutes, uint32 sample counts
+MAGIC = b"TTMX"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHHH4ddd")  # magic, version, zones, buckets, bbox, utc offset, watermark
+
+# One bucket per hour of the day
+TIME_BUCKETS = 24
+
+# Consecutive pings further apart than this split a driver's trace
+MAX_PING_GAP_SECONDS = 300
+
+# Longest trip measured from a single starting ping
+MAX_TRIP_SECONDS = 3600
+
+# Rows fetched per request when reading the tracking table
+PAGE_SIZE = 1000
+
+# How often the shared matrix checks its file for a newer build
+RELOAD_CHECK_SECONDS = 60
+
+BoundingBox = Tuple[float, float, float, float]
+
+
+class TravelTimeMatrix:
+    """
+    Zone x zone x time-of-day table of observed travel times
+
+    The bounding box is split into `zones` x `zones` cells. For every ordered
+    pair of cells and every hour of the day the matrix keeps the running mean
+    of observed travel minutes and the number of samples, so a lookup is a
+    single array index.
+    """
+
+    def __init__(self, bbox: BoundingBox, zones: int = TRAVEL_MATRIX_ZONES, buckets: int = TIME_BUCKETS,
+                 utc_offset_hours: float = TRAVEL_MATRIX_UTC_OFFSET_HOURS):
+        self.min_lat, self.min_lon, self.max_lat, self.max_lon = bbox
+        self.zones = zones
+        self.buckets = buckets
+        self.utc_offset_hours = utc_offset_hours
+        self.cells = zones * zones
+        size = self.cells * self.cells * buckets
+        self.means = array("f", bytes(4 * size))
+        self.counts = array("I", bytes(4 * size))
+        self.watermark: Optional[datetime] = None
+
+    @property
+    def bbox(self) -> BoundingBox:
+        return self.min_lat, self.min_lon, self.max_lat, self.max_lon
+
+    def zone(self, lat: float, lon: float) -> Optional[int]:
+        """
+        Return the zone index of a coordinate, or None if it lies outside the bounding box
+        """
+        if not (self.min_lat <= lat <= self.max_lat and self.min_lon <= lon <= self.max_lon):
+            return None
+        row = min(int((lat - self.min_lat) / (self.max_lat - self.min_lat) * self.zones), self.zones - 1)
+        col = min(int((lon - self.min_lon) / (self.max_lon - self.min_lon) * self.zones), self.zones - 1)
+        return row * self.zones + col
+
+    def bucket(self, when: datetime) -> int:
+        """
+        Return the time-of-day bucket of a timestamp
+        """
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=timezone.utc)
+        local = when.astimezone(timezone.utc) + timedelta(hours=self.utc_offset_hours)
+        return (local.hour * self.buckets) // 24
+
+    def _index(self, origin_zone: int, dest_zone: int, bucket: int) -> int:
+        return (origin_zone * self.cells + dest_zone) * self.buckets + bucket
+
+    def observe(self, origin_zone: int, dest_zone: int, bucket: int, minutes: float) -> None:
+        """
+        Add one observed trip to the running mean of its cell
+        """
+        index = self._index(origin_zone, dest_zone, bucket)
+        count = self.counts[index] + 1
+        self.means[index] += (minutes - self.means[index]) / count
+        self.counts[index] = count
+
+    def lookup(self, origin_lat: float, origin_lon: float, dest_lat: float, dest_lon: float,
+               when: Optional[datetime] = None, min_samples: int = TRAVEL_MATRIX_MIN_SAMPLES) -> Optional[float]:
+        """
+        Return the learned travel time in minutes, or None when there is not enough data
+
+        The time-of-day cell is used when it has `min_samples` observations,
+        otherwise the all-day mean of the zone pair. Trips inside a single
+        zone are not covered by the matrix.
+        """
+        origin_zone = self.zone(origin_lat, origin_lon)
+        dest_zone = self.zone(dest_lat, dest_lon)
+        if origin_zone is None or dest_zone is None or origin_zone == dest_zone:
+            return None
+
+        bucket = self.bucket(when or datetime.now(timezone.utc))
+        index = self._index(origin_zone, dest_zone, bucket)
+        if self.counts[index] >= min_samples:
+            return float(self.means[index])
+
+        first = self._index(origin_zone, dest_zone, 0)
+        total_count = 0
+        total_minutes = 0.0
+        for index in range(first, first + self.buckets):
+            total_count += self.counts[index]
+            total_minutes += self.means[index] * self.counts[index]
+        if total_count >= min_samples:
+            return total_minutes / total_count
+        return None
+
+    def stats(self) -> Dict[str, object]:
+        populated = sum(1 for count in self.counts if count)
+        return {
+            "zones": self.zones,
+            "time_buckets": self.buckets,
+            "bbox": list(self.bbox),
+            "populated_cells": populated,
+            "samples": sum(self.counts),
+            "watermark": self.watermark.isoformat() if self.watermark else None
+        }
+
+    def save(self, path: str) -> None:
+        """
+        Write the matrix atomically so running servers never read a partial file
+        """
+        watermark = self.watermark.timestamp() if self.watermark else 0.0
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as handle:
+            handle.write(HEADER.pack(MAGIC, FORMAT_VERSION, self.zones, self.buckets,
+                                     self.min_lat, self.min_lon, self.max_lat, self.max_lon,
+                                     self.utc_offset_hours, watermark))
+            self.means.tofile(handle)
+            self.counts.tofile(handle)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "TravelTimeMatrix":
+        with open(path, "rb") as handle:
+            magic, version, zones, buckets, min_lat, min_lon, max_lat, max_lon, utc_offset_hours, watermark = \
+                HEADER.unpack(handle.read(HEADER.size))
+            if magic != MAGIC or version != FORMAT_VERSION:
+                raise ValueError(f"unsupported travel-time matrix file {path}")
+            matrix = cls.__new__(cls)
+            matrix.min_lat, matrix.min_lon, matrix.max_lat, matrix.max_lon = min_lat, min_lon, max_lat, max_lon
+            matrix.zones = zones
+            matrix.buckets = buckets
+            matrix.utc_offset_hours = utc_offset_hours
+            matrix.cells = zones * zones
+            size = matrix.cells * matrix.cells * buckets
+            matrix.means = array("f")
+            matrix.means.fromfile(handle, size)
+            matrix.counts = array("I")
+            matrix.counts.fromfile(handle, size)
+            matrix.watermark = datetime.fromtimestamp(watermark, timezone.utc) if watermark else None
+        return matrix
+
+
+def parse_timestamp(value) -> datetime:
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def accumulate_pings(matrix: TravelTimeMatrix, rows: Iterable[dict], since: Optional[datetime] = None) -> int:
+    """
+    Feed time-ordered tracking rows into the matrix, returning the number of trips observed
+
+    Each ping starts a trip; every later ping of the same driver within
+    MAX_TRIP_SECONDS gives the travel time to the zone it was recorded in,
+    counting only the first arrival in each zone. A new ping in the same zone
+    replaces an earlier start that has not left it yet, so time spent waiting
+    is not counted as travel. Trips starting at or before `since` are skipped,
+    which lets an incremental run re-read the tail of the previous one.
+    """
+    trails: Dict[str, deque] = {}
+    observations = 0
+    for row in rows:
+        driver_id, lat, lon, updated_at = row.get("driver_id"), row.get("lat"), row.get("lon"), row.get("updated_at")
+        if driver_id is None or lat is None or lon is None or updated_at is None:
+            continue
+        when = parse_timestamp(updated_at)
+        zone = matrix.zone(float(lat), float(lon))
+
+        trail = trails.get(driver_id)
+        if trail is None or (trail and (when - trail[-1][0]).total_seconds() > MAX_PING_GAP_SECONDS):
+            trail = deque()
+        while trail and (when - trail[0][0]).total_seconds() > MAX_TRIP_SECONDS:
+            trail.popleft()
+
+        if zone is not None:
+            for start_time, start_zone, start_bucket, reached in trail:
+                if start_zone is None or start_zone == zone or zone in reached:
+                    continue
+                reached.add(zone)
+                if since is not None and start_time <= since:
+                    continue
+                matrix.observe(start_zone, zone, start_bucket, (when - start_time).total_seconds() / 60)
+                observations += 1
+            trail = deque(entry for entry in trail if entry[1] != zone or entry[3])
+
+        trail.append((when, zone, matrix.bucket(when), set()))
+        trails[driver_id] = trail
+    return observations
+
+
+def _fetch_tracking_rows(start: Optional[datetime], end: datetime) -> Iterator[dict]:
+    """
+    Stream tracking rows with start < updated_at <= end in time order
+    """
+    from ..crud import iter_table
+    conditions = [("lte", end.isoformat())]
+    if start is not None:
+        conditions.insert(0, ("gt", start.isoformat()))
+    return iter_table("tracking", "driver_id,lat,lon,updated_at", {"updated_at": conditions},
+                      ("updated_at", "id"), PAGE_SIZE)
+
+
+def _parse_bbox(value: Optional[str]) -> Optional[BoundingBox]:
+    if not value:
+        return None
+    min_lat, min_lon, max_lat, max_lon = (float(part) for part in value.split(","))
+    return min_lat, min_lon, max_lat, max_lon
+
+
+def _bbox_from_rows(rows: Iterable[dict]) -> Optional[BoundingBox]:
+    min_lat = min_lon = math.inf
+    max_lat = max_lon = -math.inf
+    for row in rows:
+        if row.get("lat") is None or row.get("lon") is None:
+            continue
+        lat, lon = float(row["lat"]), float(row["lon"])
+        min_lat, max_lat = min(min_lat, lat), max(max_lat, lat)
+        min_lon, max_lon = min(min_lon, lon), max(max_lon, lon)
+    if min_lat == math.inf or min_lat == max_lat or min_lon == max_lon:
+        return None
+    return min_lat, min_lon, max_lat, max_lon
+
+
+def build_travel_time_matrix(path: str, full: bool = False) -> TravelTimeMatrix:
+    """
+    Build or incrementally update the matrix file from the tracking table
+
+    An incremental run loads the existing file and only reads pings recorded
+    after its watermark (plus one trip length of overlap so trips crossing
+    the watermark are completed).
+    """
+    cutoff = datetime.now(timezone.utc)
+    matrix = None
+    if not full and os.path.exists(path):
+        matrix = TravelTimeMatrix.load(path)
+    if matrix is None:
+        bbox = _parse_bbox(TRAVEL_MATRIX_BBOX) or _bbox_from_rows(_fetch_tracking_rows(None, cutoff))
+        if bbox is None:
+            raise ValueError("No tracking data to derive the travel-time matrix bounding box from")
+        matrix = TravelTimeMatrix(bbox)
+
+    since = matrix.watermark
+    start = since - timedelta(seconds=MAX_TRIP_SECONDS) if since else None
+    observations = accumulate_pings(matrix, _fetch_tracking_rows(start, cutoff), since)
+    matrix.watermark = cutoff
+    matrix.save(path)
+    print(f"Travel-time matrix updated with {observations} trips: {matrix.stats()}")
+    return matrix
+
+
+_matrix: Optional[TravelTimeMatrix] = None
+_matrix_mtime = 0.0
+_matrix_checked = 0.0
+_matrix_lock = threading.Lock()
+
+
+def get_travel_time_matrix() -> Optional[TravelTimeMatrix]:
+    """
+    Return the shared matrix loaded from TRAVEL_MATRIX_PATH, or None if it has not been built
+
+    The file is checked for a newer build at most every RELOAD_CHECK_SECONDS.
+    """
+    global _matrix, _matrix_mtime, _matrix_checked
+    if not TRAVEL_MATRIX_PATH:
+        return None
+    now = time.monotonic()
+    if _matrix_checked and now - _matrix_checked < RELOAD_CHECK_SECONDS:
+        return _matrix
+    with _matrix_lock:
+        if not _matrix_checked or now - _matrix_checked >= RELOAD_CHECK_SECONDS:
+            _matrix_checked = now
+            try:
+                mtime = os.path.getmtime(TRAVEL_MATRIX_PATH) if os.path.exists(TRAVEL_MATRIX_PATH) else 0.0
+                if mtime and mtime != _matrix_mtime:
+                    _matrix = TravelTimeMatrix.load(TRAVEL_MATRIX_PATH)
+                    _matrix_mtime = mtime
+            except Exception as e:
+                print(f"Error loading travel-time matrix from {TRAVEL_MATRIX_PATH}: {e}")
+    return _matrix
+
+
+def estimate_travel_minutes(origin_lat: float, origin_lon: float, dest_lat: float, dest_lon: float,
+                            when: Optional[datetime] = None) -> Optional[float]:
+    """
+    Learned travel time in minutes for the current time of day, or None when unknown
+    """
+    matrix = get_travel_time_matrix()
+    if matrix is None:
+        return None
+    return matrix.lookup(origin_lat, origin_lon, dest_lat, dest_lon, when)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the travel-time matrix from tracking pings")
+    parser.add_argument("--path", default=TRAVEL_MATRIX_PATH, help="matrix file (defaults to TRAVEL_MATRIX_PATH)")
+    parser.add_argument("--full", action="store_true", help="rebuild from scratch instead of updating incrementally")
+    args = parser.parse_args()
+    if not args.path:
+        parser.error("TRAVEL_MATRIX_PATH is not set and --path was not given")
+    build_travel_time_matrix(args.path, full=args.full)
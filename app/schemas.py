@@ -43,6 +43,14 @@ class Token(CustomBaseModel):
 class TokenData(CustomBaseModel):
     email: Optional[str] = None
 
+class Principal(CustomBaseModel):
+    """
+    The authenticated caller, as carried in the access token claims
+    """
+    id: UUID
+    email: str
+    role: Optional[str] = None
+
 # Verification schemas
 class VerifyEmailRequest(CustomBaseModel):
     token: str
@@ -115,10 +123,34 @@ class DriverResponse(DriverCreate):
     safety_training_completed: bool = False
     total_incidents: int = 0
     performance_score: float = 100.00
+    rating_count: int = 0
+    rating_bayesian: Optional[float] = None
 
 # Update the forward reference
 RiderMatchResponse.model_rebuild()
 
+# Projection schemas: the few columns hot paths read, fetched instead of select("*")
+class DriverLocation(CustomBaseModel):
+    id: UUID
+    current_lat: float
+    current_lon: float
+    available: Optional[bool] = True
+
+class RiderTrip(CustomBaseModel):
+    id: UUID
+    origin_lat: float
+    origin_lon: float
+    destination_lat: float
+    destination_lon: float
+    preferred_departure: Optional[datetime] = None
+    beta: Optional[float] = 0.5
+
+def projection(model: type) -> str:
+    """
+    Column list selecting exactly the fields of a schema
+    """
+    return ",".join(model.model_fields)
+
 # Driver Verification schemas
 class DriverVerificationCreate(CustomBaseModel):
     driver_id: UUID
@@ -280,6 +312,7 @@ class RatingResponse(CustomBaseModel):
 class DriverRatingsResponse(CustomBaseModel):
     driver_id: UUID
     average_rating: float
+    bayesian_rating: Optional[float] = None
     total_ratings: int
     reviews: List[RatingResponse]
 
@@ -424,6 +457,8 @@ class FareEstimateResponse(CustomBaseModel):
     distance_fare: float
     time_fare: float
     surge_multiplier: Optional[float] = 1.0
+    nearby_drivers: Optional[int] = None
+    pickup_eta_minutes: Optional[float] = None
 
 # Algorithm-based fare estimation schemas
 class AlgorithmFareEstimateRequest(CustomBaseModel):
@@ -444,6 +479,8 @@ class AlgorithmFareEstimateResponse(CustomBaseModel):
     distance_fare: float
     time_fare: float
     surge_multiplier: Optional[float] = 1.0
+    nearby_drivers: Optional[int] = None
+    pickup_eta_minutes: Optional[float] = None
     utility: Optional[float] = None
     metrics: Optional[dict] = None
 
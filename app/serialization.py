@@ -0,0 +1,81 @@
+"""
+Fast-path serialization of database rows and API responses
+
+Rows are validated into response models once, by a TypeAdapter cached per
+type, straight from what the database returned (pydantic parses ISO strings
+and datetime objects alike, so no datetime pre-pass is needed). Responses are
+written with orjson, which encodes datetimes, UUIDs and dataclasses natively;
+routes on hot paths return `json_response(...)` so FastAPI neither re-validates
+the models against `response_model` nor runs `jsonable_encoder` over them.
+"""
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Iterable, List, Optional, Type, TypeVar
+
+import orjson
+from fastapi import Response
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, TypeAdapter
+
+ModelT = TypeVar("ModelT")
+
+
+@lru_cache(maxsize=None)
+def type_adapter(type_: Any) -> TypeAdapter:
+    """
+    The TypeAdapter of a type, built once (building one compiles a validator)
+    """
+    return TypeAdapter(type_)
+
+
+def validate_row(model: Type[ModelT], row: Optional[dict]) -> Optional[ModelT]:
+    """
+    Build a model from one database row (None for a missing row)
+    """
+    return type_adapter(model).validate_python(row) if row else None
+
+
+def validate_rows(model: Type[ModelT], rows: Optional[Iterable[dict]]) -> List[ModelT]:
+    """
+    Build models from database rows in a single validation pass
+    """
+    return type_adapter(List[model]).validate_python(list(rows or []))
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Encode models, rows and plain containers as JSON bytes
+    """
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONResponse(ORJSONResponse):
+    """
+    orjson response that also accepts pydantic models (the app's default response class)
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def json_response(content: Any, response: Optional[Response] = None, status_code: int = 200) -> FastJSONResponse:
+    """
+    Serialize a route's result directly, bypassing FastAPI's response processing
+
+    Pass the route's injected `response` to keep the headers it set (e.g. the
+    next page's cursor).
+    """
+    headers = None
+    if response is not None:
+        headers = {key: value for key, value in response.headers.items() if key != "content-length"}
+    return FastJSONResponse(content, status_code=status_code, headers=headers)
@@ -0,0 +1,68 @@
+"""
+Upkeep of the time-partitioned tracking table (models/tracking_partitions.sql)
+
+The tracking table holds one partition per UTC day. `run_tracking_maintenance`
+creates the partitions of the coming days, simplifies the trajectories of days
+older than TRACKING_COMPACT_AFTER_DAYS (Douglas-Peucker within
+TRACKING_COMPACTION_TOLERANCE_M metres) and drops days older than
+TRACKING_RETENTION_DAYS, so the table's size stays bounded however long the
+service runs. Each database call compacts at most TRACKING_COMPACT_DAYS_PER_CALL
+days, so a first run over a long history is many short statements rather than
+one that outlives the statement timeout. Schedule it daily (cron or similar):
+
+    python -m app.tracking_storage
+"""
+import argparse
+from typing import Optional
+from .database import get_supabase_client
+from .config import (
+    TRACKING_PARTITION_DAYS_AHEAD, TRACKING_COMPACT_AFTER_DAYS,
+    TRACKING_COMPACTION_TOLERANCE_M, TRACKING_RETENTION_DAYS, TRACKING_COMPACT_DAYS_PER_CALL
+)
+
+
+def run_tracking_maintenance(days_ahead: int = TRACKING_PARTITION_DAYS_AHEAD,
+                             compact_after_days: int = TRACKING_COMPACT_AFTER_DAYS,
+                             tolerance_m: float = TRACKING_COMPACTION_TOLERANCE_M,
+                             retention_days: int = TRACKING_RETENTION_DAYS,
+                             days_per_call: int = TRACKING_COMPACT_DAYS_PER_CALL) -> Optional[dict]:
+    """
+    Create upcoming partitions, compact old days and drop expired ones; returns what was done
+    """
+    summary = None
+    try:
+        while True:
+            response = get_supabase_client().rpc("tracking_maintenance", {
+                "p_days_ahead": days_ahead,
+                "p_compact_after_days": compact_after_days,
+                "p_tolerance_m": tolerance_m,
+                "p_retention_days": retention_days,
+                "p_max_compactions": days_per_call
+            }).execute()
+            result = response.data
+            if summary is None:
+                summary = result
+            else:
+                for key in ("partitions_created", "partitions_dropped", "default_rows_purged"):
+                    summary[key] += result[key]
+                summary["compacted"] += result["compacted"]
+                summary["days_to_compact"] = result["days_to_compact"]
+            if not result["compacted"] or not result["days_to_compact"]:
+                return summary
+    except Exception as e:
+        print(f"Error running tracking maintenance: {e}")
+        return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Partition, compact and expire the tracking table")
+    parser.add_argument("--days-ahead", type=int, default=TRACKING_PARTITION_DAYS_AHEAD)
+    parser.add_argument("--compact-after-days", type=int, default=TRACKING_COMPACT_AFTER_DAYS)
+    parser.add_argument("--tolerance-m", type=float, default=TRACKING_COMPACTION_TOLERANCE_M)
+    parser.add_argument("--retention-days", type=int, default=TRACKING_RETENTION_DAYS)
+    parser.add_argument("--days-per-call", type=int, default=TRACKING_COMPACT_DAYS_PER_CALL)
+    args = parser.parse_args()
+    if args.compact_after_days >= args.retention_days:
+        parser.error("--compact-after-days must be smaller than --retention-days")
+    print(run_tracking_maintenance(args.days_ahead, args.compact_after_days, args.tolerance_m, args.retention_days,
+                                   args.days_per_call))
@@ -1,6 +1,9 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from .jwt_utils import verify_token
+from .jwt_utils import decode_token
+from .principal_cache import principal_cache
+from ..async_crud import get_user_by_email
+from ..schemas import Principal
 
 # OAuth2 scheme for JWT tokens
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
@@ -10,16 +13,40 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 active_sessions = set()
 
 # Dependency for getting current user
-async def get_current_user(token: str = Depends(oauth2_scheme)):
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> Principal:
+    """
+    Resolve the authenticated principal from the token claims
+
+    The cached principal or the token's own id/role claims are used when
+    possible; only tokens without those claims, issued before the user's
+    role or profile changed, or older than PRINCIPAL_CLAIMS_MAX_AGE_SECONDS
+    cost a user lookup.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    
+
     # Verify the JWT token - this is the primary authentication check
     try:
-        email = verify_token(token, credentials_exception)
-        return email
+        payload = decode_token(token, credentials_exception)
     except Exception as e:
-        raise credentials_exception
\ No newline at end of file
+        raise credentials_exception
+
+    principal = principal_cache.get(payload["sub"])
+    if principal is not None:
+        return principal
+
+    principal = principal_cache.from_claims(payload)
+    if principal is None:
+        try:
+            user = await get_user_by_email(payload["sub"])
+        except Exception as e:
+            print(f"Error resolving current user: {e}")
+            raise HTTPException(status_code=500, detail="Error resolving current user")
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        principal = Principal(id=user.id, email=user.email, role=user.role)
+    principal_cache.put(principal)
+    return principal
@@ -0,0 +1,183 @@
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional, Set, Tuple
+
+
+def is_connection_error(error: Exception) -> bool:
+    """
+    Default test for a failure worth retrying as is (the database was not reached or timed out)
+    """
+    return isinstance(error, (ConnectionError, TimeoutError, asyncio.TimeoutError))
+
+
+class BackgroundBatcher:
+    """
+    Collects items and hands them to an async `flush` callable in batches
+
+    A batch is flushed once it holds `max_batch_size` items or `max_delay_seconds`
+    after its first item arrived, whichever comes first, so callers on the
+    request path only append to a list. `flush` must be safe to repeat (e.g.
+    keyed by idempotency keys), because failures are handled in two ways:
+
+    - a temporary failure (`is_transient(error)`: connection errors, timeouts,
+      server errors) is retried up to `max_retries` times, then the batch goes
+      back in the queue and is flushed again after a growing backoff;
+    - a batch the database rejects is split in halves until the entries that
+      fail on their own are isolated, so one bad entry does not take the rest
+      of its batch down; those are handed to `dead_letter(name, entries,
+      error)` to be stored for replay, and kept in memory while that fails.
+
+    One flush makes at most `max_failed_flushes` failed calls; what it has not
+    written by then goes back in the queue.
+    """
+
+    def __init__(self, flush: Callable[[List[Any]], Awaitable[Any]], max_batch_size: int = 500,
+                 max_delay_seconds: float = 0.5, max_retries: int = 3, name: str = "batch",
+                 dead_letter: Optional[Callable[[str, List[Any], str], Awaitable[Any]]] = None,
+                 is_transient: Callable[[Exception], bool] = is_connection_error,
+                 max_failed_flushes: int = 32, max_backoff_seconds: float = 30.0):
+        self._flush = flush
+        self._dead_letter = dead_letter
+        self._is_transient = is_transient
+        self.max_batch_size = max_batch_size
+        self.max_delay_seconds = max_delay_seconds
+        self.max_retries = max_retries
+        self.max_failed_flushes = max_failed_flushes
+        self.max_backoff_seconds = max_backoff_seconds
+        self.name = name
+        self._items: List[Any] = []
+        # Isolated entries whose dead-letter write failed, with their error
+        self._held: List[Tuple[List[Any], str]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._backoff = 0.0
+        self._tasks: Set[asyncio.Task] = set()
+        self.flushed = 0
+        self.failed = 0
+        self.dead_lettered = 0
+        self.requeued = 0
+
+    def add(self, item: Any) -> None:
+        """
+        Queue an item (must be called from the event loop)
+        """
+        self._items.append(item)
+        if len(self._items) >= self.max_batch_size and not self._backoff:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay_seconds, self._start_flush)
+
+    def pending(self) -> int:
+        return len(self._items)
+
+    def held(self) -> int:
+        """
+        Entries given up on whose dead-letter write has not succeeded yet
+        """
+        return sum(len(entries) for entries, _ in self._held)
+
+    def _start_flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        items, self._items = self._items, []
+        if items or self._held:
+            self._spawn(self._flush_items(items))
+
+    def _spawn(self, coroutine) -> None:
+        task = asyncio.ensure_future(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _flush_items(self, items: List[Any]) -> None:
+        """
+        One flush: the items in batches of max_batch_size, within the failed call budget
+        """
+        budget = [self.max_failed_flushes]
+        delivered = await self._deliver_held()
+        for start in range(0, len(items), self.max_batch_size):
+            unwritten = await self._flush_batch(items[start:start + self.max_batch_size], budget)
+            if unwritten:
+                self._requeue(unwritten + items[start + self.max_batch_size:])
+                return
+        if not delivered:
+            self._requeue([])
+        else:
+            self._backoff = 0.0
+
+    async def _flush_batch(self, batch: List[Any], budget: List[int]) -> List[Any]:
+        """
+        Write a batch, returning the entries left for a later flush
+        """
+        attempt = 1
+        while True:
+            try:
+                await self._flush(batch)
+                self.flushed += len(batch)
+                return []
+            except Exception as e:
+                error = e
+            budget[0] -= 1
+            if budget[0] <= 0:
+                print(f"Error flushing {self.name} batch of {len(batch)}, too many failures, requeueing: {error}")
+                return batch
+            if not self._is_transient(error):
+                break
+            if attempt >= self.max_retries:
+                print(f"Error flushing {self.name} batch of {len(batch)} (attempt {attempt}), requeueing: {error}")
+                return batch
+            print(f"Error flushing {self.name} batch of {len(batch)} (attempt {attempt}), retrying: {error}")
+            await asyncio.sleep(self.max_delay_seconds * attempt)
+            attempt += 1
+
+        if len(batch) == 1:
+            print(f"{self.name} entry rejected, giving up: {error}")
+            await self._give_up(batch, error)
+            return []
+        print(f"{self.name} batch of {len(batch)} rejected, flushing its halves separately: {error}")
+        middle = len(batch) // 2
+        unwritten = await self._flush_batch(batch[:middle], budget)
+        if unwritten:
+            return unwritten + batch[middle:]
+        return await self._flush_batch(batch[middle:], budget)
+
+    def _requeue(self, entries: List[Any]) -> None:
+        """
+        Put unwritten entries back at the front of the queue and flush again after a backoff
+        """
+        self._items[:0] = entries
+        self.requeued += len(entries)
+        self._backoff = min(max(self._backoff * 2, self.max_delay_seconds), self.max_backoff_seconds)
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = asyncio.get_running_loop().call_later(self._backoff, self._start_flush)
+
+    async def _give_up(self, batch: List[Any], error: Exception) -> None:
+        self.failed += len(batch)
+        if self._dead_letter is None:
+            return
+        self._held.append((batch, str(error)))
+        await self._deliver_held()
+
+    async def _deliver_held(self) -> bool:
+        """
+        Store held entries as dead letters; False if some are still held
+        """
+        while self._held:
+            entries, error = self._held[0]
+            try:
+                await self._dead_letter(self.name, entries, error)
+            except Exception as e:
+                print(f"Error storing {self.held()} failed {self.name} entries, keeping them: {e}")
+                return False
+            self._held.pop(0)
+            self.dead_lettered += len(entries)
+        return True
+
+    async def drain(self) -> None:
+        """
+        Flush everything queued and wait for in-flight batches (called on shutdown)
+        """
+        self._start_flush()
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks))
+        if self._items or self._held:
+            print(f"{self.name}: {self.pending()} entries unwritten and {self.held()} dead letters unstored at shutdown")
@@ -0,0 +1,168 @@
+import math
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, Optional, Tuple
+from .distance_calc import calculate_distance
+from ..routing.engine import get_routing_engine
+from ..routing.travel_time_matrix import estimate_travel_minutes
+from ..config import DISTANCE_CACHE_GRID_METERS, DISTANCE_CACHE_MAX_ENTRIES, AVERAGE_SPEED_KMH
+
+# Metres per degree of latitude (approximately constant)
+METERS_PER_DEGREE_LAT = 111320.0
+
+QuantizedKey = Tuple[int, int, int, int]
+
+
+class QuantizedDistanceCache:
+    """
+    LRU cache of origin/destination distances keyed on coordinates snapped to a grid
+
+    Coordinates are quantized to cells of roughly `grid_meters` on each side, so
+    repeated lookups between the same places (airports, stations, business
+    districts) are served from memory. The cache holds at most `max_entries`
+    pairs and evicts the least recently used pair when full.
+    """
+
+    def __init__(self, grid_meters: float = DISTANCE_CACHE_GRID_METERS,
+                 max_entries: int = DISTANCE_CACHE_MAX_ENTRIES):
+        self.grid_meters = grid_meters
+        self.max_entries = max_entries
+        self._lat_step = grid_meters / METERS_PER_DEGREE_LAT
+        self._entries: "OrderedDict[QuantizedKey, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def quantize(self, lat: float, lon: float) -> Tuple[int, int]:
+        """
+        Snap a coordinate to its grid cell
+        """
+        lat_cell = int(math.floor(lat / self._lat_step))
+        # Longitude cells shrink towards the poles, so scale by the latitude of the cell
+        cell_lat = (lat_cell + 0.5) * self._lat_step
+        lon_step = self._lat_step / max(math.cos(math.radians(cell_lat)), 0.01)
+        lon_cell = int(math.floor(lon / lon_step))
+        return lat_cell, lon_cell
+
+    def cell_center(self, lat_cell: int, lon_cell: int) -> Tuple[float, float]:
+        """
+        Return the coordinate at the center of a grid cell
+        """
+        lat = (lat_cell + 0.5) * self._lat_step
+        lon_step = self._lat_step / max(math.cos(math.radians(lat)), 0.01)
+        return lat, (lon_cell + 0.5) * lon_step
+
+    def key(self, origin_lat: float, origin_lon: float, dest_lat: float, dest_lon: float) -> QuantizedKey:
+        return self.quantize(origin_lat, origin_lon) + self.quantize(dest_lat, dest_lon)
+
+    def get_or_compute(self, origin_lat: float, origin_lon: float, dest_lat: float, dest_lon: float,
+                       compute: Callable[[float, float, float, float], Tuple[float, float]]) -> Tuple[float, float]:
+        """
+        Return (distance_km, duration_minutes) for a pair, computing it on a miss
+
+        `compute` is called with the centers of the two grid cells so that every
+        point inside a cell shares the same cached value.
+        """
+        key = self.key(origin_lat, origin_lon, dest_lat, dest_lon)
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            self.misses += 1
+
+        origin = self.cell_center(key[0], key[1])
+        destination = self.cell_center(key[2], key[3])
+        value = compute(origin[0], origin[1], destination[0], destination[1])
+
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Return hit/miss counters for monitoring
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "grid_meters": self.grid_meters,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+def _great_circle_route(origin_lat: float, origin_lon: float, dest_lat: float, dest_lon: float) -> Tuple[float, float]:
+    """
+    Great-circle distance with a duration derived from the average city speed
+    """
+    distance_km = calculate_distance(origin_lat, origin_lon, dest_lat, dest_lon)
+    duration_minutes = (distance_km / AVERAGE_SPEED_KMH) * 60
+    return distance_km, duration_minutes
+
+
+def _road_or_great_circle_route(origin_lat: float, origin_lon: float, dest_lat: float, dest_lon: float) -> Tuple[float, float]:
+    """
+    Road-network route when an OSM extract is configured, great-circle estimate otherwise
+    """
+    engine = get_routing_engine()
+    if engine is not None:
+        route = engine.route(origin_lat, origin_lon, dest_lat, dest_lon)
+        if route is not None:
+            return route
+    return _great_circle_route(origin_lat, origin_lon, dest_lat, dest_lon)
+
+
+# Shared cache instance used by pricing, rides and tracking
+distance_cache = QuantizedDistanceCache()
+
+
+def cached_route(origin_lat: float, origin_lon: float, dest_lat: float, dest_lon: float) -> Tuple[float, float]:
+    """
+    Get (distance_km, duration_minutes) between two points through the shared cache
+    """
+    return distance_cache.get_or_compute(origin_lat, origin_lon, dest_lat, dest_lon, _road_or_great_circle_route)
+
+
+def cached_distance(origin_lat: float, origin_lon: float, dest_lat: float, dest_lon: float) -> float:
+    """
+    Get the distance in kilometers between two points through the shared cache
+    """
+    return cached_route(origin_lat, origin_lon, dest_lat, dest_lon)[0]
+
+
+def cached_duration_minutes(origin_lat: float, origin_lon: float, dest_lat: float, dest_lon: float) -> float:
+    """
+    Get the travel duration in minutes between two points through the shared cache
+    """
+    return cached_route(origin_lat, origin_lon, dest_lat, dest_lon)[1]
+
+
+def estimate_route(origin_lat: float, origin_lon: float, dest_lat: float, dest_lon: float,
+                   when: Optional[datetime] = None) -> Tuple[float, float]:
+    """
+    Get (distance_km, duration_minutes), using the learned travel-time matrix for the duration when it has data
+    """
+    distance_km, duration_minutes = cached_route(origin_lat, origin_lon, dest_lat, dest_lon)
+    learned_minutes = estimate_travel_minutes(origin_lat, origin_lon, dest_lat, dest_lon, when)
+    if learned_minutes is not None:
+        duration_minutes = learned_minutes
+    return distance_km, duration_minutes
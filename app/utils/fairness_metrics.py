@@ -0,0 +1,221 @@
+import math
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+from ..config import FAIRNESS_WINDOWS_SECONDS, FAIRNESS_UTILITY_BUCKETS
+
+# Key under which assignments from every algorithm are aggregated
+ALL_ALGORITHMS = "all"
+
+# Percentiles reported in every snapshot
+PERCENTILES = (10, 25, 50, 75, 90, 99)
+
+
+class FenwickTree:
+    """
+    Binary indexed tree over integer counts with prefix sums and k-th element search
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.tree = [0] * (size + 1)
+        self._top = 1 << (size.bit_length() - 1) if size else 0
+
+    def add(self, index: int, delta: int) -> None:
+        index += 1
+        while index <= self.size:
+            self.tree[index] += delta
+            index += index & -index
+
+    def prefix(self, index: int) -> int:
+        """
+        Sum of positions 0..index (inclusive); index -1 gives 0
+        """
+        total = 0
+        index += 1
+        while index > 0:
+            total += self.tree[index]
+            index -= index & -index
+        return total
+
+    def find_kth(self, k: int) -> int:
+        """
+        Smallest position whose prefix sum is at least k (k >= 1)
+        """
+        position = 0
+        step = self._top
+        while step:
+            candidate = position + step
+            if candidate <= self.size and self.tree[candidate] < k:
+                position = candidate
+                k -= self.tree[candidate]
+            step >>= 1
+        return position
+
+
+class RollingFairnessWindow:
+    """
+    Fairness statistics over the utilities recorded in the last `seconds` seconds
+
+    Utilities are clamped to [0, 1] and quantized into `buckets` bins. Two
+    Fenwick trees (count and bucket-index sum per bin) let every insert or
+    expiry update the sum of pairwise differences in O(log buckets), which
+    gives the Gini index without the O(n^2) pair loop. Values in the same bin
+    are treated as equal.
+    """
+
+    def __init__(self, seconds: float, buckets: int = FAIRNESS_UTILITY_BUCKETS):
+        self.seconds = seconds
+        self.buckets = buckets
+        self._entries: deque = deque()  # (timestamp, bucket)
+        self._counts = FenwickTree(buckets)
+        self._index_sums = FenwickTree(buckets)
+        self.count = 0
+        self._index_total = 0
+        self._pair_diff_total = 0  # sum over pairs of |bucket_i - bucket_j|
+        self._xlogx_total = 0.0
+        self._snapshot: Optional[Dict[str, object]] = None
+
+    def value(self, bucket: int) -> float:
+        """
+        Representative utility of a bucket (its midpoint)
+        """
+        return (bucket + 0.5) / self.buckets
+
+    def bucket(self, utility: float) -> int:
+        return min(max(int(utility * self.buckets), 0), self.buckets - 1)
+
+    def _pair_diff(self, bucket: int) -> int:
+        # Sum of |bucket - other| over every other entry currently in the window
+        below_count = self._counts.prefix(bucket - 1)
+        below_sum = self._index_sums.prefix(bucket - 1)
+        above_count = self.count - self._counts.prefix(bucket)
+        above_sum = self._index_total - self._index_sums.prefix(bucket)
+        return (bucket * below_count - below_sum) + (above_sum - bucket * above_count)
+
+    def _xlogx(self, bucket: int) -> float:
+        value = self.value(bucket)
+        return value * math.log(value)
+
+    def add(self, utility: float, timestamp: float) -> None:
+        bucket = self.bucket(utility)
+        self._pair_diff_total += self._pair_diff(bucket)
+        self._counts.add(bucket, 1)
+        self._index_sums.add(bucket, bucket)
+        self.count += 1
+        self._index_total += bucket
+        self._xlogx_total += self._xlogx(bucket)
+        self._entries.append((timestamp, bucket))
+        self._snapshot = None
+
+    def _remove(self, bucket: int) -> None:
+        self._counts.add(bucket, -1)
+        self._index_sums.add(bucket, -bucket)
+        self.count -= 1
+        self._index_total -= bucket
+        self._pair_diff_total -= self._pair_diff(bucket)
+        self._xlogx_total -= self._xlogx(bucket)
+        if self.count == 0:
+            self._xlogx_total = 0.0
+
+    def expire(self, now: float) -> None:
+        """
+        Drop entries older than the window
+        """
+        cutoff = now - self.seconds
+        while self._entries and self._entries[0][0] <= cutoff:
+            _, bucket = self._entries.popleft()
+            self._remove(bucket)
+            self._snapshot = None
+
+    def percentile(self, p: float) -> float:
+        if self.count == 0:
+            return 0.0
+        rank = max(1, math.ceil(p / 100 * self.count))
+        return self.value(self._counts.find_kth(rank))
+
+    def snapshot(self) -> Dict[str, object]:
+        """
+        Current statistics; recomputed only after the window has changed
+        """
+        if self._snapshot is not None:
+            return self._snapshot
+
+        n = self.count
+        total = (self._index_total + 0.5 * n) / self.buckets if n else 0.0
+        mean = total / n if n else 0.0
+        gini = 0.0
+        theil = 0.0
+        if n and mean > 0:
+            # Gini = sum_i sum_j |x_i - x_j| / (2 n^2 mean), with each unordered pair counted once here
+            gini = (self._pair_diff_total / self.buckets) / (n * total)
+            theil = max(self._xlogx_total / total - math.log(mean), 0.0)
+
+        self._snapshot = {
+            "window_seconds": self.seconds,
+            "count": n,
+            "gini": gini,
+            "social_welfare": mean,
+            "theil": theil,
+            "percentiles": {f"p{p}": self.percentile(p) for p in PERCENTILES}
+        }
+        return self._snapshot
+
+
+class FairnessMetricsEngine:
+    """
+    Rolling fairness metrics for every matching algorithm and for all of them combined
+    """
+
+    def __init__(self, windows: Iterable[float] = FAIRNESS_WINDOWS_SECONDS,
+                 buckets: int = FAIRNESS_UTILITY_BUCKETS):
+        self.windows: List[float] = sorted(windows)
+        self.buckets = buckets
+        self._algorithms: Dict[str, Dict[float, RollingFairnessWindow]] = {}
+        self._lock = threading.Lock()
+
+    def _windows_for(self, algorithm: str) -> Dict[float, RollingFairnessWindow]:
+        windows = self._algorithms.get(algorithm)
+        if windows is None:
+            windows = {seconds: RollingFairnessWindow(seconds, self.buckets) for seconds in self.windows}
+            self._algorithms[algorithm] = windows
+        return windows
+
+    def record(self, algorithm: str, utilities: Iterable[float], timestamp: Optional[float] = None) -> None:
+        """
+        Add the utilities of one algorithm run to its windows and to the combined windows
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        utilities = [u for u in utilities if u is not None]
+        if not utilities:
+            return
+        with self._lock:
+            for key in (algorithm, ALL_ALGORITHMS):
+                for window in self._windows_for(key).values():
+                    window.expire(timestamp)
+                    for utility in utilities:
+                        window.add(utility, timestamp)
+
+    def snapshot(self, algorithm: str = ALL_ALGORITHMS, window: Optional[float] = None,
+                 now: Optional[float] = None) -> Optional[Dict[str, object]]:
+        """
+        Metrics for an algorithm over a window (the longest one by default), or None for an unknown window
+        """
+        seconds = self.windows[-1] if window is None else window
+        if seconds not in self.windows:
+            return None
+        now = time.time() if now is None else now
+        with self._lock:
+            windows = self._algorithms.get(algorithm)
+            rolling = windows[seconds] if windows else RollingFairnessWindow(seconds, self.buckets)
+            rolling.expire(now)
+            return dict(rolling.snapshot(), algorithm=algorithm)
+
+    def algorithms(self) -> List[str]:
+        with self._lock:
+            return sorted(self._algorithms)
+
+
+# Shared engine fed by the matching algorithms
+fairness_metrics = FairnessMetricsEngine()
@@ -28,23 +28,35 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": datetime.utcnow()})
     # Ensure SECRET_KEY is not None
     secret_key = SECRET_KEY or "default_secret_key_for_development_only"
     encoded_jwt = jwt.encode(to_encode, secret_key, algorithm=ALGORITHM)
     return encoded_jwt
 
-def verify_token(token: str, credentials_exception) -> str:
+def user_claims(user) -> dict:
     """
-    Verify a JWT token and return email
+    Access token claims identifying a user: email as subject plus id and role,
+    so authenticated requests don't need a user lookup
+    """
+    return {"sub": user.email, "uid": str(user.id), "role": user.role}
+
+def decode_token(token: str, credentials_exception) -> dict:
+    """
+    Verify a JWT token and return its claims
     """
     try:
         # Ensure SECRET_KEY is not None
         secret_key = SECRET_KEY or "default_secret_key_for_development_only"
         payload = jwt.decode(token, secret_key, algorithms=[ALGORITHM])
-        email = payload.get("sub")
-        if email is None:
+        if payload.get("sub") is None:
             raise credentials_exception
-        return email
+        return payload
     except JWTError:
-        raise credentials_exception
\ No newline at end of file
+        raise credentials_exception
+
+def verify_token(token: str, credentials_exception) -> str:
+    """
+    Verify a JWT token and return email
+    """
+    return decode_token(token, credentials_exception)["sub"]
\ No newline at end of file
@@ -0,0 +1,96 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from uuid import UUID
+from ..schemas import Principal
+from ..config import PRINCIPAL_CACHE_TTL_SECONDS, PRINCIPAL_CACHE_MAX_ENTRIES, PRINCIPAL_CLAIMS_MAX_AGE_SECONDS
+
+
+class PrincipalCache:
+    """
+    TTL cache of authenticated principals keyed by token subject (email)
+
+    Tokens carry the user id and role as claims, so a principal normally comes
+    straight from the token. When a user's role or profile changes the cached
+    entry is dropped and claims of tokens issued before the change stop being
+    trusted, so those requests fall back to a database lookup until the client
+    logs in again.
+
+    That invalidation only reaches this process. Other workers learn of the
+    change because they trust claims only for `claims_max_age_seconds` after
+    the token was issued and cache principals for `ttl_seconds`. After that
+    they look the user up again, so a role change (e.g. a demoted admin) takes
+    effect everywhere within the larger of the two, not when the token expires.
+    """
+
+    def __init__(self, ttl_seconds: float = PRINCIPAL_CACHE_TTL_SECONDS,
+                 max_entries: int = PRINCIPAL_CACHE_MAX_ENTRIES,
+                 claims_max_age_seconds: float = PRINCIPAL_CLAIMS_MAX_AGE_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.claims_max_age_seconds = claims_max_age_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Principal]]" = OrderedDict()
+        # user id -> time of the last invalidation; older token claims are stale
+        self._invalidated_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, email: str) -> Optional[Principal]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(email)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[email]
+            self.misses += 1
+            return None
+
+    def put(self, principal: Principal) -> None:
+        with self._lock:
+            self._entries[principal.email] = (time.monotonic() + self.ttl_seconds, principal)
+            self._entries.move_to_end(principal.email)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def from_claims(self, payload: dict) -> Optional[Principal]:
+        """
+        Principal carried by a token's claims, unless missing, older than claims_max_age_seconds
+        or issued before the user last changed
+        """
+        user_id, role, email = payload.get("uid"), payload.get("role"), payload.get("sub")
+        if not user_id or not role or not email:
+            return None
+        if time.time() - payload.get("iat", 0) > self.claims_max_age_seconds:
+            return None
+        with self._lock:
+            invalidated_at = self._invalidated_at.get(str(user_id))
+        if invalidated_at is not None and payload.get("iat", 0) <= invalidated_at:
+            return None
+        return Principal(id=user_id, email=email, role=role)
+
+    def invalidate(self, user_id: UUID) -> None:
+        """
+        Forget a user's principal after their role or profile changed
+        """
+        with self._lock:
+            self._invalidated_at[str(user_id)] = time.time()
+            for email in [email for email, (_, principal) in self._entries.items() if str(principal.id) == str(user_id)]:
+                del self._entries[email]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._invalidated_at.clear()
+
+
+# Shared instance for the process
+principal_cache = PrincipalCache()
+
+
+def invalidate_principal(user_id: UUID) -> None:
+    principal_cache.invalidate(user_id)
@@ -0,0 +1,104 @@
+import math
+import time
+from typing import Dict, List, Sequence
+
+# Phases reported by every matching algorithm
+ALGORITHM_PHASES = ("data_fetch", "utility", "assignment", "metrics")
+
+# Runtime histogram: log-spaced buckets starting at RUNTIME_HISTOGRAM_BASE_MS,
+# RUNTIME_BUCKETS_PER_DOUBLING buckets per doubling (about 19% wide each)
+RUNTIME_HISTOGRAM_BASE_MS = 0.1
+RUNTIME_BUCKETS_PER_DOUBLING = 4
+RUNTIME_HISTOGRAM_SIZE = 100
+
+# Utility histogram: equal-width bins over [0, 1]
+UTILITY_HISTOGRAM_SIZE = 100
+
+
+class PhaseTimer:
+    """
+    Wall-clock timer that attributes elapsed time to named phases
+
+    Call `lap(name)` at the end of each phase; the time since the previous lap
+    (or since the timer was created) is added to that phase.
+    """
+
+    def __init__(self):
+        self._started = time.perf_counter()
+        self._last = self._started
+        self.timings_ms: Dict[str, float] = {}
+
+    def lap(self, phase: str) -> float:
+        now = time.perf_counter()
+        elapsed_ms = (now - self._last) * 1000
+        self._last = now
+        self.timings_ms[phase] = self.timings_ms.get(phase, 0.0) + elapsed_ms
+        return elapsed_ms
+
+    def as_metrics(self) -> Dict[str, float]:
+        """
+        Phase timings in milliseconds plus the total, rounded for responses
+        """
+        metrics = {phase: round(ms, 3) for phase, ms in self.timings_ms.items()}
+        metrics["total"] = round((self._last - self._started) * 1000, 3)
+        return metrics
+
+
+def runtime_bucket(ms: float) -> int:
+    """
+    Index of the log-spaced histogram bucket holding a runtime
+    """
+    if ms <= RUNTIME_HISTOGRAM_BASE_MS:
+        return 0
+    index = int(math.floor(math.log2(ms / RUNTIME_HISTOGRAM_BASE_MS) * RUNTIME_BUCKETS_PER_DOUBLING)) + 1
+    return min(index, RUNTIME_HISTOGRAM_SIZE - 1)
+
+
+def runtime_bucket_upper_ms(index: int) -> float:
+    """
+    Upper bound (ms) of a runtime histogram bucket
+    """
+    return RUNTIME_HISTOGRAM_BASE_MS * 2 ** (index / RUNTIME_BUCKETS_PER_DOUBLING)
+
+
+def histogram_percentile(histogram: Sequence[int], p: float) -> float:
+    """
+    Runtime (ms) at percentile `p` of a runtime histogram, reported as the bucket's upper bound
+    """
+    total = sum(histogram)
+    if total == 0:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * total))
+    seen = 0
+    for index, count in enumerate(histogram):
+        seen += count
+        if seen >= rank:
+            return round(runtime_bucket_upper_ms(index), 3)
+    return round(runtime_bucket_upper_ms(len(histogram) - 1), 3)
+
+
+def fleet_size_bucket(fleet_size: int) -> int:
+    """
+    Round a fleet size up to the next power of two so runs are grouped by order of magnitude
+    """
+    if fleet_size <= 0:
+        return 0
+    return 1 << (fleet_size - 1).bit_length()
+
+
+def utility_histogram(utilities: Sequence[float]) -> List[int]:
+    """
+    Count utilities into UTILITY_HISTOGRAM_SIZE equal-width bins over [0, 1]
+    """
+    histogram = [0] * UTILITY_HISTOGRAM_SIZE
+    for utility in utilities:
+        index = min(max(int(utility * UTILITY_HISTOGRAM_SIZE), 0), UTILITY_HISTOGRAM_SIZE - 1)
+        histogram[index] += 1
+    return histogram
+
+
+def utility_bin_values() -> List[float]:
+    """
+    Midpoint utility of every utility histogram bin
+    """
+    return [(index + 0.5) / UTILITY_HISTOGRAM_SIZE for index in range(UTILITY_HISTOGRAM_SIZE)]
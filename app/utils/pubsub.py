@@ -0,0 +1,74 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Set
+from ..config import PUBSUB_SUBSCRIBER_QUEUE_SIZE
+
+
+class PubSub:
+    """
+    In-process publish/subscribe over asyncio queues
+
+    Each subscriber gets its own bounded queue; `publish` never blocks the
+    publisher: when a subscriber falls behind its oldest message is dropped, so
+    a slow socket only ever misses stale positions. Subscribers only see
+    messages published in the same worker process.
+    """
+
+    def __init__(self, queue_size: int = PUBSUB_SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._topics: Dict[str, Set[asyncio.Queue]] = {}
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    @asynccontextmanager
+    async def subscribe(self, topic: str) -> AsyncIterator[asyncio.Queue]:
+        """
+        Queue receiving the topic's messages for as long as the context is open
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._topics.setdefault(topic, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            subscribers = self._topics.get(topic)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._topics[topic]
+
+    def publish(self, topic: str, message: Any) -> int:
+        """
+        Hand a message to every subscriber of the topic (must be called from the event loop)
+        """
+        subscribers = self._topics.get(topic)
+        self.published += 1
+        if not subscribers:
+            return 0
+        for queue in subscribers:
+            if queue.full():
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(message)
+        self.delivered += len(subscribers)
+        return len(subscribers)
+
+    def subscriber_count(self, topic: str) -> int:
+        return len(self._topics.get(topic, ()))
+
+    def stats(self) -> dict:
+        return {
+            "topics": len(self._topics),
+            "subscribers": sum(len(subscribers) for subscribers in self._topics.values()),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped
+        }
+
+
+# Driver positions keyed by driver_topic(driver_id), shared by the process
+location_pubsub = PubSub()
+
+
+def driver_topic(driver_id) -> str:
+    return f"driver:{driver_id}"
@@ -0,0 +1,121 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, NamedTuple, Optional, Tuple
+from fastapi import Request, Response
+from ..serialization import dumps
+from ..config import RESPONSE_CACHE_TTL_SECONDS, RESPONSE_CACHE_MAX_ENTRIES
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    expires_at: float
+
+
+class ResponseCache:
+    """
+    TTL cache of serialized responses of rarely-changing catalog endpoints
+
+    Entries are grouped by namespace (one per catalog table) so the CRUD
+    functions writing a table can drop every cached response built from it.
+    Invalidating also bumps the namespace's generation; a response loaded
+    before that (`put` with the generation read before loading) is served but
+    not stored, so a read racing a write can't cache the old content.
+    Each body carries an ETag hashed from its content, so a client revalidating
+    an unchanged catalog gets a 304 without the body. The cache is per process;
+    other workers pick up a change when their entries expire.
+    """
+
+    def __init__(self, ttl_seconds: float = RESPONSE_CACHE_TTL_SECONDS,
+                 max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, Hashable], CachedResponse]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, namespace: str, key: Hashable = None) -> Optional[CachedResponse]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            if entry is not None and entry.expires_at > now:
+                self._entries.move_to_end((namespace, key))
+                self.hits += 1
+                return entry
+            if entry is not None:
+                del self._entries[(namespace, key)]
+            self.misses += 1
+            return None
+
+    def generation(self, namespace: str) -> int:
+        """
+        Number of invalidations of a namespace so far (read before loading the content to cache)
+        """
+        with self._lock:
+            return self._generations.get(namespace, 0)
+
+    def put(self, namespace: str, key: Hashable, content: Any, generation: Optional[int] = None) -> CachedResponse:
+        body = dumps(content)
+        etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        entry = CachedResponse(body, etag, time.monotonic() + self.ttl_seconds)
+        with self._lock:
+            if generation is not None and generation != self._generations.get(namespace, 0):
+                return entry
+            self._entries[(namespace, key)] = entry
+            self._entries.move_to_end((namespace, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, namespace: str) -> None:
+        """
+        Drop every cached response of a namespace after its table changed
+        """
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            for cache_key in [cache_key for cache_key in self._entries if cache_key[0] == namespace]:
+                del self._entries[cache_key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+# Shared instance for the process
+response_cache = ResponseCache()
+
+
+def invalidate_responses(namespace: str) -> None:
+    response_cache.invalidate(namespace)
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+
+def cached_json_response(request: Request, namespace: str, key: Hashable,
+                         load: Callable[[], Any]) -> Optional[Response]:
+    """
+    Serve a catalog read from the cache, answering 304 when the client's ETag still matches
+
+    `load` runs on a miss; an empty result (None, [] or {}) is returned as None
+    and not cached, so the route can answer 404 and errors are retried.
+    """
+    entry = response_cache.get(namespace, key)
+    if entry is None:
+        generation = response_cache.generation(namespace)
+        content = load()
+        if not content:
+            return None
+        entry = response_cache.put(namespace, key, content, generation)
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(entry.body, media_type="application/json", headers=headers)
@@ -1,6 +1,7 @@
 import math
 from typing import List
 from datetime import datetime, timezone
+from .gini_index import gini_index, weighted_gini_index
 
 def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     """
@@ -62,24 +63,6 @@ def calculate_time_utility(beta: float, preferred_time: datetime, current_time:
     time_diff = abs((preferred_time - current_time).total_seconds() / 3600)
     return 1 - (1 - beta) * time_diff
 
-def gini_index(utilities: List[float]) -> float:
-    """
-    Calculate Gini index for fairness measurement
-    """
-    if not utilities:
-        return 0.0
-    
-    n = len(utilities)
-    if n == 0:
-        return 0.0
-        
-    mean_u = sum(utilities) / n
-    if mean_u == 0:
-        return 0.0
-        
-    num = sum(abs(ui - uj) for ui in utilities for uj in utilities)
-    return num / (2 * n**2 * mean_u)
-
 def social_welfare(utilities: List[float]) -> float:
     """
     Calculate social welfare (average utility)
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Benchmark the sorted-cumulative-sum Gini index against the previous O(n^2) pair loop
+
+The pair loop cannot finish at 1M utilities (10^12 pairs), so its runtime is
+measured at small sizes and extrapolated quadratically.
+
+Usage: python benchmarks/bench_gini.py [--size 1000000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils import gini_index as gini_module
+
+
+def quadratic_gini(utilities):
+    """The previous implementation, kept here for comparison"""
+    n = len(utilities)
+    if n == 0:
+        return 0.0
+    mean_u = sum(utilities) / n
+    if mean_u == 0:
+        return 0.0
+    num = sum(abs(ui - uj) for ui in utilities for uj in utilities)
+    return num / (2 * n**2 * mean_u)
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    random.seed(42)
+    utilities = [random.random() for _ in range(args.size)]
+
+    # Quadratic baseline on small samples, extrapolated to the full size
+    samples = []
+    for n in (500, 1000, 2000):
+        expected, elapsed = timed(quadratic_gini, utilities[:n])
+        actual = gini_module.gini_index(utilities[:n])
+        assert abs(expected - actual) < 1e-9, (expected, actual)
+        samples.append(elapsed / n**2)
+        print(f"O(n^2) loop       n={n:>9,}: {elapsed * 1000:10.1f} ms")
+    per_pair = min(samples)
+    extrapolated = per_pair * args.size**2
+
+    # Pure Python sorted form
+    numpy_module = gini_module.np
+    gini_module.np = None
+    pure_result, pure_elapsed = timed(gini_module.gini_index, utilities)
+    gini_module.np = numpy_module
+    print(f"sorted (Python)   n={args.size:>9,}: {pure_elapsed * 1000:10.1f} ms")
+
+    results = [("sorted (Python)", pure_elapsed)]
+    if numpy_module is not None:
+        numpy_result, numpy_elapsed = timed(gini_module.gini_index, utilities)
+        assert abs(numpy_result - pure_result) < 1e-9
+        print(f"sorted (NumPy)    n={args.size:>9,}: {numpy_elapsed * 1000:10.1f} ms")
+        results.append(("sorted (NumPy)", numpy_elapsed))
+    else:
+        print("NumPy not installed, skipping the NumPy fast path")
+
+    weights = [random.randint(1, 5) for _ in range(args.size)]
+    _, weighted_elapsed = timed(gini_module.weighted_gini_index, utilities, weights)
+    print(f"weighted Gini     n={args.size:>9,}: {weighted_elapsed * 1000:10.1f} ms")
+
+    print(f"\nO(n^2) loop extrapolated to n={args.size:,}: {extrapolated:,.0f} s ({extrapolated / 3600:,.1f} h)")
+    for name, elapsed in results:
+        print(f"Speedup of {name}: {extrapolated / elapsed:,.0f}x")
+
+
+if __name__ == "__main__":
+    main()
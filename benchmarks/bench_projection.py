@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark select("*") against column projections for the hot driver and rider reads
+
+For each read the full row (parsed into the full response model) is compared
+with the projected columns (parsed into the lightweight model): payload bytes
+per row as JSON, and mean/p95 latency of single-row lookups and of the
+all-rows scan the matching algorithms do. Runs against the configured
+STORAGE_BACKEND.
+
+Usage: python benchmarks/bench_projection.py [--lookups 500]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.async_database import create_storage_backend
+from app.schemas import DriverResponse, DriverLocation, RiderResponse, RiderTrip, projection
+from app.utils.datetime_serializer import simple_datetime_handler
+
+CASES = (
+    ("drivers", DriverResponse, DriverLocation),
+    ("riders", RiderResponse, RiderTrip),
+)
+
+
+def percentile(sorted_values, p):
+    return sorted_values[min(len(sorted_values) - 1, int(p / 100 * len(sorted_values)))]
+
+
+async def timed_lookups(backend, table, columns, model, ids, lookups):
+    latencies = []
+    for i in range(lookups):
+        start = time.perf_counter()
+        row = await backend.select_one(table, columns, {"id": ids[i % len(ids)]})
+        model(**simple_datetime_handler(row))
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return statistics.mean(latencies), percentile(latencies, 95)
+
+
+async def timed_scan(backend, table, columns, model, repeats=5):
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        rows = await backend.select(table, columns)
+        [model(**simple_datetime_handler(row)) for row in rows]
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, rows
+
+
+async def run(args):
+    backend = create_storage_backend()
+    try:
+        for table, full_model, light_model in CASES:
+            ids = [row["id"] for row in await backend.select(table, "id", limit=args.sample)]
+            if not ids:
+                print(f"{table}: empty, skipping")
+                continue
+
+            print(f"\n{table} ({len(ids)} sampled ids)")
+            results = {}
+            for label, columns, model in (("select(*)", "*", full_model),
+                                          ("projection", projection(light_model), light_model)):
+                mean_ms, p95_ms = await timed_lookups(backend, table, columns, model, ids, args.lookups)
+                scan_ms, rows = await timed_scan(backend, table, columns, model)
+                row_bytes = len(json.dumps(rows).encode()) / max(len(rows), 1)
+                results[label] = (row_bytes, mean_ms, scan_ms)
+                print(f"  {label:>10}: {row_bytes:7.0f} B/row  lookup mean {mean_ms:6.2f} ms p95 {p95_ms:6.2f} ms  "
+                      f"scan of {len(rows)} rows {scan_ms:8.2f} ms")
+
+            (full_bytes, full_ms, full_scan), (light_bytes, light_ms, light_scan) = results["select(*)"], results["projection"]
+            print(f"  payload {full_bytes / light_bytes:.1f}x smaller, lookup {full_ms / light_ms:.2f}x faster, "
+                  f"scan {full_scan / light_scan:.2f}x faster")
+    finally:
+        await backend.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--lookups", type=int, default=500)
+    parser.add_argument("--sample", type=int, default=200, help="distinct ids to cycle through")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
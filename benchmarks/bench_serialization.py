@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Benchmark the per-row CPU cost of turning database rows into a list response
+
+The previous path ran simple_datetime_handler over each row, built the model,
+dumped it with .dict(), ran simple_datetime_handler again and then let
+FastAPI validate against response_model, jsonable_encoder and json.dumps it.
+The fast path validates all rows with one cached TypeAdapter and writes the
+models with orjson (app/serialization.py). Rows are synthetic ride rows as
+PostgREST returns them, so no database is needed.
+
+Usage: python benchmarks/bench_serialization.py [--rows 1000] [--repeats 20]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from app.schemas import RideResponse
+from app.serialization import type_adapter, validate_rows, dumps
+from app.utils.datetime_serializer import simple_datetime_handler
+
+
+def ride_rows(count):
+    start = datetime(2024, 5, 1, tzinfo=timezone.utc)
+    return [{
+        "id": str(uuid.uuid4()), "user_id": str(uuid.uuid4()), "rider_id": str(uuid.uuid4()),
+        "driver_id": str(uuid.uuid4()), "algorithm": "RGA++", "status": "completed",
+        "start_time": (start + timedelta(minutes=i)).isoformat(),
+        "end_time": (start + timedelta(minutes=i + 25)).isoformat(),
+        "fare": 10 + i % 40 * 0.5, "utility": 0.5
+    } for i in range(count)]
+
+
+def previous_path(rows):
+    rides = [RideResponse(**simple_datetime_handler(row)) for row in rows]
+    content = simple_datetime_handler([ride.dict() for ride in rides])
+    validated = type_adapter(List[RideResponse]).validate_python(content)
+    return json.dumps(jsonable_encoder(validated)).encode()
+
+
+def fast_path(rows):
+    return dumps(validate_rows(RideResponse, rows))
+
+
+def best_of(function, rows, repeats):
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function(rows)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = ride_rows(args.rows)
+    assert json.loads(previous_path(rows)) == json.loads(fast_path(rows))
+    results = {}
+    for label, function in (("previous", previous_path), ("fast path", fast_path)):
+        results[label] = best_of(function, rows, args.repeats)
+        print(f"{label:>10}: {results[label] * 1e6 / args.rows:7.2f} us/row ({args.rows} rows)")
+    print(f"fast path is {results['previous'] / results['fast path']:.1f}x faster per row")
+
+
+if __name__ == "__main__":
+    main()
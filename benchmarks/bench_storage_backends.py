@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark primary-key lookups through the PostgREST and direct Postgres storage backends
+
+Each backend fetches the same rows by primary key, first one request at a time
+(latency) and then with --concurrency requests in flight (throughput).
+PostgREST needs SUPABASE_URL/SUPABASE_KEY, the Postgres backend DATABASE_URL;
+a backend without its settings is skipped.
+
+Usage: python benchmarks/bench_storage_backends.py [--table users] [--requests 2000] [--concurrency 32]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import SUPABASE_URL, SUPABASE_KEY, DATABASE_URL
+from app.async_database import create_storage_backend
+
+
+def percentile(sorted_values, p):
+    return sorted_values[min(len(sorted_values) - 1, int(p / 100 * len(sorted_values)))]
+
+
+async def bench_backend(name, table, key, requests, concurrency, sample_size):
+    backend = create_storage_backend(name)
+    try:
+        rows = await backend.select(table, key, limit=sample_size)
+        if not rows:
+            print(f"{name:>9}: table {table!r} is empty, skipping")
+            return None
+        ids = [row[key] for row in rows]
+
+        # Warm up connections (and, for Postgres, the prepared statement)
+        for value in ids[:10]:
+            await backend.select_one(table, filters={key: value})
+
+        latencies = []
+        for i in range(requests):
+            start = time.perf_counter()
+            await backend.select_one(table, filters={key: ids[i % len(ids)]})
+            latencies.append((time.perf_counter() - start) * 1000)
+        latencies.sort()
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def lookup(value):
+            async with semaphore:
+                await backend.select_one(table, filters={key: value})
+
+        start = time.perf_counter()
+        await asyncio.gather(*(lookup(ids[i % len(ids)]) for i in range(requests)))
+        throughput = requests / (time.perf_counter() - start)
+
+        print(f"{name:>9}: mean {statistics.mean(latencies):7.2f} ms  p50 {percentile(latencies, 50):7.2f} ms  "
+              f"p95 {percentile(latencies, 95):7.2f} ms  p99 {percentile(latencies, 99):7.2f} ms  "
+              f"{throughput:9,.0f} lookups/s at concurrency {concurrency}")
+        return statistics.mean(latencies), throughput
+    finally:
+        await backend.aclose()
+
+
+async def run(args):
+    results = {}
+    configured = {"postgrest": SUPABASE_URL and SUPABASE_KEY, "postgres": DATABASE_URL}
+    for name in ("postgrest", "postgres"):
+        if not configured[name]:
+            print(f"{name:>9}: not configured, skipping")
+            continue
+        results[name] = await bench_backend(name, args.table, args.key, args.requests, args.concurrency, args.sample)
+
+    if results.get("postgrest") and results.get("postgres"):
+        (rest_latency, rest_throughput), (pg_latency, pg_throughput) = results["postgrest"], results["postgres"]
+        print(f"\nDirect Postgres: {rest_latency / pg_latency:.1f}x lower mean latency, "
+              f"{pg_throughput / rest_throughput:.1f}x higher throughput")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--table", default="users")
+    parser.add_argument("--key", default="id")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--sample", type=int, default=500, help="distinct keys to cycle through")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the async PostgREST client builds the expected requests
+"""
+
+import asyncio
+
+import httpx
+
+from app import async_database
+from app.async_database import AsyncPostgrestClient, PostgrestError, format_filter, is_transient_error
+
+def _client(handler):
+    transport = httpx.MockTransport(handler)
+    return AsyncPostgrestClient(client=httpx.AsyncClient(base_url="http://db/rest/v1", transport=transport))
+
+def test_format_filter():
+    """Plain values become eq filters, tuples pass their operator through"""
+    assert format_filter("abc") == "eq.abc"
+    assert format_filter(None) == "is.null"
+    assert format_filter(True) == "eq.true"
+    assert format_filter(("gt", 5)) == "gt.5"
+    assert format_filter(("is", None)) == "is.null"
+    assert format_filter(("in", ["requested", "assigned"])) == 'in.("requested","assigned")'
+
+def test_select_and_update_requests():
+    """Select sends filters as query params, update asks for the changed rows back"""
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request)
+        if request.method == "GET":
+            return httpx.Response(200, json=[{"id": "r1", "status": "requested"}])
+        return httpx.Response(200, json=[{"id": "r1", "status": "assigned"}])
+
+    async def run():
+        db = _client(handler)
+        rows = await db.select("rides", filters={"status": "requested"}, order="created_at.desc", limit=10)
+        updated = await db.update("rides", {"status": "assigned"}, {"id": "r1"})
+        await db.aclose()
+        return rows, updated
+
+    rows, updated = asyncio.run(run())
+    print(f"Requests: {[str(request.url) for request in seen]}")
+    assert rows[0]["id"] == "r1" and updated[0]["status"] == "assigned"
+    assert seen[0].url.path == "/rest/v1/rides"
+    assert seen[0].url.params["status"] == "eq.requested"
+    assert seen[0].url.params["order"] == "created_at.desc"
+    assert seen[0].url.params["limit"] == "10"
+    assert seen[1].method == "PATCH" and seen[1].headers["Prefer"] == "return=representation"
+
+def test_error_status_raises():
+    """PostgREST error responses surface as PostgrestError"""
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(404, json={"message": "relation does not exist"})
+
+    async def run():
+        db = _client(handler)
+        try:
+            await db.select("missing")
+        finally:
+            await db.aclose()
+
+    try:
+        asyncio.run(run())
+    except PostgrestError as e:
+        print(f"Raised: {e}")
+        assert e.status_code == 404
+    else:
+        raise AssertionError("expected PostgrestError")
+
+def test_transient_errors():
+    """Unreachable or overloaded databases are transient, rejected requests are not"""
+    assert is_transient_error(httpx.ConnectError("connection refused"))
+    assert is_transient_error(httpx.ReadTimeout("timed out"))
+    assert is_transient_error(PostgrestError(503, "database unavailable"))
+    assert not is_transient_error(PostgrestError(409, "duplicate key value"))
+    assert not is_transient_error(PostgrestError(400, "invalid input syntax"))
+    assert not is_transient_error(ValueError("bad row"))
+
+class _RecordingBackend:
+    """Stands in for a storage backend and records that it was closed"""
+
+    def __init__(self):
+        self.closed = False
+
+    async def aclose(self):
+        self.closed = True
+
+def test_client_of_previous_loop_is_closed(monkeypatch):
+    """A backend replaced after an event loop change gets closed"""
+    monkeypatch.setattr(async_database, "create_storage_backend", _RecordingBackend)
+    monkeypatch.setattr(async_database, "_client", None)
+    monkeypatch.setattr(async_database, "_client_loop", None)
+
+    async def get_backend():
+        backend = async_database.get_async_db()
+        await asyncio.sleep(0)
+        return backend
+
+    old = asyncio.run(get_backend())
+    new = asyncio.run(get_backend())
+    assert new is not old and old.closed and not new.closed
+    asyncio.run(async_database.close_async_db())
+    assert new.closed
+
+def test_missing_url_is_reported():
+    """Without SUPABASE_URL the PostgREST client says so instead of failing on None"""
+    try:
+        AsyncPostgrestClient(url=None)
+    except RuntimeError as e:
+        assert "SUPABASE_URL" in str(e)
+    else:
+        raise AssertionError("expected RuntimeError")
+
+if __name__ == "__main__":
+    test_format_filter()
+    test_select_and_update_requests()
+    test_error_status_raises()
+    test_transient_errors()
+    test_missing_url_is_reported()
+    print("SUCCESS: async PostgREST client is working correctly")
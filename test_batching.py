@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the background batcher (app/utils/batching.py)
+"""
+
+import asyncio
+
+from app.utils.batching import BackgroundBatcher
+
+def test_bad_entry_is_isolated_and_dead_lettered():
+    """One entry the database rejects does not take the rest of its batch down"""
+    written, dead_letters, calls = [], [], []
+
+    async def flush(batch):
+        calls.append(len(batch))
+        if "bad" in batch:
+            raise ValueError("violates foreign key constraint")
+        written.extend(batch)
+
+    async def dead_letter(source, entries, error):
+        dead_letters.append((source, entries, error))
+
+    async def run():
+        batcher = BackgroundBatcher(flush, max_batch_size=100, max_delay_seconds=0.001, name="grant", dead_letter=dead_letter)
+        for i in range(100):
+            batcher.add("bad" if i == 37 else i)
+        await batcher.drain()
+        return batcher
+
+    batcher = asyncio.run(run())
+    print(f"Flush calls: {calls}")
+    assert sorted(written) == [i for i in range(100) if i != 37]
+    assert dead_letters == [("grant", ["bad"], "violates foreign key constraint")]
+    assert (batcher.flushed, batcher.failed, batcher.dead_lettered) == (99, 1, 1)
+    # 3 attempts of the whole batch, then about two flushes per halving
+    assert len(calls) <= 3 + 2 * 7
+
+def test_transient_failure_is_retried():
+    """A batch that fails once is written whole by the retry"""
+    calls = []
+
+    async def flush(batch):
+        calls.append(len(batch))
+        if len(calls) == 1:
+            raise ConnectionError("connection reset")
+
+    async def run():
+        batcher = BackgroundBatcher(flush, max_batch_size=10, max_delay_seconds=0.001)
+        for i in range(10):
+            batcher.add(i)
+        await batcher.drain()
+        return batcher
+
+    batcher = asyncio.run(run())
+    assert calls == [10, 10]
+    assert (batcher.flushed, batcher.failed) == (10, 0)
+
+def test_outage_requeues_entries_instead_of_losing_them():
+    """While the database is unreachable, batches go back in the queue with a bounded number of calls"""
+    calls, dead_letters = [], []
+    database_up = False
+
+    async def flush(batch):
+        calls.append(len(batch))
+        if not database_up:
+            raise ConnectionError("connection refused")
+
+    async def dead_letter(source, entries, error):
+        dead_letters.append(entries)
+        raise ConnectionError("connection refused")
+
+    async def run():
+        nonlocal database_up
+        batcher = BackgroundBatcher(flush, max_batch_size=500, max_delay_seconds=0.001, dead_letter=dead_letter)
+        for i in range(500):
+            batcher.add(i)
+        await batcher.drain()
+        await batcher.drain()
+        outage = (batcher.pending(), batcher.failed, len(calls))
+        database_up = True
+        await batcher.drain()
+        return batcher, outage
+
+    batcher, (pending, failed, outage_calls) = asyncio.run(run())
+    print(f"Flush calls: {calls}")
+    # Only the retries of each flush, not ~1000 calls splitting the batch down to single entries
+    assert (pending, failed, outage_calls) == (500, 0, 2 * batcher.max_retries)
+    assert dead_letters == []
+    assert (batcher.flushed, batcher.pending(), batcher.failed) == (500, 0, 0)
+
+def test_dead_letters_are_kept_while_they_cannot_be_stored():
+    """An isolated entry whose dead-letter write fails stays in memory and is stored by a later flush"""
+    dead_letter_calls = []
+
+    async def flush(batch):
+        if "bad" in batch:
+            raise ValueError("violates check constraint")
+
+    async def dead_letter(source, entries, error):
+        dead_letter_calls.append(entries)
+        if len(dead_letter_calls) == 1:
+            raise ConnectionError("connection reset")
+
+    async def run():
+        batcher = BackgroundBatcher(flush, max_batch_size=10, max_delay_seconds=0.001, dead_letter=dead_letter)
+        for i in range(10):
+            batcher.add("bad" if i == 3 else i)
+        await batcher.drain()
+        held = batcher.held()
+        await batcher.drain()
+        return batcher, held
+
+    batcher, held = asyncio.run(run())
+    assert held == 1
+    assert dead_letter_calls == [["bad"], ["bad"]]
+    assert (batcher.flushed, batcher.failed, batcher.dead_lettered, batcher.held()) == (9, 1, 1, 0)
+
+def test_failed_calls_per_flush_are_capped():
+    """Isolating many rejected entries stops at max_failed_flushes and requeues the rest"""
+    failures = []
+
+    async def flush(batch):
+        if any(item % 2 for item in batch):
+            failures.append(len(batch))
+            raise ValueError("violates foreign key constraint")
+
+    async def run():
+        batcher = BackgroundBatcher(flush, max_batch_size=64, max_delay_seconds=0.001, max_failed_flushes=8)
+        for i in range(64):
+            batcher.add(i)
+        await batcher.drain()
+        return batcher
+
+    batcher = asyncio.run(run())
+    assert len(failures) == 8
+    assert batcher.pending() > 0 and batcher.requeued == batcher.pending()
+    assert batcher.flushed + batcher.failed + batcher.pending() == 64
+
+def test_loyalty_grants_survive_an_outage(monkeypatch):
+    """Points of a completed ride stay queued while accrual answers 503, and are accrued once it recovers"""
+    from uuid import uuid4
+
+    from app import async_crud
+    from app.async_database import PostgrestError
+    from app.schemas import RideResponse
+
+    accrued = []
+
+    class Database:
+        up = False
+
+        async def rpc(self, function, params=None):
+            if not self.up:
+                raise PostgrestError(503, "Database client error. Retrying the connection.")
+            accrued.extend(params["p_grants"])
+            return []
+
+        async def insert(self, table, rows, returning=True):
+            raise AssertionError("nothing should be dead-lettered")
+
+    database = Database()
+    monkeypatch.setattr(async_crud, "get_async_db", lambda: database)
+    monkeypatch.setattr(async_crud.loyalty_grants, "max_delay_seconds", 0.001)
+    ride = RideResponse(id=uuid4(), user_id=uuid4(), algorithm="RGA", fare=20.0, status="completed")
+
+    async def run():
+        async_crud.grant_ride_loyalty_points(ride)
+        await async_crud.loyalty_grants.drain()
+        during_outage = async_crud.loyalty_grants.pending()
+        database.up = True
+        await async_crud.loyalty_grants.drain()
+        return during_outage
+
+    assert asyncio.run(run()) == 1
+    assert [grant["grant_key"] for grant in accrued] == [f"ride:{ride.id}"]
+    assert async_crud.loyalty_grants.pending() == 0
+
+if __name__ == "__main__":
+    test_bad_entry_is_isolated_and_dead_lettered()
+    test_transient_failure_is_retried()
+    test_outage_requeues_entries_instead_of_losing_them()
+    test_dead_letters_are_kept_while_they_cannot_be_stored()
+    test_failed_calls_per_flush_are_capped()
+    print("SUCCESS: background batcher is working correctly")
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the quantized distance/ETA cache
+"""
+
+from app.utils.distance_cache import QuantizedDistanceCache, _great_circle_route
+from app.utils.distance_calc import calculate_distance
+
+def test_nearby_points_share_entry():
+    """Points inside the same grid cell should hit the same cache entry"""
+    cache = QuantizedDistanceCache(grid_meters=50, max_entries=10)
+
+    first = cache.get_or_compute(12.97160, 77.59460, 13.03580, 77.59700, _great_circle_route)
+    second = cache.get_or_compute(12.97161, 77.59461, 13.03581, 77.59701, _great_circle_route)
+
+    print(f"First lookup: {first}, second lookup: {second}")
+    print(f"Cache stats: {cache.stats()}")
+    assert first == second
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+    # The snapped distance should stay within a couple of grid cells of the exact value
+    exact = calculate_distance(12.97160, 77.59460, 13.03580, 77.59700)
+    assert abs(first[0] - exact) < 0.15
+
+def test_lru_eviction():
+    """The least recently used pair should be evicted when the cache is full"""
+    cache = QuantizedDistanceCache(grid_meters=50, max_entries=2)
+
+    cache.get_or_compute(12.0, 77.0, 12.1, 77.1, _great_circle_route)
+    cache.get_or_compute(12.2, 77.2, 12.3, 77.3, _great_circle_route)
+    # Touch the first pair so the second becomes least recently used
+    cache.get_or_compute(12.0, 77.0, 12.1, 77.1, _great_circle_route)
+    cache.get_or_compute(12.4, 77.4, 12.5, 77.5, _great_circle_route)
+
+    stats = cache.stats()
+    print(f"Cache stats after eviction: {stats}")
+    assert stats["size"] == 2
+    assert stats["evictions"] == 1
+
+    # The first pair is still cached, the second one was evicted
+    cache.get_or_compute(12.0, 77.0, 12.1, 77.1, _great_circle_route)
+    assert cache.stats()["hits"] == 2
+    cache.get_or_compute(12.2, 77.2, 12.3, 77.3, _great_circle_route)
+    assert cache.stats()["misses"] == 4
+
+if __name__ == "__main__":
+    test_nearby_points_share_entry()
+    test_lru_eviction()
+    print("SUCCESS: distance cache is working correctly")
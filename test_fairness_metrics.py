@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the streaming fairness metrics engine
+"""
+
+import math
+import random
+
+from app.utils.fairness_metrics import FairnessMetricsEngine, RollingFairnessWindow
+from app.utils.gini_index import gini_index
+
+def quantized(window, utilities):
+    return [window.value(window.bucket(u)) for u in utilities]
+
+def test_window_matches_batch_metrics():
+    """Incremental Gini, welfare, Theil and percentiles match a batch computation on the same values"""
+    random.seed(3)
+    window = RollingFairnessWindow(seconds=60, buckets=1024)
+    utilities = [random.random() for _ in range(300)]
+    for i, utility in enumerate(utilities):
+        window.add(utility, timestamp=i * 0.1)
+
+    # Expire the first 100 entries
+    window.expire(now=60 + 9.95)
+    remaining = quantized(window, utilities[100:])
+    snapshot = window.snapshot()
+    print(f"Snapshot: {snapshot}")
+
+    mean = sum(remaining) / len(remaining)
+    theil = sum((x / mean) * math.log(x / mean) for x in remaining) / len(remaining)
+    ordered = sorted(remaining)
+    assert snapshot["count"] == 200
+    assert abs(snapshot["gini"] - gini_index(remaining)) < 1e-9
+    assert abs(snapshot["social_welfare"] - mean) < 1e-9
+    assert abs(snapshot["theil"] - theil) < 1e-9
+    assert snapshot["percentiles"]["p50"] == ordered[99]
+    assert snapshot["percentiles"]["p99"] == ordered[197]
+
+    # Snapshots are cached until the window changes
+    assert window.snapshot() is snapshot
+
+def test_engine_per_algorithm_and_window():
+    """Runs are tracked per algorithm and combined, and windows expire independently"""
+    engine = FairnessMetricsEngine(windows=[10, 100])
+    engine.record("RGA", [0.9, 0.9], timestamp=0)
+    engine.record("IV", [0.1, 0.9], timestamp=50)
+
+    rga = engine.snapshot("RGA", window=100, now=55)
+    iv = engine.snapshot("IV", window=100, now=55)
+    combined = engine.snapshot("all", window=100, now=55)
+    print(f"RGA: {rga}\nIV: {iv}\nAll: {combined}")
+    assert rga["count"] == 2 and rga["gini"] == 0.0
+    assert iv["gini"] > 0.3
+    assert combined["count"] == 4
+
+    # Only the IV run falls within the 10 second window
+    assert engine.snapshot("all", window=10, now=55)["count"] == 2
+    assert engine.snapshot("RGA", window=10, now=55)["count"] == 0
+
+    assert engine.snapshot("all", window=42) is None
+    assert engine.snapshot("unknown", now=55)["count"] == 0
+
+if __name__ == "__main__":
+    test_window_matches_batch_metrics()
+    test_engine_per_algorithm_and_window()
+    print("SUCCESS: fairness metrics engine is working correctly")
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the live fleet position index (app/fleet_index.py)
+"""
+
+import random
+import uuid
+from unittest import mock
+
+from app.fleet_index import FleetIndex
+from app.schemas import DriverLocation
+from app.utils.distance_calc import calculate_distance
+
+def make_fleet(count, seed=7):
+    rng = random.Random(seed)
+    return [
+        DriverLocation(id=uuid.uuid4(), current_lat=12.9 + rng.random() * 0.2, current_lon=77.5 + rng.random() * 0.2,
+                       available=rng.random() < 0.8)
+        for _ in range(count)
+    ]
+
+def brute_force(fleet, lat, lon, radius_km):
+    return sorted(
+        (calculate_distance(lat, lon, d.current_lat, d.current_lon), d.id)
+        for d in fleet if d.available and calculate_distance(lat, lon, d.current_lat, d.current_lon) <= radius_km
+    )
+
+def test_radius_and_nearest_match_a_full_scan():
+    """Grid queries return exactly what scanning every driver would"""
+    fleet = make_fleet(2000)
+    index = FleetIndex(cell_km=0.5, loader=lambda: fleet)
+    for lat, lon, radius_km in ((12.95, 77.55, 1.0), (13.0, 77.6, 3.0), (12.9, 77.7, 0.2)):
+        found = [(round(distance, 9), driver.id) for driver, distance in index.within(lat, lon, radius_km)]
+        expected = [(round(distance, 9), driver_id) for distance, driver_id in brute_force(fleet, lat, lon, radius_km)]
+        assert found == expected
+        nearest = [driver.id for driver, _ in index.nearest(lat, lon, 5)]
+        assert nearest == [driver_id for _, driver_id in brute_force(fleet, lat, lon, 1000)[:5]]
+    print(f"Index stats: {index.stats()}")
+    assert index.available_count() == sum(d.available for d in fleet)
+
+def test_pings_updates_and_removals():
+    """Pings move drivers between cells; removal keeps the arrays dense and queries consistent"""
+    fleet = make_fleet(50)
+    index = FleetIndex(loader=lambda: fleet)
+    assert len(index.available_drivers()) == sum(d.available for d in fleet)
+
+    mover = fleet[0].id
+    index.update(mover, 48.85, 2.35, available=True, speed=42.0)
+    assert index.nearest(48.85, 2.35, 1)[0][0].id == mover
+    assert index.position(mover).speed == 42.0
+    index.update(mover, 12.95, 77.55)
+    assert index.within(48.85, 2.35, 10) == [] and index.position(mover).speed == 42.0
+
+    for driver in fleet[:25]:
+        index.remove(driver.id)
+    remaining = {d.id for d in fleet[25:] if d.available}
+    assert {driver.id for driver in index.available_drivers()} == remaining
+    assert {driver.id for driver, _ in index.within(13.0, 77.6, 50)} == remaining
+    assert index.position(fleet[0].id) is None and index.position(fleet[30].id).id == fleet[30].id
+
+def test_reload_keeps_newer_local_pings():
+    """A resync from the database doesn't move back drivers that pinged this process since"""
+    fleet = make_fleet(10)
+    index = FleetIndex(loader=lambda: fleet)
+    index.reload()
+    stale = fleet[1]
+
+    def loader():
+        # A ping lands while the database read is in flight
+        index.update(stale.id, 1.0, 1.0)
+        return fleet[1:]
+
+    index._loader = loader
+    assert index.reload()
+    assert (index.position(stale.id).current_lat, index.position(stale.id).current_lon) == (1.0, 1.0)
+    assert index.position(fleet[0].id) is None and index.stats()["drivers"] == 9
+
+    index._loader = lambda: 1 / 0
+    assert not index.reload() and index.stats()["drivers"] == 9
+
+def test_only_driver_rows_create_slots():
+    """Pings and updates for ids that were never read from the drivers table are ignored"""
+    fleet = make_fleet(5)
+    index = FleetIndex(loader=lambda: fleet)
+    index.reload()
+    stranger = uuid.uuid4()
+    index.ping(stranger, 12.95, 77.55, speed=30.0)
+    index.update(stranger, 12.95, 77.55)
+    assert index.position(stranger) is None and index.stats()["drivers"] == 5
+
+    # A new driver row is indexed with the availability it was stored with
+    busy = DriverLocation(id=stranger, current_lat=12.95, current_lon=77.55, available=False)
+    index.track(busy)
+    index.ping(stranger, 12.96, 77.55)
+    assert index.position(stranger).available is False and index.position(stranger).current_lat == 12.96
+    assert stranger not in {driver.id for driver in index.available_drivers()}
+
+def test_smoothed_speed_from_pings():
+    """Speed is measured between consecutive pings, smoothed, and ignores GPS jumps"""
+    index = FleetIndex(loader=lambda: [])
+    driver_id = uuid.uuid4()
+    clock = [1000.0]
+    with mock.patch("app.fleet_index.time.monotonic", lambda: clock[0]):
+        index.track(DriverLocation(id=driver_id, current_lat=12.9, current_lon=77.6, available=True))
+        # Reported speed seeds the estimate, then 0.001 degrees of latitude (~111 m) every 10 s is ~40 km/h
+        index.ping(driver_id, 12.9, 77.6, speed=20.0)
+        assert index.smoothed_speed(driver_id) is None
+        for i in range(1, 11):
+            clock[0] += 10
+            index.ping(driver_id, 12.9 + i * 0.001, 77.6, speed=0.0)
+        speed = index.smoothed_speed(driver_id)
+        print(f"Smoothed speed: {speed:.1f} km/h")
+        assert 38 < speed < 41
+
+        # A 50 km jump in 10 s is not driving
+        clock[0] += 10
+        index.ping(driver_id, 13.35, 77.6)
+        assert index.smoothed_speed(driver_id) == speed
+
+        # Stopped: the estimate decays towards zero but ETAs use a floor speed
+        for _ in range(20):
+            clock[0] += 10
+            index.ping(driver_id, 13.35, 77.6)
+        assert index.smoothed_speed(driver_id) < 1
+        assert index.eta_minutes(driver_id, 2.0, 99.0) == 2.0 / 8 * 60
+
+        # Without recent pings the route estimate is used
+        clock[0] += 600
+        assert index.smoothed_speed(driver_id) is None
+        assert index.eta_minutes(driver_id, 2.0, 7.5) == 7.5
+        assert index.eta_minutes(uuid.uuid4(), 2.0, 7.5) == 7.5
+
+if __name__ == "__main__":
+    test_radius_and_nearest_match_a_full_scan()
+    test_pings_updates_and_removals()
+    test_reload_keeps_newer_local_pings()
+    test_only_driver_rows_create_slots()
+    test_smoothed_speed_from_pings()
+    print("SUCCESS: fleet index is working correctly")
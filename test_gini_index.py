@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the O(n log n) Gini index implementations
+"""
+
+import random
+
+from app.utils import gini_index as gini_module
+from app.utils.gini_index import gini_index, weighted_gini_index
+
+def pairwise_gini(utilities):
+    n = len(utilities)
+    mean_u = sum(utilities) / n
+    return sum(abs(ui - uj) for ui in utilities for uj in utilities) / (2 * n**2 * mean_u)
+
+def test_matches_pairwise_definition():
+    """The sorted form matches the pairwise definition with and without NumPy"""
+    random.seed(1)
+    for n in (1, 2, 7, 300):
+        utilities = [random.random() for _ in range(n)]
+        expected = pairwise_gini(utilities)
+
+        numpy_module = gini_module.np
+        gini_module.np = None
+        try:
+            pure = gini_index(utilities)
+        finally:
+            gini_module.np = numpy_module
+        fast = gini_index(utilities)
+
+        print(f"n={n}: pairwise={expected:.6f} sorted={pure:.6f} fast={fast:.6f}")
+        assert abs(expected - pure) < 1e-9
+        assert abs(expected - fast) < 1e-9
+
+    assert gini_index([]) == 0.0
+    assert gini_index([0.0, 0.0]) == 0.0
+    assert gini_index([0.5, 0.5, 0.5]) == 0.0
+
+def test_weighted_gini():
+    """Integer weights give the same result as repeating each utility"""
+    random.seed(2)
+    utilities = [random.random() for _ in range(400)]
+    weights = [random.randint(1, 4) for _ in utilities]
+    repeated = [u for u, w in zip(utilities, weights) for _ in range(w)]
+
+    weighted = weighted_gini_index(utilities, weights)
+    print(f"Weighted Gini: {weighted:.6f}, repeated Gini: {gini_index(repeated):.6f}")
+    assert abs(weighted - gini_index(repeated)) < 1e-9
+    assert abs(weighted_gini_index(utilities[:10], weights[:10]) - gini_index(repeated[:sum(weights[:10])])) < 1e-9
+    assert weighted_gini_index(utilities) == gini_index(utilities)
+
+if __name__ == "__main__":
+    test_matches_pairwise_definition()
+    test_weighted_gini()
+    print("SUCCESS: Gini index is working correctly")
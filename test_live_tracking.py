@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the live-location WebSocket channels (app/routes/tracking.py, app/utils/pubsub.py)
+"""
+
+import asyncio
+import uuid
+from datetime import datetime, timezone
+from contextlib import contextmanager
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from app.fleet_index import FleetIndex
+from app.routes import tracking
+from app.schemas import DriverLocation, DriverResponse, RiderTrip
+from app.utils.jwt_utils import create_access_token
+from app.utils.pubsub import PubSub, location_pubsub, driver_topic
+
+RIDE_ID, DRIVER_ID, RIDER_ID = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+RIDER_USER_ID, DRIVER_USER_ID, OTHER_USER_ID, ADMIN_USER_ID = (uuid.uuid4() for _ in range(4))
+
+class FakeRide:
+    user_id = RIDER_USER_ID
+    rider_id = RIDER_ID
+    driver_id = DRIVER_ID
+    status = "accepted"
+    start_time = None
+
+def token_for(user_id, role):
+    return create_access_token({"sub": f"{user_id}@example.com", "uid": str(user_id), "role": role})
+
+@contextmanager
+def make_client(submitted):
+    """Tracking routes with the ride, driver and ingest lookups replaced by fakes"""
+    async def get_ride(ride_id):
+        return FakeRide() if ride_id == RIDE_ID else None
+
+    async def get_driver_location(driver_id):
+        return DriverLocation(id=driver_id, current_lat=1.0, current_lon=2.0, available=True)
+
+    driver = DriverResponse(id=DRIVER_ID, user_id=DRIVER_USER_ID, name="d", email="d@example.com",
+                            current_lat=1.0, current_lon=2.0, available=True)
+
+    async def get_driver(driver_id):
+        return driver if driver_id == DRIVER_ID else None
+
+    async def get_driver_by_user_id(user_id):
+        return driver if user_id == DRIVER_USER_ID else None
+
+    async def get_rider_by_user_id(user_id):
+        return None
+
+    async def get_rider_trip(rider_id):
+        # Picked up about 110 km south of the driver, heading to just beside them
+        return RiderTrip(id=rider_id, origin_lat=0.0, origin_lon=2.0, destination_lat=1.0, destination_lon=2.01)
+
+    async def get_driver_trajectory(driver_id, start, end, limit):
+        return [{"lat": 1.0, "lon": 2.0, "updated_at": start.isoformat()}]
+
+    def submit(driver_id, lat, lon, speed=0.0, heading=0.0, user_id=None):
+        submitted.append((driver_id, lat, lon))
+        return len(submitted) <= 2
+
+    fakes = {"get_ride": get_ride, "get_driver_location": get_driver_location, "get_driver": get_driver,
+             "get_driver_by_user_id": get_driver_by_user_id, "get_rider_by_user_id": get_rider_by_user_id,
+             "get_driver_trajectory": get_driver_trajectory, "get_rider_trip": get_rider_trip}
+    originals = {name: getattr(tracking, name) for name in fakes}
+    for name, fake in fakes.items():
+        setattr(tracking, name, fake)
+    tracking.location_ingest.submit = submit
+    app = FastAPI()
+    app.include_router(tracking.router, prefix="/tracking")
+    try:
+        yield TestClient(app)
+    finally:
+        for name, original in originals.items():
+            setattr(tracking, name, original)
+        del tracking.location_ingest.submit
+
+def test_driver_pings_reach_ride_subscribers():
+    """A ping pushed over the driver socket is delivered to every rider watching the ride"""
+    submitted = []
+    with make_client(submitted) as client:
+        _exchange_positions(client)
+    assert len(submitted) == 3
+    assert location_pubsub.subscriber_count(driver_topic(DRIVER_ID)) == 0
+
+def _exchange_positions(client):
+    token, driver_token = token_for(RIDER_USER_ID, "rider"), token_for(DRIVER_USER_ID, "driver")
+
+    with client.websocket_connect(f"/tracking/ws/rides/{RIDE_ID}?token={token}") as rider_a, \
+         client.websocket_connect(f"/tracking/ws/rides/{RIDE_ID}", headers={"Authorization": f"Bearer {token}"}) as rider_b, \
+         client.websocket_connect(f"/tracking/ws/drivers/{DRIVER_ID}?token={driver_token}") as driver:
+        assert rider_a.receive_json() == {"driver_id": str(DRIVER_ID), "lat": 1.0, "lon": 2.0}
+        assert rider_b.receive_json()["lat"] == 1.0
+        assert location_pubsub.subscriber_count(driver_topic(DRIVER_ID)) == 2
+
+        driver.send_json({"lat": 1.5, "lon": 2.5, "speed": 30})
+        for rider in (rider_a, rider_b):
+            position = rider.receive_json()
+            print(f"Pushed position: {position}")
+            assert (position["lat"], position["lon"], position["speed"]) == (1.5, 2.5, 30.0)
+
+        # Bad frames and a full ingest buffer are answered; accepted pings are not
+        driver.send_text("not json")
+        assert "error" in driver.receive_json()
+        driver.send_json({"lat": 95, "lon": 0})
+        assert driver.receive_json()["error"] == "Invalid coordinates"
+        driver.send_json({"lat": 1.6, "lon": 2.6})
+        driver.send_json({"lat": 1.7, "lon": 2.7})
+        assert driver.receive_json()["retry_after"] == 1
+        assert rider_a.receive_json()["lat"] == 1.6
+
+def test_sockets_require_a_token_and_a_ride():
+    """Connections without a valid token, or for an unknown ride, are refused"""
+    token = token_for(RIDER_USER_ID, "rider")
+    with make_client([]) as client:
+        for url in (f"/tracking/ws/rides/{RIDE_ID}", f"/tracking/ws/drivers/{DRIVER_ID}?token=bad",
+                    f"/tracking/ws/rides/{uuid.uuid4()}?token={token}"):
+            _assert_refused(client, url)
+
+def test_sockets_are_limited_to_ride_participants():
+    """Only the driver sends their own pings; only the ride's rider and driver follow it"""
+    rider_token, driver_token = token_for(RIDER_USER_ID, "rider"), token_for(DRIVER_USER_ID, "driver")
+    other_token = token_for(OTHER_USER_ID, "rider")
+    with make_client([]) as client:
+        for url in (f"/tracking/ws/drivers/{DRIVER_ID}?token={rider_token}",
+                    f"/tracking/ws/drivers/{uuid.uuid4()}?token={driver_token}",
+                    f"/tracking/ws/rides/{RIDE_ID}?token={other_token}"):
+            _assert_refused(client, url)
+        with client.websocket_connect(f"/tracking/ws/rides/{RIDE_ID}?token={driver_token}") as driver:
+            assert driver.receive_json()["driver_id"] == str(DRIVER_ID)
+
+def _assert_refused(client, url):
+    try:
+        with client.websocket_connect(url):
+            raise AssertionError(f"{url} should have been refused")
+    except WebSocketDisconnect:
+        pass
+
+def test_pings_for_unknown_drivers_are_refused():
+    """A ping for an id that is not in the drivers table never reaches the ingest buffer"""
+    submitted = []
+    token = token_for(DRIVER_USER_ID, "driver")
+    with make_client(submitted) as client:
+        response = client.post(f"/tracking/drivers/{uuid.uuid4()}/location", json={"lat": 1.0, "lon": 2.0},
+                               headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 404
+    assert submitted == []
+
+def test_trajectory_is_limited_to_the_driver_and_admins():
+    """Other users can't read where a driver has been"""
+    with make_client([]) as client:
+        statuses = {
+            role: client.get(f"/tracking/drivers/{DRIVER_ID}/trajectory",
+                             headers={"Authorization": f"Bearer {token_for(user_id, role)}"}).status_code
+            for user_id, role in ((DRIVER_USER_ID, "driver"), (ADMIN_USER_ID, "admin"), (RIDER_USER_ID, "rider"))
+        }
+    assert statuses == {"driver": 200, "admin": 200, "rider": 403}
+
+def test_started_ride_is_timed_from_the_driver_to_the_destination(monkeypatch):
+    """Once the rider is on board there is no pickup left and drop-off is the driver's remaining leg"""
+    # The driver at their stored position (1.0, 2.0), not where pings of other tests left them
+    monkeypatch.setattr(tracking, "fleet_index", FleetIndex(loader=lambda: []))
+
+    def tracking_info(status):
+        monkeypatch.setattr(FakeRide, "status", status)
+        with make_client([]) as client:
+            response = client.get(f"/tracking/rides/{RIDE_ID}",
+                                  headers={"Authorization": f"Bearer {token_for(RIDER_USER_ID, 'rider')}"})
+        assert response.status_code == 200
+        info = response.json()
+        minutes_to_dropoff = (datetime.fromisoformat(info["eta_dropoff"]) - datetime.now(timezone.utc)).total_seconds() / 60
+        return info, minutes_to_dropoff
+
+    accepted, accepted_minutes = tracking_info("accepted")
+    started, started_minutes = tracking_info("started")
+    print(f"Drop-off in {accepted_minutes:.0f} min before pickup, {started_minutes:.1f} min once started")
+    assert accepted["distance_to_pickup"] > 100
+    assert started["distance_to_pickup"] == 0
+    # The driver is about 1 km from the destination, so far less than the trip back and forth
+    assert started_minutes < 10 < accepted_minutes / 2
+
+def test_slow_subscribers_drop_oldest_messages():
+    """Publishing never blocks: a full subscriber queue loses its oldest message"""
+    async def run():
+        pubsub = PubSub(queue_size=2)
+        async with pubsub.subscribe("driver:1") as queue:
+            for i in range(3):
+                assert pubsub.publish("driver:1", i) == 1
+            assert [queue.get_nowait(), queue.get_nowait()] == [1, 2]
+        assert pubsub.publish("driver:1", 3) == 0
+        return pubsub.stats()
+
+    stats = asyncio.run(run())
+    assert stats["dropped"] == 1 and stats["delivered"] == 3 and stats["subscribers"] == 0
+
+if __name__ == "__main__":
+    test_driver_pings_reach_ride_subscribers()
+    test_sockets_require_a_token_and_a_ride()
+    test_sockets_are_limited_to_ride_participants()
+    test_pings_for_unknown_drivers_are_refused()
+    test_trajectory_is_limited_to_the_driver_and_admins()
+    test_slow_subscribers_drop_oldest_messages()
+    print("SUCCESS: live tracking channels are working correctly")
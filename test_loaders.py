@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Test script to verify request-scoped loaders batch and deduplicate lookups
+"""
+
+import asyncio
+import uuid
+
+import httpx
+
+from app import async_database
+from app.async_database import AsyncPostgrestClient, start_round_trip_count
+from app.async_crud import get_rider_trip, get_driver_location, get_ride, update_ride_status
+from app.loaders import start_request_loaders
+
+RIDER_A, RIDER_B, DRIVER, RIDE = (str(uuid.uuid4()) for _ in range(4))
+
+ROWS = {
+    "riders": [
+        {"id": RIDER_A, "origin_lat": 1.0, "origin_lon": 2.0, "destination_lat": 3.0, "destination_lon": 4.0, "beta": 0.5},
+        {"id": RIDER_B, "origin_lat": 5.0, "origin_lon": 6.0, "destination_lat": 7.0, "destination_lon": 8.0, "beta": 0.5},
+    ],
+    "drivers": [{"id": DRIVER, "current_lat": 1.5, "current_lon": 2.5, "available": True}],
+    "rides": [{"id": RIDE, "rider_id": RIDER_A, "driver_id": DRIVER, "algorithm": "RGA", "status": "requested"}],
+}
+
+def _run(scenario):
+    """Run a scenario inside one request scope against a mock PostgREST, returning the requests it made"""
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request)
+        table = request.url.path.rsplit("/", 1)[-1]
+        if request.method == "PATCH":
+            return httpx.Response(200, json=[dict(ROWS[table][0], status="assigned")])
+        condition = request.url.params["id"]
+        ids = condition[4:-1].replace('"', "").split(",") if condition.startswith("in.") else [condition[3:]]
+        return httpx.Response(200, json=[row for row in ROWS[table] if row["id"] in ids])
+
+    async def run():
+        transport = httpx.MockTransport(handler)
+        client = AsyncPostgrestClient(client=httpx.AsyncClient(base_url="http://db/rest/v1", transport=transport))
+        async_database._client, async_database._client_loop = client, asyncio.get_running_loop()
+        counter = start_round_trip_count()
+        start_request_loaders()
+        try:
+            result = await scenario()
+        finally:
+            await async_database.close_async_db()
+        return result, counter.count
+
+    result, round_trips = asyncio.run(run())
+    print(f"Requests: {[str(request.url) for request in seen]}")
+    return result, round_trips, seen
+
+def test_concurrent_lookups_are_batched():
+    """Lookups issued together become one in.(...) query per table"""
+    async def scenario():
+        return await asyncio.gather(get_rider_trip(RIDER_A), get_rider_trip(RIDER_B), get_driver_location(DRIVER))
+
+    (rider_a, rider_b, driver), round_trips, seen = _run(scenario)
+    assert str(rider_a.id) == RIDER_A and str(rider_b.id) == RIDER_B and str(driver.id) == DRIVER
+    assert round_trips == 2 and len(seen) == 2
+    assert seen[0].url.params["id"].startswith("in.")
+
+def test_repeated_lookups_are_deduplicated():
+    """The same row looked up twice in one request costs one round trip; missing rows load as None"""
+    async def scenario():
+        first = await get_rider_trip(RIDER_A)
+        second = await get_rider_trip(RIDER_A)
+        missing = await get_ride(uuid.uuid4())
+        return first, second, missing
+
+    (first, second, missing), round_trips, _ = _run(scenario)
+    assert first is second and missing is None
+    assert round_trips == 2
+
+def test_writes_invalidate_loaded_rows():
+    """A read after a write to the same table goes back to the database"""
+    async def scenario():
+        await get_ride(RIDE)
+        await update_ride_status(RIDE, "assigned")
+        return await get_ride(RIDE)
+
+    _, round_trips, seen = _run(scenario)
+    assert round_trips == 3
+    assert [request.method for request in seen] == ["GET", "PATCH", "GET"]
+
+if __name__ == "__main__":
+    test_concurrent_lookups_are_batched()
+    test_repeated_lookups_are_deduplicated()
+    test_writes_invalidate_loaded_rows()
+    print("SUCCESS: request loaders are working correctly")
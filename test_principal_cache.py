@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Test script to verify principals are resolved from token claims and the principal cache
+"""
+
+import asyncio
+import time
+import uuid
+from datetime import datetime
+
+from app.schemas import Principal, UserResponse
+from app.utils import auth_utils
+from app.utils.jwt_utils import create_access_token, user_claims
+from app.utils.principal_cache import PrincipalCache, principal_cache, invalidate_principal
+
+USER = UserResponse(id=uuid.uuid4(), name="Test Rider", email="rider@example.com", role="rider",
+                    email_verified=True, created_at=datetime.now())
+
+def _resolve(token, lookups):
+    """Run get_current_user with the database lookup replaced by a recorder"""
+    async def lookup(email):
+        lookups.append(email)
+        return USER.model_copy(update={"role": "both"})
+
+    original = auth_utils.get_user_by_email
+    auth_utils.get_user_by_email = lookup
+    try:
+        return asyncio.run(auth_utils.get_current_user(token))
+    finally:
+        auth_utils.get_user_by_email = original
+
+def test_claims_resolve_without_lookup():
+    """A token carrying id and role claims needs no user lookup"""
+    principal_cache.clear()
+    lookups = []
+    principal = _resolve(create_access_token(data=user_claims(USER)), lookups)
+    print(f"Principal: {principal}")
+    assert principal.id == USER.id and principal.role == "rider" and principal.email == USER.email
+    assert lookups == []
+
+def test_role_change_invalidates_claims():
+    """After a role change, older tokens are resolved from the database once and then cached"""
+    principal_cache.clear()
+    token = create_access_token(data=user_claims(USER))
+    time.sleep(1.1)  # token iat has one-second resolution
+    invalidate_principal(USER.id)
+    lookups = []
+    first = _resolve(token, lookups)
+    second = _resolve(token, lookups)
+    assert first.role == "both" and second.role == "both"
+    assert lookups == [USER.email]
+
+def test_tokens_without_claims_fall_back_to_lookup():
+    principal_cache.clear()
+    lookups = []
+    principal = _resolve(create_access_token(data={"sub": USER.email}), lookups)
+    assert principal.id == USER.id and lookups == [USER.email]
+
+def test_old_claims_are_not_trusted():
+    """Claims older than claims_max_age_seconds need a lookup, so role changes made by other workers apply"""
+    cache = PrincipalCache(claims_max_age_seconds=60)
+    claims = {"sub": USER.email, "uid": str(USER.id), "role": "admin"}
+    assert cache.from_claims(dict(claims, iat=int(time.time()))).role == "admin"
+    assert cache.from_claims(dict(claims, iat=int(time.time()) - 120)) is None
+
+def test_entries_expire():
+    cache = PrincipalCache(ttl_seconds=0.05)
+    principal = Principal(id=USER.id, email=USER.email, role=USER.role)
+    cache.put(principal)
+    assert cache.get(USER.email) == principal
+    time.sleep(0.1)
+    assert cache.get(USER.email) is None
+
+if __name__ == "__main__":
+    test_claims_resolve_without_lookup()
+    test_role_change_invalidates_claims()
+    test_tokens_without_claims_fall_back_to_lookup()
+    test_old_claims_are_not_trusted()
+    test_entries_expire()
+    print("SUCCESS: principal resolution is working correctly")
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Test script to verify algorithm phase timing and runtime histograms
+"""
+
+import time
+
+from app.utils.profiling import (
+    PhaseTimer, runtime_bucket, runtime_bucket_upper_ms, histogram_percentile,
+    fleet_size_bucket, utility_histogram, RUNTIME_HISTOGRAM_SIZE
+)
+
+def test_phase_timer():
+    """Laps are attributed to phases and add up to the total"""
+    timer = PhaseTimer()
+    time.sleep(0.01)
+    timer.lap("data_fetch")
+    time.sleep(0.005)
+    timer.lap("utility")
+    timer.lap("utility")
+
+    metrics = timer.as_metrics()
+    print(f"Timings: {metrics}")
+    assert metrics["data_fetch"] >= 10
+    assert metrics["utility"] >= 5
+    assert abs(metrics["total"] - (metrics["data_fetch"] + metrics["utility"])) < 0.01
+
+def test_runtime_histogram_percentiles():
+    """Percentiles from the log-spaced histogram are within one bucket (about 19%) of the true value"""
+    runtimes = [float(ms) for ms in range(1, 1001)]
+    histogram = [0] * RUNTIME_HISTOGRAM_SIZE
+    for ms in runtimes:
+        bucket = runtime_bucket(ms)
+        assert ms <= runtime_bucket_upper_ms(bucket) * (1 + 1e-9)
+        histogram[bucket] += 1
+
+    for p, expected in ((50, 500), (95, 950), (99, 990)):
+        estimate = histogram_percentile(histogram, p)
+        print(f"p{p}: estimate={estimate} ms, exact={expected} ms")
+        assert expected <= estimate <= expected * 1.19 + 0.001
+
+    assert histogram_percentile([0] * RUNTIME_HISTOGRAM_SIZE, 50) == 0.0
+    assert runtime_bucket(10 ** 9) == RUNTIME_HISTOGRAM_SIZE - 1
+
+def test_buckets():
+    """Fleet sizes round up to powers of two and utilities fill equal-width bins"""
+    assert [fleet_size_bucket(n) for n in (0, 1, 2, 3, 17, 64)] == [0, 1, 2, 4, 32, 64]
+    histogram = utility_histogram([0.0, 0.005, 0.5, 1.0, 1.5, -0.2])
+    assert histogram[0] == 3 and histogram[50] == 1 and histogram[99] == 2
+
+if __name__ == "__main__":
+    test_phase_timer()
+    test_runtime_histogram_percentiles()
+    test_buckets()
+    print("SUCCESS: profiling helpers are working correctly")
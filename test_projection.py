@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the projection schemas only select real columns
+"""
+
+from app.schemas import DriverResponse, DriverLocation, RiderResponse, RiderTrip, projection
+
+def test_projections_are_subsets():
+    """Every projected column exists on the full table model, so the narrowed query stays valid"""
+    for light, full in ((DriverLocation, DriverResponse), (RiderTrip, RiderResponse)):
+        columns = projection(light).split(",")
+        print(f"{light.__name__}: {columns}")
+        assert set(columns) <= set(full.model_fields), set(columns) - set(full.model_fields)
+        assert "id" in columns
+
+def test_projection_parses_full_rows():
+    """A full row also parses into the lightweight model"""
+    row = {"id": "6f1c2b1e-0c1f-4a7e-9a43-5d2d6e1f0a11", "name": "Asha", "email": "asha@example.com",
+           "current_lat": 12.97, "current_lon": 77.59, "available": True, "license_number": "KA01"}
+    location = DriverLocation(**row)
+    assert location.current_lat == 12.97 and location.available is True
+
+if __name__ == "__main__":
+    test_projections_are_subsets()
+    test_projection_parses_full_rows()
+    print("SUCCESS: projection schemas are working correctly")
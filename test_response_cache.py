@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the catalog response cache (app/utils/response_cache.py)
+"""
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from app.utils.response_cache import ResponseCache, response_cache, invalidate_responses, cached_json_response
+
+def make_client(catalog, loads):
+    app = FastAPI()
+
+    def load():
+        loads.append(1)
+        return list(catalog)
+
+    @app.get("/plans")
+    async def plans(request: Request):
+        cached = cached_json_response(request, "test_plans", None, load)
+        return cached if cached is not None else []
+
+    return TestClient(app)
+
+def test_etag_revalidation_and_invalidation():
+    """Repeat reads come from memory, a matching If-None-Match gets a 304 and writes invalidate"""
+    response_cache.clear()
+    catalog, loads = [{"name": "Basic", "price": 9.99}], []
+    client = make_client(catalog, loads)
+
+    first = client.get("/plans")
+    etag = first.headers["etag"]
+    print(f"First response: {first.status_code} {first.json()} ETag {etag}")
+    assert first.status_code == 200 and first.json() == catalog
+
+    assert client.get("/plans").json() == catalog
+    not_modified = client.get("/plans", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304 and not_modified.content == b""
+    assert client.get("/plans", headers={"If-None-Match": f'W/{etag}, "other"'}).status_code == 304
+    assert len(loads) == 1
+
+    # A write drops the cached response; the new content gets a new ETag
+    catalog.append({"name": "Plus", "price": 19.99})
+    invalidate_responses("test_plans")
+    changed = client.get("/plans", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and len(changed.json()) == 2
+    assert changed.headers["etag"] != etag and len(loads) == 2
+
+def test_empty_results_are_not_cached():
+    """An empty or failed load is retried on the next request"""
+    response_cache.clear()
+    loads = []
+    client = make_client([], loads)
+    assert client.get("/plans").json() == []
+    assert client.get("/plans").json() == []
+    assert len(loads) == 2
+
+def test_entries_expire():
+    """Entries are dropped after their TTL and the cache stays within max_entries"""
+    cache = ResponseCache(ttl_seconds=0, max_entries=2)
+    cache.put("plans", None, [1])
+    assert cache.get("plans") is None
+    cache = ResponseCache(ttl_seconds=60, max_entries=2)
+    for key in range(3):
+        cache.put("plans", key, [key])
+    assert cache.get("plans", 0) is None and cache.get("plans", 2).body == b"[2]"
+
+def test_load_racing_an_invalidation_is_not_cached():
+    """Content loaded before a write finished is served once but not kept"""
+    response_cache.clear()
+    catalog, loads = [{"name": "Basic", "price": 9.99}], []
+
+    def load():
+        loads.append(1)
+        stale = list(catalog)
+        if len(loads) == 1:
+            # The plan is updated and invalidated while this request is still reading the old rows
+            catalog[0] = {"name": "Basic", "price": 12.99}
+            invalidate_responses("race_plans")
+        return stale
+
+    app = FastAPI()
+
+    @app.get("/plans")
+    async def plans(request: Request):
+        return cached_json_response(request, "race_plans", None, load)
+
+    client = TestClient(app)
+    assert client.get("/plans").json()[0]["price"] == 9.99
+    assert client.get("/plans").json()[0]["price"] == 12.99
+    assert client.get("/plans").json()[0]["price"] == 12.99
+    assert len(loads) == 2
+
+if __name__ == "__main__":
+    test_etag_revalidation_and_invalidation()
+    test_empty_results_are_not_cached()
+    test_load_racing_an_invalidation_is_not_cached()
+    test_entries_expire()
+    print("SUCCESS: response cache is working correctly")
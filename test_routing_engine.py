@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the OSM road-network routing engine
+"""
+
+import heapq
+import os
+import random
+import tempfile
+
+from app.routing.osm import load_osm_graph, parse_maxspeed
+from app.routing.engine import RoutingEngine
+
+def build_grid_osm(size=6, step=0.002, base_lat=12.97, base_lon=77.59):
+    """Write a small grid city as OSM XML: two-way residential streets and one oneway avenue"""
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', '<osm version="0.6">']
+    for row in range(size):
+        for col in range(size):
+            node_id = row * size + col + 1
+            lines.append(f'  <node id="{node_id}" lat="{base_lat + row * step}" lon="{base_lon + col * step}"/>')
+
+    way_id = 1000
+    for row in range(size):
+        refs = "".join(f'<nd ref="{row * size + col + 1}"/>' for col in range(size))
+        # Row 0 is a fast oneway avenue running east
+        tags = '<tag k="highway" v="primary"/><tag k="oneway" v="yes"/>' if row == 0 else '<tag k="highway" v="residential"/>'
+        lines.append(f'  <way id="{way_id}">{refs}{tags}</way>')
+        way_id += 1
+    for col in range(size):
+        refs = "".join(f'<nd ref="{row * size + col + 1}"/>' for row in range(size))
+        lines.append(f'  <way id="{way_id}">{refs}<tag k="highway" v="residential"/><tag k="maxspeed" v="20"/></way>')
+        way_id += 1
+    # A footpath that must be ignored
+    lines.append(f'  <way id="{way_id}"><nd ref="1"/><nd ref="{size * size}"/><tag k="highway" v="footway"/></way>')
+    lines.append('</osm>')
+
+    handle = tempfile.NamedTemporaryFile("w", suffix=".osm", delete=False)
+    handle.write("\n".join(lines))
+    handle.close()
+    return handle.name
+
+def dijkstra(graph, source, target):
+    adjacency = {}
+    for u, v, seconds, meters in graph.edges:
+        adjacency.setdefault(u, []).append((v, seconds))
+    best = {source: 0.0}
+    queue = [(0.0, source)]
+    while queue:
+        cost, node = heapq.heappop(queue)
+        if node == target:
+            return cost
+        if cost > best[node]:
+            continue
+        for neighbour, seconds in adjacency.get(node, ()):
+            if cost + seconds < best.get(neighbour, float("inf")):
+                best[neighbour] = cost + seconds
+                heapq.heappush(queue, (cost + seconds, neighbour))
+    return None
+
+def test_osm_parsing():
+    """Drivable ways are loaded, footpaths are skipped and oneway streets are respected"""
+    path = build_grid_osm()
+    try:
+        graph = load_osm_graph(path)
+    finally:
+        os.remove(path)
+
+    print(f"Loaded {graph.node_count} nodes and {len(graph.edges)} edges")
+    assert graph.node_count == 36
+    # 5 two-way rows, 6 two-way columns (5 segments each) and one oneway row
+    assert len(graph.edges) == 5 * 5 * 2 + 6 * 5 * 2 + 5
+    assert parse_maxspeed("30 mph") > 48
+    assert parse_maxspeed("signals") is None
+
+def test_hierarchy_matches_dijkstra():
+    """Contraction hierarchy queries must return the same travel times as plain Dijkstra"""
+    path = build_grid_osm()
+    try:
+        graph = load_osm_graph(path)
+    finally:
+        os.remove(path)
+    engine = RoutingEngine.from_graph(graph)
+    print(f"Hierarchy built with {engine.hierarchy.shortcut_count} shortcuts")
+
+    random.seed(7)
+    nodes = list(range(graph.node_count))
+    for _ in range(50):
+        source, target = random.choice(nodes), random.choice(nodes)
+        expected = dijkstra(graph, source, target)
+        actual = engine.hierarchy.query(source, target)
+        assert (expected is None) == (actual is None)
+        if expected is not None:
+            assert abs(actual[0] - expected) < 1e-6
+
+    sources, targets = nodes[:8], nodes[-8:]
+    table = engine.hierarchy.many_to_many(sources, targets)
+    for i, source in enumerate(sources):
+        for j, target in enumerate(targets):
+            assert abs(table[i][j][0] - dijkstra(graph, source, target)) < 1e-6
+
+def test_route_and_table():
+    """Coordinates are snapped to the road network and the oneway avenue is faster eastbound"""
+    path = build_grid_osm()
+    try:
+        engine = RoutingEngine.from_graph(load_osm_graph(path))
+    finally:
+        os.remove(path)
+
+    east = engine.route(12.97, 77.59, 12.97, 77.60)
+    west = engine.route(12.97, 77.60, 12.97, 77.59)
+    print(f"Eastbound: {east}, westbound: {west}")
+    assert east is not None and west is not None
+    assert east[1] < west[1]
+    assert east[0] > 1.0
+
+    # Points far away from any road cannot be routed
+    assert engine.route(13.5, 78.5, 12.97, 77.59) is None
+
+    table = engine.table([(12.97, 77.59), (12.98, 77.60)], [(12.97, 77.60)])
+    assert abs(table[0][0][1] - east[1]) < 1e-6
+    assert table[1][0] is not None
+
+if __name__ == "__main__":
+    test_osm_parsing()
+    test_hierarchy_matches_dijkstra()
+    test_route_and_table()
+    print("SUCCESS: routing engine is working correctly")
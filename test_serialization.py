@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the fast-path serialization layer (app/serialization.py)
+"""
+
+import json
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import List
+from uuid import UUID
+
+from fastapi import Response
+from app.schemas import RideResponse
+from app.serialization import type_adapter, validate_row, validate_rows, dumps, json_response
+
+RIDE_ID = "6f1c2b1e-0c1f-4a7e-9a43-5d2d6e1f0a11"
+
+def test_rows_validate_from_strings_and_datetimes():
+    """PostgREST rows (ISO strings) and asyncpg rows (datetime objects) build the same model"""
+    started = datetime(2024, 5, 1, 8, 30, tzinfo=timezone.utc)
+    from_json = {"id": RIDE_ID, "algorithm": "RGA++", "status": "started", "fare": 12.5, "start_time": started.isoformat()}
+    from_asyncpg = {"id": UUID(RIDE_ID), "algorithm": "RGA++", "status": "started", "fare": Decimal("12.5"), "start_time": started}
+    rides = validate_rows(RideResponse, [from_json, from_asyncpg])
+    print(f"Rides: {rides}")
+    assert rides[0] == rides[1] and rides[0].start_time == started
+    assert validate_row(RideResponse, from_json) == rides[0]
+    assert validate_row(RideResponse, None) is None
+    # Adapters are built once per type
+    assert type_adapter(List[RideResponse]) is type_adapter(List[RideResponse])
+
+def test_json_output_matches_previous_format():
+    """Models, nested models and decimals encode to the same JSON the routes produced before"""
+    ride = validate_row(RideResponse, {"id": RIDE_ID, "algorithm": "RGA++", "status": "completed",
+                                       "end_time": "2024-05-01T09:00:00.123456+00:00"})
+    body = json.loads(dumps({"ride": ride, "rides": [ride], "total": Decimal("3.5")}))
+    print(f"Body: {body}")
+    assert body["ride"] == json.loads(ride.model_dump_json())
+    assert body["ride"]["end_time"] == "2024-05-01T09:00:00.123456+00:00"
+    assert body["rides"] == [body["ride"]] and body["total"] == 3.5
+
+def test_json_response_keeps_route_headers():
+    """Headers a route set on its injected Response (e.g. the next cursor) survive"""
+    injected = Response()
+    del injected.headers["content-length"]
+    injected.headers["X-Next-Cursor"] = "abc"
+    response = json_response([], injected)
+    assert response.headers["x-next-cursor"] == "abc"
+    assert response.headers["content-length"] == "2" and response.body == b"[]"
+
+if __name__ == "__main__":
+    test_rows_validate_from_strings_and_datetimes()
+    test_json_output_matches_previous_format()
+    test_json_response_keeps_route_headers()
+    print("SUCCESS: serialization is working correctly")
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the learned travel-time matrix
+"""
+
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+from app.routing.travel_time_matrix import TravelTimeMatrix, accumulate_pings
+
+BBOX = (12.90, 77.50, 13.10, 77.70)
+
+def make_pings(driver_id, start, points, interval_seconds=60):
+    """Build tracking rows for a driver visiting `points` one ping per interval"""
+    return [
+        {
+            "driver_id": driver_id,
+            "lat": lat,
+            "lon": lon,
+            "updated_at": (start + timedelta(seconds=i * interval_seconds)).isoformat()
+        }
+        for i, (lat, lon) in enumerate(points)
+    ]
+
+def test_accumulate_and_lookup():
+    """Trips between zones are learned per hour of the day"""
+    matrix = TravelTimeMatrix(BBOX, zones=4)
+    start = datetime(2024, 5, 1, 8, 0, tzinfo=timezone.utc)
+
+    rows = []
+    for k in range(3):
+        # Wait two minutes in the first zone, then drive to the opposite corner in ten minutes
+        points = [(12.91, 77.51)] * 3 + [(13.00, 77.60)] * 5 + [(13.09, 77.69)]
+        rows += make_pings(f"driver-{k}", start + timedelta(minutes=k), points, interval_seconds=75)
+    rows.sort(key=lambda row: row["updated_at"])
+
+    observations = accumulate_pings(matrix, rows)
+    print(f"Observations: {observations}, stats: {matrix.stats()}")
+    assert observations > 0
+
+    minutes = matrix.lookup(12.91, 77.51, 13.09, 77.69, start)
+    print(f"Learned corner-to-corner time at 08:00: {minutes}")
+    # Waiting time in the origin zone is not counted as travel
+    assert abs(minutes - 7.5) < 1e-3
+
+    # Other hours fall back to the all-day mean of the zone pair
+    assert abs(matrix.lookup(12.91, 77.51, 13.09, 77.69, start.replace(hour=22)) - 7.5) < 1e-3
+
+    # No data in the reverse direction, within a zone, or outside the bounding box
+    assert matrix.lookup(13.09, 77.69, 12.91, 77.51, start) is None
+    assert matrix.lookup(12.91, 77.51, 12.92, 77.52, start) is None
+    assert matrix.lookup(14.0, 77.51, 13.09, 77.69, start) is None
+
+def test_incremental_watermark_and_file_roundtrip():
+    """Trips starting before the watermark are skipped and the file round-trips"""
+    matrix = TravelTimeMatrix(BBOX, zones=4)
+    start = datetime(2024, 5, 1, 9, 0, tzinfo=timezone.utc)
+    rows = make_pings("driver-1", start, [(12.91, 77.51), (13.09, 77.69)], interval_seconds=240)
+
+    assert accumulate_pings(matrix, rows, since=start) == 0
+    assert accumulate_pings(matrix, rows, since=start - timedelta(seconds=1)) == 1
+
+    # A long gap between pings splits the trace
+    gap_rows = make_pings("driver-2", start, [(12.91, 77.51), (13.09, 77.69)], interval_seconds=3600)
+    assert accumulate_pings(matrix, gap_rows) == 0
+
+    matrix.watermark = start
+    path = tempfile.NamedTemporaryFile(suffix=".ttm", delete=False).name
+    try:
+        matrix.save(path)
+        loaded = TravelTimeMatrix.load(path)
+    finally:
+        os.remove(path)
+
+    print(f"Loaded matrix stats: {loaded.stats()}")
+    assert loaded.bbox == matrix.bbox
+    assert loaded.watermark == start
+    assert loaded.stats()["samples"] == 1
+    assert abs(loaded.lookup(12.91, 77.51, 13.09, 77.69, start, min_samples=1) - 4.0) < 1e-3
+
+if __name__ == "__main__":
+    test_accumulate_and_lookup()
+    test_incremental_watermark_and_file_roundtrip()
+    print("SUCCESS: travel-time matrix is working correctly")